@@ -1,8 +1,11 @@
 from types import NoneType
 import base64
+import httplib
 import locale
 import logging
 import os
+import socket
+import threading
 import urllib
 try:
     import oauth2 as oauth
@@ -19,6 +22,16 @@ from pulp.common.constants import DEFAULT_CA_PATH
 from pulp.common.util import ensure_utf_8, encode_unicode
 
 
+# The number of idle connections to the server kept open for reuse
+DEFAULT_POOL_SIZE = 4
+
+# Errors raised when a connection the server has already closed is reused
+STALE_CONNECTION_ERRORS = (httplib.HTTPException, socket.error, SSL.SSLError)
+
+# Methods that can be sent again when it is not known whether the server received them
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+
 class PulpConnection(object):
     """
     Stub for invoking methods against the Pulp server. By default, the
@@ -27,6 +40,10 @@ class PulpConnection(object):
     parameter can be used to pass in another mechanism to make the actual
     call to the server. The likely use of this is a duck-typed mock object
     for unit testing purposes.
+
+    Connections to the server are kept open and reused by later requests. Up to
+    pool_size idle connections are kept, which threaded callers making requests
+    at the same time may want to raise.
     """
 
     def __init__(self,
@@ -44,7 +61,8 @@ class PulpConnection(object):
                  cert_filename=None,
                  server_wrapper=None,
                  verify_ssl=True,
-                 ca_path=DEFAULT_CA_PATH):
+                 ca_path=DEFAULT_CA_PATH,
+                 pool_size=DEFAULT_POOL_SIZE):
 
         self.host = host
         self.port = port
@@ -84,6 +102,9 @@ class PulpConnection(object):
         self.verify_ssl = verify_ssl
         self.ca_path = ca_path
 
+        # Connection reuse
+        self.pool_size = pool_size
+
     def DELETE(self, path, body=None):
         return self._request('DELETE', path, body=body)
 
@@ -237,6 +258,10 @@ class HTTPSServerWrapper(object):
     This abstraction is used to simplify mocking. In this implementation, the
     intricacies (read: ugliness) of invoking and getting the response from
     the HTTPConnection class are hidden in favor of a simpler API to mock.
+
+    The SSL context is built once and shared by all connections. Connections are
+    kept alive and returned to a pool after each request, and new connections
+    resume the SSL session of the previous one to skip a full handshake.
     """
 
     def __init__(self, pulp_connection):
@@ -245,12 +270,19 @@ class HTTPSServerWrapper(object):
         :type pulp_connection: PulpConnection
         """
         self.pulp_connection = pulp_connection
+        self._ssl_context = None
+        self._ssl_settings = None
+        self._ssl_session = None
+        self._pool = []
+        self._lock = threading.Lock()
 
     def request(self, method, url, body):
         """
         Make the request against the Pulp server, returning a tuple of (status_code, respose_body).
-        This method creates a new connection each time since HTTPSConnection has problems
-        reusing a connection for multiple calls (as claimed by a prior comment in this module).
+        An idle connection from the pool is used if there is one. If the server has closed it,
+        the request is sent again on a new connection, as long as that cannot repeat it: the
+        method is idempotent, the request could not be written, or the server closed the
+        connection without answering.
 
         :param method: The HTTP method to be used for the request (GET, POST, etc.)
         :type  method: str
@@ -266,34 +298,10 @@ class HTTPSServerWrapper(object):
         """
         headers = dict(self.pulp_connection.headers)  # copy so we don't affect the calling method
 
-        # Despite the confusing name, 'sslv23' configures m2crypto to use any available protocol in
-        # the underlying openssl implementation.
-        ssl_context = SSL.Context('sslv23')
-        # This restricts the protocols we are willing to do by configuring m2 not to do SSLv2.0 or
-        # SSLv3.0. EL 5 does not have support for TLS > v1.0, so we have to leave support for
-        # TLSv1.0 enabled.
-        ssl_context.set_options(m2.SSL_OP_NO_SSLv2 | m2.SSL_OP_NO_SSLv3)
-
-        if self.pulp_connection.verify_ssl:
-            ssl_context.set_verify(SSL.verify_peer, depth=100)
-            # We need to stat the ca_path to see if it exists (error if it doesn't), and if so
-            # whether it is a file or a directory. m2crypto has different directives depending on
-            # which type it is.
-            if os.path.isfile(self.pulp_connection.ca_path):
-                ssl_context.load_verify_locations(cafile=self.pulp_connection.ca_path)
-            elif os.path.isdir(self.pulp_connection.ca_path):
-                ssl_context.load_verify_locations(capath=self.pulp_connection.ca_path)
-            else:
-                # If it's not a file and it's not a directory, it's not a valid setting
-                raise exceptions.MissingCAPathException(self.pulp_connection.ca_path)
-        ssl_context.set_session_timeout(self.pulp_connection.timeout)
-
         if self.pulp_connection.username and self.pulp_connection.password:
             raw = ':'.join((self.pulp_connection.username, self.pulp_connection.password))
             encoded = base64.encodestring(raw)[:-1]
             headers['Authorization'] = 'Basic ' + encoded
-        elif self.pulp_connection.cert_filename:
-            ssl_context.load_cert(self.pulp_connection.cert_filename)
 
         # oauth configuration. This block is only True if oauth is not None, so it won't run on RHEL
         # 5.
@@ -314,14 +322,29 @@ class HTTPSServerWrapper(object):
             headers.update(oauth_header)
             headers['pulp-user'] = self.pulp_connection.oauth_user
 
-        connection = httpslib.HTTPSConnection(
-            self.pulp_connection.host, self.pulp_connection.port, ssl_context=ssl_context)
+        connection, reused = self._get_connection()
 
         try:
-            # Request against the server
-            connection.request(method, url, body=body, headers=headers)
-            response = connection.getresponse()
+            sent = False
+            try:
+                # Request against the server
+                self._send(connection, method, url, body, headers)
+                sent = True
+                response, response_body = self._receive(connection)
+            except STALE_CONNECTION_ERRORS, err:
+                self._discard(connection)
+                if not reused:
+                    raise
+                if sent and method.upper() not in IDEMPOTENT_METHODS and \
+                        not _closed_before_response(err):
+                    # The server may have acted on the request already
+                    raise
+                # The server closed the idle connection, so try once more on a new one
+                connection, reused = self._new_connection(), False
+                self._send(connection, method, url, body, headers)
+                response, response_body = self._receive(connection)
         except SSL.SSLError, err:
+            self._discard(connection)
             # Translate stale login certificate to an auth exception
             if 'sslv3 alert certificate expired' == str(err):
                 raise exceptions.ClientCertificateExpiredException(
@@ -330,12 +353,172 @@ class HTTPSServerWrapper(object):
                 raise exceptions.CertificateVerificationException()
             else:
                 raise exceptions.ConnectionException(None, str(err), None)
+        except Exception:
+            self._discard(connection)
+            raise
 
-        # Attempt to deserialize the body (should pass unless the server is busted)
-        response_body = response.read()
+        self._release(connection, response)
 
+        # Attempt to deserialize the body (should pass unless the server is busted)
         try:
             response_body = json.loads(response_body)
         except:
             pass
         return response.status, response_body
+
+    def close(self):
+        """
+        Close the idle connections in the pool.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for connection in pool:
+            self._discard(connection)
+
+    def _send(self, connection, method, url, body, headers):
+        """
+        Write a request to the connection.
+        """
+        connection.request(method, url, body=body, headers=headers)
+
+    def _receive(self, connection):
+        """
+        Read the whole response to a request, so the connection can be used again.
+
+        :return: A 2-tuple of the response and the response body
+        :rtype:  tuple
+        """
+        response = connection.getresponse()
+        return response, response.read()
+
+    def _get_connection(self):
+        """
+        :return: A 2-tuple of a connection to the server, and True if it was taken from the pool
+                 or False if it is new
+        :rtype:  tuple
+        """
+        ssl_context = self._get_ssl_context()
+        with self._lock:
+            while self._pool:
+                connection = self._pool.pop()
+                if connection.ssl_ctx is ssl_context:
+                    return connection, True
+                self._discard(connection)
+        return self._new_connection(), False
+
+    def _new_connection(self):
+        """
+        :return: A new connection to the server that resumes the last SSL session
+        :rtype:  M2Crypto.httpslib.HTTPSConnection
+        """
+        connection = httpslib.HTTPSConnection(
+            self.pulp_connection.host, self.pulp_connection.port,
+            ssl_context=self._get_ssl_context())
+        session = self._ssl_session
+        if session is not None:
+            connection.set_session(session)
+        return connection
+
+    def _release(self, connection, response):
+        """
+        Return a connection to the pool after its response has been read, or close it if the
+        server will close it or the pool is full.
+
+        :param connection: The connection the response was read from
+        :type  connection: M2Crypto.httpslib.HTTPSConnection
+        :param response:   The response that was read
+        :type  response:   httplib.HTTPResponse
+        """
+        if response.will_close:
+            self._discard(connection)
+            return
+        if connection.sock is not None:
+            self._ssl_session = connection.get_session()
+        with self._lock:
+            if len(self._pool) < self.pulp_connection.pool_size:
+                self._pool.append(connection)
+                return
+        self._discard(connection)
+
+    @staticmethod
+    def _discard(connection):
+        """
+        Close a connection. The close() of M2Crypto's HTTPSConnection leaves the socket open, so
+        the socket is closed here.
+
+        :param connection: The connection to close
+        :type  connection: M2Crypto.httpslib.HTTPSConnection
+        """
+        sock, connection.sock = connection.sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except (socket.error, SSL.SSLError):
+                pass
+
+    def _get_ssl_context(self):
+        """
+        Build the SSL context shared by the connections. It is built again if the SSL settings of
+        the pulp connection change, and the connections made with the old one are not reused.
+
+        :return: The SSL context
+        :rtype:  M2Crypto.SSL.Context
+        """
+        pulp_connection = self.pulp_connection
+        client_cert = None
+        if not (pulp_connection.username and pulp_connection.password):
+            client_cert = pulp_connection.cert_filename
+        settings = (pulp_connection.verify_ssl, pulp_connection.ca_path, client_cert,
+                    pulp_connection.timeout)
+        with self._lock:
+            if self._ssl_context is None or settings != self._ssl_settings:
+                self._ssl_context = self._build_ssl_context(client_cert)
+                self._ssl_settings = settings
+                self._ssl_session = None
+            return self._ssl_context
+
+    def _build_ssl_context(self, client_cert):
+        """
+        :param client_cert: The path to the certificate used to authenticate, or None
+        :type  client_cert: str
+
+        :return: A new SSL context
+        :rtype:  M2Crypto.SSL.Context
+        """
+        # Despite the confusing name, 'sslv23' configures m2crypto to use any available protocol in
+        # the underlying openssl implementation.
+        ssl_context = SSL.Context('sslv23')
+        # This restricts the protocols we are willing to do by configuring m2 not to do SSLv2.0 or
+        # SSLv3.0. EL 5 does not have support for TLS > v1.0, so we have to leave support for
+        # TLSv1.0 enabled.
+        ssl_context.set_options(m2.SSL_OP_NO_SSLv2 | m2.SSL_OP_NO_SSLv3)
+
+        if self.pulp_connection.verify_ssl:
+            ssl_context.set_verify(SSL.verify_peer, depth=100)
+            # We need to stat the ca_path to see if it exists (error if it doesn't), and if so
+            # whether it is a file or a directory. m2crypto has different directives depending on
+            # which type it is.
+            if os.path.isfile(self.pulp_connection.ca_path):
+                ssl_context.load_verify_locations(cafile=self.pulp_connection.ca_path)
+            elif os.path.isdir(self.pulp_connection.ca_path):
+                ssl_context.load_verify_locations(capath=self.pulp_connection.ca_path)
+            else:
+                # If it's not a file and it's not a directory, it's not a valid setting
+                raise exceptions.MissingCAPathException(self.pulp_connection.ca_path)
+        ssl_context.set_session_timeout(self.pulp_connection.timeout)
+
+        if client_cert:
+            ssl_context.load_cert(client_cert)
+        return ssl_context
+
+
+def _closed_before_response(err):
+    """
+    :param err: An error raised while reading a response
+    :type  err: Exception
+    :return:    True if the server closed the connection without sending any of a response,
+                as it does with idle connections, rather than failing part way through one
+    :rtype:     bool
+    """
+    # httplib reports an empty status line as its repr
+    return isinstance(err, httplib.BadStatusLine) and err.line in ('', repr(''))
@@ -7,6 +7,10 @@ from pulp.bindings.search import SearchAPI
 import pulp.common.tags as tag_util
 
 
+# The number of tasks requested at a time by get_all_tasks
+TASKS_PAGE_SIZE = 1000
+
+
 class TasksAPI(PulpAPI):
 
     def __init__(self, pulp_connection):
@@ -42,29 +46,50 @@ class TasksAPI(PulpAPI):
         response.response_body = Task(response.response_body)
         return response
 
-    def get_all_tasks(self, tags=()):
+    def get_all_tasks(self, tags=(), details=False, page_size=TASKS_PAGE_SIZE):
         """
         Retrieves all tasks in the system. If tags are specified, only tasks
         that contain all of the given tags are returned. All tasks will be
         represented by Task objects in a list in the response's response_body
-        attribute. By default, completed tasks are excluded but they can be included by setting
-        include_completed to True.
+        attribute.
+
+        The tasks are requested page_size at a time. Their progress reports and
+        results are large, so they are only retrieved when details is True; use
+        get_task to retrieve them for a single task.
 
         :param tags:              if specified, only tasks that contain all tags in the given
                                   list are returned; None to return all tasks
         :type  tags:              list
+        :param details:           if True, include each task's progress_report and result
+        :type  details:           bool
+        :param page_size:         the number of tasks to request at a time
+        :type  page_size:         int
         :return:                  response with a list of Task objects; empty list for no matching
                                   tasks
         :rtype:                   Response
         """
         path = '/v2/tasks/'
-        tags = [('tag', t) for t in tags]
-
-        response = self.server.GET(path, queries=tags)
+        queries = [('tag', t) for t in tags]
+        queries.append(('limit', page_size))
+        if details:
+            queries.append(('details', 'true'))
+
+        docs = []
+        marker = None
+        while True:
+            page_queries = list(queries)
+            if marker is not None:
+                page_queries.append(('marker', marker))
+            response = self.server.GET(path, queries=page_queries)
+            page = response.response_body
+            docs.extend(page)
+            if len(page) < page_size:
+                break
+            marker = _task_oid(page[-1])
 
         tasks = []
         # sort based on id, which is chronological in mongo
-        for doc in sorted(response.response_body, key=lambda x: x['id']['$oid']):
+        for doc in sorted(docs, key=_task_oid):
             tasks.append(Task(doc))
 
         response.response_body = tasks
@@ -94,7 +119,7 @@ class TasksAPI(PulpAPI):
         """
         repo_tag = tag_util.resource_tag(tag_util.RESOURCE_REPOSITORY_TYPE, repo_id)
         sync_tag = tag_util.action_tag(tag_util.ACTION_SYNC_TYPE)
-        return self.get_all_tasks(tags=[repo_tag, sync_tag])
+        return self.get_all_tasks(tags=[repo_tag, sync_tag], details=True)
 
     def get_repo_publish_tasks(self, repo_id):
         """
@@ -108,7 +133,20 @@ class TasksAPI(PulpAPI):
         """
         repo_tag = tag_util.resource_tag(tag_util.RESOURCE_REPOSITORY_TYPE, repo_id)
         publish_tag = tag_util.action_tag(tag_util.ACTION_PUBLISH_TYPE)
-        return self.get_all_tasks(tags=[repo_tag, publish_tag])
+        return self.get_all_tasks(tags=[repo_tag, publish_tag], details=True)
+
+
+def _task_oid(doc):
+    """
+    :param doc: a task returned by the server
+    :type  doc: dict
+    :return:    the database id of the task, which increases in the order tasks are created
+    :rtype:     basestring
+    """
+    task_id = doc['id']
+    if isinstance(task_id, dict):
+        return task_id['$oid']
+    return task_id
 
 
 class TaskSearchAPI(SearchAPI):
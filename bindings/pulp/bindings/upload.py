@@ -9,14 +9,25 @@ class UploadAPI(PulpAPI):
     def __init__(self, pulp_connection):
         super(UploadAPI, self).__init__(pulp_connection)
 
-    def initialize_upload(self):
+    def initialize_upload(self, size=None, checksum_type=None):
         url = '/v2/content/uploads/'
+        body = {}
+        if size is not None:
+            body['size'] = size
+        if checksum_type is not None:
+            body['checksum_type'] = checksum_type
+        if body:
+            return self.server.POST(url, body)
         return self.server.POST(url)
 
     def upload_segment(self, upload_id, offset, data):
         url = '/v2/content/uploads/%s/%s/' % (upload_id, offset)
         return self.server.PUT(url, data, ensure_encoding=False)
 
+    def upload_status(self, upload_id):
+        url = '/v2/content/uploads/%s/' % upload_id
+        return self.server.GET(url)
+
     def list_all_uploads(self):
         url = '/v2/content/uploads/'
         return self.server.GET(url)
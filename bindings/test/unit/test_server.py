@@ -75,6 +75,7 @@ class TestHTTPSServerWrapper(unittest.TestCase):
                 return '{}'
 
             status = 200
+            will_close = False
 
         getresponse.return_value = FakeResponse()
 
@@ -127,6 +128,7 @@ class TestHTTPSServerWrapper(unittest.TestCase):
                 return '{}'
 
             status = 200
+            will_close = False
 
         getresponse.return_value = FakeResponse()
 
@@ -160,6 +162,7 @@ class TestHTTPSServerWrapper(unittest.TestCase):
                 return '{"it": "worked!"}'
 
             status = 200
+            will_close = False
 
         getresponse.return_value = FakeResponse()
 
@@ -172,6 +175,162 @@ class TestHTTPSServerWrapper(unittest.TestCase):
         load_verify_locations.assert_called_once_with(cafile=ca_path)
 
 
+@mock.patch('pulp.bindings.server.SSL.Context')
+@mock.patch('pulp.bindings.server.httpslib.HTTPSConnection')
+class TestHTTPSServerWrapperPool(unittest.TestCase):
+    """
+    This class contains tests for the connection reuse of the HTTPSServerWrapper class.
+    """
+    def setUp(self):
+        self.conn = server.PulpConnection('host', verify_ssl=False, pool_size=1)
+        self.wrapper = server.HTTPSServerWrapper(self.conn)
+
+    @staticmethod
+    def make_connection(ssl_context, will_close=False):
+        connection = mock.Mock(ssl_ctx=ssl_context)
+        response = connection.getresponse.return_value
+        response.status = 200
+        response.read.return_value = '{}'
+        response.will_close = will_close
+        return connection
+
+    def test_connection_reused(self, HTTPSConnection, Context):
+        connection = self.make_connection(Context.return_value)
+        HTTPSConnection.return_value = connection
+
+        self.wrapper.request('GET', '/awesome/api/', '')
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(HTTPSConnection.call_count, 1)
+        self.assertEqual(Context.call_count, 1)
+        self.assertEqual(connection.request.call_count, 2)
+        self.assertEqual(connection.sock.close.call_count, 0)
+
+    def test_will_close(self, HTTPSConnection, Context):
+        connections = [self.make_connection(Context.return_value, will_close=True),
+                       self.make_connection(Context.return_value)]
+        HTTPSConnection.side_effect = connections
+        sock = connections[0].sock
+
+        self.wrapper.request('GET', '/awesome/api/', '')
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(HTTPSConnection.call_count, 2)
+        sock.close.assert_called_once_with()
+
+    def test_session_resumed(self, HTTPSConnection, Context):
+        connections = [self.make_connection(Context.return_value),
+                       self.make_connection(Context.return_value)]
+        HTTPSConnection.side_effect = connections
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        # the first connection is busy, so a second one is opened
+        self.wrapper._pool = []
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        connections[1].set_session.assert_called_once_with(connections[0].get_session.return_value)
+
+    def test_pool_size(self, HTTPSConnection, Context):
+        connections = [self.make_connection(Context.return_value),
+                       self.make_connection(Context.return_value)]
+        HTTPSConnection.side_effect = connections
+        self.wrapper._pool = [connections[0]]
+        sock = connections[1].sock
+
+        self.wrapper._release(connections[1], connections[1].getresponse.return_value)
+
+        self.assertEqual(self.wrapper._pool, [connections[0]])
+        sock.close.assert_called_once_with()
+
+    def test_stale_connection(self, HTTPSConnection, Context):
+        stale = self.make_connection(Context.return_value)
+        stale.getresponse.side_effect = server.httplib.BadStatusLine('')
+        fresh = self.make_connection(Context.return_value)
+        HTTPSConnection.return_value = fresh
+        self.wrapper._get_ssl_context()
+        self.wrapper._pool = [stale]
+
+        status, body = self.wrapper.request('POST', '/awesome/api/', '{}')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(stale.request.call_count, 1)
+        fresh.request.assert_called_once_with('POST', '/awesome/api/', body='{}',
+                                              headers=mock.ANY)
+        self.assertEqual(self.wrapper._pool, [fresh])
+
+    def test_stale_connection_not_written(self, HTTPSConnection, Context):
+        stale = self.make_connection(Context.return_value)
+        stale.request.side_effect = server.socket.error('broken pipe')
+        fresh = self.make_connection(Context.return_value)
+        HTTPSConnection.return_value = fresh
+        self.wrapper._get_ssl_context()
+        self.wrapper._pool = [stale]
+
+        status, body = self.wrapper.request('POST', '/awesome/api/', '{}')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(fresh.request.call_count, 1)
+
+    def test_stale_connection_idempotent(self, HTTPSConnection, Context):
+        stale = self.make_connection(Context.return_value)
+        stale.getresponse.side_effect = server.socket.error('reset')
+        fresh = self.make_connection(Context.return_value)
+        HTTPSConnection.return_value = fresh
+        self.wrapper._get_ssl_context()
+        self.wrapper._pool = [stale]
+
+        status, body = self.wrapper.request('GET', '/awesome/api/', '')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(fresh.request.call_count, 1)
+
+    def test_stale_connection_sent(self, HTTPSConnection, Context):
+        # the POST was written and the server may have acted on it, so it is not sent again
+        stale = self.make_connection(Context.return_value)
+        stale.getresponse.side_effect = server.socket.error('reset')
+        self.wrapper._get_ssl_context()
+        self.wrapper._pool = [stale]
+
+        self.assertRaises(server.socket.error, self.wrapper.request, 'POST', '/awesome/api/',
+                          '{}')
+        self.assertEqual(HTTPSConnection.call_count, 0)
+        self.assertEqual(self.wrapper._pool, [])
+
+    def test_new_connection_error(self, HTTPSConnection, Context):
+        connection = self.make_connection(Context.return_value)
+        connection.request.side_effect = server.socket.error('refused')
+        HTTPSConnection.return_value = connection
+
+        self.assertRaises(server.socket.error, self.wrapper.request, 'GET', '/awesome/api/', '')
+        self.assertEqual(HTTPSConnection.call_count, 1)
+        self.assertEqual(self.wrapper._pool, [])
+
+    def test_settings_changed(self, HTTPSConnection, Context):
+        contexts = [mock.Mock(), mock.Mock()]
+        Context.side_effect = contexts
+        old = self.make_connection(contexts[0])
+        HTTPSConnection.side_effect = [old, self.make_connection(contexts[1])]
+        self.wrapper.request('GET', '/awesome/api/', '')
+        sock = old.sock
+
+        self.conn.cert_filename = '/path/to/cert'
+        self.wrapper.request('GET', '/awesome/api/', '')
+
+        contexts[1].load_cert.assert_called_once_with('/path/to/cert')
+        self.assertEqual(HTTPSConnection.call_count, 2)
+        sock.close.assert_called_once_with()
+
+    def test_close(self, HTTPSConnection, Context):
+        connection = self.make_connection(Context.return_value)
+        sock = connection.sock
+        self.wrapper._pool = [connection]
+
+        self.wrapper.close()
+
+        self.assertEqual(self.wrapper._pool, [])
+        sock.close.assert_called_once_with()
+
+
 class TestPulpConnection(unittest.TestCase):
     """
     This class contains tests for the PulpConnection object.
@@ -211,6 +370,7 @@ class TestPulpConnection(unittest.TestCase):
         self.assertEqual(connection.server_wrapper.pulp_connection, connection)
         self.assertEqual(connection.verify_ssl, True)
         self.assertEqual(connection.ca_path, server.DEFAULT_CA_PATH)
+        self.assertEqual(connection.pool_size, server.DEFAULT_POOL_SIZE)
         # 1142376 - verify default path points to a known valid file
         self.assertEqual(server.DEFAULT_CA_PATH, '/etc/pki/tls/certs/ca-bundle.crt')
 
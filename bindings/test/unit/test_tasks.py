@@ -75,6 +75,37 @@ class TestGetAllTasks(unittest.TestCase):
         for task in ret:
             self.assertTrue(isinstance(task, responses.Task))
 
+    def test_queries(self):
+        self.api.get_all_tasks(tags=['a', 'b'], details=True)
+
+        self.server.GET.assert_called_once_with(
+            '/v2/tasks/', queries=[('tag', 'a'), ('tag', 'b'), ('limit', tasks.TASKS_PAGE_SIZE),
+                                   ('details', 'true')])
+
+    def test_repo_tasks_details(self):
+        # callers of these read the progress_report and result of each task
+        for get_tasks in (self.api.get_repo_sync_tasks, self.api.get_repo_publish_tasks):
+            self.server.GET.reset_mock()
+            self.server.GET.return_value.response_body = copy.deepcopy(TASKS)
+            get_tasks('repo1')
+
+            self.assertTrue(('details', 'true') in self.server.GET.call_args[1]['queries'])
+
+    def test_pages(self):
+        pages = [copy.deepcopy(TASKS[:2]), copy.deepcopy(TASKS[2:])]
+        for page in pages:
+            for doc in page:
+                doc['id'] = doc['id']['$oid']
+        self.server.GET.side_effect = [mock.Mock(response_body=page) for page in pages]
+
+        ret = self.api.get_all_tasks(page_size=2).response_body
+
+        self.assertEqual([t.task_id for t in ret],
+                         [TASKS[0]['task_id'], TASKS[2]['task_id'], TASKS[1]['task_id']])
+        self.assertEqual(self.server.GET.call_count, 2)
+        self.server.GET.assert_called_with(
+            '/v2/tasks/', queries=[('limit', 2), ('marker', TASKS[1]['id']['$oid'])])
+
 
 TASKS = [
     {
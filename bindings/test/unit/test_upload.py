@@ -38,3 +38,22 @@ class TestUploadAPI(unittest.TestCase):
         self.api.server.POST.assert_called_once_with('/v2/repositories/%s/actions/import_upload/'
                                                      % 'repo_id', expected_body)
         self.assertEqual(ret, self.api.server.POST.return_value)
+
+    def test_initialize_upload(self):
+        ret = self.api.initialize_upload()
+
+        self.api.server.POST.assert_called_once_with('/v2/content/uploads/')
+        self.assertEqual(ret, self.api.server.POST.return_value)
+
+    def test_initialize_upload_with_size(self):
+        ret = self.api.initialize_upload(size=1024, checksum_type='sha256')
+
+        self.api.server.POST.assert_called_once_with('/v2/content/uploads/',
+                                                     {'size': 1024, 'checksum_type': 'sha256'})
+        self.assertEqual(ret, self.api.server.POST.return_value)
+
+    def test_upload_status(self):
+        ret = self.api.upload_status('upload_id')
+
+        self.api.server.GET.assert_called_once_with('/v2/content/uploads/upload_id/')
+        self.assertEqual(ret, self.api.server.GET.return_value)
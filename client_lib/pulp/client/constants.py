@@ -1 +1,4 @@
 USER_CONFIG_DIR = '~/.pulp/'
+
+# Name of the file in USER_CONFIG_DIR that indexes the commands each extension pack adds, by role
+EXTENSIONS_INDEX_FILENAME = '%s_extensions_index.json'
@@ -14,6 +14,8 @@ import sys
 
 import pkg_resources
 
+from pulp.common.compat import json
+
 
 _logger = logging.getLogger(__name__)
 
@@ -30,6 +32,13 @@ _ENTRY_POINTS = 'entry points'
 # name of the entry point
 ENTRY_POINT_EXTENSIONS = 'pulp.extensions.%s'
 
+# Format version of the command index; indexes written in another format are rebuilt
+INDEX_VERSION = 1
+
+# Identifiers of the packs in the command index
+_PACK_MODULE = 'module:%s'
+_PACK_ENTRY_POINT = 'entry point:%s'
+
 
 class ExtensionLoaderException(Exception):
     """ Base class for all loading-related exceptions. """
@@ -80,7 +89,7 @@ class InvalidExtensionConfig(ExtensionLoaderException):
     pass
 
 
-def load_extensions(extensions_dir, context, role):
+def load_extensions(extensions_dir, context, role, section=None, index_filename=None):
     """
     @param extensions_dir: directory in which to find extension packs
     @type  extensions_dir: str
@@ -91,6 +100,12 @@ def load_extensions(extensions_dir, context, role):
     This way we can load the modules and entry points for a given priority at
     the same time.
 
+    When an index_filename is given, the root sections and commands each pack
+    adds to the CLI are recorded in the command index the first time all of the
+    packs are loaded. Later calls that name the section about to be run load
+    only the packs that add to it. The index is rebuilt when a pack in the
+    extensions directory is modified or an entry point's distribution changes.
+
     @param context: pre-populated context the extensions should be given to
                     interact with the client
     @type  context: pulp.client.extensions.core.ClientContext
@@ -98,12 +113,37 @@ def load_extensions(extensions_dir, context, role):
     @param role:    name of a role, either "admin" or "consumer", so we know
                     which extensions to load
     @type  role:    str
+
+    @param section: name of the root section or command about to be run, or
+                    None if all of the packs are needed
+    @type  section: str
+
+    @param index_filename: full path to the command index file, or None to not
+                           use an index
+    @type  index_filename: str
     """
 
     # Validation
     if not os.access(extensions_dir, os.F_OK | os.R_OK):
         raise InvalidExtensionsDirectory(extensions_dir)
 
+    entry_points = list(pkg_resources.iter_entry_points(ENTRY_POINT_EXTENSIONS % role))
+
+    # The index only describes the CLI
+    if context.cli is None:
+        index_filename = None
+
+    signature = None
+    index = None
+    if index_filename is not None:
+        signature = _index_signature(extensions_dir, entry_points)
+        index = _read_index(index_filename, signature)
+        if index is not None and section is not None:
+            pack_ids = _required_packs(index, section)
+            if pack_ids:
+                _load_indexed_packs(extensions_dir, context, pack_ids, entry_points)
+                return
+
     # identify modules and sort them
     try:
         unsorted_modules = _load_pack_modules(extensions_dir)
@@ -112,13 +152,19 @@ def load_extensions(extensions_dir, context, role):
         raise LoadFailed([e.pack_name]), None, sys.exc_info()[2]
 
     # find extensions from entry points and add them to the sorted structure
-    for extension in pkg_resources.iter_entry_points(ENTRY_POINT_EXTENSIONS % role):
+    for extension in entry_points:
         priority = getattr(extension, PRIORITY_VAR, DEFAULT_PRIORITY)
         sorted_extensions.setdefault(priority, {}).setdefault(_ENTRY_POINTS, []).append(extension)
 
+    # Only record what each pack adds if the index needs to be written
+    record = index_filename is not None and index is None
+    packs = []
+
     error_packs = []
     for priority in sorted(sorted_extensions.keys()):
         for module in sorted_extensions[priority].get(_MODULES, []):
+            if record:
+                before = _cli_snapshot(context.cli)
             try:
                 _load_pack(extensions_dir, module, context)
             except ExtensionLoaderException, e:
@@ -126,12 +172,24 @@ def load_extensions(extensions_dir, context, role):
                 # the cause will be logged by _load_pack. This method should
                 # continue to load extensions so all of the errors are logged.
                 error_packs.append(module.__name__)
+                continue
+            if record:
+                packs.append([_PACK_MODULE % module.__name__,
+                              _cli_changes(before, _cli_snapshot(context.cli))])
         for entry_point in sorted_extensions[priority].get(_ENTRY_POINTS, []):
+            if record:
+                before = _cli_snapshot(context.cli)
             entry_point.load()(context)
+            if record:
+                packs.append([_PACK_ENTRY_POINT % entry_point,
+                              _cli_changes(before, _cli_snapshot(context.cli))])
 
     if len(error_packs) > 0:
         raise LoadFailed(error_packs)
 
+    if record:
+        _write_index(index_filename, signature, packs)
+
 
 def _load_pack_modules(extensions_dir):
     """
@@ -248,3 +306,179 @@ def _load_pack(extensions_dir, pack_module, context):
     except Exception:
         _logger.exception(_('Module [%(m)s] could not be initialized' % {'m': init_mod_name}))
         raise InitError(), None, sys.exc_info()[2]
+
+
+def _load_indexed_packs(extensions_dir, context, pack_ids, entry_points):
+    """
+    Loads only the given packs, in the order they are listed.
+
+    @param pack_ids: command index identifiers of the packs to load
+    @type  pack_ids: list
+
+    @param entry_points: the extension entry points of the role
+    @type  entry_points: list
+
+    @raises LoadFailed: if any of the packs cannot be loaded
+    """
+    if extensions_dir not in sys.path:
+        sys.path.append(extensions_dir)
+
+    entry_points = dict((_PACK_ENTRY_POINT % entry_point, entry_point)
+                        for entry_point in entry_points)
+
+    error_packs = []
+    for pack_id in pack_ids:
+        if pack_id in entry_points:
+            entry_points[pack_id].load()(context)
+            continue
+
+        pack = pack_id[len(_PACK_MODULE % ''):]
+        try:
+            module = __import__(pack)
+        except Exception:
+            raise LoadFailed([pack]), None, sys.exc_info()[2]
+        try:
+            _load_pack(extensions_dir, module, context)
+        except ExtensionLoaderException:
+            error_packs.append(pack)
+
+    if len(error_packs) > 0:
+        raise LoadFailed(error_packs)
+
+
+def _index_signature(extensions_dir, entry_points):
+    """
+    Describes the installed packs so a command index built for other packs
+    is not used. Packs in the extensions directory are described by the latest
+    modification time of their python source files, which unlike the directories
+    do not change when the modules are compiled, and entry points by the version
+    of the distribution providing them.
+
+    @param entry_points: the extension entry points of the role
+    @type  entry_points: list
+
+    @return: JSON serializable description of the packs
+    @rtype:  list
+    """
+    modules = []
+    for pack in sorted(os.listdir(extensions_dir)):
+        if pack.startswith('.'):
+            continue
+        mtime = 0
+        for dir_path, dir_names, file_names in os.walk(os.path.join(extensions_dir, pack)):
+            for name in file_names:
+                if name.endswith('.py'):
+                    mtime = max(mtime, os.path.getmtime(os.path.join(dir_path, name)))
+        modules.append([pack, mtime])
+
+    distributions = []
+    for entry_point in entry_points:
+        dist = entry_point.dist
+        version = dist and '%s-%s' % (dist.project_name, dist.version)
+        distributions.append([str(entry_point), version])
+    distributions.sort()
+
+    return [INDEX_VERSION, extensions_dir, modules, distributions]
+
+
+def _read_index(index_filename, signature):
+    """
+    @return: the packs in the command index, each a list of the pack identifier
+             and the names of the root sections and commands it adds to, or None
+             if there is no index or it was built for other packs
+    @rtype:  list or None
+    """
+    try:
+        f = open(index_filename)
+        try:
+            index = json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return None
+
+    if not isinstance(index, dict) or index.get('signature') != signature:
+        return None
+    return index.get('packs')
+
+
+def _write_index(index_filename, signature, packs):
+    """
+    Writes the command index. The index only saves time, so failing to write
+    it is logged rather than raised.
+    """
+    temp_filename = '%s.%d' % (index_filename, os.getpid())
+    try:
+        f = open(temp_filename, 'w')
+        try:
+            json.dump({'signature': signature, 'packs': packs}, f)
+        finally:
+            f.close()
+        os.rename(temp_filename, index_filename)
+    except (IOError, OSError):
+        _logger.debug(_('Could not write the extensions command index [%(f)s]' %
+                        {'f': index_filename}), exc_info=True)
+
+
+def _required_packs(packs, section):
+    """
+    Determines the packs needed to run a root section or command. These are
+    the packs that add to it, and the packs that add to any other root
+    section one of those packs adds to, since a pack may expect to find
+    sections added by another.
+
+    @param packs: the packs in the command index
+    @type  packs: list
+
+    @param section: name of the root section or command
+    @type  section: str
+
+    @return: identifiers of the required packs in the order they are loaded;
+             empty if no pack adds the section
+    @rtype:  list
+    """
+    names = set([section])
+    required = set()
+    changed = True
+    while changed:
+        changed = False
+        for pack_id, pack_names in packs:
+            if pack_id not in required and names.intersection(pack_names):
+                required.add(pack_id)
+                names.update(pack_names)
+                changed = True
+    return [pack_id for pack_id, pack_names in packs if pack_id in required]
+
+
+def _cli_snapshot(cli):
+    """
+    @return: the structure under each root section and command, keyed by name
+    @rtype:  dict
+    """
+    root = cli.root_section
+    snapshot = dict((name, None) for name in root.commands)
+    for name, subsection in root.subsections.items():
+        snapshot[name] = _section_structure(subsection)
+    return snapshot
+
+
+def _section_structure(section):
+    """
+    @return: the names of the commands in the section and the structure of
+             each of its subsections
+    @rtype:  tuple
+    """
+    subsections = sorted((name, _section_structure(subsection))
+                         for name, subsection in section.subsections.items())
+    return tuple(sorted(section.commands)), tuple(subsections)
+
+
+def _cli_changes(before, after):
+    """
+    @return: names of the root sections and commands that were added, removed
+             or changed between two snapshots
+    @rtype:  list
+    """
+    names = set(before).symmetric_difference(after)
+    names.update(name for name in after if name in before and before[name] != after[name])
+    return sorted(names)
@@ -98,8 +98,17 @@ def main(config, exception_handler_class=ExceptionHandler):
     extensions_dir = os.path.expanduser(extensions_dir)
 
     role = config['client']['role']
+
+    # Only the packs that add to the section being run are loaded; everything
+    # is loaded when the root usage or the map will be displayed
+    section = None
+    if args and not args[0].startswith('-') and not options.print_map:
+        section = args[0]
+    index_filename = os.path.join(os.path.expanduser(constants.USER_CONFIG_DIR),
+                                  constants.EXTENSIONS_INDEX_FILENAME % role)
+
     try:
-        extensions_loader.load_extensions(extensions_dir, context, role)
+        extensions_loader.load_extensions(extensions_dir, context, role, section, index_filename)
     except extensions_loader.LoadFailed, e:
         prompt.write(
             _('The following extensions failed to load: %(f)s' % {'f': ', '.join(e.failed_packs)}))
@@ -7,13 +7,21 @@ client-side tracking of upload requests on the server.
 
 import copy
 import errno
+import mmap
 import os
 import pickle
+import Queue
+import sys
+import threading
+import time
 
 from pulp.common.lock import LockFile
 
 
 DEFAULT_CHUNKSIZE = 1048576  # 1 MB per upload call
+DEFAULT_CONCURRENCY = 4  # number of upload calls in progress at once
+TRACKER_SAVE_INTERVAL = 5  # seconds between saves of the tracker file during an upload
+RESULT_POLL_INTERVAL = 0.5  # seconds to wait for an upload call before checking again
 
 
 class ManagerUninitializedException(Exception):
@@ -71,7 +79,8 @@ class UploadManager(object):
     on disk state files.
     """
 
-    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE):
+    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE,
+                 concurrency=DEFAULT_CONCURRENCY):
         """
         @param upload_working_dir: directory in which to store client-side files
                to track upload requests; if it doesn't exist it will be created
@@ -84,10 +93,15 @@ class UploadManager(object):
         @param chunk_size: size in bytes of data to upload on each call to the
                server
         @type  chunk_size: int
+
+        @param concurrency: number of upload calls to the server that may be
+               in progress at once
+        @type  concurrency: int
         """
         self.upload_working_dir = upload_working_dir
         self.bindings = bindings
         self.chunk_size = chunk_size
+        self.concurrency = concurrency
 
         # Internal state
         self.tracker_files = {}
@@ -187,9 +201,16 @@ class UploadManager(object):
         client-side on disk tracker files will store the current offset and
         resume the upload from where it left off on the next call to this method.
 
+        Segments of the file are uploaded by up to concurrency threads at
+        once, so they may finish out of order. The tracker file records which
+        segments past its offset have been uploaded, so a resumed upload only
+        sends the gaps. It is saved every TRACKER_SAVE_INTERVAL seconds and
+        when the upload stops; segments finished since the last save are sent
+        again if the process dies.
+
         The callback_func is used to get feedback on the upload process. After
         each successful upload segment call to the server, this function
-        will be invoked with the new offset in the file and the file size
+        will be invoked with the number of bytes uploaded and the file size
         (intended to be fed into a progress indicator). As this is called
         after each upload segment call, the granularity at which it is called
         depends on the chunk_size value for this instance.
@@ -234,23 +255,19 @@ class UploadManager(object):
             tracker_file.save()
 
             source_file_size = os.path.getsize(tracker_file.source_filename)
+            segments = tracker_file.pending_segments(source_file_size, self.chunk_size)
 
-            f = open(tracker_file.source_filename, 'r')
-            while True:
-                # Load the chunk to upload
-                f.seek(tracker_file.offset)
-                data = f.read(self.chunk_size)
-                if not data:
-                    break
-
-                # Server request
-                self.bindings.uploads.upload_segment(upload_id, tracker_file.offset, data)
-
-                # Status update and callback notification
-                tracker_file.offset = min(tracker_file.offset + self.chunk_size, source_file_size)
-                tracker_file.save()
-
-                callback_func(tracker_file.offset, source_file_size)
+            if segments:
+                f = open(tracker_file.source_filename, 'r')
+                try:
+                    source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    try:
+                        self._upload_segments(tracker_file, source, segments, source_file_size,
+                                              callback_func)
+                    finally:
+                        source.close()
+                finally:
+                    f.close()
 
             tracker_file.is_finished_uploading = True
         finally:
@@ -259,6 +276,114 @@ class UploadManager(object):
             tracker_file.is_running = False
             tracker_file.save()
 
+    def _upload_segments(self, tracker_file, source, segments, source_file_size,
+                         callback_func):
+        """
+        Upload the given segments of the source file with up to concurrency
+        threads, recording each finished segment in the tracker. If an upload
+        call fails, no more segments are started and the error is raised once
+        the calls in progress have finished.
+
+        @param tracker_file: tracker for the upload request
+        @type  tracker_file: UploadTracker
+
+        @param source: contents of the file being uploaded
+        @type  source: mmap.mmap
+
+        @param segments: offset and length of each segment to upload
+        @type  segments: list of (int, int)
+
+        @param source_file_size: size of the file being uploaded
+        @type  source_file_size: int
+
+        @param callback_func: optional method to be called after each upload
+               call to the server
+        @type  callback_func: func
+        """
+        pending = Queue.Queue()
+        for segment in segments:
+            pending.put(segment)
+        results = Queue.Queue()
+        stop = threading.Event()
+
+        workers = []
+        for i in range(max(1, min(self.concurrency, len(segments)))):
+            worker = threading.Thread(target=self._upload_worker,
+                                      args=(tracker_file.upload_id, source, pending, results,
+                                            stop))
+            worker.setDaemon(True)
+            worker.start()
+            workers.append(worker)
+
+        try:
+            last_save = time.time()
+            for i in range(len(segments)):
+                # Wait with a timeout so a KeyboardInterrupt is still delivered
+                while True:
+                    try:
+                        offset, length, error = results.get(timeout=RESULT_POLL_INTERVAL)
+                        break
+                    except Queue.Empty:
+                        pass
+                if error is not None:
+                    raise error[0], error[1], error[2]
+
+                tracker_file.segment_uploaded(offset, length)
+                if time.time() - last_save >= TRACKER_SAVE_INTERVAL:
+                    tracker_file.save()
+                    last_save = time.time()
+
+                if callback_func:
+                    callback_func(tracker_file.uploaded_size(), source_file_size)
+        finally:
+            # Let the calls in progress finish so the segments they upload are recorded
+            stop.set()
+            for worker in workers:
+                while worker.isAlive():
+                    worker.join(RESULT_POLL_INTERVAL)
+            while True:
+                try:
+                    offset, length, error = results.get_nowait()
+                except Queue.Empty:
+                    break
+                if error is None:
+                    tracker_file.segment_uploaded(offset, length)
+
+    def _upload_worker(self, upload_id, source, pending, results, stop):
+        """
+        Upload segments from the pending queue until it is empty or the upload
+        is stopped, putting a tuple of offset, length and error for each
+        segment in the results queue. The error is None if the segment was
+        uploaded or the exc_info of the failure otherwise.
+
+        @param upload_id: identifies the upload request
+        @type  upload_id: str
+
+        @param source: contents of the file being uploaded
+        @type  source: mmap.mmap
+
+        @param pending: offset and length of each segment left to upload
+        @type  pending: Queue.Queue
+
+        @param results: queue the outcome of each segment is put in
+        @type  results: Queue.Queue
+
+        @param stop: set when no more segments should be started
+        @type  stop: threading.Event
+        """
+        while not stop.isSet():
+            try:
+                offset, length = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                self.bindings.uploads.upload_segment(upload_id, offset,
+                                                     source[offset:offset + length])
+            except Exception:
+                results.put((offset, length, sys.exc_info()))
+                return
+            results.put((offset, length, None))
+
     def import_upload(self, upload_id):
         """
         Once the file is finished uploading, this call will request the server
@@ -397,7 +522,8 @@ class UploadTracker(object):
         # Upload call information
         self.upload_id = None
         self.location = None  # URL to the upload request on the server
-        self.offset = None  # start of next chunk to upload
+        self.offset = None  # everything before this offset has been uploaded
+        self.uploaded_segments = {}  # start to end offset of segments uploaded past offset
         self.source_filename = None  # path on disk to the file to upload
 
         # Import call information
@@ -410,6 +536,60 @@ class UploadTracker(object):
         self.is_running = False
         self.is_finished_uploading = False
 
+    def pending_segments(self, file_size, chunk_size):
+        """
+        Returns the segments of the source file that have not been uploaded,
+        split into chunks of at most chunk_size bytes.
+
+        @param file_size: size of the source file
+        @type  file_size: int
+
+        @param chunk_size: largest segment to return
+        @type  chunk_size: int
+
+        @return: offset and length of each segment, in file order
+        @rtype:  list of (int, int)
+        """
+        uploaded = sorted(self.uploaded_segments.items())
+        segments = []
+        position = self.offset
+        i = 0
+        while position < file_size:
+            # Skip the uploaded segments that end before the current position
+            while i < len(uploaded) and uploaded[i][1] <= position:
+                i += 1
+            if i < len(uploaded) and uploaded[i][0] <= position:
+                position = uploaded[i][1]
+                continue
+            end = min(position + chunk_size, file_size)
+            if i < len(uploaded):
+                end = min(end, uploaded[i][0])
+            segments.append((position, end - position))
+            position = end
+        return segments
+
+    def segment_uploaded(self, offset, length):
+        """
+        Records that a segment of the source file has been uploaded, advancing
+        the offset over any uploaded segments that now follow it.
+
+        @param offset: start of the segment
+        @type  offset: int
+
+        @param length: size of the segment
+        @type  length: int
+        """
+        self.uploaded_segments[offset] = offset + length
+        while self.offset in self.uploaded_segments:
+            self.offset = self.uploaded_segments.pop(self.offset)
+
+    def uploaded_size(self):
+        """
+        @return: number of bytes of the source file that have been uploaded
+        @rtype:  int
+        """
+        return self.offset + sum(end - start for start, end in self.uploaded_segments.items())
+
     def save(self):
         """
         Saves the current state of the tracker file. This will lock on the file
@@ -449,4 +629,7 @@ class UploadTracker(object):
         status_file = pickle.load(f)
         f.close()
 
+        # Tracker files saved before segments could finish out of order
+        status_file.__dict__.setdefault('uploaded_segments', {})
+
         return status_file
@@ -250,6 +250,7 @@ class UploadManagerTests(unittest.TestCase):
     def test_upload_multiple_passes(self):
         # Setup
         self.upload_manager.chunk_size = 100
+        self.upload_manager.concurrency = 1  # so the callbacks arrive in file order
         self.upload_manager.initialize()
         upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1', {'k' : 'v'}, 'm-1')
 
@@ -302,10 +303,82 @@ class UploadManagerTests(unittest.TestCase):
         tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
         self.assertEqual(rpm_size, tracker.offset)
 
+    def test_upload_parallel(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.concurrency = 4
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+
+        mock_callback = mock.Mock()
+
+        # Test
+        self.upload_manager.upload(upload_id, mock_callback.update_status)
+
+        # Verify each segment was sent once with the right contents
+        f = open(TEST_RPM_FILENAME, 'r')
+        contents = f.read()
+        f.close()
+        rpm_size = len(contents)
+
+        uploaded = {}
+        for single_call_args in self.mock_upload_bindings.upload_segment.call_args_list:
+            upload_args = single_call_args[0]
+            self.assertEqual(upload_id, upload_args[0])
+            self.assertTrue(upload_args[1] not in uploaded)
+            uploaded[upload_args[1]] = upload_args[2]
+        self.assertEqual(contents, ''.join(uploaded[o] for o in sorted(uploaded)))
+
+        self.assertEqual(len(uploaded), mock_callback.update_status.call_count)
+        self.assertEqual((rpm_size, rpm_size), mock_callback.update_status.call_args[0])
+
+        tracker = upload_util.UploadTracker.load(self.upload_manager._tracker_filename(upload_id))
+        self.assertEqual(rpm_size, tracker.offset)
+        self.assertEqual({}, tracker.uploaded_segments)
+        self.assertEqual(True, tracker.is_finished_uploading)
+
+    def test_upload_resume_with_gaps(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        tracker.segment_uploaded(0, 100)
+        tracker.segment_uploaded(200, 300)
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify the uploaded segments were not sent again
+        offsets = sorted(c[0][1] for c in self.mock_upload_bindings.upload_segment.call_args_list)
+        self.assertEqual(100, offsets[0])
+        self.assertEqual(500, offsets[1])
+        self.assertTrue(200 not in offsets)
+        self.assertEqual(os.path.getsize(TEST_RPM_FILENAME), tracker.offset)
+
+    def test_upload_segment_error(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.concurrency = 1
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        self.mock_upload_bindings.upload_segment.side_effect = [Response(200, {}),
+                                                                ValueError('oops')]
+
+        # Test
+        self.assertRaises(ValueError, self.upload_manager.upload, upload_id, mock.Mock())
+
+        # Verify the segment that was uploaded is saved and the upload can be resumed
+        tracker = upload_util.UploadTracker.load(self.upload_manager._tracker_filename(upload_id))
+        self.assertEqual(100, tracker.offset)
+        self.assertEqual(False, tracker.is_running)
+        self.assertEqual(False, tracker.is_finished_uploading)
+
     def test_upload_concurrent_upload(self):
         # Setup
         self.upload_manager.initialize()
-        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1', {'k' : 'v'}, 'm-1')
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
 
         tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
         tracker.is_running = True
@@ -452,3 +525,41 @@ class UploadManagerTests(unittest.TestCase):
         Configures the mock bindings to return a valid response on importing an upload.
         """
         self.mock_upload_bindings.import_upload.return_value = Response(200, {})
+
+
+class UploadTrackerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tracker = upload_util.UploadTracker('/tmp/pulp-upload-tracker-test')
+        self.tracker.offset = 0
+
+    def test_pending_segments(self):
+        self.assertEqual([(0, 4), (4, 4), (8, 2)], self.tracker.pending_segments(10, 4))
+
+    def test_pending_segments_with_gaps(self):
+        self.tracker.segment_uploaded(0, 4)
+        self.tracker.segment_uploaded(6, 2)
+
+        self.assertEqual([(4, 2), (8, 2)], self.tracker.pending_segments(10, 4))
+
+    def test_segment_uploaded_out_of_order(self):
+        self.tracker.segment_uploaded(4, 4)
+        self.tracker.segment_uploaded(8, 2)
+        self.assertEqual(0, self.tracker.offset)
+        self.assertEqual(6, self.tracker.uploaded_size())
+
+        self.tracker.segment_uploaded(0, 4)
+
+        self.assertEqual(10, self.tracker.offset)
+        self.assertEqual({}, self.tracker.uploaded_segments)
+        self.assertEqual(10, self.tracker.uploaded_size())
+
+    def test_load_old_tracker(self):
+        del self.tracker.uploaded_segments
+        self.tracker.save()
+        try:
+            tracker = upload_util.UploadTracker.load(self.tracker.filename)
+        finally:
+            self.tracker.delete()
+
+        self.assertEqual({}, tracker.uploaded_segments)
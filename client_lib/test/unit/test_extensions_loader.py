@@ -9,8 +9,11 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import json
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 import mock
@@ -203,3 +206,93 @@ class ExtensionLoaderTests(unittest.TestCase):
         def foo():
             pass
         self.assertEqual(getattr(foo, loader.PRIORITY_VAR), loader.DEFAULT_PRIORITY)
+
+
+class CommandIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        super(CommandIndexTests, self).setUp()
+        self.working_dir = tempfile.mkdtemp(prefix='extensions-index-')
+        self.index_filename = os.path.join(self.working_dir, 'admin_extensions_index.json')
+
+    def tearDown(self):
+        super(CommandIndexTests, self).tearDown()
+        shutil.rmtree(self.working_dir)
+
+    def _context(self):
+        prompt = PulpPrompt()
+        cli = PulpCli(prompt)
+        return ClientContext(None, None, None, prompt, None, cli=cli)
+
+    def _sections(self, context):
+        return sorted(context.cli.root_section.subsections)
+
+    @mock.patch('pkg_resources.iter_entry_points', return_value=())
+    def test_build_index(self, mock_entry):
+        context = self._context()
+
+        loader.load_extensions(VALID_SET, context, 'admin', 'section-2', self.index_filename)
+
+        # everything is loaded while the index is built
+        self.assertEqual(self._sections(context), ['section-1', 'section-2', 'section-3'])
+        index = json.load(open(self.index_filename))
+        self.assertEqual(index['packs'], [['module:ext3', ['section-3']],
+                                          ['module:ext1', ['section-1']],
+                                          ['module:ext4', []],
+                                          ['module:ext2', ['section-2']]])
+
+    @mock.patch('pkg_resources.iter_entry_points', return_value=())
+    def test_load_indexed_section(self, mock_entry):
+        loader.load_extensions(VALID_SET, self._context(), 'admin', None, self.index_filename)
+        context = self._context()
+
+        loader.load_extensions(VALID_SET, context, 'admin', 'section-2', self.index_filename)
+
+        self.assertEqual(self._sections(context), ['section-2'])
+
+    @mock.patch('pkg_resources.iter_entry_points', return_value=())
+    def test_load_indexed_unknown_section(self, mock_entry):
+        loader.load_extensions(VALID_SET, self._context(), 'admin', None, self.index_filename)
+        context = self._context()
+
+        loader.load_extensions(VALID_SET, context, 'admin', 'fake', self.index_filename)
+
+        self.assertEqual(self._sections(context), ['section-1', 'section-2', 'section-3'])
+
+    @mock.patch('pkg_resources.iter_entry_points', return_value=())
+    def test_stale_index(self, mock_entry):
+        loader.load_extensions(VALID_SET, self._context(), 'admin', None, self.index_filename)
+        index = json.load(open(self.index_filename))
+        index['signature'][2][0][1] -= 10
+        json.dump(index, open(self.index_filename, 'w'))
+        context = self._context()
+
+        loader.load_extensions(VALID_SET, context, 'admin', 'section-2', self.index_filename)
+
+        self.assertEqual(self._sections(context), ['section-1', 'section-2', 'section-3'])
+        index = json.load(open(self.index_filename))
+        self.assertEqual(index['signature'],
+                         loader._index_signature(VALID_SET, []))
+
+    @mock.patch('pkg_resources.iter_entry_points', autospec=True)
+    def test_load_indexed_entry_point(self, mock_iter):
+        def initialize(context):
+            context.cli.create_section('section-ep', 'Entry point section')
+        entry_point = mock.MagicMock(dist=None)
+        entry_point.__str__.return_value = 'ep = pack.extensions:initialize'
+        entry_point.load.return_value = initialize
+        mock_iter.return_value = [entry_point]
+        loader.load_extensions(EMPTY_SET, self._context(), 'admin', None, self.index_filename)
+        context = self._context()
+
+        loader.load_extensions(EMPTY_SET, context, 'admin', 'section-ep', self.index_filename)
+
+        self.assertEqual(self._sections(context), ['section-ep'])
+        self.assertEqual(entry_point.load.call_count, 2)
+
+    def test_required_packs(self):
+        packs = [['a', ['repo']], ['b', ['tasks']], ['c', ['rpm', 'repo']], ['d', ['rpm']]]
+
+        self.assertEqual(loader._required_packs(packs, 'rpm'), ['a', 'c', 'd'])
+        self.assertEqual(loader._required_packs(packs, 'tasks'), ['b'])
+        self.assertEqual(loader._required_packs(packs, 'fake'), [])
@@ -28,4 +28,7 @@ PUBLISH_STEP_TAR = u'save_tar'
 PUBLISH_STEP_COPY_DIRECTORY = u'copy_directory'
 
 SYNC_STEP_GET_LOCAL = u'get_local'
-REFRESH_STEP_CONTENT_SOURCE = u'refresh_content_source'
\ No newline at end of file
+REFRESH_STEP_CONTENT_SOURCE = u'refresh_content_source'
+
+ORPHAN_STEP_DELETE = u'delete_orphans'
+ORPHAN_STEP_DELETE_TYPE = u'delete_orphans_of_type'
@@ -9,7 +9,55 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import struct
+import hashlib
+
+from array import array
+from tempfile import TemporaryFile
+
+from pulp.server.compat import json
+
 from pulp_node import constants
+from pulp_node.manifest import UnitRef, UnitReader
+
+
+# A parent unit: (key digest, last_updated, source, offset, length)
+PARENT_RECORD = struct.Struct('!16sdHQI')
+
+# A child unit: (key digest, last_updated, offset, length)
+CHILD_RECORD = struct.Struct('!16sdQI')
+
+# The source of parent units that are not referenced within a units file.
+# The offset of these records is the index of the (unit, ref) kept in memory.
+IN_MEMORY = 0xFFFF
+
+
+def key_digest(unit):
+    """
+    Get a fixed-width digest of a unit's type_id & unit_key.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: The MD5 digest.
+    :rtype: str
+    """
+    uid = [unit['type_id'], unit['unit_key']]
+    return hashlib.md5(json.dumps(uid, sort_keys=True)).digest()
+
+
+def unique(records):
+    """
+    Iterate sorted records, skipping records with the same key digest as
+    the previous record.
+    :param records: The sorted records.
+    :type records: RecordArray
+    :return: A generator of: (index, record).
+    """
+    previous = None
+    for index in xrange(len(records)):
+        record = records[index]
+        if record[0] != previous:
+            previous = record[0]
+            yield index, record
 
 
 class UniqueKey(object):
@@ -39,30 +87,69 @@ class UniqueKey(object):
         return self.uid != other.uid
 
 
-class UnitInventory(object):
+class RecordArray(object):
     """
-    The unit inventory contains both the parent and child inventory
-    of content units associated with a specific repository.  Each is contained
-    within a dictionary keyed by {UnitKey} to ensure uniqueness.
+    An array of fixed-width records sorted by unit key digest.
+    The records are packed into a single string rather than kept as
+    python objects to bound the memory used by large inventories.
+    :ivar record: The record structure.
+    :type record: struct.Struct
+    :ivar data: The packed records.
+    :type data: str
     """
 
-    @staticmethod
-    def _import_parent_units(units):
-        _units = {}
-        for unit, ref in units:
-            unit.pop('metadata', None)
-            key = UniqueKey(unit)
-            _units[key] = (unit, ref)
-        return _units
+    def __init__(self, record, records):
+        """
+        :param record: The record structure.
+        :type record: struct.Struct
+        :param records: A list of packed records.  The list is sorted in place.
+        :type records: list
+        """
+        records.sort()
+        self.record = record
+        self.data = ''.join(records)
 
-    @staticmethod
-    def _import_child_units(units):
-        _units = {}
-        for unit in units:
-            unit.pop('metadata', None)
-            key = UniqueKey(unit)
-            _units[key] = unit
-        return _units
+    def __len__(self):
+        return len(self.data) / self.record.size
+
+    def __getitem__(self, index):
+        return self.record.unpack_from(self.data, index * self.record.size)
+
+
+class UnitList(object):
+    """
+    A sized list of units that are read when iterated.
+    """
+
+    def __init__(self, indexes, fetch):
+        """
+        :param indexes: The record indexes of the units.
+        :type indexes: array
+        :param fetch: Called with a record index to read the unit.
+        :type fetch: callable
+        """
+        self.indexes = indexes
+        self.fetch = fetch
+
+    def __iter__(self):
+        for index in self.indexes:
+            yield self.fetch(index)
+
+    def __len__(self):
+        return len(self.indexes)
+
+
+class UnitInventory(object):
+    """
+    The unit inventory contains both the parent and child inventory
+    of content units associated with a specific repository.  Each is stored as
+    an array of records sorted by a digest of the unit key, and the arrays are
+    merged to find the units that need to be added, updated and deleted.
+    The units themselves are read when listed: parent units from the units
+    file and child units from a temporary file, each through a shared file handle.
+    :ivar base_URL: The base URL for downloading parent units.
+    :type base_URL: str
+    """
 
     def __init__(self, base_URL, parent_units, child_units):
         """
@@ -73,40 +160,151 @@ class UnitInventory(object):
         :type child_units: iterable
         """
         self.base_URL = base_URL
+        self._readers = []
+        self._in_memory = []
+        self._child_reader = UnitReader(None, TemporaryFile())
         self.parent_units = self._import_parent_units(parent_units)
         self.child_units = self._import_child_units(child_units)
+        self._merge()
+
+    def _import_parent_units(self, units):
+        """
+        Build the sorted parent records.
+        Units referenced within a units file are read again when needed.
+        :param units: An iterable of (unit, ref).
+        :type units: iterable
+        :return: The parent records.
+        :rtype: RecordArray
+        """
+        records = []
+        sources = {}
+        for unit, ref in units:
+            last_updated = unit.get(constants.LAST_UPDATED) or 0
+            if isinstance(ref, UnitRef):
+                source = sources.get(ref.path)
+                if source is None:
+                    source = len(self._readers)
+                    sources[ref.path] = source
+                    self._readers.append(UnitReader(ref.path))
+                offset, length = ref.offset, ref.length
+            else:
+                unit.pop('metadata', None)
+                source = IN_MEMORY
+                offset, length = len(self._in_memory), 0
+                self._in_memory.append((unit, ref))
+            record = PARENT_RECORD.pack(
+                key_digest(unit), last_updated, source, offset, length)
+            records.append(record)
+        return RecordArray(PARENT_RECORD, records)
+
+    def _import_child_units(self, units):
+        """
+        Build the sorted child records.
+        The units are written to a temporary file and read again when needed.
+        :param units: An iterable of units.
+        :type units: iterable
+        :return: The child records.
+        :rtype: RecordArray
+        """
+        records = []
+        fp = self._child_reader.fp
+        for unit in units:
+            unit.pop('metadata', None)
+            json_unit = json.dumps(unit)
+            offset = fp.tell()
+            fp.write(json_unit)
+            last_updated = unit.get(constants.LAST_UPDATED) or 0
+            record = CHILD_RECORD.pack(
+                key_digest(unit), last_updated, offset, len(json_unit))
+            records.append(record)
+        fp.flush()
+        return RecordArray(CHILD_RECORD, records)
+
+    def _merge(self):
+        """
+        Merge the sorted parent and child records to find the units on
+        the parent only, the units on the child only and the units updated
+        on the parent.  When a unit key is found more than once in an
+        inventory, only one of the units is used.
+        """
+        self._parent_only = array('L')
+        self._child_only = array('L')
+        self._updated = array('L')
+        parent_records = unique(self.parent_units)
+        child_records = unique(self.child_units)
+        parent = next(parent_records, None)
+        child = next(child_records, None)
+        while parent is not None or child is not None:
+            if child is None or (parent is not None and parent[1][0] < child[1][0]):
+                self._parent_only.append(parent[0])
+                parent = next(parent_records, None)
+            elif parent is None or child[1][0] < parent[1][0]:
+                self._child_only.append(child[0])
+                child = next(child_records, None)
+            else:
+                if parent[1][1] > child[1][1]:
+                    self._updated.append(parent[0])
+                parent = next(parent_records, None)
+                child = next(child_records, None)
+
+    def _parent_unit(self, index):
+        """
+        Read a parent unit.
+        :param index: The index of the unit's record.
+        :type index: int
+        :return: (unit, ref)
+        :rtype: tuple(2)
+        """
+        digest, last_updated, source, offset, length = self.parent_units[index]
+        if source == IN_MEMORY:
+            return self._in_memory[offset]
+        reader = self._readers[source]
+        unit = reader.read(offset, length)
+        unit.pop('metadata', None)
+        return unit, UnitRef(reader.path, offset, length, reader)
+
+    def _child_unit(self, index):
+        """
+        Read a child unit.
+        :param index: The index of the unit's record.
+        :type index: int
+        :return: The unit.
+        :rtype: dict
+        """
+        digest, last_updated, offset, length = self.child_units[index]
+        return self._child_reader.read(offset, length)
 
     def units_on_parent_only(self):
         """
         Listing of units contained in the parent inventory
         but not contained in the child inventory.
         :return: List of (unit, ref).
-        :rtype: list
+        :rtype: UnitList
         """
-        return [r for k, r in self.parent_units.items() if k not in self.child_units]
+        return UnitList(self._parent_only, self._parent_unit)
 
     def units_on_child_only(self):
         """
         Listing of units contained in the child inventory
         but not contained in the parent inventory.
         :return: List of units that need to be purged.
-        :rtype: list
+        :rtype: UnitList
         """
-        return [u for k, u in self.child_units.items() if k not in self.parent_units]
+        return UnitList(self._child_only, self._child_unit)
 
     def updated_units(self):
         """
         Listing of units updated on the parent.
         :return: List of (unit, ref).
-        :rtype: list
-        """
-        updated = []
-        for key, (unit, ref) in self.parent_units.items():
-            child_unit = self.child_units.get(key)
-            if child_unit is None:
-                continue
-            parent_last_updated = unit.get(constants.LAST_UPDATED, 0)
-            child_last_updated = child_unit.get(constants.LAST_UPDATED, 0)
-            if parent_last_updated > child_last_updated:
-                updated.append((unit, ref))
-        return updated
\ No newline at end of file
+        :rtype: UnitList
+        """
+        return UnitList(self._updated, self._parent_unit)
+
+    def close(self):
+        """
+        Close the files used to read units and delete the temporary file.
+        Child units cannot be listed once the inventory is closed.
+        """
+        for reader in self._readers:
+            reader.close()
+        self._child_reader.close()
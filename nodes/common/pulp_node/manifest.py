@@ -14,6 +14,13 @@ Provides classes for managing the content unit manifest.
 The manifest is a json encoded file that defines content units
 associated with repository.  The units themselves are stored in a separate
 json encoded file.  For performance reasons, the unit files are compressed.
+
+Each publish increments the manifest revision and writes a delta file listing the
+units added, updated and removed since the previous revision.  The manifest lists
+the deltas still available so that a child holding the units of a recent revision
+can fetch the deltas rather than the entire units file.  Each delta records the ID
+of the manifest it applies to and of the manifest it produces, so that a child only
+applies deltas that continue from the manifest it holds.
 """
 
 import os
@@ -21,6 +28,7 @@ import gzip
 import errno
 
 from logging import getLogger
+from threading import RLock
 
 from nectar.request import DownloadRequest
 from nectar.listener import AggregatingEventListener
@@ -39,6 +47,7 @@ log = getLogger(__name__)
 MANIFEST_VERSION = 2
 MANIFEST_FILE_NAME = 'manifest.json'
 UNITS_FILE_NAME = 'units.json.gz'
+DELTA_FILE_NAME = 'delta-%d.json.gz'
 
 ID = 'id'
 VERSION = 'version'
@@ -48,6 +57,15 @@ UNITS = 'units'
 UNITS_PATH = 'path'
 UNITS_TOTAL = 'total'
 UNITS_SIZE = 'size'
+REVISION = 'revision'
+DELTAS = 'deltas'
+PREVIOUS = 'previous'
+
+DELTA_ACTION = 'action'
+DELTA_UNIT = 'unit'
+UNIT_ADDED = 'added'
+UNIT_UPDATED = 'updated'
+UNIT_REMOVED = 'removed'
 
 
 # --- utils -----------------------------------------------------------------------------
@@ -76,6 +94,70 @@ def unzip(path, destination, bfrlen=65535):
         fp_in.close()
 
 
+def unit_uid(unit):
+    """
+    Get an ID that uniquely identifies a content unit.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: A tuple of: (type_id, sorted unit_key items).
+    :rtype: tuple
+    """
+    return unit['type_id'], tuple(sorted(unit['unit_key'].items()))
+
+
+def apply_deltas(units_path, delta_paths, destination):
+    """
+    Write the units that result from applying the specified deltas, in order,
+    to the units in the units file.
+    :param units_path: The path to a units file, which may be compressed.
+    :type units_path: str
+    :param delta_paths: The paths to compressed delta files.
+    :type delta_paths: list
+    :param destination: The path to the (uncompressed) units file to be written.
+    :type destination: str
+    :return: The number of units written.
+    :rtype: int
+    :raise IOError: on I/O errors.
+    :raise ValueError: on json decoding errors.
+    """
+    changes = {}
+    for path in delta_paths:
+        fp = gzip.open(path)
+        try:
+            for line in fp:
+                change = json.loads(line)
+                unit = change[DELTA_UNIT]
+                if change[DELTA_ACTION] == UNIT_REMOVED:
+                    changes[unit_uid(unit)] = None
+                else:
+                    changes[unit_uid(unit)] = unit
+        finally:
+            fp.close()
+
+    total = 0
+    if units_path.endswith('.gz'):
+        fp_in = gzip.open(units_path)
+    else:
+        fp_in = open(units_path)
+    try:
+        with open(destination, 'w+') as fp_out:
+            for json_unit in fp_in:
+                uid = unit_uid(json.loads(json_unit))
+                if uid in changes:
+                    continue
+                fp_out.write(json_unit)
+                total += 1
+            for unit in changes.values():
+                if unit is None:
+                    continue
+                fp_out.write(json.dumps(unit))
+                fp_out.write('\n')
+                total += 1
+    finally:
+        fp_in.close()
+    return total
+
+
 # --- manifest --------------------------------------------------------------------------
 
 
@@ -90,6 +172,13 @@ class Manifest(object):
     :type total_units: int
     :param publishing_details: Details of how units have been published.
     :type publishing_details: dict
+    :ivar revision: The number of times the units have been published, or None
+        when published without revisions.
+    :type revision: int
+    :ivar deltas: The available delta files.  Each is a dict of the revision and
+        manifest ID it produces, the ID of the manifest it applies to, its path
+        relative to the manifest and its size and number of units.
+    :type deltas: list
     """
 
     def __init__(self, path, manifest_id=None):
@@ -104,6 +193,8 @@ class Manifest(object):
         self.version = MANIFEST_VERSION
         self.units = {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0}
         self.publishing_details = {}
+        self.revision = None
+        self.deltas = []
         if os.path.isdir(path):
             path = pathlib.join(path, MANIFEST_FILE_NAME)
         self.path = path
@@ -118,7 +209,9 @@ class Manifest(object):
             ID: self.id,
             VERSION: self.version,
             UNITS: self.units,
-            PUBLISHING_DETAILS: self.publishing_details
+            PUBLISHING_DETAILS: self.publishing_details,
+            REVISION: self.revision,
+            DELTAS: self.deltas,
         }
         with open(self.path, 'w+') as fp:
             json.dump(state, fp, indent=2)
@@ -138,6 +231,8 @@ class Manifest(object):
         self.version = d.get(VERSION, 0)
         self.units = d.get(UNITS, {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0})
         self.publishing_details = d.get(PUBLISHING_DETAILS, {})
+        self.revision = d.get(REVISION)
+        self.deltas = d.get(DELTAS, [])
 
     def get_units(self):
         """
@@ -164,6 +259,58 @@ class Manifest(object):
         self.units[UNITS_TOTAL] = unit_writer.total_units
         self.units[UNITS_SIZE] = unit_writer.bytes_written
 
+    def delta_published(self, delta_writer, previous_id):
+        """
+        Add a delta to the manifest.  The delta produces the units of this
+        manifest from the units of the previously published manifest.
+        :param delta_writer: A writer used to publish the delta.
+        :type delta_writer: UnitWriter
+        :param previous_id: The ID of the previously published manifest.
+        :type previous_id: str
+        """
+        delta = {
+            REVISION: self.revision,
+            ID: self.id,
+            PREVIOUS: previous_id,
+            PATH: os.path.basename(delta_writer.path),
+            UNITS_TOTAL: delta_writer.total_units,
+            UNITS_SIZE: delta_writer.bytes_written,
+        }
+        self.deltas.append(delta)
+
+    def deltas_since(self, manifest):
+        """
+        Get the deltas needed to update the units of the specified manifest
+        to the units of this manifest.  The first delta must apply to the
+        specified manifest and each of the others to the manifest produced by
+        the one before it, so deltas published after the revisions were
+        restarted (e.g. when the publish directory was reset) are not applied
+        to the units of another lineage.
+        :param manifest: A previously published manifest.
+        :type manifest: Manifest
+        :return: The deltas in the order they must be applied, or None when
+            any of them is no longer available or does not continue from the
+            specified manifest.
+        :rtype: list
+        """
+        if manifest.id is not None and manifest.id == self.id:
+            return []
+        if manifest.revision is None or self.revision is None or \
+                manifest.revision >= self.revision:
+            return None
+        deltas = dict((d[REVISION], d) for d in self.deltas)
+        needed = []
+        manifest_id = manifest.id
+        for n in range(manifest.revision + 1, self.revision + 1):
+            delta = deltas.get(n)
+            if delta is None or manifest_id is None or delta.get(PREVIOUS) != manifest_id:
+                return None
+            needed.append(delta)
+            manifest_id = delta.get(ID)
+        if manifest_id != self.id:
+            return None
+        return needed
+
     def published(self, details):
         """
         Update the publishing details.
@@ -292,6 +439,55 @@ class RemoteManifest(Manifest):
             report = listener.failed_reports[0]
             raise ManifestDownloadError(self.url, report.error_msg)
 
+    def fetch_deltas(self, manifest):
+        """
+        Update the units of a previously fetched manifest to the units
+        referenced in this manifest by fetching and applying the deltas
+        published since it.  When this is not possible, or the deltas
+        are no smaller than the units file, nothing is fetched and the units
+        file must be fetched using fetch_units().
+        :param manifest: A previously fetched manifest with valid units.
+        :type manifest: Manifest
+        :return: True if the units were updated.
+        :rtype: bool
+        :raise IOError: on I/O errors.
+        :raise ValueError: on json decoding errors
+        """
+        deltas = self.deltas_since(manifest)
+        if deltas is None:
+            return False
+        if sum(d[UNITS_SIZE] for d in deltas) >= self.units[UNITS_SIZE]:
+            return False
+
+        base_url = self.url.rsplit('/', 1)[0]
+        dir_path = os.path.dirname(self.path)
+        requests = []
+        for delta in deltas:
+            url = pathlib.join(base_url, delta[PATH])
+            destination = pathlib.join(dir_path, delta[PATH])
+            requests.append(DownloadRequest(str(url), destination))
+        listener = AggregatingEventListener()
+        self.downloader.event_listener = listener
+        self.downloader.download(requests)
+        try:
+            if listener.failed_reports:
+                report = listener.failed_reports[0]
+                log.info('fetching deltas failed: %s', report.error_msg)
+                return False
+            path = pathlib.join(dir_path, UNITS_FILE_NAME[:-3])
+            tmp_path = pathlib.join(dir_path, '.' + UNITS_FILE_NAME[:-3])
+            total = apply_deltas(
+                manifest.units_path(), [r.destination for r in requests], tmp_path)
+            os.rename(tmp_path, path)
+        finally:
+            for request in requests:
+                if os.path.exists(request.destination):
+                    os.unlink(request.destination)
+        self.units[UNITS_PATH] = path
+        self.units[UNITS_TOTAL] = total
+        self.units[UNITS_SIZE] = os.path.getsize(path)
+        return True
+
 
 class UnitWriter(object):
     """
@@ -340,15 +536,19 @@ class UnitWriter(object):
     def add(self, unit):
         """
         Add (write) the specified unit to the file as a json encoded string.
+        The keys are sorted so the same unit is always encoded the same way.
         :param unit: A content unit.
         :type unit: dict
+        :return: The json encoded unit.
+        :rtype: str
         :raise IOError: on I/O errors.
         :raise ValueError: json encoding errors
         """
         self.total_units += 1
-        json_unit = json.dumps(unit)
+        json_unit = json.dumps(unit, sort_keys=True)
         self.fp.write(json_unit)
         self.fp.write('\n')
+        return json_unit
 
     def close(self):
         """
@@ -420,9 +620,11 @@ class UnitRef(object):
     :type offset: int
     :ivar length: The length of a specific unit within the file.
     :type length: int
+    :ivar reader: An optional reader used to share one file handle between refs.
+    :type reader: UnitReader
     """
 
-    def __init__(self, path, offset, length):
+    def __init__(self, path, offset, length, reader=None):
         """
         :param path: The absolute path to the units file.
         :type path: str
@@ -430,10 +632,13 @@ class UnitRef(object):
         :type offset: int
         :param length: The length of a specific unit within the file.
         :type length: int
+        :param reader: An optional reader used to share one file handle between refs.
+        :type reader: UnitReader
         """
         self.path = path
         self.offset = offset
         self.length = length
+        self.reader = reader
 
     def fetch(self):
         """
@@ -443,7 +648,61 @@ class UnitRef(object):
         :raise IOError: on I/O errors.
         :raise ValueError: json decoding errors
         """
+        if self.reader is not None:
+            return self.reader.read(self.offset, self.length)
         with open(self.path) as fp:
             fp.seek(self.offset)
             json_unit = fp.read(self.length)
             return json.loads(json_unit)
+
+
+class UnitReader(object):
+    """
+    Reads json encoded units from a units file through one shared file
+    handle rather than opening the file for every unit read.
+    The file is opened on the first read.
+    :ivar path: The absolute path to the units file.
+    :type path: str
+    :ivar fp: The open file.
+    :type fp: file
+    """
+
+    def __init__(self, path, fp=None):
+        """
+        :param path: The absolute path to the units file.
+        :type path: str
+        :param fp: An optional file already open for reading.  When specified,
+            the file cannot be read once the reader is closed.
+        :type fp: file
+        """
+        self.path = path
+        self.fp = fp
+        self._lock = RLock()
+
+    def read(self, offset, length):
+        """
+        Read a unit.
+        :param offset: The offset of the unit within the file.
+        :type offset: int
+        :param length: The length of the unit within the file.
+        :type length: int
+        :return: The json decoded unit.
+        :rtype: dict
+        :raise IOError: on I/O errors.
+        :raise ValueError: json decoding errors
+        """
+        with self._lock:
+            if self.fp is None:
+                self.fp = open(self.path)
+            self.fp.seek(offset)
+            json_unit = self.fp.read(length)
+        return json.loads(json_unit)
+
+    def close(self):
+        """
+        Close the file.
+        """
+        with self._lock:
+            if self.fp is not None:
+                self.fp.close()
+                self.fp = None
@@ -10,20 +10,51 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import os
+import gzip
+import time
+import errno
+import shutil
+import hashlib
 import tarfile
 
 from uuid import uuid4
 from tempfile import mkdtemp
 from logging import getLogger
 
+from billiard import Pool
+
+from pulp.server.compat import json
+
 from pulp_node import constants
 from pulp_node import pathlib
-from pulp_node.manifest import Manifest, UnitWriter
+from pulp_node.manifest import (Manifest, UnitWriter, unit_uid, MANIFEST_FILE_NAME,
+                                DELTA_FILE_NAME, DELTA_ACTION, DELTA_UNIT, UNIT_ADDED,
+                                UNIT_UPDATED, UNIT_REMOVED, REVISION, PATH)
 
 
 log = getLogger(__name__)
 
 
+# The number of deltas kept in the publish directory.  Children that last
+# synchronized longer ago than this many publishes fetch the entire units file.
+DELTA_HISTORY = 10
+
+# The directory, next to the repository publish directories, in which tarballs
+# of directory units are cached by tree fingerprint and hard linked from there
+# into each publish directory.
+TARBALL_CACHE_DIR = '.tarballs'
+
+# The number of seconds a cached tarball that is no longer linked into any
+# publish directory is kept before it is deleted.
+TARBALL_CACHE_RETENTION = 3600
+
+# The maximum number of processes used to build tarballs.
+TAR_PROCESSES = 4
+
+# The number of tarballs built by a process before it is replaced.
+TAR_MAX_TASKS_PER_CHILD = 10
+
+
 # --- utils --------------------------------------------------------
 
 def tar_path(path):
@@ -57,6 +88,95 @@ def tar_dir(dir_path, tar_path, bufsize=65535):
         tb.close()
 
 
+def tree_fingerprint(dir_path):
+    """
+    Fingerprint the directory tree at the specified path.
+    The fingerprint covers the path, and the relative path, type, ownership,
+    size and modification time of each entry in the tree so that it changes
+    whenever the content of a tarball of the tree would.
+    :param dir_path: The absolute path to a directory.
+    :type dir_path: str
+    :return: The hex digest of the tree.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    digest.update(_encode(dir_path))
+    for root, dirs, files in os.walk(dir_path):
+        dirs.sort()
+        for name in sorted(dirs + files):
+            path = os.path.join(root, name)
+            st = os.lstat(path)
+            entry = (os.path.relpath(path, dir_path), st.st_mode, st.st_uid, st.st_gid,
+                     st.st_size, repr(st.st_mtime))
+            digest.update(_encode('\0'.join([unicode(f) for f in entry]) + '\n'))
+    return digest.hexdigest()
+
+
+def build_tarball(paths):
+    """
+    Tar up a directory into the tarball cache.
+    The tarball is written to a temporary path and renamed so a partially
+    written tarball is never found in the cache.
+    :param paths: The absolute path to the directory and the cached tarball path.
+    :type paths: tuple(2)
+    :return: The cached tarball path.
+    :rtype: str
+    """
+    dir_path, cached_path = paths
+    tmp_path = '.'.join((cached_path, str(uuid4())))
+    try:
+        tar_dir(dir_path, tmp_path)
+        os.rename(tmp_path, cached_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return cached_path
+
+
+def build_tarballs(paths, processes=TAR_PROCESSES):
+    """
+    Build tarballs into the tarball cache using a bounded pool of processes.
+    The billiard pool is used because publishing runs in a celery worker, which
+    is a daemonic process that the multiprocessing pool refuses to fork from.
+    :param paths: A list of (directory path, cached tarball path).
+    :type paths: list
+    :param processes: The maximum number of processes.
+    :type processes: int
+    """
+    if len(paths) < 2:
+        for _paths in paths:
+            build_tarball(_paths)
+        return
+    pool = Pool(min(processes, len(paths)), maxtasksperchild=TAR_MAX_TASKS_PER_CHILD)
+    try:
+        pool.map(build_tarball, paths)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def link_file(path, link_path):
+    """
+    Hard link a file, copying it when it cannot be linked.
+    :param path: The absolute path to an existing file.
+    :type path: str
+    :param link_path: The absolute path to the link.
+    :type link_path: str
+    """
+    try:
+        os.link(path, link_path)
+    except OSError, e:
+        if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM):
+            raise
+        shutil.copyfile(path, link_path)
+
+
+def _encode(s):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    return s
+
+
 # --- publisher ----------------------------------------------------
 
 
@@ -94,6 +214,9 @@ class FilePublisher(Publisher):
     :type tmp_dir: str
     :ivar staged: A flag indicating that publishing has been staged and needs commit.
     :type staged: bool
+    :ivar tarballs: The published paths of the tarballs to be linked from the tarball
+        cache, keyed by cached path.  Each value is: (directory path, [published path]).
+    :type tarballs: dict
     """
 
     def __init__(self, publish_dir):
@@ -104,6 +227,7 @@ class FilePublisher(Publisher):
         self.publish_dir = publish_dir
         self.tmp_dir = None
         self.staged = False
+        self.tarballs = {}
 
     def publish(self, units):
         """
@@ -121,17 +245,108 @@ class FilePublisher(Publisher):
         pathlib.mkdir(parent_path)
         self.tmp_dir = mkdtemp(dir=parent_path)
 
+        manifest_id = str(uuid4())
+        manifest = Manifest(self.tmp_dir, manifest_id)
+        previous = self.previous_manifest()
+        if previous is not None and previous.revision is not None:
+            manifest.revision = previous.revision + 1
+            previous_units = self.unit_digests(previous)
+        else:
+            manifest.revision = 1
+            previous_units = None
+
+        delta_writer = None
+        if previous_units is not None:
+            delta_path = pathlib.join(self.tmp_dir, DELTA_FILE_NAME % manifest.revision)
+            delta_writer = UnitWriter(delta_path)
+
         with UnitWriter(self.tmp_dir) as writer:
             for unit in units:
                 self.publish_unit(unit)
-                writer.add(unit)
-        manifest_id = str(uuid4())
-        manifest = Manifest(self.tmp_dir, manifest_id)
+                json_unit = writer.add(unit)
+                if delta_writer is None:
+                    continue
+                digest = previous_units.pop(unit_uid(unit), None)
+                if digest is None:
+                    delta_writer.add({DELTA_ACTION: UNIT_ADDED, DELTA_UNIT: unit})
+                elif digest != hashlib.md5(json_unit).digest():
+                    delta_writer.add({DELTA_ACTION: UNIT_UPDATED, DELTA_UNIT: unit})
         manifest.units_published(writer)
+        self.link_tarballs()
+
+        if delta_writer is not None:
+            for type_id, unit_key in previous_units:
+                unit = dict(type_id=type_id, unit_key=dict(unit_key))
+                delta_writer.add({DELTA_ACTION: UNIT_REMOVED, DELTA_UNIT: unit})
+            delta_writer.close()
+            self.keep_deltas(previous, manifest)
+            manifest.delta_published(delta_writer, previous.id)
+
         manifest.write()
         self.staged = True
         return manifest.path
 
+    def previous_manifest(self):
+        """
+        Read the manifest written by the previous publish.
+        :return: The manifest or None when not found or not readable.
+        :rtype: Manifest
+        """
+        manifest = Manifest(pathlib.join(self.publish_dir, MANIFEST_FILE_NAME))
+        try:
+            manifest.read()
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                log.exception(manifest.path)
+            return None
+        except ValueError:
+            log.exception(manifest.path)
+            return None
+        if not manifest.is_valid():
+            return None
+        return manifest
+
+    def unit_digests(self, manifest):
+        """
+        Read the units published with the specified manifest.
+        :param manifest: A previously published manifest.
+        :type manifest: Manifest
+        :return: A digest of each json encoded unit keyed by unit UID, or None
+            when the units file is not valid.
+        :rtype: dict
+        """
+        if not manifest.has_valid_units():
+            return None
+        digests = {}
+        fp = gzip.open(manifest.units_path())
+        try:
+            for line in fp:
+                json_unit = line.rstrip('\n')
+                digests[unit_uid(json.loads(json_unit))] = hashlib.md5(json_unit).digest()
+        finally:
+            fp.close()
+        return digests
+
+    def keep_deltas(self, previous, manifest):
+        """
+        Link the most recent deltas published with the previous manifest into
+        the temporary publishing directory and add them to the new manifest.
+        Up to DELTA_HISTORY deltas are kept, including the one being published.
+        :param previous: The previously published manifest.
+        :type previous: Manifest
+        :param manifest: The manifest being published.
+        :type manifest: Manifest
+        """
+        oldest = manifest.revision - DELTA_HISTORY + 1
+        for delta in previous.deltas:
+            if delta[REVISION] < oldest:
+                continue
+            path = pathlib.join(self.publish_dir, delta[PATH])
+            if not os.path.exists(path):
+                continue
+            os.link(path, pathlib.join(self.tmp_dir, delta[PATH]))
+            manifest.deltas.append(delta)
+
     def publish_unit(self, unit):
         """
         Publish the file associated with the unit into the publish directory.
@@ -147,11 +362,65 @@ class FilePublisher(Publisher):
         pathlib.mkdir(os.path.dirname(published_path))
         unit[constants.FILE_SIZE] = os.path.getsize(storage_path)
         if os.path.isdir(storage_path):
-            tar_dir(storage_path, tar_path(published_path))
+            cached_path = tar_path(pathlib.join(self.tarball_cache_dir(),
+                                                tree_fingerprint(storage_path)))
+            links = self.tarballs.setdefault(cached_path, (storage_path, []))[1]
+            links.append(tar_path(published_path))
             unit[constants.TARBALL_PATH] = tar_path(relative_path)
         else:
             os.symlink(storage_path, published_path)
 
+    def tarball_cache_dir(self):
+        """
+        Get the tarball cache directory.
+        :return: The absolute path to the directory.
+        :rtype: str
+        """
+        parent_path = os.path.normpath(os.path.join(self.publish_dir, '../'))
+        return pathlib.join(parent_path, TARBALL_CACHE_DIR)
+
+    def link_tarballs(self):
+        """
+        Link the tarballs of the published directory units from the tarball
+        cache into the temporary publishing directory, building the tarballs
+        not found in the cache first.
+        """
+        if not self.tarballs:
+            return
+        pathlib.mkdir(self.tarball_cache_dir())
+        missing = []
+        for cached_path, (dir_path, links) in self.tarballs.items():
+            try:
+                # refresh the mtime so the tarball is not pruned before it is linked
+                os.utime(cached_path, None)
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+                missing.append((dir_path, cached_path))
+        build_tarballs(missing)
+        for cached_path, (dir_path, links) in self.tarballs.items():
+            for path in links:
+                link_file(cached_path, path)
+        self.tarballs = {}
+
+    def prune_tarballs(self):
+        """
+        Delete the cached tarballs that are no longer linked into any publish
+        directory and have not been used for TARBALL_CACHE_RETENTION seconds.
+        """
+        cache_dir = self.tarball_cache_dir()
+        if not os.path.isdir(cache_dir):
+            return
+        expiration = time.time() - TARBALL_CACHE_RETENTION
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            try:
+                st = os.stat(path)
+                if st.st_nlink == 1 and st.st_mtime < expiration:
+                    os.unlink(path)
+            except OSError:
+                log.exception(path)
+
     def commit(self):
         """
         Commit publishing.
@@ -163,6 +432,7 @@ class FilePublisher(Publisher):
         os.system('rm -rf %s' % self.publish_dir)
         os.rename(self.tmp_dir, self.publish_dir)
         self.staged = False
+        self.prune_tarballs()
 
     def unstage(self):
         """
@@ -170,6 +440,7 @@ class FilePublisher(Publisher):
         """
         os.system('rm -rf %s' % self.tmp_dir)
         self.staged = False
+        self.tarballs = {}
 
     def __enter__(self):
         return self
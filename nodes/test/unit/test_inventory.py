@@ -0,0 +1,113 @@
+# Copyright (c) 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import tempfile
+
+from unittest import TestCase
+
+from pulp.server.compat import json
+
+from pulp_node import constants
+from pulp_node.manifest import UnitIterator, UnitRef
+from pulp_node.importers.inventory import UnitInventory, key_digest
+
+
+BASE_URL = 'http://redhat.com'
+
+
+def unit(n, last_updated=0, **kwargs):
+    _unit = dict(type_id='T', unit_key={'n': n, 'v': '1.0'}, metadata={'m': n})
+    _unit[constants.LAST_UPDATED] = last_updated
+    _unit.update(kwargs)
+    return _unit
+
+
+class TestInventory(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.units_path = os.path.join(self.tmp_dir, 'units.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def parent_units(self, units):
+        with open(self.units_path, 'w') as fp:
+            for _unit in units:
+                fp.write(json.dumps(_unit))
+                fp.write('\n')
+        return UnitIterator(self.units_path, len(units))
+
+    def test_key_digest(self):
+        self.assertEqual(len(key_digest(unit(1))), 16)
+        self.assertEqual(key_digest(unit(1)), key_digest(unit(1, 10, metadata={})))
+        self.assertNotEqual(key_digest(unit(1)), key_digest(unit(2)))
+        self.assertNotEqual(key_digest(unit(1)), key_digest(unit(1, type_id='U')))
+
+    def test_diff(self):
+        # setup
+        parent_units = [unit(n) for n in range(100)]
+        parent_units[60][constants.LAST_UPDATED] = 20
+        parent_units[61][constants.LAST_UPDATED] = 5
+        child_units = [unit(n, 10, unit_id=str(n)) for n in range(50, 150)]
+        # test
+        inventory = UnitInventory(BASE_URL, self.parent_units(parent_units), child_units[::-1])
+        # verify
+        try:
+            added = inventory.units_on_parent_only()
+            self.assertEqual(len(added), 50)
+            added = list(added)
+            self.assertEqual(sorted(u['unit_key']['n'] for u, r in added), range(50))
+            for _unit, ref in added:
+                self.assertFalse('metadata' in _unit)
+                self.assertTrue(isinstance(ref, UnitRef))
+                self.assertEqual(ref.fetch()['metadata'], {'m': _unit['unit_key']['n']})
+            self.assertEqual(len(set(r.reader for u, r in added)), 1)
+            updated = [u for u, r in inventory.updated_units()]
+            self.assertEqual([u['unit_key']['n'] for u in updated], [60])
+            deleted = inventory.units_on_child_only()
+            self.assertEqual(len(deleted), 50)
+            self.assertEqual(sorted(u['unit_id'] for u in deleted),
+                             sorted(str(n) for n in range(100, 150)))
+        finally:
+            inventory.close()
+
+    def test_duplicates(self):
+        # setup
+        parent_units = [unit(1), unit(1), unit(2)]
+        child_units = [unit(2, unit_id='2'), unit(3, unit_id='3'), unit(3, unit_id='3')]
+        # test
+        inventory = UnitInventory(BASE_URL, self.parent_units(parent_units), child_units)
+        # verify
+        self.assertEqual([u['unit_key']['n'] for u, r in inventory.units_on_parent_only()], [1])
+        self.assertEqual([u['unit_id'] for u in inventory.units_on_child_only()], ['3'])
+        self.assertEqual(len(inventory.updated_units()), 0)
+        inventory.close()
+
+    def test_refs_in_memory(self):
+        # setup
+        ref = object()
+        parent_units = [(unit(1), ref), (unit(2), ref)]
+        # test
+        inventory = UnitInventory(BASE_URL, parent_units, [unit(2)])
+        # verify
+        self.assertEqual(list(inventory.units_on_parent_only()), [parent_units[0]])
+        self.assertEqual(len(inventory.units_on_child_only()), 0)
+        inventory.close()
+
+    def test_empty(self):
+        inventory = UnitInventory(BASE_URL, [], [])
+        self.assertEqual(list(inventory.units_on_parent_only()), [])
+        self.assertEqual(list(inventory.units_on_child_only()), [])
+        self.assertEqual(list(inventory.updated_units()), [])
+        inventory.close()
@@ -131,4 +131,57 @@ class TestManifest(TestCase):
             units_in.append(unit)
             _unit = ref.fetch()
             self.assertEqual(unit, _unit)
-        self.verify(units, units_in)
\ No newline at end of file
+        self.verify(units, units_in)
+    def test_deltas_since(self):
+        def published(revision, manifest_id):
+            published_manifest = Manifest(self.tmp_dir, manifest_id)
+            published_manifest.revision = revision
+            return published_manifest
+
+        manifest = Manifest(self.tmp_dir, self.MANIFEST_ID)
+        manifest.revision = 5
+        manifest.deltas = [
+            {REVISION: 3, ID: 'm3', PREVIOUS: 'm2', PATH: DELTA_FILE_NAME % 3},
+            {REVISION: 4, ID: 'm4', PREVIOUS: 'm3', PATH: DELTA_FILE_NAME % 4},
+            {REVISION: 5, ID: self.MANIFEST_ID, PREVIOUS: 'm4', PATH: DELTA_FILE_NAME % 5}]
+        self.assertEqual(manifest.deltas_since(published(5, self.MANIFEST_ID)), [])
+        self.assertEqual(manifest.deltas_since(published(3, 'm3')), manifest.deltas[1:])
+        self.assertEqual(manifest.deltas_since(published(2, 'm2')), manifest.deltas)
+        self.assertEqual(manifest.deltas_since(published(1, 'm1')), None)
+        self.assertEqual(manifest.deltas_since(published(6, 'm6')), None)
+        self.assertEqual(manifest.deltas_since(published(None, 'm2')), None)
+        # manifests of another lineage, published before the revisions were restarted
+        self.assertEqual(manifest.deltas_since(published(2, 'other')), None)
+        self.assertEqual(manifest.deltas_since(published(5, 'other')), None)
+        self.assertEqual(manifest.deltas_since(published(2, None)), None)
+        # a broken chain
+        manifest.deltas[1][PREVIOUS] = 'other'
+        self.assertEqual(manifest.deltas_since(published(2, 'm2')), None)
+        self.assertEqual(manifest.deltas_since(published(4, 'm4')), manifest.deltas[2:])
+
+    def test_apply_deltas(self):
+        units_path = os.path.join(self.tmp_dir, UNITS_FILE_NAME)
+        with UnitWriter(units_path) as writer:
+            for i in range(0, self.NUM_UNITS):
+                writer.add(dict(type_id='T', unit_key={'n': i}))
+        delta_paths = []
+        for revision, changes in enumerate([
+                [(UNIT_REMOVED, 0), (UNIT_UPDATED, 1), (UNIT_ADDED, 10)],
+                [(UNIT_REMOVED, 10), (UNIT_ADDED, 11), (UNIT_ADDED, 0)]]):
+            path = os.path.join(self.tmp_dir, DELTA_FILE_NAME % revision)
+            with UnitWriter(path) as writer:
+                for action, n in changes:
+                    unit = dict(type_id='T', unit_key={'n': n}, action=action)
+                    writer.add({DELTA_ACTION: action, DELTA_UNIT: unit})
+            delta_paths.append(path)
+        destination = os.path.join(self.tmp_dir, 'units.json')
+        # Test
+        total = apply_deltas(units_path, delta_paths, destination)
+        # Verify
+        with open(destination) as fp:
+            units = dict((u['unit_key']['n'], u) for u in map(json.loads, fp))
+        self.assertEqual(total, self.NUM_UNITS + 1)
+        self.assertEqual(sorted(units), range(0, self.NUM_UNITS) + [11])
+        self.assertEqual(units[0]['action'], UNIT_ADDED)
+        self.assertEqual(units[1]['action'], UNIT_UPDATED)
+        self.assertFalse('action' in units[2])
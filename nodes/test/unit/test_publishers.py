@@ -14,14 +14,18 @@ import shutil
 import tempfile
 import tarfile
 
+import mock
+
 from unittest import TestCase
 from nectar.downloaders.local import LocalFileDownloader
 from nectar.config import DownloaderConfig
 
 from pulp_node import constants
 from pulp_node import pathlib
+from pulp_node.distributors import publisher
 from pulp_node.distributors.http.publisher import HttpPublisher
-from pulp_node.manifest import RemoteManifest
+from pulp_node.manifest import RemoteManifest, Manifest, DELTA_FILE_NAME, REVISION, PATH, \
+    ID, PREVIOUS
 
 
 class TestHttp(TestCase):
@@ -157,3 +161,153 @@ class TestHttp(TestCase):
             p.publish(units)
         # verify
         self.assertFalse(os.path.exists(p.tmp_dir))
+
+    def publish(self, units):
+        repo_id = 'test_repo'
+        base_url = 'file://'
+        publish_dir = os.path.join(self.tmpdir, 'nodes/repos')
+        repo_publish_dir = os.path.join(publish_dir, repo_id)
+        virtual_host = (publish_dir, publish_dir)
+        with HttpPublisher(base_url, virtual_host, repo_id, repo_publish_dir) as p:
+            p.publish(units)
+            p.commit()
+        return p
+
+    def fetch(self, p, working_dir):
+        downloader = LocalFileDownloader(DownloaderConfig())
+        url = pathlib.url_join(p.base_url, p.manifest_path())
+        manifest = RemoteManifest(url, downloader, working_dir)
+        manifest.fetch()
+        return manifest
+
+    def test_delta(self):
+        # setup
+        units = self.populate()
+        units += [{'type_id': 'unit', 'unit_key': {'n': n}} for n in range(10, 60)]
+        p = self.publish(units)
+        working_dir = os.path.join(self.tmpdir, 'working_dir')
+        os.makedirs(working_dir)
+        manifest = self.fetch(p, working_dir)
+        manifest.fetch_units()
+        manifest.write()
+        list(manifest.get_units())
+        # test
+        # remove unit 2, update unit 1 and add a unit without a file
+        units[1]['last_updated'] = 10
+        units = units[:2] + units[3:] + [{'type_id': 'unit', 'unit_key': {'n': 3}}]
+        p = self.publish(units)
+        fetched = self.fetch(p, working_dir)
+        # verify
+        self.assertEqual(manifest.revision, 1)
+        self.assertEqual(fetched.revision, 2)
+        self.assertEqual(fetched.deltas_since(manifest), fetched.deltas)
+        self.assertEqual(fetched.deltas[0][PREVIOUS], manifest.id)
+        self.assertEqual(fetched.deltas[0][ID], fetched.id)
+        self.assertEqual(fetched.deltas[0][PATH], DELTA_FILE_NAME % 2)
+        self.assertTrue(fetched.fetch_deltas(manifest))
+        self.assertTrue(fetched.has_valid_units())
+        fetched_units = sorted((u for u, ref in fetched.get_units()),
+                               key=lambda u: u['unit_key']['n'])
+        self.assertEqual([u['unit_key']['n'] for u in fetched_units], [0, 1, 3] + range(10, 60))
+        self.assertEqual(fetched_units[1]['last_updated'], 10)
+        self.assertEqual(fetched.units['total'], 53)
+
+    def test_delta_history(self):
+        # setup
+        units = self.populate()
+        # test
+        published = []
+        for n in range(publisher.DELTA_HISTORY + 2):
+            p = self.publish(units)
+            manifest = Manifest(p.publish_dir)
+            manifest.read()
+            published.append(manifest)
+        # verify
+        revision = publisher.DELTA_HISTORY + 2
+        self.assertEqual(manifest.revision, revision)
+        self.assertEqual([d[REVISION] for d in manifest.deltas], range(3, revision + 1))
+        self.assertEqual(manifest.deltas_since(published[0]), None)
+        self.assertEqual(len(manifest.deltas_since(published[1])), publisher.DELTA_HISTORY)
+        for delta in manifest.deltas:
+            self.assertTrue(os.path.exists(os.path.join(p.publish_dir, delta[PATH])))
+        self.assertFalse(os.path.exists(os.path.join(p.publish_dir, DELTA_FILE_NAME % 2)))
+
+    def test_tarball_cache(self):
+        # setup
+        units = self.populate()
+        p = self.publish(units)
+        path = os.path.join(p.publish_dir, units[0][constants.TARBALL_PATH])
+        cache_dir = p.tarball_cache_dir()
+        cached = os.listdir(cache_dir)
+        # test
+        # publish again unchanged then with a file of the directory unit changed
+        p = self.publish(units)
+        unchanged = os.stat(path)
+        cached_stat = os.stat(os.path.join(cache_dir, cached[0]))
+        with open(os.path.join(units[0]['storage_path'], self.TARED_FILE % 0), 'w') as fp:
+            fp.write('changed')
+        with mock.patch.object(publisher, 'TARBALL_CACHE_RETENTION', -1):
+            p = self.publish(units)
+        # verify
+        self.assertEqual(len(cached), 1)
+        self.assertEqual(unchanged.st_ino, cached_stat.st_ino)
+        self.assertEqual(unchanged.st_nlink, 2)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        self.assertNotEqual(os.listdir(cache_dir), cached)
+        tb = tarfile.open(path)
+        try:
+            self.assertEqual(tb.extractfile(self.TARED_FILE % 0).read(), 'changed')
+        finally:
+            tb.close()
+
+    def test_tarball_cache_missing(self):
+        # setup
+        units = self.populate()
+        for n in range(3, 5):
+            relative_path = os.path.join(self.RELATIVE_PATH, 'test_%d' % n)
+            path = os.path.join(self.unit_dir, relative_path)
+            os.mkdir(path)
+            with open(os.path.join(path, self.TARED_FILE % n), 'w') as fp:
+                fp.write(str(n))
+            units.append({
+                'type_id': 'unit',
+                'unit_key': {'n': n},
+                'storage_path': path,
+                'relative_path': relative_path
+            })
+        # test
+        with mock.patch.object(publisher, 'Pool', wraps=publisher.Pool) as pool:
+            p = self.publish(units)
+        # verify
+        pool.assert_called_once_with(3, maxtasksperchild=publisher.TAR_MAX_TASKS_PER_CHILD)
+        self.assertEqual(len(os.listdir(p.tarball_cache_dir())), 3)
+        for unit in (units[0], units[3], units[4]):
+            path = os.path.join(p.publish_dir, unit[constants.TARBALL_PATH])
+            self.assertEqual(os.stat(path).st_nlink, 2)
+            tb = tarfile.open(path)
+            try:
+                expected = sorted(os.listdir(unit['storage_path']))
+                self.assertEqual(sorted(tb.getnames()), expected)
+            finally:
+                tb.close()
+
+    def test_build_tarballs(self):
+        # setup
+        paths = []
+        for n in range(3):
+            dir_path = os.path.join(self.unit_dir, 'dir_%d' % n)
+            os.makedirs(dir_path)
+            with open(os.path.join(dir_path, self.TARED_FILE % n), 'w') as fp:
+                fp.write(str(n))
+            paths.append((dir_path, os.path.join(self.tmpdir, 'dir_%d.TGZ' % n)))
+        # test
+        publisher.build_tarballs(paths, processes=2)
+        # verify
+        for n, (dir_path, cached_path) in enumerate(paths):
+            tb = tarfile.open(cached_path)
+            try:
+                self.assertEqual(tb.getnames(), [self.TARED_FILE % n])
+            finally:
+                tb.close()
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['content'] + ['dir_%d.TGZ' % n for n in range(3)])
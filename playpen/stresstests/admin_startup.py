@@ -0,0 +1,120 @@
+#!/usr/bin/python -tt
+"""
+Measure how long the client takes to load its extensions before running a command, loading every
+pack as pulp-admin used to and loading only the packs the command index says the command needs.
+
+Each run is a new interpreter so the pack modules are imported again every time, as they are
+when pulp-admin is started from a script. By default a set of synthetic packs is generated, each
+adding a section with a number of commands; point --extensions-dir at an installed extensions
+directory to measure real packs, and use --role to include the entry points of that role.
+
+ ./admin_startup.py --packs 10 --commands 40 --runs 5
+ ./admin_startup.py --extensions-dir /usr/lib/pulp/admin/extensions --section rpm
+"""
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+CHILD = """
+import sys, time
+from pulp.client.extensions import loader
+from pulp.client.extensions.core import ClientContext, PulpCli, PulpPrompt
+started = time.time()
+prompt = PulpPrompt()
+context = ClientContext(None, None, None, prompt, None)
+context.cli = PulpCli(context)
+section, index_filename = sys.argv[3] or None, sys.argv[4] or None
+loader.load_extensions(sys.argv[1], context, sys.argv[2], section, index_filename)
+print 'elapsed %f' % (time.time() - started)
+"""
+
+PACK_CLI = """
+from pulp.client.extensions.extensions import PulpCliCommand, PulpCliSection
+
+%(commands)s
+
+def initialize(context):
+    section = PulpCliSection('%(name)s', 'generated section')
+    for command_class in COMMANDS:
+        section.add_command(command_class())
+    context.cli.add_section(section)
+"""
+
+COMMAND = """
+class Command%(i)d(PulpCliCommand):
+    def __init__(self):
+        PulpCliCommand.__init__(self, 'command-%(i)d', 'generated command', self.run)
+
+    def run(self, **kwargs):
+        return %(i)d
+"""
+
+
+def generate_packs(extensions_dir, num_packs, num_commands):
+    for pack in range(num_packs):
+        pack_dir = os.path.join(extensions_dir, 'bench_pack_%d' % pack)
+        os.mkdir(pack_dir)
+        open(os.path.join(pack_dir, '__init__.py'), 'w').close()
+        commands = ''.join(COMMAND % {'i': i} for i in range(num_commands))
+        commands += '\nCOMMANDS = [%s]\n' % ', '.join('Command%d' % i for i in range(num_commands))
+        f = open(os.path.join(pack_dir, 'pulp_cli.py'), 'w')
+        f.write(PACK_CLI % {'name': 'bench-section-%d' % pack, 'commands': commands})
+        f.close()
+
+
+def measure(extensions_dir, role, section, index_filename, runs):
+    times = []
+    for i in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', CHILD, extensions_dir, role,
+                                          section or '', index_filename or ''])
+        times.append(float(output.split('elapsed ')[-1]))
+    times.sort()
+    return times[len(times) / 2]
+
+
+def run(options):
+    working_dir = tempfile.mkdtemp(prefix='admin-startup-')
+    try:
+        extensions_dir = options.extensions_dir
+        section = options.section
+        if extensions_dir is None:
+            extensions_dir = os.path.join(working_dir, 'extensions')
+            os.mkdir(extensions_dir)
+            generate_packs(extensions_dir, options.packs, options.commands)
+            section = section or 'bench-section-0'
+        index_filename = os.path.join(working_dir, 'index.json')
+
+        full = measure(extensions_dir, options.role, None, None, options.runs)
+        # The first indexed run builds the index
+        measure(extensions_dir, options.role, section, index_filename, 1)
+        indexed = measure(extensions_dir, options.role, section, index_filename, options.runs)
+
+        print 'Extensions: %s' % extensions_dir
+        print 'Loading every pack: %.1f ms' % (full * 1000)
+        print 'Loading packs for %s: %.1f ms' % (section, indexed * 1000)
+    finally:
+        shutil.rmtree(working_dir)
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('--extensions-dir', dest='extensions_dir', default=None,
+                      help='extensions directory to load instead of generated packs')
+    parser.add_option('--role', dest='role', default='admin',
+                      help='role whose entry points are loaded')
+    parser.add_option('--section', dest='section', default=None,
+                      help='root section of the command being run')
+    parser.add_option('--packs', dest='packs', type='int', default=10,
+                      help='number of packs to generate')
+    parser.add_option('--commands', dest='commands', type='int', default=40,
+                      help='number of commands in each generated pack')
+    parser.add_option('--runs', dest='runs', type='int', default=5,
+                      help='number of runs to take the median of')
+    options, args = parser.parse_args()
+    if options.extensions_dir is not None and options.section is None:
+        parser.error('--section is required with --extensions-dir')
+    run(options)
@@ -0,0 +1,69 @@
+#!/usr/bin/python -tt
+"""
+Measure the time spent authorizing one REST API call, with the database queries that
+is_authorized used to make for every request and with the in-process authorization cache.
+
+Both run against the database configured in /etc/pulp/server.conf and only read from it. The
+user must exist; give a non super user to exercise the permission lookup.
+
+ ./authorization_overhead.py --login alice --resource /v2/repositories/zoo/actions/sync/
+"""
+import optparse
+import time
+
+from pulp.server.auth import authorization
+from pulp.server.auth.cache import authorization_cache
+from pulp.server.db import connection
+from pulp.server.db.model.auth import Permission, User
+from pulp.server.managers.auth.role.cud import SUPER_USER_ROLE
+
+
+def uncached_is_authorized(resource, login, operation):
+    """
+    The queries is_authorized made before the authorization cache: the user, then each
+    parent of the resource, then "/".
+    """
+    user = User.get_collection().find_one({'login': login})
+    if SUPER_USER_ROLE in user['roles']:
+        return True
+    parts = [p for p in resource.split('/') if p]
+    resources = ['/%s/' % '/'.join(parts[:i]) for i in range(len(parts), 0, -1)] + ['/']
+    for current_resource in resources:
+        permission = Permission.get_collection().find_one({'resource': current_resource})
+        if permission is None:
+            continue
+        for item in permission['users']:
+            if item['username'] == login and operation in item['permissions']:
+                return True
+    return False
+
+
+def cached_is_authorized(resource, login, operation):
+    if SUPER_USER_ROLE in authorization_cache.user_roles(login):
+        return True
+    return authorization_cache.permission_tree().is_authorized(resource, login, operation)
+
+
+def measure(name, function, resource, login, operation, requests):
+    result = function(resource, login, operation)
+    started = time.time()
+    for i in range(requests):
+        function(resource, login, operation)
+    elapsed = time.time() - started
+    print '%-10s authorized=%s  %.1f us/request' % (name, result, elapsed / requests * 1000000)
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('--login', dest='login', default='admin', help='user making the requests')
+    parser.add_option('--resource', dest='resource',
+                      default='/v2/repositories/zoo/actions/sync/', help='requested resource')
+    parser.add_option('--requests', dest='requests', type='int', default=10000,
+                      help='number of requests to authorize')
+    options, args = parser.parse_args()
+
+    connection.initialize()
+    for name, function in (('uncached', uncached_is_authorized),
+                           ('cached', cached_is_authorized)):
+        measure(name, function, options.resource, options.login, authorization.EXECUTE,
+                options.requests)
@@ -4,8 +4,15 @@ from pulp.server.managers import factory as managers
 class CatalogerConduit(object):
     """
     Provides access to pulp platform API.
+    Added entries are buffered and written to the catalog in batches of
+    ADD_BATCH_SIZE.  The buffer is written when an entry is deleted and
+    when flush() is called.
+    :cvar ADD_BATCH_SIZE: The number of added entries written to the catalog at once.
+    :type ADD_BATCH_SIZE: int
     """
 
+    ADD_BATCH_SIZE = 1000
+
     def __init__(self, source_id, expires):
         """
         :param source_id: The content source ID.
@@ -18,6 +25,7 @@ class CatalogerConduit(object):
         self.expires = expires
         self.added_count = 0
         self.deleted_count = 0
+        self.pending = []
 
     def add_entry(self, type_id, unit_key, url):
         """
@@ -29,9 +37,10 @@ class CatalogerConduit(object):
         :param url: The URL used to download content associated with the unit.
         :type url: str
         """
-        manager = managers.content_catalog_manager()
-        manager.add_entry(self.source_id, self.expires, type_id, unit_key, url)
+        self.pending.append((type_id, unit_key, url))
         self.added_count += 1
+        if len(self.pending) >= self.ADD_BATCH_SIZE:
+            self.flush()
 
     def delete_entry(self, type_id, unit_key):
         """
@@ -41,13 +50,27 @@ class CatalogerConduit(object):
         :param unit_key: The content unit key.
         :type unit_key: dict
         """
+        self.flush()
         manager = managers.content_catalog_manager()
         manager.delete_entry(self.source_id, type_id, unit_key)
         self.deleted_count += 1
 
+    def flush(self):
+        """
+        Write the buffered entries to the content catalog.
+        """
+        if not self.pending:
+            return
+        manager = managers.content_catalog_manager()
+        manager.add_entries(self.source_id, self.expires, self.pending)
+        self.pending = []
+
     def reset(self):
         """
-        Reset statistics.
+        Reset statistics and discard the buffered entries that have not been
+        written, so that entries added by a failed refresh are not written
+        with those of the next one.
         """
         self.added_count = 0
         self.deleted_count = 0
+        self.pending = []
@@ -1,13 +1,19 @@
 from gettext import gettext as _
+import copy
 import logging
 import sys
+import threading
+import time
+import uuid
 
 from pymongo.errors import DuplicateKeyError
 
 from pulp.plugins.model import Unit, PublishReport
 from pulp.plugins.types import database as types_db
+from pulp.plugins.util.misc import paginate
 from pulp.server.async.tasks import get_current_task_id
 from pulp.server.db.model.dispatch import TaskStatus
+from pulp.server.db.model.repository import RepoContentUnit
 from pulp.server.exceptions import MissingResource
 import pulp.plugins.conduits._common as common_utils
 import pulp.server.managers.factory as manager_factory
@@ -15,6 +21,13 @@ import pulp.server.managers.factory as manager_factory
 
 _logger = logging.getLogger(__name__)
 
+# The number of units saved at once by AddUnitMixin.save_units.
+SAVE_UNITS_BATCH_SIZE = 1000
+
+# The minimum number of seconds between the progress report writes made for
+# StatusMixin.update_progress.
+PROGRESS_WRITE_INTERVAL = 0.5
+
 
 class ImporterConduitException(Exception):
     """
@@ -44,6 +57,13 @@ class ContentSourcesConduitException(Exception):
     pass
 
 
+class OrphanConduitException(Exception):
+    """
+    General exception that wraps any exception coming out of the Pulp server.
+    """
+    pass
+
+
 class RepoScratchPadMixin(object):
 
     def __init__(self, repo_id, exception_class):
@@ -416,6 +436,11 @@ class AddUnitMixin(object):
         self._added_count = 0
         self._updated_count = 0
 
+        # Repositories whose content revision has to be replaced, and the ids of the existing
+        # units, keyed by type, whose content was changed by an update
+        self._revised_repo_ids = set()
+        self._changed_unit_ids = {}
+
         self._association_owner_id = association_owner_id
 
     def init_unit(self, type_id, unit_key, metadata, relative_path):
@@ -507,6 +532,180 @@ class AddUnitMixin(object):
             _logger.exception(_('Content unit association failed [%s]' % str(unit)))
             raise ImporterConduitException(e), None, sys.exc_info()[2]
 
+    def save_units(self, units):
+        """
+        Bulk equivalent of save_unit(). Creates or updates Pulp's knowledge of
+        each content unit and associates the units to the repository being
+        synchronized.
+
+        Units are processed SAVE_UNITS_BATCH_SIZE at a time. Existing units are
+        looked up by unit key for the whole batch, new units are added with a
+        single insert and the associations are created together. The repository
+        unit counts, last unit added and content revisions are updated once
+        after all of the units are saved.
+
+        The id field of each unit is populated with the UUID for the unit.
+
+        :param units: unit objects returned from the init_unit call
+        :type  units: iterable of Unit
+
+        :return: object references to the provided units, their state updated from the call
+        :rtype:  list of Unit
+        """
+        try:
+            association_manager = manager_factory.repo_unit_association_manager()
+            repo_manager = manager_factory.repo_manager()
+
+            saved = []
+            added_counts = {}
+            for page in paginate(units, SAVE_UNITS_BATCH_SIZE):
+                units_by_type = {}
+                for unit in page:
+                    units_by_type.setdefault(unit.type_id, []).append(unit)
+                for type_id, typed_units in units_by_type.items():
+                    self._save_units(type_id, typed_units)
+                    added_counts[type_id] = added_counts.get(type_id, 0) + \
+                        association_manager.associate_all_by_ids(
+                            self.repo_id, type_id, [unit.id for unit in typed_units],
+                            self.association_owner_type, self.association_owner_id,
+                            update_repo_metadata=False)
+                saved.extend(page)
+
+            for type_id, count in added_counts.items():
+                if count:
+                    repo_manager.update_unit_count(self.repo_id, type_id, count)
+            if any(added_counts.values()):
+                repo_manager.update_last_unit_added(self.repo_id)
+                self._revised_repo_ids.add(self.repo_id)
+            self.update_content_revisions()
+
+            return saved
+        except Exception, e:
+            _logger.exception(_('Content unit association failed'))
+            raise ImporterConduitException(e), None, sys.exc_info()[2]
+
+    def _save_units(self, type_id, units):
+        """
+        Add or update a batch of units of the same type. Units that share a unit
+        key are saved once and are all given the same id.
+
+        :param type_id: the type of all of the units
+        :type  type_id: str
+        :param units:   the units to be saved
+        :type  units:   list of pulp.plugins.model.Unit
+
+        """
+        content_query_manager = manager_factory.content_query_manager()
+        content_manager = manager_factory.content_manager()
+
+        key_fields = sorted(units[0].unit_key)
+
+        def unit_key_values(unit_key):
+            return tuple(unit_key.get(f) for f in key_fields)
+
+        units_by_key = {}
+        for unit in units:
+            units_by_key.setdefault(unit_key_values(unit.unit_key), []).append(unit)
+
+        existing = dict(
+            (unit_key_values(pulp_unit), pulp_unit)
+            for pulp_unit in content_query_manager.get_multiple_units_by_keys_dicts(
+                type_id, [same_units[0].unit_key for same_units in units_by_key.values()]))
+
+        new_units = {}
+        for key, same_units in units_by_key.items():
+            if key in existing:
+                existing_unit = existing[key]
+                pulp_unit = common_utils.to_pulp_unit(same_units[-1])
+                self._set_unit_ids(same_units, existing_unit['_id'])
+                self._unit_updated(type_id, existing_unit, pulp_unit)
+                content_manager.update_content_unit(type_id, existing_unit['_id'], pulp_unit)
+                self._updated_count += 1
+            else:
+                new_units[key] = same_units
+
+        if not new_units:
+            return
+
+        unit_ids = [str(uuid.uuid4()) for key in new_units]
+        try:
+            content_manager.add_content_units(
+                type_id, [(unit_id, common_utils.to_pulp_unit(same_units[-1]))
+                          for unit_id, same_units in zip(unit_ids, new_units.values())])
+        except DuplicateKeyError:
+            # Another workflow added some of the same units since they were looked up.
+            _logger.debug(_('cannot add some units; already exist. updating instead.'))
+            added = set(pulp_unit['_id'] for pulp_unit in
+                        content_query_manager.get_multiple_units_by_ids(
+                            type_id, unit_ids, model_fields=['_id']))
+            for unit_id, same_units in zip(unit_ids, new_units.values()):
+                if unit_id in added:
+                    self._set_unit_ids(same_units, unit_id)
+                    self._added_count += 1
+                else:
+                    pulp_unit = common_utils.to_pulp_unit(same_units[-1])
+                    self._set_unit_ids(same_units, self._update_unit(same_units[-1], pulp_unit))
+            return
+
+        for unit_id, same_units in zip(unit_ids, new_units.values()):
+            self._set_unit_ids(same_units, unit_id)
+        self._added_count += len(new_units)
+
+    def _unit_updated(self, type_id, existing_unit, pulp_unit):
+        """
+        Remember an existing unit that is about to be updated if the update changes its
+        content, so that the content revision of each repository it is in can be replaced.
+
+        :param type_id:         the type of the unit
+        :type  type_id:         str
+        :param existing_unit:   the unit as it is stored in the database
+        :type  existing_unit:   dict
+        :param pulp_unit:       the unit it is updated with, as a dict
+        :type  pulp_unit:       dict
+        """
+        for field, value in pulp_unit.items():
+            if existing_unit.get(field) != value:
+                self._changed_unit_ids.setdefault(type_id, set()).add(existing_unit['_id'])
+                return
+
+    def update_content_revisions(self):
+        """
+        Replace the content revision of every repository whose content was changed through
+        this conduit since the last call: the repository units were added to, and each
+        repository containing an existing unit whose content was updated. Each revision is
+        replaced once however many units changed.
+
+        This is called by save_units and by Pulp once the importer is finished, so importers
+        do not need to call it.
+        """
+        repo_ids = self._revised_repo_ids
+        changed_unit_ids = self._changed_unit_ids
+        self._revised_repo_ids = set()
+        self._changed_unit_ids = {}
+
+        collection = RepoContentUnit.get_collection()
+        for type_id, unit_ids in changed_unit_ids.items():
+            for page in paginate(unit_ids, SAVE_UNITS_BATCH_SIZE):
+                spec = {'unit_type_id': type_id, 'unit_id': {'$in': list(page)}}
+                repo_ids.update(collection.find(spec, fields=['repo_id']).distinct('repo_id'))
+
+        repo_manager = manager_factory.repo_manager()
+        for repo_id in repo_ids:
+            repo_manager.update_content_revision(repo_id)
+
+    @staticmethod
+    def _set_unit_ids(units, unit_id):
+        """
+        Set the id field of each unit.
+
+        :param units:   the units to be updated
+        :type  units:   list of pulp.plugins.model.Unit
+        :param unit_id: the id of the units
+        :type  unit_id: basestring
+        """
+        for unit in units:
+            unit.id = unit_id
+
     def _update_unit(self, unit, pulp_unit):
         """
         Update a unit. If it is not found, add it.
@@ -525,6 +724,7 @@ class AddUnitMixin(object):
             existing_unit = content_query_manager.get_content_unit_by_keys_dict(unit.type_id,
                                                                                 unit.unit_key)
             unit_id = existing_unit['_id']
+            self._unit_updated(unit.type_id, existing_unit, pulp_unit)
             content_manager.update_content_unit(unit.type_id, unit_id, pulp_unit)
             self._updated_count += 1
             return unit_id
@@ -593,6 +793,138 @@ class AddUnitMixin(object):
             raise ImporterConduitException(e), None, sys.exc_info()[2]
 
 
+class ProgressReportWriter(object):
+    """
+    Writes one entry of the progress report of a task to its TaskStatus. Reports passed to
+    update() are coalesced and written by a background thread at most every interval seconds,
+    and only the parts of the report that changed since the last write are sent. flush() writes
+    the latest report immediately.
+
+    Only the entry of the progress report under report_id is written, so several writers can
+    report on the same task without overwriting each other's entries.
+
+    The background thread is started by update() and exits once there is nothing left to write,
+    so no thread outlives the task.
+    """
+
+    def __init__(self, task_id, report_id, interval=PROGRESS_WRITE_INTERVAL):
+        """
+        :param task_id:   The ID of the task whose progress report is written
+        :type  task_id:   basestring
+        :param report_id: The key of the entry of the progress report that is written
+        :type  report_id: basestring
+        :param interval:  The minimum number of seconds between writes made by the background
+                          thread
+        :type  interval:  float
+        """
+        self.task_id = task_id
+        self.report_id = report_id
+        self.interval = interval
+        self.written = None
+        self.pending = None
+        self.last_write = 0
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def update(self, progress_report):
+        """
+        Replace the report waiting to be written and make sure it is written within interval
+        seconds.
+
+        :param progress_report: The complete report of this entry
+        """
+        with self._lock:
+            self.pending = copy.deepcopy(progress_report)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.setDaemon(True)
+                self._thread.start()
+
+    def write(self, progress_report):
+        """
+        Write a report immediately, replacing any report waiting to be written.
+
+        :param progress_report: The complete report of this entry
+        """
+        with self._lock:
+            self.pending = copy.deepcopy(progress_report)
+            self._write()
+
+    def flush(self):
+        """
+        Write the report waiting to be written, if any.
+        """
+        with self._lock:
+            self._write()
+
+    def _run(self):
+        """
+        Write the waiting report every interval seconds until none is waiting.
+        """
+        while True:
+            with self._lock:
+                delay = self.last_write + self.interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with self._lock:
+                if self.pending is None:
+                    self._thread = None
+                    return
+                try:
+                    self._write()
+                except Exception:
+                    _logger.exception(_('Could not write the progress report of task [%(t)s]') %
+                                      {'t': self.task_id})
+
+    def _write(self):
+        """
+        Write the waiting report. The first report is written whole, and later reports as a
+        $set of the parts that changed. The report is left waiting if the write fails.
+        """
+        report = self.pending
+        if report is None:
+            return
+        path = 'progress_report.%s' % self.report_id
+        changes = {}
+        if self.written is None:
+            changes[path] = report
+        else:
+            _progress_changes(path, self.written, report, changes)
+        if changes:
+            TaskStatus._get_collection().update({'task_id': self.task_id}, {'$set': changes})
+        self.written = report
+        self.last_write = time.time()
+        if self.pending is report:
+            self.pending = None
+
+
+def _progress_changes(path, old, new, changes):
+    """
+    Find the parts of a progress report that changed. Dictionaries with the same keys and lists
+    of the same length are compared item by item, and anything else that differs is replaced
+    whole.
+
+    :param path:    The dotted path of the values in the document
+    :type  path:    str
+    :param old:     The value that was last written
+    :param new:     The value to be written
+    :param changes: The values to $set, keyed by dotted path, which is added to
+    :type  changes: dict
+    """
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict) and set(old) == set(new) and \
+            not [k for k in new if not isinstance(k, basestring) or '.' in k or
+                 k.startswith('$')]:
+        for key, value in new.items():
+            _progress_changes('%s.%s' % (path, key), old[key], value, changes)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, value in enumerate(new):
+            _progress_changes('%s.%d' % (path, index), old[index], value, changes)
+    else:
+        changes[path] = new
+
+
 class StatusMixin(object):
 
     def __init__(self, report_id, exception_class):
@@ -600,6 +932,7 @@ class StatusMixin(object):
         self.exception_class = exception_class
         self.progress_report = {}
         self.task_id = get_current_task_id()
+        self._progress_writer = None
 
     def set_progress(self, status):
         """
@@ -607,6 +940,9 @@ class StatusMixin(object):
         contents of the status is dependent on how the distributor
         implementation chooses to divide up the publish process.
 
+        The status is written before this call returns. Use update_progress
+        for frequent updates that may be coalesced.
+
         @param status: contains arbitrary data to describe the state of the
                publish; the contents may contain whatever information is relevant
                to the distributor implementation so long as it is serializable
@@ -618,8 +954,7 @@ class StatusMixin(object):
 
         try:
             self.progress_report[self.report_id] = status
-            TaskStatus.objects(task_id=self.task_id).update_one(
-                set__progress_report=self.progress_report)
+            self._get_progress_writer().write(status)
         except Exception, e:
             _logger.exception(
                 'Exception from server setting progress for report [%s]' % self.report_id)
@@ -631,6 +966,48 @@ class StatusMixin(object):
                 pass
             raise self.exception_class(e), None, sys.exc_info()[2]
 
+    def update_progress(self, status):
+        """
+        Informs the server of the current state of the operation without
+        waiting for it to be written. Updates are coalesced and written by a
+        background thread at most every PROGRESS_WRITE_INTERVAL seconds; call
+        set_progress or flush_progress to write the status immediately.
+
+        @param status: contains arbitrary data to describe the state of the
+               operation, as for set_progress
+        """
+
+        if self.task_id is None:
+            # not running within a task
+            return
+
+        self.progress_report[self.report_id] = status
+        self._get_progress_writer().update(status)
+
+    def flush_progress(self):
+        """
+        Write the status passed to update_progress if it has not been written yet.
+        """
+
+        if self._progress_writer is None:
+            return
+
+        try:
+            self._progress_writer.flush()
+        except Exception, e:
+            _logger.exception(
+                'Exception from server setting progress for report [%s]' % self.report_id)
+            raise self.exception_class(e), None, sys.exc_info()[2]
+
+    def _get_progress_writer(self):
+        """
+        @return: the writer of this conduit's progress report
+        @rtype:  ProgressReportWriter
+        """
+        if self._progress_writer is None:
+            self._progress_writer = ProgressReportWriter(self.task_id, self.report_id)
+        return self._progress_writer
+
 
 class PublishReportMixin(object):
 
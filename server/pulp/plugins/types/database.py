@@ -4,16 +4,23 @@ This module covers both the ContentType collection itself as well as any
 type-specific collections that exist to suit the type needs.
 """
 
+import copy
 import logging
+import threading
+import time
 
 from pymongo import ASCENDING
 
-from pulp.server.db.model.content import ContentType
+from pulp.server.db.model.content import ContentType, ContentTypeGeneration
 import pulp.server.db.connection as pulp_db
 
 
 TYPE_COLLECTION_PREFIX = 'units_'
 
+# The number of seconds the cached type definitions are used before the database is checked
+# for changes made by other processes
+GENERATION_CHECK_INTERVAL = 10
+
 _logger = logging.getLogger(__name__)
 
 
@@ -48,6 +55,78 @@ class MissingDefinitions(Exception):
         return 'MissingDefinitions [%s]' % ', '.join(self.missing_type_ids)
 
 
+class TypeDefinitionCache(object):
+    """
+    An in-process copy of the type definitions in the database. Type definitions only change
+    when update_database runs, which increments the generation stored in the
+    content_type_generation collection. The cache is reloaded when that generation changes, and
+    checks it at most every GENERATION_CHECK_INTERVAL seconds. Changes made in this process
+    invalidate the cache immediately.
+
+    :ivar generation:      The generation of the cached definitions
+    :type generation:      int
+    :ivar definitions:     The type definitions in database order
+    :type definitions:     list of dict
+    :ivar by_id:           The type definitions keyed by type ID
+    :type by_id:           dict
+    :ivar unit_key_fields: The flattened unit key fields of each type, keyed by type ID
+    :type unit_key_fields: dict
+    """
+
+    def __init__(self):
+        self.generation = None
+        self.definitions = None
+        self.by_id = {}
+        self.unit_key_fields = {}
+        self._checked_at = None
+        self._lock = threading.RLock()
+
+    def get(self):
+        """
+        Bring the cache up to date if it may be stale.
+
+        :return: this cache
+        :rtype:  TypeDefinitionCache
+        """
+        with self._lock:
+            now = time.time()
+            if self.definitions is not None and \
+                    now - self._checked_at < GENERATION_CHECK_INTERVAL:
+                return self
+            generation = _read_generation()
+            if self.definitions is None or generation != self.generation:
+                self.load(generation)
+            self._checked_at = now
+            return self
+
+    def load(self, generation):
+        """
+        Read all of the type definitions from the database.
+
+        :param generation: the generation that was read before the definitions
+        :type  generation: int
+        """
+        definitions = list(ContentType.get_collection().find())
+        self.by_id = dict((d['id'], d) for d in definitions)
+        self.unit_key_fields = {}
+        for type_def in definitions:
+            fields = []
+            _flatten_keys(fields, type_def.get('unit_key'))
+            self.unit_key_fields[type_def['id']] = tuple(fields)
+        self.definitions = definitions
+        self.generation = generation
+
+    def invalidate(self):
+        """
+        Discard the cached definitions so they are read again on the next call to get.
+        """
+        with self._lock:
+            self.definitions = None
+
+
+_type_cache = TypeDefinitionCache()
+
+
 def update_database(definitions, error_on_missing_definitions=False, drop_indices=False):
     """
     Brings the database up to date with the types defined in the given
@@ -140,6 +219,7 @@ def clean():
     # Purge the types collection of all entries
     type_collection = ContentType.get_collection()
     type_collection.remove(safe=True)
+    _increment_generation()
 
 
 def type_units_collection(type_id):
@@ -164,11 +244,7 @@ def all_type_ids():
     @rtype:  list of str
     """
 
-    collection = ContentType.get_collection()
-    type_id_son = list(collection.find(fields={'id': 1}))
-    type_ids = [t['id'] for t in type_id_son]
-
-    return type_ids
+    return [t['id'] for t in _type_cache.get().definitions]
 
 
 def all_type_collection_names():
@@ -177,14 +253,7 @@ def all_type_collection_names():
     @rtype:  list of str
     """
 
-    collection = ContentType.get_collection()
-    type_ids = list(collection.find(fields={'id': 1}))
-
-    type_collection_names = []
-    for id in type_ids:
-        type_collection_names.append(unit_collection_name(id['id']))
-
-    return type_collection_names
+    return [unit_collection_name(t['id']) for t in _type_cache.get().definitions]
 
 
 def all_type_definitions():
@@ -193,9 +262,7 @@ def all_type_definitions():
     @rtype:  list of dict
     """
 
-    coll = ContentType.get_collection()
-    types = list(coll.find())
-    return types
+    return copy.deepcopy(_type_cache.get().definitions)
 
 
 def type_definition(type_id):
@@ -206,9 +273,7 @@ def type_definition(type_id):
     @return: corresponding type definition, None if not found
     @rtype: SON or None
     """
-    collection = ContentType.get_collection()
-    type_ = collection.find_one({'id': type_id})
-    return type_
+    return copy.deepcopy(_type_cache.get().by_id.get(type_id))
 
 
 def unit_collection_name(type_id):
@@ -235,11 +300,66 @@ def type_units_unit_key(type_id):
              content type collection
     @rtype: list of str or None
     """
-    collection = ContentType.get_collection()
-    type_def = collection.find_one({'id': type_id})
+    type_def = _type_cache.get().by_id.get(type_id)
     if type_def is None:
         return None
-    return type_def['unit_key']
+    return copy.deepcopy(type_def['unit_key'])
+
+
+def type_units_unit_key_fields(type_id):
+    """
+    Get the fields of the unit key for a given content type, with any nested
+    lists of fields flattened. If no type definition is found for the given ID,
+    None is returned.
+
+    @param type_id: unique content type identifier
+    @type type_id: str
+    @return: names of the fields that together uniquely identify a unit of the type
+    @rtype: tuple of str or None
+    """
+    return _type_cache.get().unit_key_fields.get(type_id)
+
+
+def _read_generation():
+    """
+    @return: the generation of the type definitions in the database
+    @rtype:  int
+    """
+    document = ContentTypeGeneration.get_collection().find_one(
+        {'_id': ContentTypeGeneration.DOCUMENT_ID})
+    if document is None:
+        return 0
+    return document['generation']
+
+
+def _increment_generation():
+    """
+    Record that the type definitions in the database have changed, so that
+    other processes reload them, and discard this process's cached copy.
+    """
+    ContentTypeGeneration.get_collection().update(
+        {'_id': ContentTypeGeneration.DOCUMENT_ID}, {'$inc': {'generation': 1}},
+        upsert=True, safe=True)
+    _type_cache.invalidate()
+
+
+def _flatten_keys(flat_keys, nested_keys):
+    """
+    Take a list of string keys and (possibly) nested sub-lists and flatten it
+    out into an un-nested list of string keys.
+
+    @param flat_keys: the flat list to store all of the keys in
+    @type flat_keys: list
+    @param nested_keys: possibly nested list of string keys
+    @type nested_keys: list or str
+    """
+    if not nested_keys:
+        return
+    if isinstance(nested_keys, basestring):
+        flat_keys.append(nested_keys)
+        return
+    for key in nested_keys:
+        _flatten_keys(flat_keys, key)
 
 
 def _create_or_update_type(type_def):
@@ -271,6 +391,7 @@ def _create_or_update_type(type_def):
         content_type._id = existing_type['_id']
     # XXX this still causes a potential race condition when 2 users are updating the same type
     content_type_collection.save(content_type, safe=True)
+    _increment_generation()
 
 
 def _update_indexes(type_def, unique):
@@ -17,6 +17,46 @@ _LOG = logging.getLogger(__name__)
 BUFFER_SIZE = 1024
 
 
+class ChecksumFile(object):
+    """
+    Wraps a file object opened for writing and calculates the checksum and
+    size of the content incrementally as it is written.  All other attributes
+    are those of the wrapped file object.
+    """
+
+    def __init__(self, file_object, checksum_constructor):
+        """
+        :param file_object: the file object to write to
+        :type  file_object: file
+        :param checksum_constructor: hashlib constructor for the checksum
+        :type  checksum_constructor: callable
+        """
+        self.file_object = file_object
+        self.hasher = checksum_constructor()
+        self.size = 0
+
+    def write(self, data):
+        """
+        Write the data to the wrapped file object and add it to the checksum.
+
+        :param data: the data to write
+        :type  data: str
+        """
+        self.file_object.write(data)
+        self.hasher.update(data)
+        self.size += len(data)
+
+    def hexdigest(self):
+        """
+        :return: the checksum of the content written so far
+        :rtype:  str
+        """
+        return self.hasher.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self.file_object, name)
+
+
 class MetadataFileContext(object):
     """
     Context manager class for metadata file generation.
@@ -36,6 +76,10 @@ class MetadataFileContext(object):
         self.metadata_file_handle = None
         self.checksum_type = checksum_type
         self.checksum = None
+        self.open_checksum = None
+        self.open_size = None
+        self._checksum_file = None
+        self._open_checksum_file = None
         if self.checksum_type is not None:
             checksum_function = CHECKSUM_FUNCTIONS.get(checksum_type)
             if not checksum_function:
@@ -96,9 +140,12 @@ class MetadataFileContext(object):
         # Add calculated checksum to the filename
         file_name = os.path.basename(self.metadata_file_path)
         if self.checksum_type is not None:
-            with open(self.metadata_file_path, 'rb') as file_handle:
-                content = file_handle.read()
-                checksum = self.checksum_constructor(content).hexdigest()
+            if self._checksum_file is not None:
+                checksum = self._checksum_file.hexdigest()
+                self.open_checksum = self._open_checksum_file.hexdigest()
+                self.open_size = self._open_checksum_file.size
+            else:
+                checksum = self._calculate_checksum()
 
             self.checksum = checksum
             file_name_with_checksum = checksum + '-' + file_name
@@ -109,6 +156,24 @@ class MetadataFileContext(object):
 
         # Set the metadata_file_handle to None so we don't double call finalize
         self.metadata_file_handle = None
+        self._checksum_file = None
+        self._open_checksum_file = None
+
+    def _calculate_checksum(self):
+        """
+        Calculate the checksum of the metadata file by reading it. This is only
+        needed when the metadata file handle was not opened by this context.
+
+        :return: the checksum of the metadata file
+        :rtype:  str
+        """
+        hasher = self.checksum_constructor()
+        with open(self.metadata_file_path, 'rb') as file_handle:
+            content = file_handle.read(BUFFER_SIZE)
+            while content:
+                hasher.update(content)
+                content = file_handle.read(BUFFER_SIZE)
+        return hasher.hexdigest()
 
     def _open_metadata_file_handle(self):
         """
@@ -142,11 +207,30 @@ class MetadataFileContext(object):
         msg = _('Opening metadata file handle for [%(p)s]')
         _LOG.debug(msg % {'p': self.metadata_file_path})
 
+        if self.checksum_type is None:
+            if self.metadata_file_path.endswith('.gz'):
+                self.metadata_file_handle = gzip.open(self.metadata_file_path, 'w')
+
+            else:
+                self.metadata_file_handle = open(self.metadata_file_path, 'w')
+            return
+
+        # The checksums are calculated as the content is written so that finalize
+        # does not need to read the file again. For gzip files, the checksum of
+        # the compressed file is calculated along with the open checksum and size
+        # of the uncompressed content.
+        self._checksum_file = ChecksumFile(open(self.metadata_file_path, 'wb'),
+                                           self.checksum_constructor)
+
         if self.metadata_file_path.endswith('.gz'):
-            self.metadata_file_handle = gzip.open(self.metadata_file_path, 'w')
+            gzip_handle = gzip.GzipFile(self.metadata_file_path, 'wb',
+                                        fileobj=self._checksum_file)
+            self._open_checksum_file = ChecksumFile(gzip_handle, self.checksum_constructor)
 
         else:
-            self.metadata_file_handle = open(self.metadata_file_path, 'w')
+            self._open_checksum_file = self._checksum_file
+
+        self.metadata_file_handle = self._open_checksum_file
 
     def _write_file_header(self):
         """
@@ -168,6 +252,9 @@ class MetadataFileContext(object):
         if not self._is_closed(self.metadata_file_handle):
             self.metadata_file_handle.flush()
             self.metadata_file_handle.close()
+        # closing a gzip file does not close the file object it was given
+        if not self._is_closed(self._checksum_file):
+            self._checksum_file.close()
 
     @staticmethod
     def _is_closed(file_object):
@@ -184,13 +271,16 @@ class MetadataFileContext(object):
             # finalize has already been run or initialize has not been run
             return True
 
+        while isinstance(file_object, ChecksumFile):
+            file_object = file_object.file_object
+
         try:
             return file_object.closed
         except AttributeError:
             # python 2.6 doesn't have a "closed" attribute on a GzipFile,
             # so we must look deeper.
             if isinstance(file_object, gzip.GzipFile):
-                return file_object.myfileobj is None or file_object.myfileobj.closed
+                return file_object.fileobj is None
             else:
                 raise
 
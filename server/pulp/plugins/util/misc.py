@@ -1,7 +1,9 @@
 import errno
+from functools import partial
 from gettext import gettext as _
 import itertools
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import shutil
 
@@ -146,3 +148,75 @@ def clear_directory(path, skip_list=()):
 
         elif os.path.isfile(entry_path):
             os.unlink(entry_path)
+
+
+def link_tree(source_dir, target_dir, threads=1):
+    """
+    Recreate the directory tree rooted at source_dir at target_dir, hard linking
+    the files instead of copying them. Symbolic links are recreated with the same
+    target, as shutil.copytree() does with symlinks=True. Each level of the tree
+    is walked by a pool of threads.
+
+    The source_dir and target_dir must be on the same filesystem and target_dir
+    must not already exist.
+
+    :param source_dir: path of the directory tree to link
+    :type  source_dir: str
+    :param target_dir: path of the directory to create
+    :type  target_dir: str
+    :param threads: number of threads used to walk the tree
+    :type  threads: int
+
+    :raises OSError: if a file cannot be linked, such as when target_dir is on a
+                     different filesystem than source_dir
+    """
+    _log.debug('Linking tree from %s to %s' % (source_dir, target_dir))
+
+    os.makedirs(target_dir)
+    directories = ['']
+    pending = ['']
+    pool = ThreadPool(threads)
+    try:
+        while pending:
+            link_directory = partial(_link_directory, source_dir, target_dir)
+            pending = list(itertools.chain.from_iterable(pool.map(link_directory, pending)))
+            directories.extend(pending)
+    finally:
+        pool.close()
+        pool.join()
+
+    # Match shutil.copytree() by copying the directory permissions and times once
+    # the contents of each directory have been created.
+    for relative_dir in reversed(directories):
+        shutil.copystat(os.path.join(source_dir, relative_dir),
+                        os.path.join(target_dir, relative_dir))
+
+
+def _link_directory(source_dir, target_dir, relative_dir):
+    """
+    Link the files and symbolic links in a single directory for link_tree() and
+    create its subdirectories.
+
+    :param source_dir: path of the directory tree being linked
+    :type  source_dir: str
+    :param target_dir: path of the directory tree being created
+    :type  target_dir: str
+    :param relative_dir: path of the directory to link relative to source_dir
+    :type  relative_dir: str
+
+    :return: paths of the subdirectories relative to source_dir
+    :rtype:  list of str
+    """
+    subdirectories = []
+    for name in os.listdir(os.path.join(source_dir, relative_dir)):
+        relative_path = os.path.join(relative_dir, name)
+        source_path = os.path.join(source_dir, relative_path)
+        target_path = os.path.join(target_dir, relative_path)
+        if os.path.islink(source_path):
+            os.symlink(os.readlink(source_path), target_path)
+        elif os.path.isdir(source_path):
+            os.mkdir(target_path)
+            subdirectories.append(relative_path)
+        else:
+            os.link(source_path, target_path)
+    return subdirectories
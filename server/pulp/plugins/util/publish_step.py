@@ -26,6 +26,18 @@ import pulp.server.managers.factory as manager_factory
 
 _logger = logging.getLogger(__name__)
 
+# Ways AtomicDirectoryPublishStep can create the timestamped master directory
+MASTER_COPY = 'copy'
+MASTER_HARDLINK = 'hardlink'
+MASTER_RENAME = 'rename'
+
+# The number of threads used to walk the source directory when hard linking it
+MASTER_HARDLINK_THREADS = 4
+
+# The minimum number of seconds between the progress reports built by the root step for
+# updates that are not forced
+PROGRESS_REPORT_INTERVAL = 0.1
+
 
 def _post_order(step):
     """
@@ -258,6 +270,12 @@ class Step(object):
         """
         Bubble up that something has changed where progress should be reported.
         It is up to the parent to determine what actions should be taken.
+
+        The root step builds a report at most every PROGRESS_REPORT_INTERVAL
+        seconds and hands it to the conduit to be written in the background.
+        Forced reports, including every change of a step's state, are written
+        before this returns.
+
         :param force: Whether or not a write to the database should be forced
         :type force: bool
         """
@@ -272,9 +290,12 @@ class Step(object):
                 self.get_status_conduit().set_progress(self.get_progress_report())
             else:
                 current_time = time.time()
-                if current_time != self.last_report_time:
-                    # Update at most once a second
-                    self.get_status_conduit().set_progress(self.get_progress_report())
+                if current_time - self.last_report_time >= PROGRESS_REPORT_INTERVAL:
+                    # The conduit coalesces these and writes them in the background. Conduits
+                    # that only implement set_progress write each of them immediately.
+                    conduit = self.get_status_conduit()
+                    update_progress = getattr(conduit, 'update_progress', conduit.set_progress)
+                    update_progress(self.get_progress_report())
                     self.last_report_time = current_time
 
     def get_progress_report(self):
@@ -720,9 +741,18 @@ class AtomicDirectoryPublishStep(PublishStep):
             link each file in the source directory to a file with the same name in the target
             directory
     :type only_publish_directory_contents: bool
+    :param master_mode: How the master directory is created from the source directory. One of
+            MASTER_COPY to copy the tree, MASTER_HARDLINK to hard link its files or MASTER_RENAME
+            to move the source directory itself. The hard link and rename modes fall back to
+            copying when the source directory is on a different filesystem than the master
+            publish directory. The source directory no longer exists after a rename.
+    :type master_mode: str
+    :raises ValueError: if master_mode is not one of the modes above
     """
     def __init__(self, source_dir, publish_locations, master_publish_dir, step_type=None,
-                 only_publish_directory_contents=False):
+                 only_publish_directory_contents=False, master_mode=MASTER_COPY):
+        if master_mode not in (MASTER_COPY, MASTER_HARDLINK, MASTER_RENAME):
+            raise ValueError(_('Unknown master mode: %(m)s') % {'m': master_mode})
         step_type = step_type if step_type else reporting_constants.PUBLISH_STEP_DIRECTORY
         super(AtomicDirectoryPublishStep, self).__init__(step_type)
         self.context = None
@@ -730,6 +760,7 @@ class AtomicDirectoryPublishStep(PublishStep):
         self.publish_locations = publish_locations
         self.master_publish_dir = master_publish_dir
         self.only_publish_directory_contents = only_publish_directory_contents
+        self.master_mode = master_mode
 
     def process_main(self):
         """
@@ -744,9 +775,7 @@ class AtomicDirectoryPublishStep(PublishStep):
 
         # Given that it is timestamped for this publish/repo we could skip the copytree
         # for items where http & https are published to a separate directory
-
-        _logger.debug('Copying tree from %s to %s' % (self.source_dir, timestamp_master_dir))
-        shutil.copytree(self.source_dir, timestamp_master_dir, symlinks=True)
+        self._create_master_dir(timestamp_master_dir)
 
         for source_relative_location, publish_location in self.publish_locations:
             if source_relative_location.startswith('/'):
@@ -787,6 +816,35 @@ class AtomicDirectoryPublishStep(PublishStep):
         # Clear out any previously published masters
         self._clear_directory(self.master_publish_dir, skip_list=[self.parent.timestamp])
 
+    def _create_master_dir(self, timestamp_master_dir):
+        """
+        Create the timestamped master directory from the source directory as
+        specified by the master_mode.
+
+        :param timestamp_master_dir: The master directory to create
+        :type timestamp_master_dir: str
+        """
+        if self.master_mode != MASTER_COPY:
+            misc.mkdir(self.master_publish_dir)
+            same_filesystem = \
+                os.stat(self.source_dir).st_dev == os.stat(self.master_publish_dir).st_dev
+
+            if same_filesystem and self.master_mode == MASTER_RENAME:
+                _logger.debug('Renaming %s to %s' % (self.source_dir, timestamp_master_dir))
+                os.rename(self.source_dir, timestamp_master_dir)
+                return
+
+            if same_filesystem and self.master_mode == MASTER_HARDLINK:
+                misc.link_tree(self.source_dir, timestamp_master_dir,
+                               threads=MASTER_HARDLINK_THREADS)
+                return
+
+            _logger.debug('%s and %s are on different filesystems' %
+                          (self.source_dir, self.master_publish_dir))
+
+        _logger.debug('Copying tree from %s to %s' % (self.source_dir, timestamp_master_dir))
+        shutil.copytree(self.source_dir, timestamp_master_dir, symlinks=True)
+
 
 class SaveTarFilePublishStep(PublishStep):
     """
@@ -19,6 +19,8 @@ celery = Celery('tasks', broker=broker_url)
 
 DEDICATED_QUEUE_EXCHANGE = 'C.dq'
 RESOURCE_MANAGER_QUEUE = 'resource_manager'
+# Reservation releases and worker changes are sent to the resource manager on this queue
+RESERVATION_EVENT_QUEUE = 'reservation_events'
 CELERYBEAT_SCHEDULE = {
     'reap_expired_documents': {
         'task': 'pulp.server.db.reaper.queue_reap_expired_documents',
@@ -0,0 +1,264 @@
+"""
+This module contains the policies that decide which worker a reserved task is placed on when the
+resource it reserves is not already reserved on a worker. The policy is chosen with the
+worker_placement setting in the [tasks] section of server.conf, and the number of resources
+that may be reserved on a worker at once with the max_reservations_per_worker setting.
+"""
+
+from gettext import gettext as _
+import bisect
+import hashlib
+import logging
+import time
+
+from pulp.common import constants, dateutils
+from pulp.server.config import config
+from pulp.server.db.model.dispatch import TaskStatus
+
+
+_logger = logging.getLogger(__name__)
+
+# Names of the placement policies accepted by the worker_placement setting
+PLACEMENT_UNRESERVED = 'unreserved'
+PLACEMENT_LEAST_LOADED = 'least_loaded'
+PLACEMENT_CONSISTENT_HASH = 'consistent_hash'
+
+# The number of recently finished tasks used to estimate how long each worker's tasks take
+DURATION_SAMPLE_SIZE = 500
+
+# The number of seconds the task duration estimates are used before they are read again
+DURATION_REFRESH_INTERVAL = 60
+
+# The duration in seconds assumed for a task when no tasks have finished yet
+DEFAULT_DURATION = 60.0
+
+# The number of points each worker is given on the consistent hash ring
+HASH_REPLICAS = 100
+
+
+class PlacementPolicy(object):
+    """
+    Base class for the placement policies. A worker may be chosen only while fewer than
+    max_reservations resources are reserved on it.
+
+    :ivar max_reservations: The number of resources that may be reserved on a worker at once
+    :type max_reservations: int
+    """
+
+    def __init__(self, max_reservations=1):
+        self.max_reservations = max_reservations
+
+    def has_capacity(self, table, worker_name):
+        """
+        :param table:       The reservation table of the resource manager
+        :type  table:       pulp.server.managers.resources.ReservationTable
+        :param worker_name: The name of a worker
+        :type  worker_name: basestring
+
+        :return: True if another resource may be reserved on the worker
+        :rtype:  bool
+        """
+        return table.reserved_resource_count(worker_name) < self.max_reservations
+
+    def select(self, table, resource_id):
+        """
+        Choose the worker a resource that is not yet reserved should be reserved on.
+
+        :param table:       The reservation table of the resource manager
+        :type  table:       pulp.server.managers.resources.ReservationTable
+        :param resource_id: The name of the resource to be reserved
+        :type  resource_id: basestring
+
+        :return: The chosen worker, or None if no worker may take another reservation
+        :rtype:  pulp.server.db.model.resources.Worker or None
+        """
+        raise NotImplementedError()
+
+
+class UnreservedPolicy(PlacementPolicy):
+    """
+    Place the resource on the worker with the fewest reserved resources. With the default
+    max_reservations of 1 this is any worker that has no reservations.
+    """
+
+    def select(self, table, resource_id):
+        candidates = [(table.reserved_resource_count(name), name)
+                      for name in table.workers if self.has_capacity(table, name)]
+        if not candidates:
+            return None
+        return table.workers[min(candidates)[1]]
+
+
+class LeastLoadedPolicy(PlacementPolicy):
+    """
+    Place the resource on the worker that is expected to finish its queued tasks first. The
+    expected time is the number of tasks queued on the worker multiplied by the mean duration of
+    the tasks that recently finished on it.
+
+    :ivar durations: The recent task durations of the workers
+    :type durations: pulp.server.async.placement.TaskDurations
+    """
+
+    def __init__(self, max_reservations=1, durations=None):
+        super(LeastLoadedPolicy, self).__init__(max_reservations)
+        self.durations = durations or TaskDurations()
+
+    def select(self, table, resource_id):
+        candidates = [(self.estimated_load(table, name), table.queue_depth(name), name)
+                      for name in table.workers if self.has_capacity(table, name)]
+        if not candidates:
+            return None
+        return table.workers[min(candidates)[2]]
+
+    def estimated_load(self, table, worker_name):
+        """
+        :param table:       The reservation table of the resource manager
+        :type  table:       pulp.server.managers.resources.ReservationTable
+        :param worker_name: The name of a worker
+        :type  worker_name: basestring
+
+        :return: The number of seconds the worker is expected to need for its queued tasks
+        :rtype:  float
+        """
+        return table.queue_depth(worker_name) * self.durations.get(worker_name)
+
+
+class ConsistentHashPolicy(PlacementPolicy):
+    """
+    Place the resource on the worker that follows it on a consistent hash ring, so that a
+    resource is placed on the same worker each time as long as the workers do not change. When
+    that worker may not take another reservation, the next worker on the ring is used.
+    """
+
+    def __init__(self, max_reservations=1):
+        super(ConsistentHashPolicy, self).__init__(max_reservations)
+        self._ring = []
+        self._ring_workers = frozenset()
+
+    def select(self, table, resource_id):
+        self._build_ring(table.workers)
+        start = bisect.bisect(self._ring, (_hash(resource_id),))
+        seen = set()
+        for i in range(len(self._ring)):
+            name = self._ring[(start + i) % len(self._ring)][1]
+            if name in seen:
+                continue
+            seen.add(name)
+            if self.has_capacity(table, name):
+                return table.workers[name]
+        return None
+
+    def _build_ring(self, worker_names):
+        """
+        Rebuild the hash ring if the workers have changed since it was last built.
+
+        :param worker_names: The names of the workers that can be assigned work
+        :type  worker_names: iterable
+        """
+        worker_names = frozenset(worker_names)
+        if worker_names == self._ring_workers:
+            return
+        ring = []
+        for name in worker_names:
+            for replica in range(HASH_REPLICAS):
+                ring.append((_hash('%s-%d' % (name, replica)), name))
+        ring.sort()
+        self._ring = ring
+        self._ring_workers = worker_names
+
+
+class TaskDurations(object):
+    """
+    The mean duration of the tasks that recently finished on each worker, read from the
+    task_status collection at most every DURATION_REFRESH_INTERVAL seconds.
+
+    :ivar means:   The mean task duration in seconds, keyed by worker name
+    :type means:   dict
+    :ivar default: The duration used for workers that have no finished tasks
+    :type default: float
+    """
+
+    def __init__(self):
+        self.means = {}
+        self.default = DEFAULT_DURATION
+        self._loaded_at = None
+
+    def get(self, worker_name):
+        """
+        :param worker_name: The name of a worker
+        :type  worker_name: basestring
+
+        :return: The mean duration in seconds of the tasks recently finished on the worker
+        :rtype:  float
+        """
+        now = time.time()
+        if self._loaded_at is None or now - self._loaded_at >= DURATION_REFRESH_INTERVAL:
+            self._loaded_at = now
+            try:
+                self.load()
+            except Exception:
+                _logger.exception(_('Could not read the recent task durations'))
+        return self.means.get(worker_name, self.default)
+
+    def load(self):
+        """
+        Read the start and finish times of the most recently finished tasks.
+        """
+        statuses = TaskStatus.objects(state__in=constants.CALL_COMPLETE_STATES,
+                                      start_time__ne=None, finish_time__ne=None)
+        statuses = statuses.only('worker_name', 'start_time', 'finish_time')
+        statuses = statuses.order_by('-finish_time').limit(DURATION_SAMPLE_SIZE)
+        totals = {}
+        for status in statuses:
+            start = dateutils.parse_iso8601_datetime(status.start_time)
+            finish = dateutils.parse_iso8601_datetime(status.finish_time)
+            delta = finish - start
+            duration = max(0.0, delta.days * 86400 + delta.seconds + delta.microseconds / 1e6)
+            total = totals.setdefault(status.worker_name, [0.0, 0])
+            total[0] += duration
+            total[1] += 1
+        self.means = dict((name, seconds / count) for name, (seconds, count) in totals.items())
+        if totals:
+            self.default = (sum(seconds for seconds, count in totals.values()) /
+                            sum(count for seconds, count in totals.values()))
+        else:
+            self.default = DEFAULT_DURATION
+
+
+POLICIES = {
+    PLACEMENT_UNRESERVED: UnreservedPolicy,
+    PLACEMENT_LEAST_LOADED: LeastLoadedPolicy,
+    PLACEMENT_CONSISTENT_HASH: ConsistentHashPolicy,
+}
+
+
+def get_policy():
+    """
+    Create the placement policy configured in the [tasks] section of server.conf. An unknown
+    policy name is logged and the unreserved policy is used instead.
+
+    :return: The configured placement policy
+    :rtype:  pulp.server.async.placement.PlacementPolicy
+    """
+    name = config.get('tasks', 'worker_placement')
+    max_reservations = max(1, config.getint('tasks', 'max_reservations_per_worker'))
+    try:
+        policy_class = POLICIES[name]
+    except KeyError:
+        msg = _('Unknown worker placement policy %(p)s, using %(d)s')
+        _logger.error(msg % {'p': name, 'd': PLACEMENT_UNRESERVED})
+        policy_class = UnreservedPolicy
+    return policy_class(max_reservations)
+
+
+def _hash(value):
+    """
+    :param value: The value to hash
+    :type  value: basestring
+
+    :return: A hash of the value that is the same in every process
+    :rtype:  long
+    """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return long(hashlib.md5(value).hexdigest()[:16], 16)
@@ -2,13 +2,12 @@ from datetime import datetime
 from gettext import gettext as _
 import logging
 import signal
-import time
 import uuid
 
 from celery import task, Task as CeleryTask, current_task
 from celery.app import control, defaults
 from celery.result import AsyncResult
-from celery.signals import worker_init
+from celery.signals import worker_init, worker_process_shutdown
 from mongoengine.queryset import DoesNotExist
 
 from pulp.common import constants, dateutils
@@ -18,6 +17,7 @@ from pulp.server.exceptions import PulpException, MissingResource
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import ReservedResource, Worker
+from pulp.server.event import dispatch
 from pulp.server.exceptions import NoWorkers
 from pulp.server.managers import resources
 from pulp.server.managers.repo import _common as common_utils
@@ -62,16 +62,17 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
             break
 
         try:
-            worker = resources.get_unreserved_worker()
+            worker = resources.get_unreserved_worker(resource_id)
         except NoWorkers:
             pass
         else:
             break
 
-        # No worker is ready for this work, so we need to wait
-        time.sleep(0.25)
+        # No worker is ready for this work, so we need to wait for a reservation to be released
+        resources.wait_for_release()
 
     ReservedResource(task_id, worker['name'], resource_id).save()
+    resources.add_reservation(task_id, worker['name'], resource_id)
 
     inner_kwargs['routing_key'] = worker.name
     inner_kwargs['exchange'] = DEDICATED_QUEUE_EXCHANGE
@@ -115,6 +116,7 @@ def _delete_worker(name, normal_shutdown=False):
 
     # Delete all reserved_resource documents for the worker
     ReservedResource.get_collection().remove({'worker_name': name})
+    resources.notify_workers_changed()
 
     # Cancel all of the tasks that were assigned to this worker's queue
     worker = Worker.from_bson({'_id': name})
@@ -133,12 +135,13 @@ def _release_resource(task_id):
     the _queue_reserved_task task.
 
     When a resource-reserving task is complete, this method releases the resource by removing the
-    ReservedResource object by UUID.
+    ReservedResource object by UUID and notifying the resource manager of the release.
 
     :param task_id: The UUID of the task that requested the reservation
     :type  task_id: basestring
     """
     ReservedResource.get_collection().remove({'_id': task_id})
+    resources.notify_released(task_id)
 
 
 class TaskResult(object):
@@ -516,3 +519,17 @@ def cleanup_old_worker(*args, **kwargs):
     _delete_worker(name, normal_shutdown=True)
     # Recreate a new working directory for worker that is starting now
     common_utils.create_worker_working_directory(name)
+
+
+@worker_process_shutdown.connect
+def deliver_notifications(*args, **kwargs):
+    """
+    Deliver the event notifications still queued in a worker process before it exits. Worker
+    processes exit without running atexit handlers, so the notification dispatcher cannot deliver
+    them on its own.
+
+    :param args: For positional arguments; and not used otherwise
+    :param kwargs: For keyword arguments; and not used otherwise
+    :return: None
+    """
+    dispatch.dispatcher.shutdown()
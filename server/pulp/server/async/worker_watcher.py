@@ -91,6 +91,7 @@ def handle_worker_heartbeat(event):
         msg = _("New worker '%(worker_name)s' discovered") % event_info
         _logger.info(msg)
         new_worker.save()
+        resources.notify_workers_changed()
 
 
 def handle_worker_offline(event):
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+"""
+In-process caches used to authorize REST API calls without querying the database for every
+request. The permissions are indexed by resource path in a PermissionTree, and the roles of
+each user are kept for a short time. The user, role and permission managers invalidate the
+caches when they write, and the time limits bound how long a change made by another process
+goes unnoticed.
+
+Passwords and certificates that were recently verified are kept in CredentialCaches so the
+expensive password hashing and CA signature check are not repeated on every request.
+"""
+
+import hashlib
+import threading
+import time
+
+from pulp.server.db.model.auth import Permission, User
+from pulp.server.exceptions import MissingResource
+
+
+# The number of seconds cached permissions and users are used before they are read again
+AUTHORIZATION_CACHE_TTL = 10
+
+# The number of verified credentials that are kept, and the number of seconds each is kept for
+CREDENTIAL_CACHE_SIZE = 1024
+CREDENTIAL_CACHE_TTL = 30
+
+
+class PermissionNode(object):
+    """
+    A node of the permission tree, corresponding to one resource path.
+
+    :ivar children: The nodes of the resource paths one component longer, keyed by the component
+    :type children: dict
+    :ivar users:    The operations each user may perform, keyed by login, or None if there is
+                    no permission for the resource path
+    :type users:    dict or None
+    """
+
+    def __init__(self):
+        self.children = {}
+        self.users = None
+
+
+class PermissionTree(object):
+    """
+    All of the permissions, indexed by the components of their resource paths so that the
+    permissions for a resource and each of its parents are found with one walk from the root.
+
+    :ivar root: The node of the "/" resource
+    :type root: PermissionNode
+    """
+
+    def __init__(self, permissions=()):
+        self.root = PermissionNode()
+        for permission in permissions:
+            self.add(permission)
+
+    def add(self, permission):
+        """
+        Add a permission document to the tree. The resource of the permission must be "/" or
+        begin and end with "/" to be found, which is the form is_authorized has always looked up.
+
+        :param permission: a permission document from the database
+        :type  permission: dict
+        """
+        resource = permission['resource']
+        parts = _split(resource)
+        if resource != _join(parts):
+            return
+        node = self.root
+        for part in parts:
+            node = node.children.setdefault(part, PermissionNode())
+        if node.users is not None:
+            return
+        node.users = dict((item['username'], frozenset(item['permissions']))
+                          for item in permission['users'])
+
+    def is_authorized(self, resource, login, operation):
+        """
+        :param resource:  pulp resource path
+        :type  resource:  str
+        :param login:     login of the user
+        :type  login:     str
+        :param operation: operation to be performed on the resource
+        :type  operation: int
+
+        :return: True if the user is granted the operation on the resource or any of its parents
+        :rtype:  bool
+        """
+        node = self.root
+        nodes = [node]
+        for part in _split(resource):
+            node = node.children.get(part)
+            if node is None:
+                break
+            nodes.append(node)
+        for node in nodes:
+            if node.users is not None and operation in node.users.get(login, ()):
+                return True
+        return False
+
+
+class AuthorizationCache(object):
+    """
+    The permission tree and the roles of the users that recently made requests.
+
+    :ivar ttl: The number of seconds cached values are used before they are read again
+    :type ttl: int
+    """
+
+    def __init__(self, ttl=AUTHORIZATION_CACHE_TTL):
+        self.ttl = ttl
+        self._tree = None
+        self._tree_expires = 0
+        self._roles = {}
+        self._lock = threading.Lock()
+
+    def permission_tree(self):
+        """
+        :return: the permission tree, read from the database if it has expired
+        :rtype:  PermissionTree
+        """
+        with self._lock:
+            now = time.time()
+            if self._tree is None or now >= self._tree_expires:
+                self._tree = PermissionTree(Permission.get_collection().find())
+                self._tree_expires = now + self.ttl
+            return self._tree
+
+    def user_roles(self, login):
+        """
+        :param login: login of the user
+        :type  login: str
+
+        :return: the IDs of the roles the user is a member of
+        :rtype:  frozenset
+
+        :raise MissingResource: if there is no user with the login
+        """
+        with self._lock:
+            now = time.time()
+            cached = self._roles.get(login)
+            if cached is not None and now < cached[0]:
+                return cached[1]
+            user = User.get_collection().find_one({'login': login}, fields=['roles'])
+            if user is None:
+                self._roles.pop(login, None)
+                raise MissingResource(login)
+            roles = frozenset(user['roles'])
+            self._roles[login] = (now + self.ttl, roles)
+            return roles
+
+    def invalidate_permissions(self):
+        """
+        Discard the permission tree so it is read again on the next authorization.
+        """
+        with self._lock:
+            self._tree = None
+
+    def invalidate_users(self, login=None):
+        """
+        Discard the cached roles of a user, or of all users when no login is given.
+
+        :param login: login of the user
+        :type  login: str
+        """
+        with self._lock:
+            if login is None:
+                self._roles.clear()
+            else:
+                self._roles.pop(login, None)
+
+
+class CredentialCache(object):
+    """
+    A bounded cache of credentials that were successfully verified. Keys are digests of the
+    credentials so the credentials themselves are not kept in memory. When the cache is full
+    the least recently used entry is discarded.
+
+    :ivar size: The maximum number of entries
+    :type size: int
+    :ivar ttl:  The number of seconds an entry is used for
+    :type ttl:  int
+    """
+
+    def __init__(self, size=CREDENTIAL_CACHE_SIZE, ttl=CREDENTIAL_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: digest of the credentials
+        :type  key: str
+
+        :return: the value stored when the credentials were verified, or None if they were not
+                 verified recently
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry[0]:
+                del self._entries[key]
+                return None
+            self._clock += 1
+            entry[2] = self._clock
+            return entry[1]
+
+    def add(self, key, value):
+        """
+        Record that the credentials were verified.
+
+        :param key:   digest of the credentials
+        :type  key:   str
+        :param value: the value to return from get, which must not be None
+        """
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.size:
+                now = time.time()
+                expired = [k for k, entry in self._entries.items() if now >= entry[0]]
+                for k in expired:
+                    del self._entries[k]
+                if len(self._entries) >= self.size:
+                    oldest = min(self._entries, key=lambda k: self._entries[k][2])
+                    del self._entries[oldest]
+            self._clock += 1
+            self._entries[key] = [time.time() + self.ttl, value, self._clock]
+
+    def invalidate(self, value=None):
+        """
+        Discard the entries that were added with the given value, or all entries when no value
+        is given.
+
+        :param value: the value the entries were added with
+        """
+        with self._lock:
+            if value is None:
+                self._entries.clear()
+                return
+            for key, entry in self._entries.items():
+                if entry[1] == value:
+                    del self._entries[key]
+
+
+def credential_digest(*parts):
+    """
+    :param parts: the parts of the credentials
+    :type  parts: list of str
+
+    :return: a digest of the credentials to use as a CredentialCache key
+    :rtype:  str
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, unicode):
+            part = part.encode('utf-8')
+        digest.update(hashlib.sha256(part).digest())
+    return digest.digest()
+
+
+def _split(resource):
+    """
+    :param resource: pulp resource path
+    :type  resource: str
+
+    :return: the non-empty components of the path
+    :rtype:  list of str
+    """
+    return [p for p in resource.split('/') if p]
+
+
+def _join(parts):
+    """
+    :param parts: components of a resource path
+    :type  parts: list of str
+
+    :return: the resource path the components were split from
+    :rtype:  str
+    """
+    if not parts:
+        return '/'
+    return '/%s/' % '/'.join(parts)
+
+
+authorization_cache = AuthorizationCache()
+password_cache = CredentialCache()
+certificate_cache = CredentialCache()
@@ -87,6 +87,8 @@ _default_values = {
         'cacert': '/etc/pki/pulp/qpid/ca.crt',
         'keyfile': '/etc/pki/pulp/qpid/client.crt',
         'certfile': '/etc/pki/pulp/qpid/client.crt',
+        'worker_placement': 'unreserved',
+        'max_reservations_per_worker': '1',
     },
 }
 
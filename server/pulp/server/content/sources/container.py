@@ -7,9 +7,11 @@ from nectar.listener import DownloadEventListener
 from nectar.report import DownloadReport as NectarDownloadReport
 from nectar.request import DownloadRequest
 
+from pulp.plugins.util.misc import paginate
 from pulp.server.content.sources.model import ContentSource, PrimarySource, \
     DownloadReport, DownloadDetails, RefreshReport
 from pulp.server.managers import factory as managers
+from pulp.server.managers.content.catalog import FIND_BATCH_SIZE
 
 
 log = getLogger(__name__)
@@ -335,6 +337,24 @@ class Batch(object):
         queue.start()
         return queue
 
+    def _find_sources(self):
+        """
+        Find the content sources for each request.  The catalog is searched
+        for a page of FIND_BATCH_SIZE requests at a time rather than
+        for each request individually.
+        :return: A generator of requests with their sources set.
+        :rtype: generator
+        """
+        for page in paginate(self.requests, FIND_BATCH_SIZE):
+            if self.is_canceled:
+                return
+            catalog = managers.content_catalog_manager()
+            found = catalog.find_many((request.type_id, request.unit_key) for request in page)
+            for request in page:
+                entries = found.get(request.locator, [])
+                request.find_sources(self.primary, self.sources, entries)
+                yield request
+
     def download(self):
         """
         Begin processing the batch of requests.
@@ -351,10 +371,9 @@ class Batch(object):
         report.total_sources = len(self.sources)
 
         try:
-            for request in self.requests:
+            for request in self._find_sources():
                 if self.is_canceled:
                     break
-                request.find_sources(self.primary, self.sources)
                 self.dispatch(request)
                 count += 1
         except Exception:
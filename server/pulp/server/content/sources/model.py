@@ -22,6 +22,7 @@ from pulp.plugins.conduits.cataloger import CatalogerConduit
 from pulp.plugins.loader import api as plugins
 from pulp.server.content.sources import constants
 from pulp.server.content.sources.descriptor import is_valid, to_seconds, DEFAULT
+from pulp.server.db.model.content import ContentCatalog
 from pulp.server.managers import factory as managers
 
 
@@ -80,7 +81,16 @@ class Request(object):
         self.errors = []
         self.data = None
 
-    def find_sources(self, primary, alternates):
+    @property
+    def locator(self):
+        """
+        The content catalog locator for the requested unit.
+        :return: The locator.
+        :rtype: str
+        """
+        return ContentCatalog.get_locator(self.type_id, self.unit_key)
+
+    def find_sources(self, primary, alternates, entries=None):
         """
         Find and set the list of content sources in the order they are to
         be used to satisfy the request.  The alternate sources are
@@ -89,10 +99,15 @@ class Request(object):
         :type primary: ContentSource
         :param alternates: A list of alternative sources.
         :type list of: ContentSource
+        :param entries: The catalog entries for the requested unit when already
+            fetched using find_many().  When None, the catalog is searched.
+        :type entries: list
         """
         resolved = [(primary, self.url)]
-        catalog = managers.content_catalog_manager()
-        for entry in catalog.find(self.type_id, self.unit_key):
+        if entries is None:
+            catalog = managers.content_catalog_manager()
+            entries = catalog.find(self.type_id, self.unit_key)
+        for entry in entries:
             source_id = entry[constants.SOURCE_ID]
             source = alternates.get(source_id)
             if source is None:
@@ -295,11 +310,13 @@ class ContentSource(object):
         for url in self.urls:
             if cancel_event.isSet():
                 break
+            # discards the entries left unwritten when the previous URL failed
             conduit.reset()
             report = RefreshReport(self.id, url)
             log.info(REFRESHING, self.id, url)
             try:
                 plugin.refresh(conduit, self.descriptor, url)
+                conduit.flush()
                 log.info(REFRESH_SUCCEEDED, self.id, conduit.added_count, conduit.deleted_count)
                 report.succeeded = True
                 report.added_count = conduit.added_count
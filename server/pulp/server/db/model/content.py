@@ -65,6 +65,35 @@ class ContentType(Model):
         self.referenced_types = referenced_types
 
 
+class ContentTypeGeneration(Model):
+    """
+    Counts the changes made to the content type definitions, so that processes
+    caching the definitions can tell when they must be reloaded. The collection
+    holds a single document, whose _id is DOCUMENT_ID, with an integer
+    'generation' field that is incremented by each change.
+    """
+
+    collection_name = 'content_type_generation'
+    unique_indices = ()
+
+    DOCUMENT_ID = 'content_types'
+
+
+class ContentUnitGeneration(Model):
+    """
+    Counts the removals of content units, so that processes caching what was
+    calculated from the units, such as the orphan summary, can tell that it is
+    stale even when as many units were added since. The collection holds a
+    single document, whose _id is DOCUMENT_ID, with an integer 'generation'
+    field that is incremented by each removal.
+    """
+
+    collection_name = 'content_unit_generation'
+    unique_indices = ()
+
+    DOCUMENT_ID = 'content_units'
+
+
 class ContentCatalog(Model):
     """
     Represents a catalog of available content provided by content sources.
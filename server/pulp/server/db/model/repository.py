@@ -35,6 +35,11 @@ class Repo(Model):
                     the values may change as the contents of the repo change,
                     either set by the user or by an importer or distributor
     @type metadata: dict
+
+    @ivar content_revision: opaque token that is replaced every time units are
+                            associated with or unassociated from the repo; None
+                            until the first such change
+    @type content_revision: str
     """
 
     collection_name = 'repos'
@@ -51,6 +56,7 @@ class Repo(Model):
         self.content_unit_counts = content_unit_counts or {}
         self.last_unit_added = None
         self.last_unit_removed = None
+        self.content_revision = None
 
         # Timeline
         # TODO: figure out how to track repo modified states
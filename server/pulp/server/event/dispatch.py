@@ -0,0 +1,386 @@
+"""
+Delivers event notifications from a bounded pool of threads in each process.
+
+Notifiers submit a Delivery for each notification instead of sending it from the thread that
+fired the event. Each worker keeps its connection to every target it recently sent to open and
+reuses it, failed deliveries are retried with an exponential backoff, and submit waits for room
+when the queue is full so a storm of events slows the process firing them rather than starting a
+thread and a connection for each. The workers log the delivery metrics every METRICS_INTERVAL
+seconds while notifications are being submitted. Notifications still queued when the process
+exits are delivered before it exits, for up to SHUTDOWN_TIMEOUT seconds. Celery worker processes
+exit without running atexit handlers, so they call shutdown when the worker process shuts down.
+"""
+
+import atexit
+import logging
+import os
+import Queue
+import threading
+import time
+
+
+# The number of threads delivering notifications in each process
+WORKERS = 4
+
+# The number of notifications that may be queued, and the number of seconds submit waits for
+# room in a full queue before the notification is dropped
+QUEUE_SIZE = 1000
+QUEUE_TIMEOUT = 10
+
+# The number of times a failed delivery is retried, and the number of seconds before the first
+# retry, which is doubled for each retry after it
+RETRIES = 3
+RETRY_DELAY = 1
+
+# The number of seconds a connection is kept open after it was last used
+CONNECTION_IDLE_TIMEOUT = 30
+
+# The number of seconds spent delivering the queued notifications when the process exits
+SHUTDOWN_TIMEOUT = 10
+
+# The number of seconds between the logging of the delivery metrics
+METRICS_INTERVAL = 300
+
+_logger = logging.getLogger(__name__)
+
+
+class NotSent(Exception):
+    """
+    Raised by the send callable of a delivery when the notification could not be sent at all,
+    such as when the target had already closed the connection, so that sending it again cannot
+    deliver it twice.
+    """
+    pass
+
+
+class Delivery(object):
+    """
+    A notification to be delivered.
+
+    :ivar target:  identifies the connection the notification is sent over; notifications with
+                   the same target share a connection
+    :type target:  tuple
+    :ivar connect: called with no arguments to open a connection to the target
+    :type connect: callable
+    :ivar send:    called with the connection and args to send the notification; it raises an
+                   exception when the notification should be sent again, and NotSent when it
+                   was not sent at all
+    :type send:    callable
+    :ivar args:    the arguments passed to send after the connection
+    :type args:    tuple
+    :ivar queued:  the time the delivery was created
+    :type queued:  float
+    """
+
+    def __init__(self, target, connect, send, *args):
+        self.target = target
+        self.connect = connect
+        self.send = send
+        self.args = args
+        self.queued = time.time()
+
+
+class Connections(object):
+    """
+    The connections a worker has open, keyed by target. Each worker has its own connections,
+    so a connection is only used by one thread.
+    """
+
+    def __init__(self):
+        self._connections = {}
+
+    def __contains__(self, target):
+        return target in self._connections
+
+    def get(self, target, connect):
+        """
+        :param target:  identifies the connection
+        :type  target:  tuple
+        :param connect: called with no arguments to open the connection if it is not open
+        :type  connect: callable
+
+        :return: the open connection to the target
+        """
+        entry = self._connections.get(target)
+        if entry is None:
+            entry = [connect(), None]
+            self._connections[target] = entry
+        entry[1] = time.time()
+        return entry[0]
+
+    def discard(self, target):
+        """
+        Close the connection to a target, if it is open.
+
+        :param target: identifies the connection
+        :type  target: tuple
+        """
+        entry = self._connections.pop(target, None)
+        if entry is None:
+            return
+        try:
+            entry[0].close()
+        except Exception:
+            _logger.debug('Error closing the connection to %s' % (target,), exc_info=True)
+
+    def close_idle(self, idle):
+        """
+        Close the connections that have not been used recently.
+
+        :param idle: the number of seconds since a connection was last used
+        :type  idle: int
+        """
+        expired = time.time() - idle
+        for target, entry in self._connections.items():
+            if entry[1] < expired:
+                self.discard(target)
+
+    def close(self):
+        """
+        Close all of the connections.
+        """
+        for target in self._connections.keys():
+            self.discard(target)
+
+
+class Dispatcher(object):
+    """
+    Queues deliveries and delivers them from a pool of worker threads. The threads are started
+    when the first delivery is submitted in a process, including in each process forked after
+    the dispatcher was used.
+
+    :ivar workers:          the number of worker threads
+    :type workers:          int
+    :ivar queue_size:       the number of deliveries that may be queued
+    :type queue_size:       int
+    :ivar queue_timeout:    the number of seconds submit waits for room in a full queue
+    :type queue_timeout:    int
+    :ivar retries:          the number of times a failed delivery is retried
+    :type retries:          int
+    :ivar retry_delay:      the number of seconds before the first retry
+    :type retry_delay:      int
+    :ivar metrics_interval: the number of seconds between the logging of the metrics
+    :type metrics_interval: int
+    """
+
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, queue_timeout=QUEUE_TIMEOUT,
+                 retries=RETRIES, retry_delay=RETRY_DELAY, metrics_interval=METRICS_INTERVAL):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.metrics_interval = metrics_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._threads = []
+        self._exit_registered = False
+        self._queued = 0
+        self._delivered = 0
+        self._retried = 0
+        self._failed = 0
+        self._dropped = 0
+        self._latency = 0.0
+        self._max_latency = 0.0
+        self._metrics_logged = time.time()
+        self._metrics_queued = 0
+
+    def submit(self, delivery):
+        """
+        Queue a notification to be delivered. When the queue is full this waits up to
+        queue_timeout seconds for room, then drops the notification.
+
+        :param delivery: the notification
+        :type  delivery: Delivery
+
+        :return: True if the notification was queued
+        :rtype:  bool
+        """
+        queue = self._start()
+        try:
+            queue.put(delivery, timeout=self.queue_timeout)
+        except Queue.Full:
+            with self._lock:
+                self._dropped += 1
+            _logger.error('Notification queue is full; dropping the notification to %s' %
+                          (delivery.target,))
+            return False
+        with self._lock:
+            self._queued += 1
+        return True
+
+    def join(self):
+        """
+        Wait for the queued notifications to be delivered.
+        """
+        with self._lock:
+            queue = self._queue if self._pid == os.getpid() else None
+        if queue is not None:
+            queue.join()
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Deliver the queued notifications and stop the worker threads. This is called when the
+        process exits, and when a celery worker process shuts down.
+
+        :param timeout: the number of seconds to wait for the queued notifications
+        :type  timeout: int
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            queue = self._queue
+            threads = self._threads
+            self._pid = None
+            self._queue = None
+            self._threads = []
+        deadline = time.time() + timeout
+        try:
+            for thread in threads:
+                queue.put(None, timeout=max(deadline - time.time(), 0))
+        except Queue.Full:
+            pass
+        for thread in threads:
+            thread.join(max(deadline - time.time(), 0))
+        if [t for t in threads if t.isAlive()]:
+            _logger.warn('Notifications were still being delivered after %s seconds' % timeout)
+
+    def metrics(self):
+        """
+        :return: the number of notifications waiting in the queue ("queue_depth"), the number
+                 queued, delivered, retried, failed and dropped since the dispatcher was
+                 created, and the average and maximum number of seconds from the submission
+                 to the delivery of a notification ("average_latency", "max_latency")
+        :rtype:  dict
+        """
+        with self._lock:
+            queue = self._queue if self._pid == os.getpid() else None
+            average = 0.0
+            if self._delivered:
+                average = self._latency / self._delivered
+            return {
+                'queue_depth': queue.qsize() if queue is not None else 0,
+                'queued': self._queued,
+                'delivered': self._delivered,
+                'retried': self._retried,
+                'failed': self._failed,
+                'dropped': self._dropped,
+                'average_latency': average,
+                'max_latency': self._max_latency,
+            }
+
+    def _log_metrics(self):
+        """
+        Log the metrics if metrics_interval seconds have passed since they were last logged and
+        notifications were submitted since then, so an idle process does not log them.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._metrics_logged < self.metrics_interval:
+                return
+            if self._queued == self._metrics_queued:
+                return
+            self._metrics_logged = now
+            self._metrics_queued = self._queued
+        _logger.info('Notification delivery: %(queue_depth)d waiting, %(queued)d queued, '
+                     '%(delivered)d delivered, %(retried)d retried, %(failed)d failed, '
+                     '%(dropped)d dropped, %(average_latency).3fs average and '
+                     '%(max_latency).3fs maximum latency' % self.metrics())
+
+    def _start(self):
+        """
+        Start the worker threads if they are not running in this process.
+
+        :return: the queue of deliveries
+        :rtype:  Queue.Queue
+        """
+        with self._lock:
+            pid = os.getpid()
+            if self._pid == pid:
+                return self._queue
+            # threads are not copied into a forked process, so it gets its own queue and workers
+            self._pid = pid
+            self._queue = Queue.Queue(self.queue_size)
+            self._threads = []
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, args=(self._queue,),
+                                          name='notifier-%d' % i)
+                thread.setDaemon(True)
+                thread.start()
+                self._threads.append(thread)
+            if not self._exit_registered:
+                atexit.register(self.shutdown)
+                self._exit_registered = True
+            return self._queue
+
+    def _run(self, queue):
+        """
+        Deliver notifications from the queue until a None is read from it.
+
+        :param queue: the queue of deliveries
+        :type  queue: Queue.Queue
+        """
+        connections = Connections()
+        try:
+            while True:
+                try:
+                    delivery = queue.get(timeout=CONNECTION_IDLE_TIMEOUT)
+                except Queue.Empty:
+                    connections.close_idle(CONNECTION_IDLE_TIMEOUT)
+                    self._log_metrics()
+                    continue
+                try:
+                    if delivery is None:
+                        return
+                    self._deliver(delivery, connections)
+                finally:
+                    queue.task_done()
+                connections.close_idle(CONNECTION_IDLE_TIMEOUT)
+                self._log_metrics()
+        finally:
+            connections.close()
+
+    def _deliver(self, delivery, connections):
+        """
+        Send a notification, retrying it if it fails.
+
+        :param delivery:    the notification
+        :type  delivery:    Delivery
+        :param connections: the connections of the worker
+        :type  connections: Connections
+        """
+        attempt = 0
+        while True:
+            reused = delivery.target in connections
+            try:
+                connection = connections.get(delivery.target, delivery.connect)
+                delivery.send(connection, *delivery.args)
+                break
+            except Exception, e:
+                connections.discard(delivery.target)
+                if reused and isinstance(e, NotSent):
+                    # the target closed the idle connection before the notification was sent,
+                    # so send it on a new connection at once
+                    continue
+                if attempt >= self.retries:
+                    _logger.exception('Failed to deliver the notification to %s' %
+                                      (delivery.target,))
+                    with self._lock:
+                        self._failed += 1
+                    return
+                delay = self.retry_delay * 2 ** attempt
+                _logger.warn('Failed to deliver the notification to %s; retrying in %s seconds' %
+                             (delivery.target, delay))
+                with self._lock:
+                    self._retried += 1
+                attempt += 1
+                time.sleep(delay)
+        latency = time.time() - delivery.queued
+        with self._lock:
+            self._delivered += 1
+            self._latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+
+dispatcher = Dispatcher()
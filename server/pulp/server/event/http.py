@@ -10,11 +10,13 @@ Eventually this should be enhanced to support authentication credentials as well
 """
 
 import base64
+import functools
 import httplib
 import logging
-import threading
+import socket
 
 from pulp.server.compat import json, json_util
+from pulp.server.event import dispatch
 
 
 TYPE_ID = 'http'
@@ -23,8 +25,8 @@ _logger = logging.getLogger(__name__)
 
 
 def handle_event(notifier_config, event):
-    # fire the actual http push function off in a separate thread to keep
-    # pulp from blocking or deadlocking due to the tasking subsystem
+    # queue the http push to be sent by the dispatcher to keep pulp from blocking
+    # or deadlocking due to the tasking subsystem
 
     data = event.data()
 
@@ -32,13 +34,6 @@ def handle_event(notifier_config, event):
 
     body = json.dumps(data, default=json_util.default)
 
-    thread = threading.Thread(target=_send_post, args=[notifier_config, body])
-    thread.setDaemon(True)
-    thread.start()
-
-
-def _send_post(notifier_config, body):
-
     # Basic headers
     headers = {'Accept': 'application/json',
                'Content-Type': 'application/json'}
@@ -56,20 +51,43 @@ def _send_post(notifier_config, body):
         _logger.warn('Improperly configured post_sync_url: %(u)s' % {'u': url})
         return
 
-    connection = _create_connection(scheme, server)
-
     # Process authentication
     if 'username' in notifier_config and 'password' in notifier_config:
         raw = ':'.join((notifier_config['username'], notifier_config['password']))
         encoded = base64.encodestring(raw)[:-1]
         headers['Authorization'] = 'Basic ' + encoded
 
-    connection.request('POST', '/' + path, body=body, headers=headers)
-    response = connection.getresponse()
+    # notifications to the same server share a connection
+    connect = functools.partial(_create_connection, scheme, server)
+    delivery = dispatch.Delivery((scheme, server), connect, _send_post, '/' + path, body, headers)
+    dispatch.dispatcher.submit(delivery)
+
+
+def _send_post(connection, path, body, headers):
+    """
+    Post an event to the notifier URL. The response is read so the connection can be reused.
+
+    :raise dispatch.NotSent:      if the post could not be written, or the server closed the
+                                  connection without answering it
+    :raise httplib.HTTPException: if the server returns a server error, so the post is retried
+    """
+    try:
+        connection.request('POST', path, body=body, headers=headers)
+    except (httplib.HTTPException, socket.error), e:
+        raise dispatch.NotSent(str(e))
+    try:
+        response = connection.getresponse()
+    except httplib.BadStatusLine, e:
+        # httplib reports an empty status line as its repr
+        if e.line in ('', repr('')):
+            raise dispatch.NotSent('The server closed the connection')
+        raise
+    response_body = response.read()
+    if response.status >= httplib.INTERNAL_SERVER_ERROR:
+        raise httplib.HTTPException('Error response from HTTP notifier: %(s)s %(e)s' %
+                                    {'s': response.status, 'e': response_body})
     if response.status != httplib.OK:
-        error_msg = response.read()
-        _logger.warn('Error response from HTTP notifier: %(e)s' % {'e': error_msg})
-    connection.close()
+        _logger.warn('Error response from HTTP notifier: %(e)s' % {'e': response_body})
 
 
 def _create_connection(scheme, server):
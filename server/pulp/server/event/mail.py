@@ -1,6 +1,7 @@
+import functools
 import logging
 import smtplib
-import threading
+import socket
 
 try:
     from email.mime.text import MIMEText
@@ -10,6 +11,7 @@ except ImportError:
 
 from pulp.server.compat import json, json_util
 from pulp.server.config import config
+from pulp.server.event import dispatch
 
 
 TYPE_ID = 'email'
@@ -35,17 +37,38 @@ def handle_event(notifier_config, event):
     body = json.dumps(event.data(), indent=2, default=json_util.default)
     subject = notifier_config['subject']
     addresses = notifier_config['addresses']
+    host = config.get('email', 'host')
+    port = config.getint('email', 'port')
 
+    # the emails are sent over one connection to the SMTP server per dispatcher worker
+    connect = functools.partial(_connect, host, port)
     for address in addresses:
-        thread = threading.Thread(target=_send_email, args=(subject, body, address))
-        thread.daemon = True
-        thread.start()
+        delivery = dispatch.Delivery(('smtp', host, port), connect, _send_email,
+                                     subject, body, address)
+        dispatch.dispatcher.submit(delivery)
+
+
+def _connect(host, port):
+    """
+    Connect to the SMTP server.
+
+    :param host:    SMTP server host
+    :type  host:    basestring
+    :param port:    SMTP server port
+    :type  port:    int
+
+    :return: the SMTP connection
+    :rtype:  smtplib.SMTP
+    """
+    return smtplib.SMTP(host=host, port=port)
 
 
-def _send_email(subject, body, to_address):
+def _send_email(connection, subject, body, to_address):
     """
     Send a text email to one recipient
 
+    :param connection:  SMTP connection
+    :type  connection:  smtplib.SMTP
     :param subject: email subject
     :type  subject: basestring
     :param body:    text body of the email
@@ -54,9 +77,11 @@ def _send_email(subject, body, to_address):
     :type  to_address:  basestring
 
     :return: None
+
+    :raise dispatch.NotSent:      if the server closed the connection before the email was sent
+    :raise smtplib.SMTPException: if the email should be sent again, such as when the server
+                                  disconnected
     """
-    host = config.get('email', 'host')
-    port = config.getint('email', 'port')
     from_address = config.get('email', 'from')
 
     message = MIMEText(body)
@@ -65,16 +90,13 @@ def _send_email(subject, body, to_address):
     message['To'] = to_address
 
     try:
-        connection = smtplib.SMTP(host=host, port=port)
-    except smtplib.SMTPConnectError:
-        _logger.exception('SMTP connection failed to %s on %s' % (host, port))
-        return
+        # finds a connection the server closed while it was idle before the email is sent on it
+        connection.noop()
+    except (smtplib.SMTPServerDisconnected, socket.error), e:
+        raise dispatch.NotSent(str(e))
 
     try:
         connection.sendmail(from_address, to_address, message.as_string())
-    except smtplib.SMTPException:
-        try:
-            _logger.exception('Error sending mail.')
-        except AttributeError:
-            _logger.error('SMTP error while sending mail')
-    connection.quit()
+    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+        # the server refused the email, so sending it again would not help
+        _logger.exception('Error sending mail.')
@@ -4,6 +4,7 @@ import logging
 import oauth2
 
 from pulp.server.auth import ldap_connection
+from pulp.server.auth.cache import certificate_cache, credential_digest
 from pulp.server.config import config
 from pulp.server.db.model.consumer import Consumer
 from pulp.server.exceptions import PulpException
@@ -110,19 +111,11 @@ class AuthenticationManager(object):
         :rtype: str or None
         :return: user login corresponding to the credentials
         """
-        cert = factory.certificate_manager(content=cert_pem)
-        subject = cert.subject()
-        encoded_user = subject.get('CN', None)
-
+        encoded_user = self._check_cert(cert_pem)
         if not encoded_user:
             return None
 
         cert_gen_manager = factory.cert_generation_manager()
-        if not cert_gen_manager.verify_cert(cert_pem):
-            _logger.error(_('Auth certificate with CN [%(u)s] is signed by a foreign CA') %
-                          {'u': encoded_user})
-            return None
-
         try:
             username, id = cert_gen_manager.decode_admin_user(encoded_user)
         except PulpException:
@@ -141,20 +134,40 @@ class AuthenticationManager(object):
         :rtype: str or None
         :return: id of a consumer corresponding to the credentials
         """
+        return self._check_cert(cert_pem)
+
+    def _check_cert(self, cert_pem):
+        """
+        Check that an ssl certificate is signed by the server's CA. Certificates that were
+        verified recently are not parsed or verified again.
+        Return None if the certificate is not valid
+
+        :type cert_pem: str
+        :param cert_pem: pem encoded ssl certificate
+
+        :rtype: str or None
+        :return: the CN of the certificate subject
+        """
+        key = credential_digest(cert_pem)
+        cn = certificate_cache.get(key)
+        if cn is not None:
+            return cn
+
         cert = factory.certificate_manager(content=cert_pem)
         subject = cert.subject()
-        consumerid = subject.get('CN', None)
+        cn = subject.get('CN', None)
 
-        if consumerid is None:
+        if not cn:
             return None
 
         cert_gen_manager = factory.cert_generation_manager()
         if not cert_gen_manager.verify_cert(cert_pem):
             _logger.error(_('Auth certificate with CN [%(cn)s] is signed by a foreign CA') %
-                          {'cn': consumerid})
+                          {'cn': cn})
             return None
 
-        return consumerid
+        certificate_cache.add(key, cn)
+        return cn
 
     def check_oauth(self, username, method, url, auth, query):
         """
@@ -4,14 +4,19 @@ Password Manager
 Functions taken from stackoverflow.com : http://tinyurl.com/2f6gx7s
 """
 
-from hmac import HMAC
 import random
 
+from pulp.server.auth.cache import credential_digest, password_cache
 from pulp.server.compat import digestmod
 
 
 NUM_ITERATIONS = 5000
 
+# HMAC key padding, as in the hmac module
+_BLOCK_SIZE = 64
+_TRANS_5C = "".join(chr(x ^ 0x5C) for x in xrange(256))
+_TRANS_36 = "".join(chr(x ^ 0x36) for x in xrange(256))
+
 
 class PasswordManager(object):
     """
@@ -21,9 +26,16 @@ class PasswordManager(object):
         return "".join(chr(random.randrange(256)) for i in xrange(num_bytes))
 
     def pbkdf_sha256(self, password, salt, iterations):
-        result = password
+        # Each iteration is HMAC(result, salt, digestmod).digest(), computed with the
+        # digest functions directly to avoid creating and copying HMAC objects.
+        result = str(password)
+        translate = str.translate
         for i in xrange(iterations):
-            result = HMAC(result, salt, digestmod).digest()  # use HMAC to apply the salt
+            if len(result) > _BLOCK_SIZE:
+                result = digestmod(result).digest()
+            key = result + chr(0) * (_BLOCK_SIZE - len(result))
+            inner = digestmod(translate(key, _TRANS_36) + salt).digest()
+            result = digestmod(translate(key, _TRANS_5C) + inner).digest()
         return result
 
     def hash_password(self, plain_password):
@@ -33,8 +45,26 @@ class PasswordManager(object):
         return salt.encode("base64").strip() + "," + hashed_password.encode("base64").strip()
 
     def check_password(self, saved_password_entry, plain_password):
+        # Passwords verified recently are not hashed again
+        key = credential_digest(saved_password_entry, plain_password)
+        if password_cache.get(key) is not None:
+            return True
         salt, hashed_password = saved_password_entry.split(",")
         salt = salt.decode("base64")
         hashed_password = hashed_password.decode("base64")
         pbkdbf = self.pbkdf_sha256(plain_password, salt, NUM_ITERATIONS)
-        return hashed_password == pbkdbf
+        if hashed_password != pbkdbf:
+            return False
+        password_cache.add(key, saved_password_entry)
+        return True
+
+    def invalidate_password(self, saved_password_entry):
+        """
+        Forget that passwords matching a saved password entry were verified. This is called
+        when a user's password is changed or the user is deleted.
+
+        :param saved_password_entry: the salted hash stored for the user
+        :type  saved_password_entry: str
+        """
+        if saved_password_entry:
+            password_cache.invalidate(saved_password_entry)
@@ -22,6 +22,7 @@ from celery import task
 from pulp.server.async.tasks import Task
 from pulp.server.auth.authorization import CREATE, READ, UPDATE, DELETE, EXECUTE, \
     _operations_not_granted_by_roles
+from pulp.server.auth.cache import authorization_cache
 from pulp.server.db.model.auth import Role, User
 from pulp.server.exceptions import (DuplicateResource, InvalidValue, MissingResource,
                                     PulpDataException)
@@ -263,6 +264,7 @@ class RoleManager(object):
 
         user['roles'].append(role_id)
         User.get_collection().save(user, safe=True)
+        authorization_cache.invalidate_users(login)
 
         for item in role['permissions']:
             factory.permission_manager().grant(item['resource'], login,
@@ -299,6 +301,7 @@ class RoleManager(object):
 
         user['roles'].remove(role_id)
         User.get_collection().save(user, safe=True)
+        authorization_cache.invalidate_users(login)
 
         for item in role['permissions']:
             other_roles = factory.role_query_manager().get_other_roles(role, user['roles'])
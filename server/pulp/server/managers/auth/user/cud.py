@@ -10,6 +10,7 @@ from celery import task
 
 from pulp.server import config
 from pulp.server.async.tasks import Task
+from pulp.server.auth.cache import authorization_cache
 from pulp.server.db.model.auth import User
 from pulp.server.exceptions import (PulpDataException, DuplicateResource, InvalidValue,
                                     MissingResource)
@@ -74,6 +75,7 @@ class UserManager(object):
         # Creation
         create_me = User(login=login, password=hashed_password, name=name, roles=roles)
         User.get_collection().save(create_me, safe=True)
+        authorization_cache.invalidate_users(login)
 
         # Grant permissions
         permission_manager = factory.permission_manager()
@@ -110,6 +112,7 @@ class UserManager(object):
 
         # Check invalid values
         invalid_values = []
+        old_password = user['password']
         if 'password' in delta:
             password = delta.pop('password')
             if password is None or invalid_type(password, basestring):
@@ -147,6 +150,9 @@ class UserManager(object):
             raise InvalidValue(delta.keys())
 
         User.get_collection().save(user, safe=True)
+        authorization_cache.invalidate_users(login)
+        if user['password'] != old_password:
+            factory.password_manager().invalidate_password(old_password)
 
         # Retrieve the user to return the SON object
         updated = User.get_collection().find_one({'login': login})
@@ -184,6 +190,8 @@ class UserManager(object):
         permission_manager.revoke_all_permissions_from_user(login)
 
         User.get_collection().remove({'login': login}, safe=True)
+        authorization_cache.invalidate_users(login)
+        factory.password_manager().invalidate_password(found['password'])
 
     def ensure_admin(self):
         """
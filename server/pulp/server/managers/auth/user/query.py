@@ -4,9 +4,9 @@ Contains users query classes
 
 from gettext import gettext as _
 
-from pulp.server.db.model.auth import User, Permission, Role
+from pulp.server.auth.cache import authorization_cache
+from pulp.server.db.model.auth import User, Role
 from pulp.server.exceptions import PulpDataException, MissingResource
-from pulp.server.managers import factory
 from pulp.server.managers.auth.role.cud import SUPER_USER_ROLE
 
 
@@ -87,11 +87,7 @@ class UserQueryManager(object):
         @rtype: bool
         @return: True if the user is a super user, False otherwise
         """
-        user = User.get_collection().find_one({'login': login})
-        if user is None:
-            raise MissingResource(login)
-
-        return SUPER_USER_ROLE in user['roles']
+        return SUPER_USER_ROLE in authorization_cache.user_roles(login)
 
     def is_authorized(self, resource, login, operation):
         """
@@ -113,20 +109,7 @@ class UserQueryManager(object):
         if self.is_superuser(login):
             return True
 
-        permission_query_manager = factory.permission_query_manager()
-
-        parts = [p for p in resource.split('/') if p]
-        while parts:
-            current_resource = '/%s/' % '/'.join(parts)
-            permission = permission_query_manager.find_by_resource(current_resource)
-            if permission is not None:
-                if operation in permission_query_manager.find_user_permission(permission, login):
-                    return True
-            parts = parts[:-1]
-
-        permission = Permission.get_collection().find_one({'resource': '/'})
-        return (permission is not None and
-                operation in permission_query_manager.find_user_permission(permission, login))
+        return authorization_cache.permission_tree().is_authorized(resource, login, operation)
 
     def is_last_super_user(self, login):
         """
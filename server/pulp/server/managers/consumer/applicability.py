@@ -6,12 +6,15 @@ from gettext import gettext as _
 from logging import getLogger
 
 from celery import task
+from pymongo.errors import DuplicateKeyError
 
+from pulp.common import tags
 from pulp.plugins.conduits.profiler import ProfilerConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.plugins.profiler import Profiler
-from pulp.server.async.tasks import Task
+from pulp.plugins.util.misc import paginate
+from pulp.server.async.tasks import Task, TaskResult
 from pulp.server.db.model.consumer import Bind, RepoProfileApplicability, UnitProfile
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.repository import Repo
@@ -21,6 +24,16 @@ from pulp.server.managers.consumer.query import ConsumerQueryManager
 
 _logger = getLogger(__name__)
 
+# The number of (repo_id, profile_hash) pairs handled together when regenerating applicability
+APPLICABILITY_BATCH_SIZE = 1000
+
+# The maximum number of profile hashes regenerated by each task when regenerating the
+# applicability of a repository in parallel
+APPLICABILITY_SHARD_SIZE = 100
+
+# The number of consumers processed at a time when streaming a consumer applicability report
+APPLICABILITY_REPORT_CHUNK_SIZE = 1000
+
 
 class ApplicabilityRegenerationManager(object):
     @staticmethod
@@ -30,6 +43,11 @@ class ApplicabilityRegenerationManager(object):
 
         :param consumer_criteria: The consumer selection criteria
         :type consumer_criteria: dict
+
+        :return: counts of (repo_id, profile_hash) pairs that were skipped because applicability
+                 already existed, computed by a profiler and written to the database, keyed by
+                 'skipped', 'computed' and 'written'
+        :rtype: dict
         """
         consumer_criteria = Criteria.from_dict(consumer_criteria)
         consumer_query_manager = managers.consumer_query_manager()
@@ -90,27 +108,31 @@ class ApplicabilityRegenerationManager(object):
                     for unit_profile_tuple in consumer_unit_profiles_map[consumer_id]:
                         repo_profile_hashes.add((repo_id, unit_profile_tuple))
 
-        # Iterate through each tuple in repo_profile_hashes set and regenerate applicability,
-        # if it doesn't exist. These are all guaranteed to be unique tuples because of the logic
-        # used to create maps and sets above, eliminating multiple unnecessary queries
-        # to check for existing applicability for same profiles.
-        manager = managers.applicability_regeneration_manager()
-        for repo_id, (profile_hash, content_type) in repo_profile_hashes:
-            # Check if applicability for given profile_hash and repo_id already exists
-            if ApplicabilityRegenerationManager._is_existing_applicability(repo_id, profile_hash):
-                continue
-            # If applicability does not exist, generate applicability data for given profile
-            # and repo id.
-            profile_id = profile_hash_profile_id_map[profile_hash]
-            manager.regenerate_applicability(profile_hash, content_type, profile_id, repo_id)
+        # Regenerate applicability for each tuple in repo_profile_hashes set that doesn't already
+        # have it. These are all guaranteed to be unique tuples because of the logic used to create
+        # maps and sets above, eliminating multiple unnecessary queries to check for existing
+        # applicability for same profiles.
+        return ApplicabilityRegenerationManager._regenerate_missing_applicability(
+            repo_profile_hashes, profile_hash_profile_id_map)
 
     @staticmethod
-    def regenerate_applicability_for_repos(repo_criteria):
+    def regenerate_applicability_for_repos(repo_criteria, parallel=False):
         """
         Regenerate and save applicability data affected by given updated repositories.
 
+        If parallel is True, the existing applicability of each repository is split into shards
+        of at most APPLICABILITY_SHARD_SIZE profile hashes, and every shard is regenerated by its
+        own task so that the work is spread across the available workers.
+
         :param repo_criteria: The repo selection criteria
         :type repo_criteria: dict
+
+        :param parallel: if True, dispatch a task for each shard instead of regenerating the
+                         applicability data in this task
+        :type parallel: bool
+
+        :return: if parallel is True, a TaskResult listing the dispatched shard tasks
+        :rtype: pulp.server.async.tasks.TaskResult or None
         """
         repo_criteria = Criteria.from_dict(repo_criteria)
         repo_query_manager = managers.repo_query_manager()
@@ -119,31 +141,97 @@ class ApplicabilityRegenerationManager(object):
         repo_criteria.fields = ['id']
         repo_ids = [r['id'] for r in repo_query_manager.find_by_criteria(repo_criteria)]
 
+        if parallel:
+            return ApplicabilityRegenerationManager._queue_repo_applicability_shards(repo_ids)
+
         for repo_id in repo_ids:
-            # Find all existing applicabilities for given repo_id
-            existing_applicabilities = RepoProfileApplicability.get_collection().find(
-                {'repo_id': repo_id})
-            for existing_applicability in existing_applicabilities:
-                # Convert cursor to RepoProfileApplicability object
-                existing_applicability = RepoProfileApplicability(**dict(existing_applicability))
-                profile_hash = existing_applicability['profile_hash']
-                unit_profile = UnitProfile.get_collection().find_one({'profile_hash': profile_hash},
-                                                                     fields=['id', 'content_type'])
-                if unit_profile is None:
-                    # Unit profiles change whenever packages are installed or removed on consumers,
-                    # and it is possible that existing_applicability references a UnitProfile
-                    # that no longer exists. This is harmless, as Pulp has a monthly cleanup task
-                    # that will identify these dangling references and remove them.
-                    continue
+            ApplicabilityRegenerationManager.regenerate_applicability_for_repo_shard(repo_id)
+
+    @staticmethod
+    def regenerate_applicability_for_repo_shard(repo_id, profile_hashes=None):
+        """
+        Regenerate and save existing applicability data for the given repository, optionally
+        limited to the given profile hashes. Applicability data that was calculated against the
+        repository's current content revision is up to date and is skipped.
+
+        :param repo_id: id of the repository to regenerate applicability data for
+        :type repo_id: str
+
+        :param profile_hashes: if not None, only the applicability data for these profile hashes
+                               is regenerated
+        :type profile_hashes: list or None
+        """
+        # The revision has to be read before calculating, so that content changes made while
+        # this runs cause the applicability data to be regenerated again next time
+        repo_content_revision = ApplicabilityRegenerationManager._get_repo_content_revision(
+            repo_id)
+
+        # Find all existing applicabilities for given repo_id that are out of date
+        query_params = ApplicabilityRegenerationManager._stale_applicability_spec(
+            repo_id, repo_content_revision)
+        if profile_hashes is not None:
+            query_params['profile_hash'] = {'$in': profile_hashes}
+        existing_applicabilities = RepoProfileApplicability.get_collection().find(query_params)
+        for existing_applicability in existing_applicabilities:
+            # Convert cursor to RepoProfileApplicability object
+            existing_applicability = RepoProfileApplicability(**dict(existing_applicability))
+            profile_hash = existing_applicability['profile_hash']
+            unit_profile = UnitProfile.get_collection().find_one({'profile_hash': profile_hash},
+                                                                 fields=['id', 'content_type'])
+            if unit_profile is None:
+                # Unit profiles change whenever packages are installed or removed on consumers,
+                # and it is possible that existing_applicability references a UnitProfile
+                # that no longer exists. This is harmless, as Pulp has a monthly cleanup task
+                # that will identify these dangling references and remove them.
+                continue
+
+            # Regenerate applicability data for given unit_profile and repo id
+            ApplicabilityRegenerationManager.regenerate_applicability(
+                profile_hash, unit_profile['content_type'], unit_profile['id'], repo_id,
+                existing_applicability, repo_content_revision)
+
+    @staticmethod
+    def _queue_repo_applicability_shards(repo_ids):
+        """
+        Split the out of date applicability data of the given repositories into shards of at most
+        APPLICABILITY_SHARD_SIZE profile hashes and dispatch a regeneration task for each shard.
+
+        :param repo_ids: ids of the repositories to regenerate applicability data for
+        :type repo_ids: list
 
-                # Regenerate applicability data for given unit_profile and repo id
-                ApplicabilityRegenerationManager.regenerate_applicability(
-                    profile_hash, unit_profile['content_type'], unit_profile['id'], repo_id,
-                    existing_applicability)
+        :return: a TaskResult with the number of repositories and shards in its result, and the
+                 dispatched shard tasks as its spawned tasks
+        :rtype: pulp.server.async.tasks.TaskResult
+        """
+        task_tags = [tags.action_tag('content_applicability_regeneration')]
+        spawned_tasks = []
+        for repo_id in repo_ids:
+            repo_content_revision = ApplicabilityRegenerationManager._get_repo_content_revision(
+                repo_id)
+            applicabilities = RepoProfileApplicability.get_collection().find(
+                ApplicabilityRegenerationManager._stale_applicability_spec(
+                    repo_id, repo_content_revision),
+                fields=['profile_hash']).sort('profile_hash')
+            profile_hashes = (a['profile_hash'] for a in applicabilities)
+            for index, shard in enumerate(paginate(profile_hashes, APPLICABILITY_SHARD_SIZE)):
+                # Every shard reserves only its own part of the repository's applicability data,
+                # so that the shards of one repository can run on different workers at once.
+                # They do not hold the RESOURCE_ANY_ID reservation that serializes the other
+                # applicability tasks; a shard only updates the existing documents of its own
+                # profile hashes, which consumer regeneration never replaces.
+                resource_id = '%s:%d' % (repo_id, index)
+                async_result = regenerate_applicability_for_repo_shard.apply_async_with_reservation(
+                    tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE, resource_id,
+                    (repo_id, list(shard)), tags=task_tags)
+                spawned_tasks.append(async_result)
+
+        result = {'repo_count': len(repo_ids), 'shard_count': len(spawned_tasks)}
+        return TaskResult(result=result, spawned_tasks=spawned_tasks)
 
     @staticmethod
     def regenerate_applicability(profile_hash, content_type, profile_id,
-                                 bound_repo_id, existing_applicability=None):
+                                 bound_repo_id, existing_applicability=None,
+                                 repo_content_revision=None):
         """
         Regenerate and save applicability data for given profile and bound repo id.
         If existing_applicability is not None, replace it with the new applicability data.
@@ -163,6 +251,10 @@ class ApplicabilityRegenerationManager(object):
 
         :param existing_applicability: existing RepoProfileApplicability object to be replaced
         :type existing_applicability: pulp.server.db.model.consumer.RepoProfileApplicability
+
+        :param repo_content_revision: content revision of the bound repo that the applicability
+                                      is calculated against
+        :type repo_content_revision: basestring
         """
         profiler_conduit = ProfilerConduit()
         # Get the profiler for content_type of given unit_profile
@@ -202,13 +294,15 @@ class ApplicabilityRegenerationManager(object):
             if existing_applicability:
                 # Update existing applicability object
                 existing_applicability.applicability = applicability
+                existing_applicability.repo_content_revision = repo_content_revision
                 existing_applicability.save()
             else:
                 # Create a new RepoProfileApplicability object and save it in the db
                 RepoProfileApplicability.objects.create(profile_hash,
                                                         bound_repo_id,
                                                         unit_profile['profile'],
-                                                        applicability)
+                                                        applicability,
+                                                        repo_content_revision)
 
     @staticmethod
     def _get_existing_repo_content_types(repo_id):
@@ -231,21 +325,201 @@ class ApplicabilityRegenerationManager(object):
         return repo_content_types_with_non_zero_unit_count
 
     @staticmethod
-    def _is_existing_applicability(repo_id, profile_hash):
+    def _regenerate_missing_applicability(repo_profile_hashes, profile_hash_profile_id_map):
+        """
+        Generate and save applicability data for each (repo_id, (profile_hash, content_type))
+        tuple that does not have applicability data yet.
+
+        The tuples are processed in batches of APPLICABILITY_BATCH_SIZE. Existing applicability
+        for a batch is found with a single query, the missing tuples are grouped by repo so that
+        the repo content types and the profiler for each content type are resolved only once,
+        the needed profiles are fetched with a single query and the new applicability documents
+        are inserted in bulk.
+
+        :param repo_profile_hashes:         set of (repo_id, (profile_hash, content_type)) tuples
+        :type  repo_profile_hashes:         set
+        :param profile_hash_profile_id_map: maps each profile_hash to the id of a unit profile
+                                            with that hash
+        :type  profile_hash_profile_id_map: dict
+
+        :return: counts of the tuples that were skipped, computed and written, keyed by
+                 'skipped', 'computed' and 'written'
+        :rtype:  dict
+        """
+        report = {'skipped': 0, 'computed': 0, 'written': 0}
+        # These caches are shared by all batches
+        profilers = {}
+        repo_content_types = {}
+        repo_content_revisions = {}
+
+        for batch in paginate(repo_profile_hashes, APPLICABILITY_BATCH_SIZE):
+            existing_keys = ApplicabilityRegenerationManager._get_existing_applicability_keys(
+                [(repo_id, profile_hash) for repo_id, (profile_hash, content_type) in batch])
+
+            # Group the tuples that still need applicability by repo
+            repo_profiles_map = {}
+            for repo_id, (profile_hash, content_type) in batch:
+                if (repo_id, profile_hash) in existing_keys:
+                    report['skipped'] += 1
+                    continue
+                repo_profiles_map.setdefault(repo_id, []).append((profile_hash, content_type))
+
+            # Find out which of the missing tuples can be handled by a profiler
+            to_calculate = []
+            for repo_id, profile_tuples in repo_profiles_map.iteritems():
+                if repo_id not in repo_content_types:
+                    repo_content_revisions[repo_id] = \
+                        ApplicabilityRegenerationManager._get_repo_content_revision(repo_id)
+                    repo_content_types[repo_id] = set(
+                        ApplicabilityRegenerationManager._get_existing_repo_content_types(repo_id))
+                for profile_hash, content_type in profile_tuples:
+                    if content_type not in profilers:
+                        profilers[content_type] = \
+                            ApplicabilityRegenerationManager._applicability_profiler(content_type)
+                    profiler_info = profilers[content_type]
+                    if profiler_info is None:
+                        continue
+                    profiler, profiler_cfg, profiler_types = profiler_info
+                    if repo_content_types[repo_id] & profiler_types:
+                        to_calculate.append((repo_id, profile_hash, content_type))
+
+            if not to_calculate:
+                continue
+
+            # Fetch every profile needed by this batch at once
+            profile_ids = list(set(profile_hash_profile_id_map[profile_hash]
+                                   for repo_id, profile_hash, content_type in to_calculate))
+            profiles = dict(
+                (p['profile_hash'], p['profile']) for p in UnitProfile.get_collection().find(
+                    {'id': {'$in': profile_ids}}, fields=['profile_hash', 'profile']))
+
+            new_documents = []
+            for repo_id, profile_hash, content_type in to_calculate:
+                if profile_hash not in profiles:
+                    # The profile was removed since the regeneration started
+                    continue
+                profiler, profiler_cfg, profiler_types = profilers[content_type]
+                call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
+                                                      repo_plugin_config=None)
+                try:
+                    applicability = profiler.calculate_applicable_units(
+                        profiles[profile_hash], repo_id, call_config, ProfilerConduit())
+                except NotImplementedError:
+                    msg = "Profiler for content type [%s] does not support applicability"
+                    _logger.debug(msg % content_type)
+                    continue
+                report['computed'] += 1
+                new_documents.append({'profile_hash': profile_hash, 'repo_id': repo_id,
+                                      'profile': profiles[profile_hash],
+                                      'applicability': applicability,
+                                      'repo_content_revision': repo_content_revisions[repo_id]})
+
+            report['written'] += ApplicabilityRegenerationManager._insert_applicability(
+                new_documents)
+
+        _logger.debug('Applicability regeneration: %(skipped)d skipped, %(computed)d computed, '
+                      '%(written)d written' % report)
+        return report
+
+    @staticmethod
+    def _get_repo_content_revision(repo_id):
+        """
+        Return the current content revision of the given repo.
+
+        :param repo_id: The repo_id of the repository
+        :type  repo_id: basestring
+        :return:        the content revision, or None if the repo doesn't exist or its content has
+                        not changed since the revision was introduced
+        :rtype:         basestring or None
+        """
+        repo = Repo.get_collection().find_one({'id': repo_id}, fields=['content_revision'])
+        if repo:
+            return repo.get('content_revision')
+        return None
+
+    @staticmethod
+    def _stale_applicability_spec(repo_id, repo_content_revision):
+        """
+        Build a query that matches the applicability data of the given repo that was not
+        calculated against the given content revision.
+
+        :param repo_id:               The repo_id of the repository
+        :type  repo_id:               basestring
+        :param repo_content_revision: the current content revision of the repo. If it is None,
+                                      there is no way to tell what is up to date, so all of the
+                                      repo's applicability data is matched.
+        :type  repo_content_revision: basestring or None
+        :return:                      a MongoDB query dictionary
+        :rtype:                       dict
+        """
+        spec = {'repo_id': repo_id}
+        if repo_content_revision is not None:
+            spec['repo_content_revision'] = {'$ne': repo_content_revision}
+        return spec
+
+    @staticmethod
+    def _get_existing_applicability_keys(repo_profile_pairs):
+        """
+        Find which of the given (repo_id, profile_hash) pairs already have applicability data,
+        using a single query.
+
+        :param repo_profile_pairs: list of (repo_id, profile_hash) tuples
+        :type  repo_profile_pairs: list
+        :return:                   the subset of repo_profile_pairs that have applicability data
+        :rtype:                    set
+        """
+        if not repo_profile_pairs:
+            return set()
+        repo_ids = list(set(repo_id for repo_id, profile_hash in repo_profile_pairs))
+        profile_hashes = list(set(profile_hash for repo_id, profile_hash in repo_profile_pairs))
+        # This query can match pairs that were not asked for, so intersect with the given pairs
+        existing = RepoProfileApplicability.get_collection().find(
+            {'repo_id': {'$in': repo_ids}, 'profile_hash': {'$in': profile_hashes}},
+            fields=['repo_id', 'profile_hash'])
+        existing_keys = set((a['repo_id'], a['profile_hash']) for a in existing)
+        return existing_keys & set(repo_profile_pairs)
+
+    @staticmethod
+    def _insert_applicability(documents):
+        """
+        Insert the given RepoProfileApplicability documents in bulk.
+
+        Another task may have generated applicability for some of the same repos and profiles in
+        the meantime. Those documents are rejected by the unique index, and the rest are still
+        inserted.
+
+        :param documents: RepoProfileApplicability documents
+        :type  documents: list of dict
+        :return:          the number of documents that were written
+        :rtype:           int
+        """
+        if not documents:
+            return 0
+        collection = RepoProfileApplicability.get_collection()
+        try:
+            collection.insert(documents, safe=True, continue_on_error=True)
+        except DuplicateKeyError:
+            # insert() sets the _id on each document before sending it, so we can count
+            # the ones that made it in
+            _logger.debug('Applicability was generated concurrently for some profiles')
+            return collection.find({'_id': {'$in': [d['_id'] for d in documents]}}).count()
+        return len(documents)
+
+    @staticmethod
+    def _applicability_profiler(content_type):
         """
-        Check if applicability for given repo and profle hash is already calculated.
+        Find the profiler for the given content type, if it supports applicability.
 
-        :param repo_id:      repo id
-        :type repo_id:       basestring
-        :param profile_hash: unit profile hash
-        :type profile_hash:  basestring
-        :return:             true if applicability exists, false otherwise
-        :type:               boolean
+        :param content_type: The content type ID.
+        :type  content_type: str
+        :return:             (profiler, cfg, set of type ids handled by the profiler), or None if
+                             there is no profiler that calculates applicability for this type
+        :rtype:              tuple or None
         """
-        query_params = {'repo_id': repo_id, 'profile_hash': profile_hash}
-        if RepoProfileApplicability.get_collection().find_one(query_params, fields=['_id']):
-            return True
-        return False
+        profiler, profiler_cfg = ApplicabilityRegenerationManager._profiler(content_type)
+        if profiler.calculate_applicable_units == Profiler.calculate_applicable_units:
+            return None
+        return profiler, profiler_cfg, set(profiler.metadata()['types'])
 
     @staticmethod
     def _profiler(type_id):
@@ -273,6 +547,9 @@ regenerate_applicability_for_consumers = task(
 regenerate_applicability_for_repos = task(
     ApplicabilityRegenerationManager.regenerate_applicability_for_repos, base=Task,
     ignore_result=True)
+regenerate_applicability_for_repo_shard = task(
+    ApplicabilityRegenerationManager.regenerate_applicability_for_repo_shard, base=Task,
+    ignore_result=True)
 
 
 class DoesNotExist(Exception):
@@ -295,7 +572,7 @@ class RepoProfileApplicabilityManager(object):
     """
     This class is useful for querying for RepoProfileApplicability objects in the database.
     """
-    def create(self, profile_hash, repo_id, profile, applicability):
+    def create(self, profile_hash, repo_id, profile, applicability, repo_content_revision=None):
         """
         Create and return a RepoProfileApplicability object.
 
@@ -309,12 +586,15 @@ class RepoProfileApplicabilityManager(object):
         :param applicability: A dictionary structure mapping unit type IDs to lists of applicable
                               Unit IDs.
         :type  applicability: dict
+        :param repo_content_revision: The content revision of the repo that the applicability data
+                                      was calculated against
+        :type  repo_content_revision: basestring
         :return:              A new RepoProfileApplicability object
         :rtype:               pulp.server.db.model.consumer.RepoProfileApplicability
         """
         applicability = RepoProfileApplicability(
             profile_hash=profile_hash, repo_id=repo_id, profile=profile,
-            applicability=applicability)
+            applicability=applicability, repo_content_revision=repo_content_revision)
         applicability.save()
         return applicability
 
@@ -422,6 +702,76 @@ def retrieve_consumer_applicability(consumer_criteria, content_types=None):
     # We only need the consumer ids
     consumer_criteria['fields'] = ['id']
     consumer_ids = [c['id'] for c in ConsumerQueryManager.find_by_criteria(consumer_criteria)]
+    return _retrieve_applicability_for_consumer_ids(consumer_ids, content_types)
+
+
+def stream_consumer_applicability(consumer_criteria, content_types=None,
+                                  chunk_size=APPLICABILITY_REPORT_CHUNK_SIZE):
+    """
+    Query content applicability for consumers matched by a given consumer_criteria, optionally
+    limiting by content type, and generate the results in the same format as
+    retrieve_consumer_applicability().
+
+    The matched consumers are found before this returns, so that an invalid criteria or a
+    database error is raised to the caller rather than while the results are being generated.
+    They are then processed in chunks of chunk_size, and the results for each chunk are
+    generated before the next one is read, so memory use is bounded by the chunk size and the
+    list of matched consumer ids rather than by the applicability data of all of them. Consumers
+    are only grouped together with other consumers from the same chunk, so consumers that share
+    applicability data may be reported in more than one entry when they fall into different
+    chunks.
+
+    :param consumer_criteria: The consumer selection criteria
+    :type  consumer_criteria: pulp.server.db.model.criteria.Criteria
+    :param content_types:     An optional list of content types that the caller wishes to limit
+                              the results to. Defaults to None, which will return data for all
+                              types
+    :type  content_types:     list
+    :param chunk_size:        The number of consumers to process at a time
+    :type  chunk_size:        int
+    :return:                  generator of dictionaries with keys 'consumers' and 'applicability'
+    :rtype:                   generator
+    """
+    # We only need the consumer ids
+    consumer_criteria['fields'] = ['id']
+    consumer_ids = [c['id'] for c in ConsumerQueryManager.find_by_criteria(consumer_criteria)]
+    return _generate_consumer_applicability(consumer_ids, content_types, chunk_size)
+
+
+def _generate_consumer_applicability(consumer_ids, content_types, chunk_size):
+    """
+    Generate the applicability data for the given consumer ids, chunk_size consumers at a time.
+    See stream_consumer_applicability().
+
+    :param consumer_ids:  The ids of the consumers to generate applicability data for
+    :type  consumer_ids:  list
+    :param content_types: An optional list of content types to limit the results to
+    :type  content_types: list
+    :param chunk_size:    The number of consumers to process at a time
+    :type  chunk_size:    int
+    :return:              generator of dictionaries with keys 'consumers' and 'applicability'
+    :rtype:               generator
+    """
+    for chunk in paginate(consumer_ids, chunk_size):
+        for applicability_data in _retrieve_applicability_for_consumer_ids(list(chunk),
+                                                                           content_types):
+            yield applicability_data
+
+
+def _retrieve_applicability_for_consumer_ids(consumer_ids, content_types):
+    """
+    Query content applicability for the given consumer ids, optionally limiting by content type.
+    See retrieve_consumer_applicability() for the format of the result.
+
+    :param consumer_ids:  A list of consumer ids that the applicability data should be retrieved
+                          against
+    :type  consumer_ids:  list
+    :param content_types: An optional list of content types that the caller wishes to limit the
+                          results to. None will return data for all types
+    :type  content_types: list
+    :return:              applicability data for the given consumers
+    :rtype:               list
+    """
     consumer_map = dict([(c, {'profiles': [], 'repo_ids': []}) for c in consumer_ids])
 
     # Fill out the mapping of consumer_ids to profiles, and store the list of profile_hashes
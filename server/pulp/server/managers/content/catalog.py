@@ -13,6 +13,7 @@ from logging import getLogger
 
 from pymongo import ASCENDING
 
+from pulp.plugins.util.misc import paginate
 from pulp.server.db.model.content import ContentCatalog
 
 
@@ -24,6 +25,9 @@ log = getLogger(__name__)
 # in the catalog after it has expired.
 GRACE_PERIOD = 3600  # 1 hour.
 
+# The maximum number of locators included in a single find_many() query.
+FIND_BATCH_SIZE = 1000
+
 
 class ContentCatalogManager(object):
     """
@@ -60,6 +64,26 @@ class ContentCatalogManager(object):
         entry = ContentCatalog(source_id, expires, type_id, unit_key, url)
         collection.insert(entry, safe=True)
 
+    def add_entries(self, source_id, expires, entries):
+        """
+        Add multiple entries to the content catalog using a single insert.
+        :param source_id: A content source ID.
+        :type source_id: str
+        :param expires: The entry expiration in seconds.
+        :type expires: int
+        :param entries: The entries to add as tuples of: (type_id, unit_key, url).
+        :type entries: iterable
+        :return: The number of entries added.
+        :rtype: int
+        """
+        documents = [ContentCatalog(source_id, expires, type_id, unit_key, url)
+                     for type_id, unit_key, url in entries]
+        if not documents:
+            return 0
+        collection = ContentCatalog.get_collection()
+        collection.insert(documents, safe=True)
+        return len(documents)
+
     def delete_entry(self, source_id, type_id, unit_key):
         """
         Delete an entry from the content catalog.
@@ -137,16 +161,46 @@ class ContentCatalogManager(object):
         :return: A list of matching entries.
         :rtype: list
         """
-        collection = ContentCatalog.get_collection()
         locator = ContentCatalog.get_locator(type_id, unit_key)
+        return self._find_newest([locator]).get(locator, [])
+
+    def find_many(self, units):
+        """
+        Find entries in the content catalog for many units at once.  The lookup is
+        performed using one query for every FIND_BATCH_SIZE units rather than
+        one query for each unit.  As with find(), only the newest entry for each
+        source is included for each unit.
+        :param units: The units to find as tuples of: (type_id, unit_key).
+        :type units: iterable
+        :return: A dictionary of lists of matching entries keyed by locator.
+            Units without matching entries are not included.
+        :rtype: dict
+        """
+        locators = set(ContentCatalog.get_locator(type_id, unit_key) for type_id, unit_key in units)
+        found = {}
+        for page in paginate(locators, FIND_BATCH_SIZE):
+            found.update(self._find_newest(page))
+        return found
+
+    @staticmethod
+    def _find_newest(locators):
+        """
+        Find the newest unexpired entry for each content source for each
+        of the specified locators.
+        :param locators: A list of locators.
+        :type locators: list
+        :return: A dictionary of lists of matching entries keyed by locator.
+        :rtype: dict
+        """
+        collection = ContentCatalog.get_collection()
         query = {
-            'locator': locator,
+            'locator': {'$in': list(locators)},
             'expiration': {'$gte': ContentCatalog.get_expiration(0)}
         }
         newest_by_source = {}
         for entry in collection.find(query, sort=[('_id', ASCENDING)]):
-            newest_by_source[entry['source_id']] = entry
-        return newest_by_source.values()
+            newest_by_source.setdefault(entry['locator'], {})[entry['source_id']] = entry
+        return dict((locator, entries.values()) for locator, entries in newest_by_source.items())
 
     def has_entries(self, source_id):
         """
@@ -3,6 +3,7 @@ import uuid
 from pulp.common import dateutils
 from pulp.plugins.types import database as content_types_db
 from pulp.server.exceptions import InvalidValue
+from pulp.server.managers import factory
 
 
 class ContentManager(object):
@@ -35,6 +36,38 @@ class ContentManager(object):
         collection.insert(unit_doc, safe=True)
         return unit_id
 
+    def add_content_units(self, content_type, units):
+        """
+        Add multiple content units and their metadata to the corresponding
+        pulp db collection using a single insert.  When some of the units
+        already exist, the remaining units are still added before the
+        DuplicateKeyError is raised.
+        @param content_type: unique id of content collection
+        @type content_type: str
+        @param units: list of (unit_id, unit_metadata) tuples; a unit_id of
+                      None means to generate the id
+        @type units: list of tuple
+        @return: unit ids in the same order as units, useful if any were generated
+        @rtype: list of str
+        @raise DuplicateKeyError: if any of the units already exist
+        """
+        collection = content_types_db.type_units_collection(content_type)
+        now = dateutils.now_utc_timestamp()
+        unit_docs = []
+        for unit_id, unit_metadata in units:
+            if unit_id is None:
+                unit_id = str(uuid.uuid4())
+            unit_doc = {
+                '_id': unit_id,
+                '_content_type_id': content_type,
+                '_last_updated': now
+            }
+            unit_doc.update(unit_metadata)
+            unit_docs.append(unit_doc)
+        if unit_docs:
+            collection.insert(unit_docs, safe=True, continue_on_error=True)
+        return [doc['_id'] for doc in unit_docs]
+
     def update_content_unit(self, content_type, unit_id, unit_metadata_delta):
         """
         Update a content unit's stored metadata.
@@ -60,6 +93,7 @@ class ContentManager(object):
         """
         collection = content_types_db.type_units_collection(content_type)
         collection.remove({'_id': unit_id}, safe=True)
+        factory.content_orphan_manager().invalidate_summary_cache()
 
     def link_referenced_content_units(self, from_type, from_id, to_type, to_ids):
         """
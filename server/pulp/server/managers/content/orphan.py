@@ -1,35 +1,100 @@
 from gettext import gettext as _
+import itertools
 import logging
 import os
+from multiprocessing.pool import ThreadPool
 import re
 import shutil
 
 from celery import task
 
+from pulp.common.plugins import reporting_constants
+from pulp.plugins.conduits.mixins import OrphanConduitException, StatusMixin
 from pulp.plugins.types import database as content_types_db
+from pulp.plugins.util.misc import paginate
+from pulp.plugins.util.publish_step import Step
 from pulp.server import config as pulp_config, exceptions as pulp_exceptions
-from pulp.server.async.tasks import Task
-from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.async.tasks import register_sigterm_handler, Task
+from pulp.server.db.model.content import ContentUnitGeneration
+from pulp.server.db.model.repository import Repo, RepoContentUnit
 
 
 _logger = logging.getLogger(__name__)
 
+# number of unit ids checked against the association collection in a single query
+ORPHAN_BATCH_SIZE = 1000
+
+# number of threads used to remove the files of deleted orphans
+ORPHAN_DELETE_THREADS = 4
+
 
 class OrphanManager(object):
 
-    def orphans_summary(self):
+    # cached orphan summary shared by all manager instances in this process, stored along
+    # with the fingerprint of the database state it was calculated from
+    _summary_cache = {'fingerprint': None, 'summary': None}
+
+    def orphans_summary(self, use_cache=False):
         """
         Return a summary of the orphaned units as a dictionary of
         content type -> number of orphaned units
 
+        When use_cache is True, a summary calculated earlier by this process is returned as long
+        as no unit has been added or removed and no repository's content has changed since.
+
+        :param use_cache: if True, return the cached summary when it is still valid
+        :type  use_cache: bool
         :return: summary of orphaned units
         :rtype: dict
         """
+        fingerprint = None
+        if use_cache:
+            fingerprint = OrphanManager._summary_fingerprint()
+            cache = OrphanManager._summary_cache
+            if cache['fingerprint'] == fingerprint:
+                return dict(cache['summary'])
+
         summary = {}
         for content_type_id in content_types_db.all_type_ids():
             summary[content_type_id] = self.orphans_count_by_type(content_type_id)
+
+        if use_cache:
+            OrphanManager._summary_cache = {'fingerprint': fingerprint, 'summary': dict(summary)}
         return summary
 
+    @staticmethod
+    def invalidate_summary_cache():
+        """
+        Record that content units were removed, so that every process discards its cached
+        orphan summary.
+        """
+        ContentUnitGeneration.get_collection().update(
+            {'_id': ContentUnitGeneration.DOCUMENT_ID}, {'$inc': {'generation': 1}},
+            upsert=True, safe=True)
+        OrphanManager._summary_cache = {'fingerprint': None, 'summary': None}
+
+    @staticmethod
+    def _summary_fingerprint():
+        """
+        Build a cheap fingerprint of everything the orphan summary depends on. Every change to a
+        repository's units replaces its content revision, the collection counts catch units
+        being added as well as repositories being removed, and the content unit generation
+        catches units being removed.
+
+        :return: fingerprint that changes whenever the orphan summary may have changed
+        :rtype:  tuple
+        """
+        repos = Repo.get_collection().find({}, fields=['id', 'content_revision'])
+        repo_revisions = sorted((repo['id'], repo.get('content_revision')) for repo in repos)
+        unit_counts = sorted(
+            (content_type_id, content_types_db.type_units_collection(content_type_id).count())
+            for content_type_id in content_types_db.all_type_ids())
+        association_count = RepoContentUnit.get_collection().count()
+        document = ContentUnitGeneration.get_collection().find_one(
+            {'_id': ContentUnitGeneration.DOCUMENT_ID})
+        generation = document['generation'] if document is not None else 0
+        return tuple(repo_revisions), tuple(unit_counts), association_count, generation
+
     def orphans_count_by_type(self, content_type_id):
         """
         Generate a count of the orphans of a given content type.
@@ -83,6 +148,9 @@ class OrphanManager(object):
 
         If fields is not specified, only the `_id` field will be present.
 
+        The units are streamed in _id order and checked against the associations in batches of
+        ORPHAN_BATCH_SIZE, so each batch costs a single query instead of one per unit.
+
         :param content_type_id: id of the content type
         :type content_type_id: basestring
         :param fields: list of fields to include in each content unit
@@ -93,17 +161,30 @@ class OrphanManager(object):
 
         fields = fields if fields is not None else ['_id']
         content_units_collection = content_types_db.type_units_collection(content_type_id)
-        repo_content_units_collection = RepoContentUnit.get_collection()
-
-        for content_unit in content_units_collection.find({}, fields=fields):
+        content_units = content_units_collection.find({}, fields=fields).sort('_id')
 
-            repo_content_units_cursor = repo_content_units_collection.find(
-                {'unit_id': content_unit['_id']})
+        for page in paginate(content_units, ORPHAN_BATCH_SIZE):
+            associated_ids = OrphanManager._associated_unit_ids(
+                content_type_id, [content_unit['_id'] for content_unit in page])
+            for content_unit in page:
+                if content_unit['_id'] not in associated_ids:
+                    yield content_unit
 
-            if repo_content_units_cursor.count() > 0:
-                continue
+    @staticmethod
+    def _associated_unit_ids(content_type_id, unit_ids):
+        """
+        Return which of the given units are associated with at least one repository.
 
-            yield content_unit
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        :param unit_ids: ids of units of the given type
+        :type  unit_ids: list
+        :return: the subset of unit_ids that have at least one association
+        :rtype:  set
+        """
+        spec = {'unit_type_id': content_type_id, 'unit_id': {'$in': unit_ids}}
+        associations = RepoContentUnit.get_collection().find(spec, fields=['unit_id'])
+        return set(association['unit_id'] for association in associations)
 
     @staticmethod
     def generate_orphans_by_type_with_unit_keys(content_type_id):
@@ -142,11 +223,11 @@ class OrphanManager(object):
                                  given content type and unit id
         """
 
-        for content_unit in OrphanManager.generate_orphans_by_type(content_type_id):
-
-            if content_unit['_id'] != content_unit_id:
-                continue
+        content_units_collection = content_types_db.type_units_collection(content_type_id)
+        content_unit = content_units_collection.find_one({'_id': content_unit_id}, fields=['_id'])
 
+        if content_unit is not None and \
+                not OrphanManager._associated_unit_ids(content_type_id, [content_unit_id]):
             return content_unit
 
         raise pulp_exceptions.MissingResource(content_type=content_type_id,
@@ -158,8 +239,9 @@ class OrphanManager(object):
         Delete all orphaned content units.
         """
 
-        for content_type_id in content_types_db.all_type_ids():
-            OrphanManager.delete_orphans_by_type(content_type_id)
+        steps = [DeleteOrphansStep(content_type_id)
+                 for content_type_id in content_types_db.all_type_ids()]
+        OrphanManager._process_delete_steps(steps)
 
     @staticmethod
     def delete_orphans_by_id(content_unit_list):
@@ -183,8 +265,9 @@ class OrphanManager(object):
                 content_unit['content_type_id'], [])
             content_unit_id_list.append(content_unit['unit_id'])
 
-        for content_type_id, content_unit_id_list in content_units_by_content_type.items():
-            OrphanManager.delete_orphans_by_type(content_type_id, content_unit_id_list)
+        steps = [DeleteOrphansStep(content_type_id, unit_ids)
+                 for content_type_id, unit_ids in content_units_by_content_type.items()]
+        OrphanManager._process_delete_steps(steps)
 
     @staticmethod
     def delete_orphans_by_type(content_type_id, content_unit_ids=None):
@@ -202,19 +285,88 @@ class OrphanManager(object):
         :type content_unit_ids: iterable or None
         """
 
+        OrphanManager._process_delete_steps([DeleteOrphansStep(content_type_id, content_unit_ids)])
+
+    @staticmethod
+    def _process_delete_steps(steps):
+        """
+        Run the given orphan deletion steps under a single parent step, so that the progress of
+        each of them is reported on the current task. Canceling the task cancels the steps, which
+        stop once the batch being deleted is finished.
+
+        :param steps: steps that each delete the orphans of one content type
+        :type  steps: list of DeleteOrphansStep
+        """
+        conduit = OrphanConduit(reporting_constants.ORPHAN_STEP_DELETE)
+        parent_step = Step(reporting_constants.ORPHAN_STEP_DELETE, status_conduit=conduit,
+                           non_halting_exceptions=[])
+        parent_step.description = _('Deleting orphaned content units')
+        for step in steps:
+            parent_step.add_child(step)
+        process_lifecycle = register_sigterm_handler(parent_step.process_lifecycle,
+                                                     parent_step.cancel)
+        process_lifecycle()
+
+    @staticmethod
+    def generate_orphans_by_ids(content_type_id, content_unit_ids, fields=None):
+        """
+        Return a generator of the orphaned content units of the given content type whose ids
+        are in the given list. Units that do not exist are skipped.
+
+        If fields is not specified, only the `_id` field will be present.
+
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        :param content_unit_ids: ids of the content units to consider
+        :type  content_unit_ids: iterable
+        :param fields: list of fields to include in each content unit
+        :type  fields: list or None
+        :return: generator of orphaned content units for the given content type
+        :rtype:  generator
+        """
+        fields = fields if fields is not None else ['_id']
         content_units_collection = content_types_db.type_units_collection(content_type_id)
 
-        for content_unit in OrphanManager.generate_orphans_by_type(content_type_id,
-                                                                   fields=['_id', '_storage_path']):
+        for page in paginate(sorted(set(content_unit_ids)), ORPHAN_BATCH_SIZE):
+            content_units = list(content_units_collection.find({'_id': {'$in': list(page)}},
+                                                               fields=fields))
+            associated_ids = OrphanManager._associated_unit_ids(
+                content_type_id, [content_unit['_id'] for content_unit in content_units])
+            for content_unit in content_units:
+                if content_unit['_id'] not in associated_ids:
+                    yield content_unit
 
-            if content_unit_ids is not None and content_unit['_id'] not in content_unit_ids:
-                continue
+    @staticmethod
+    def delete_orphan_units(content_type_id, content_units, pool=None):
+        """
+        Delete a batch of orphaned content units of one content type, along with their files.
+
+        The files of the units are deleted first, spread over the given thread pool when one is
+        provided, and the units are then removed from the database with a single query. If the
+        deletion is interrupted, the units whose files were already deleted remain orphans and
+        are deleted again later.
+
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        :param content_units: orphaned units, each with the `_id` and `_storage_path` fields
+        :type  content_units: list of dict
+        :param pool: pool of threads used to delete the files; None deletes them in this thread
+        :type  pool: multiprocessing.pool.ThreadPool or None
+        """
+        if not content_units:
+            return
 
-            content_units_collection.remove(content_unit['_id'], safe=False)
+        storage_paths = [content_unit['_storage_path'] for content_unit in content_units
+                         if content_unit.get('_storage_path') is not None]
+        if pool is None:
+            map(OrphanManager.delete_orphaned_file, storage_paths)
+        else:
+            pool.map(OrphanManager.delete_orphaned_file, storage_paths)
 
-            storage_path = content_unit.get('_storage_path', None)
-            if storage_path is not None:
-                OrphanManager.delete_orphaned_file(storage_path)
+        content_units_collection = content_types_db.type_units_collection(content_type_id)
+        unit_ids = [content_unit['_id'] for content_unit in content_units]
+        content_units_collection.remove({'_id': {'$in': unit_ids}}, safe=True)
+        OrphanManager.invalidate_summary_cache()
 
     @staticmethod
     def delete_orphaned_file(path):
@@ -228,6 +380,10 @@ class OrphanManager(object):
         if not os.path.isabs(path):
             raise ValueError(_('Path: %(p)s must be absolute path') % {'p': path})
 
+        # the file of a unit is already gone if an earlier deletion of it was interrupted
+        if not os.path.lexists(path):
+            return
+
         storage_dir = pulp_config.config.get('server', 'storage_dir')
 
         # shared content
@@ -243,12 +399,17 @@ class OrphanManager(object):
             path = os.path.dirname(path)
             if root_content_regex.match(path):
                 break
-            contents = os.listdir(path)
-            if contents:
+            # orphans are deleted concurrently, so another thread may be pruning the same
+            # directory; stop as soon as it is gone or no longer empty
+            try:
+                contents = os.listdir(path)
+                if contents:
+                    break
+                if not os.access(path, os.W_OK):
+                    break
+                os.rmdir(path)
+            except OSError:
                 break
-            if not os.access(path, os.W_OK):
-                break
-            os.rmdir(path)
 
     @staticmethod
     def is_shared(storage_dir, path):
@@ -313,6 +474,73 @@ class OrphanManager(object):
             _logger.error(_('Delete path: %(p)s failed: %(m)s'), {'p': path, 'm': str(e)})
 
 
+class OrphanConduit(StatusMixin):
+    """
+    Used to report the progress of orphan deletion on the task performing it.
+    """
+
+    def __init__(self, report_id):
+        """
+        :param report_id: key of the progress report on the task
+        :type  report_id: str
+        """
+        StatusMixin.__init__(self, report_id, OrphanConduitException)
+
+    def __str__(self):
+        return 'OrphanConduit'
+
+
+class DeleteOrphansStep(Step):
+    """
+    Deletes the orphaned units of one content type in batches of ORPHAN_BATCH_SIZE, removing
+    their files with a pool of ORPHAN_DELETE_THREADS threads.
+    """
+
+    def __init__(self, content_type_id, content_unit_ids=None):
+        """
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        :param content_unit_ids: ids of the units that may be deleted; None means all orphans
+        :type  content_unit_ids: iterable or None
+        """
+        super(DeleteOrphansStep, self).__init__(
+            step_type=reporting_constants.ORPHAN_STEP_DELETE_TYPE, non_halting_exceptions=[])
+        self.content_type_id = content_type_id
+        self.content_unit_ids = content_unit_ids
+        self.description = _('Deleting orphaned units of type %(t)s') % {'t': content_type_id}
+        self.pool = None
+
+    def _get_total(self):
+        if self.content_unit_ids is not None:
+            return len(set(self.content_unit_ids))
+        return OrphanManager().orphans_count_by_type(self.content_type_id)
+
+    def initialize(self):
+        self.pool = ThreadPool(ORPHAN_DELETE_THREADS)
+
+    def finalize(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def get_iterator(self):
+        fields = ['_id', '_storage_path']
+        if self.content_unit_ids is not None:
+            orphans = OrphanManager.generate_orphans_by_ids(
+                self.content_type_id, self.content_unit_ids, fields=fields)
+        else:
+            orphans = OrphanManager.generate_orphans_by_type(self.content_type_id, fields=fields)
+        # stop looking for orphans once the step is canceled
+        return itertools.takewhile(lambda page: not self.canceled,
+                                   paginate(orphans, ORPHAN_BATCH_SIZE))
+
+    def _process_block(self, item=None):
+        OrphanManager.delete_orphan_units(self.content_type_id, item, self.pool)
+        self.progress_successes += len(item)
+        self.report_progress()
+
+
 delete_all_orphans = task(OrphanManager.delete_all_orphans, base=Task, ignore_result=True)
 delete_orphans_by_id = task(OrphanManager.delete_orphans_by_id, base=Task, ignore_result=True)
 delete_orphans_by_type = task(OrphanManager.delete_orphans_by_type, base=Task, ignore_result=True)
@@ -204,11 +204,10 @@ class ContentQueryManager(object):
                  the same index in each tuple corresponds to a single content unit
         @rtype: tuple of (possibly empty) tuples
         """
-        key_fields = content_types_db.type_units_unit_key(content_type)
+        key_fields = content_types_db.type_units_unit_key_fields(content_type)
         if key_fields is None:
             raise InvalidValue(['content_type'])
-        all_fields = ['_id']
-        _flatten_keys(all_fields, key_fields)
+        all_fields = ['_id'] + list(key_fields)
         collection = content_types_db.type_units_collection(content_type)
         cursor = collection.find({'_id': {'$in': unit_ids}}, fields=all_fields)
         dicts = tuple(dict(d) for d in cursor)
@@ -281,24 +280,6 @@ class ContentQueryManager(object):
         return unit_path
 
 
-def _flatten_keys(flat_keys, nested_keys):
-    """
-    Take list of string keys and (possibly) nested sub-lists and flatten it out
-    into an un-nested list of string keys.
-    @param flat_keys: the flat list to store all of the keys in
-    @type flat_keys: list
-    @param nested_keys: possibly nested list of string keys
-    @type nested_keys: list
-    """
-    if not nested_keys:
-        return
-    for key in nested_keys:
-        if isinstance(key, basestring):
-            flat_keys.append(key)
-        else:
-            _flatten_keys(flat_keys, key)
-
-
 def _build_multi_keys_spec(content_type, unit_keys_dicts):
     """
     Build a mongo db spec document for a query on the given content_type
@@ -314,8 +295,7 @@ def _build_multi_keys_spec(content_type, unit_keys_dicts):
             fields of the collection
     """
     # keys dicts validation constants
-    key_fields = []
-    _flatten_keys(key_fields, content_types_db.type_units_unit_key(content_type))
+    key_fields = content_types_db.type_units_unit_key_fields(content_type) or ()
     key_fields_set = set(key_fields)
     extra_keys_msg = _('keys dictionary found with superfluous keys %(a)s, valid keys are %(b)s')
     missing_keys_msg = _('keys dictionary missing keys %(a)s, required keys are %(b)s')
@@ -11,29 +11,202 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 from celery import task
+from cStringIO import StringIO
 from gettext import gettext as _
 from uuid import uuid4
+import errno
+import hashlib
 import logging
 import os
 import sys
 
+from pulp.common.compat import json
 from pulp.plugins.conduits.upload import UploadConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.server import config as pulp_config
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.repository import RepoContentUnit
-from pulp.server.exceptions import (PulpDataException, MissingResource, PulpExecutionException,
-                                    PulpException)
+from pulp.server.exceptions import (InvalidValue, PulpDataException, MissingResource,
+                                    PulpExecutionException, PulpException)
 import pulp.server.managers.factory as manager_factory
 import pulp.server.managers.repo._common as repo_common_utils
 
 
 logger = logging.getLogger(__name__)
 
+# Suffix of the ledger file kept next to each upload file
+LEDGER_SUFFIX = '.ledger'
+
+# Number of bytes read from a request body and written to the upload file at a time
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class UploadLedger(object):
+    """
+    Records the byte ranges of an upload that have been received. The ledger is a file of JSON
+    lines kept next to the upload file: the first line describes the upload and each following
+    line describes one saved segment. Lines are appended with single writes to a file opened with
+    O_APPEND, so segments saved at once by several processes are all recorded.
+
+    The ledger is created when the upload is initialized. Uploads initialized before ledgers were
+    kept have none, and are treated as complete.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: full path to the ledger file
+        :type  path: str
+        """
+        self.path = path
+
+    def create(self, size=None, checksum_type=None):
+        """
+        Write the ledger for a new upload.
+
+        :param size:          number of bytes the uploaded file will have, if known
+        :type  size:          int or None
+        :param checksum_type: name of the hashlib algorithm used to checksum each segment as it
+                              is written, or None to not compute checksums
+        :type  checksum_type: str or None
+        """
+        f = open(self.path, 'w')
+        try:
+            f.write(json.dumps({'size': size, 'checksum_type': checksum_type}) + '\n')
+        finally:
+            f.close()
+
+    def exists(self):
+        """
+        :return: True if the upload has a ledger
+        :rtype:  bool
+        """
+        return os.path.exists(self.path)
+
+    def record(self, offset, length, checksum=None):
+        """
+        Record that a segment was written to the upload file. Nothing is recorded for uploads
+        that have no ledger.
+
+        :param offset:   offset in the uploaded file the segment was written at
+        :type  offset:   int
+        :param length:   number of bytes in the segment
+        :type  length:   int
+        :param checksum: hex digest of the segment, if checksums are computed
+        :type  checksum: str or None
+        """
+        line = json.dumps({'offset': offset, 'length': length, 'checksum': checksum}) + '\n'
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        except OSError, e:
+            if e.errno == errno.ENOENT:
+                return
+            raise
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def description(self):
+        """
+        Read only the first line of the ledger, so the segments saved so far are not parsed.
+
+        :return: the upload description, or None if the upload has no ledger
+        :rtype:  dict or None
+        """
+        try:
+            f = open(self.path)
+        except IOError, e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+        try:
+            line = f.readline()
+        finally:
+            f.close()
+        if not line.strip():
+            return None
+        return json.loads(line)
+
+    def read(self):
+        """
+        :return: tuple of the upload description and the list of recorded segments in the order
+                 they were saved, or (None, []) if the upload has no ledger
+        :rtype:  tuple
+        """
+        try:
+            f = open(self.path)
+        except IOError, e:
+            if e.errno == errno.ENOENT:
+                return None, []
+            raise
+        try:
+            lines = [line for line in f.read().splitlines() if line]
+        finally:
+            f.close()
+        if not lines:
+            return None, []
+        return json.loads(lines[0]), [json.loads(line) for line in lines[1:]]
+
+    def status(self):
+        """
+        Summarize what has been received. The received ranges are merged and sorted, and a range
+        is a two item list of its start offset and the offset after its last byte. When a
+        segment was saved more than once, the checksum of the last save is reported.
+
+        :return: dict with the keys size, checksum_type, received, complete and segments, or None
+                 if the upload has no ledger
+        :rtype:  dict or None
+        """
+        description, segments = self.read()
+        if description is None:
+            return None
+
+        latest = {}
+        for segment in segments:
+            latest[(segment['offset'], segment['length'])] = segment
+        segments = [latest[k] for k in sorted(latest)]
+
+        received = []
+        for segment in segments:
+            start = segment['offset']
+            end = start + segment['length']
+            if segment['length'] == 0:
+                continue
+            if received and start <= received[-1][1]:
+                received[-1][1] = max(received[-1][1], end)
+            else:
+                received.append([start, end])
+
+        size = description['size']
+        if size is None:
+            complete = len(received) <= 1 and (not received or received[0][0] == 0)
+        else:
+            complete = received == ([[0, size]] if size else [])
+
+        return {
+            'size': size,
+            'checksum_type': description['checksum_type'],
+            'received': received,
+            'complete': complete,
+            'segments': segments,
+        }
+
+    def is_complete(self):
+        """
+        An upload whose size was given is complete when every byte of it was received. Otherwise
+        it is complete when the received bytes have no gaps from the start of the file. Uploads
+        with no ledger are considered complete.
+
+        :return: True if the upload is complete
+        :rtype:  bool
+        """
+        status = self.status()
+        return status is None or status['complete']
+
 
 class ContentUploadManager(object):
-    def initialize_upload(self):
+    def initialize_upload(self, size=None, checksum_type=None):
         """
         Informs the Pulp server that a new file is about to be uploaded, allowing
         it to do any preparation it needs to do to store or track the upload.
@@ -41,9 +214,29 @@ class ContentUploadManager(object):
         The ID returned from this call is used to track this specific uploaded
         file for the remainder of its life.
 
+        @param size: number of bytes the uploaded file will have; when given the
+                     upload cannot be imported until all of them are received
+        @type  size: int or None
+
+        @param checksum_type: name of a hashlib algorithm, such as sha256, used to
+                              checksum each segment as it is saved
+        @type  checksum_type: str or None
+
         @return: unique ID to refer to this upload request in the future
         @rtype:  str
+
+        @raise InvalidValue: if the size or checksum type is not valid
         """
+        invalid = []
+        if size is not None and (not isinstance(size, (int, long)) or size < 0):
+            invalid.append('size')
+        if checksum_type is not None:
+            try:
+                hashlib.new(checksum_type)
+            except (TypeError, ValueError):
+                invalid.append('checksum_type')
+        if invalid:
+            raise InvalidValue(invalid)
 
         # Eventually I can see this method keeping track of uploads in the
         # database so a user can later query the server to find incomplete
@@ -59,6 +252,8 @@ class ContentUploadManager(object):
         f = open(file_path, 'w')
         f.close()
 
+        ContentUploadManager._upload_ledger(upload_id).create(size, checksum_type)
+
         return upload_id
 
     def save_data(self, upload_id, offset, data):
@@ -77,6 +272,28 @@ class ContentUploadManager(object):
         @param data: content to write to the file
         @type  data: str
         """
+        self.save_stream(upload_id, offset, StringIO(data))
+
+    def save_stream(self, upload_id, offset, stream):
+        """
+        Saves bits read from a file-like object into the given upload request
+        starting at an offset value. The bits are written as they are read, so
+        a segment is never held in memory in full. The segment is recorded in
+        the upload's ledger once it has been written.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+
+        @param offset: area in the uploaded file to start writing at
+        @type  offset: int
+
+        @param stream: object with a read(size) method returning the content to
+                       write, and an empty string when there is no more
+        @type  stream: file
+
+        @return: number of bytes written
+        @rtype:  int
+        """
 
         file_path = ContentUploadManager._upload_file_path(upload_id)
 
@@ -84,10 +301,55 @@ class ContentUploadManager(object):
         if not os.path.exists(file_path):
             raise MissingResource(upload_request=upload_id)
 
+        ledger = ContentUploadManager._upload_ledger(upload_id)
+        description = ledger.description()
+        digest = None
+        if description is not None and description['checksum_type']:
+            digest = hashlib.new(description['checksum_type'])
+
+        length = 0
         f = open(file_path, 'r+')
-        f.seek(offset)
-        f.write(data)
-        f.close()
+        try:
+            f.seek(offset)
+            while True:
+                data = stream.read(STREAM_BUFFER_SIZE)
+                if not data:
+                    break
+                f.write(data)
+                if digest is not None:
+                    digest.update(data)
+                length += len(data)
+        finally:
+            f.close()
+
+        checksum = digest.hexdigest() if digest is not None else None
+        ledger.record(offset, length, checksum)
+        return length
+
+    def upload_status(self, upload_id):
+        """
+        Returns which parts of the given upload have been received.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+
+        @return: dict with the keys size, checksum_type, received (a sorted list of
+                 [start, end) byte ranges), complete and segments (the offset, length
+                 and checksum of each saved segment); uploads initialized without a
+                 ledger report only complete
+        @rtype:  dict
+
+        @raise MissingResource: if the upload request ID does not exist
+        """
+        file_path = ContentUploadManager._upload_file_path(upload_id)
+        if not os.path.exists(file_path):
+            raise MissingResource(upload_id=upload_id)
+
+        status = ContentUploadManager._upload_ledger(upload_id).status()
+        if status is None:
+            status = {'size': None, 'checksum_type': None, 'received': None, 'complete': True,
+                      'segments': None}
+        return status
 
     def delete_upload(self, upload_id):
         """
@@ -107,6 +369,10 @@ class ContentUploadManager(object):
         else:
             raise MissingResource(upload_id=upload_id)
 
+        ledger = ContentUploadManager._upload_ledger(upload_id)
+        if ledger.exists():
+            os.remove(ledger.path)
+
     def read_upload(self, upload_id):
         """
         Utility method for reading and returning the contents of an upload
@@ -139,7 +405,8 @@ class ContentUploadManager(object):
         @rtype:  list
         """
         upload_dir = ContentUploadManager._upload_storage_dir()
-        upload_ids = os.listdir(upload_dir)
+        upload_ids = [name for name in os.listdir(upload_dir)
+                      if not name.endswith(LEDGER_SUFFIX)]
         return upload_ids
 
     @staticmethod
@@ -181,7 +448,8 @@ class ContentUploadManager(object):
 
         This call will first call is_valid_upload to check the integrity of the
         destination repository. See that method's documentation for exception
-        possibilities.
+        possibilities. An upload whose ledger shows bytes that were not received
+        is rejected with PulpDataException.
 
         :param repo_id:       identifies the repository into which the unit is uploaded
         :type  repo_id:       str
@@ -199,6 +467,10 @@ class ContentUploadManager(object):
         # If it doesn't raise an exception, it's good to go
         ContentUploadManager.is_valid_upload(repo_id, unit_type_id)
 
+        if not ContentUploadManager._upload_ledger(upload_id).is_complete():
+            raise PulpDataException(_('Upload [%(u)s] has not received all of its data') %
+                                    {'u': upload_id})
+
         repo_query_manager = manager_factory.repo_query_manager()
         importer_manager = manager_factory.repo_importer_manager()
 
@@ -223,8 +495,12 @@ class ContentUploadManager(object):
 
         # Invoke the importer
         try:
-            return importer_instance.upload_unit(transfer_repo, unit_type_id, unit_key,
-                                                 unit_metadata, file_path, conduit, call_config)
+            try:
+                return importer_instance.upload_unit(transfer_repo, unit_type_id, unit_key,
+                                                     unit_metadata, file_path, conduit,
+                                                     call_config)
+            finally:
+                conduit.update_content_revisions()
         except PulpException:
             msg = _('Error from the importer while importing uploaded unit to repository [%(r)s]')
             msg = msg % {'r': repo_id}
@@ -252,6 +528,18 @@ class ContentUploadManager(object):
         path = os.path.join(upload_storage_dir, upload_id)
         return path
 
+    @staticmethod
+    def _upload_ledger(upload_id):
+        """
+        Returns the ledger of the given upload.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          ledger recording the received parts of the upload
+        :rtype:           UploadLedger
+        """
+        return UploadLedger(ContentUploadManager._upload_file_path(upload_id) + LEDGER_SUFFIX)
+
     @staticmethod
     def _upload_storage_dir():
         """
@@ -10,6 +10,7 @@ from pulp.server.db.model.event import EventListener
 from pulp.server.event import notifiers
 from pulp.server.event.data import ALL_EVENT_TYPES
 from pulp.server.exceptions import InvalidValue, MissingResource
+from pulp.server.managers.event.fire import listener_cache
 
 
 class EventListenerManager(object):
@@ -57,6 +58,7 @@ class EventListenerManager(object):
         el = EventListener(notifier_type_id, notifier_config, event_types)
         collection = EventListener.get_collection()
         created_id = collection.save(el, safe=True)
+        listener_cache.invalidate()
         created = collection.find_one(created_id)
 
         return created
@@ -103,6 +105,7 @@ class EventListenerManager(object):
         self.get(event_listener_id)  # check for MissingResource
 
         collection.remove({'_id': ObjectId(event_listener_id)})
+        listener_cache.invalidate()
 
     def update(self, event_listener_id, notifier_config=None, event_types=None):
         """
@@ -153,6 +156,7 @@ class EventListenerManager(object):
 
         # Update the database
         collection.save(existing, safe=True)
+        listener_cache.invalidate()
 
         # Reload to return
         existing = collection.find_one({'_id': ObjectId(event_listener_id)})
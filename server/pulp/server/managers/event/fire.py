@@ -6,6 +6,8 @@ in a consistent event format for that type.
 """
 
 import logging
+import threading
+import time
 
 from pulp.server.db.model.event import EventListener
 from pulp.server.event import data as e, notifiers
@@ -13,6 +15,56 @@ from pulp.server.event import data as e, notifiers
 
 _logger = logging.getLogger(__name__)
 
+# The number of seconds the event listeners are used before they are read again
+LISTENER_CACHE_TTL = 10
+
+
+class ListenerCache(object):
+    """
+    The event listeners, read from the database at most once every ttl seconds instead of for
+    every event fired. The event listener manager invalidates the cache when it writes, and the
+    time limit bounds how long a change made by another process goes unnoticed.
+
+    :ivar ttl: The number of seconds the listeners are used before they are read again
+    :type ttl: int
+    """
+
+    def __init__(self, ttl=LISTENER_CACHE_TTL):
+        self.ttl = ttl
+        self._listeners = None
+        self._expires = 0
+        self._lock = threading.Lock()
+
+    def listeners(self, event_type):
+        """
+        :param event_type: type of the event being fired
+        :type  event_type: str
+
+        :return: the listeners for the event type, including those listening for all events
+        :rtype:  list of dict
+        """
+        with self._lock:
+            now = time.time()
+            if self._listeners is None or now >= self._expires:
+                self._listeners = list(EventListener.get_collection().find())
+                self._expires = now + self.ttl
+            listeners = self._listeners
+        matched = []
+        for listener in listeners:
+            event_types = listener['event_types']
+            if isinstance(event_types, basestring):
+                event_types = [event_types]
+            if event_type in event_types or '*' in event_types:
+                matched.append(listener)
+        return matched
+
+    def invalidate(self):
+        """
+        Discard the listeners so they are read again when the next event is fired.
+        """
+        with self._lock:
+            self._listeners = None
+
 
 class EventFireManager(object):
 
@@ -62,8 +114,7 @@ class EventFireManager(object):
         @type  event: pulp.server.event.data.Event
         """
         # Determine which listeners should be notified
-        listeners = list(EventListener.get_collection().find(
-            {'$or': ({'event_types': event.event_type}, {'event_types': '*'})}))
+        listeners = listener_cache.listeners(event.event_type)
 
         # For each listener, retrieve the notifier and invoke it. Be sure that
         # an exception from a notifier is logged but does not interrupt the
@@ -76,3 +127,6 @@ class EventFireManager(object):
                 f(l['notifier_config'], event)
             except Exception:
                 _logger.exception('Exception from notifier of type [%s]' % notifier_type_id)
+
+
+listener_cache = ListenerCache()
@@ -8,6 +8,7 @@ from gettext import gettext as _
 import logging
 import re
 import sys
+import uuid
 
 from celery import task
 import pymongo
@@ -344,6 +345,25 @@ class RepoManager(object):
                 message = 'There was a problem updating repository %s' % repo_id
                 raise PulpExecutionException(message), None, sys.exc_info()[2]
 
+    @staticmethod
+    def update_content_revision(repo_id):
+        """
+        Replaces the content revision token on the repository. This must be called every time the
+        set of units in the repository changes, so that data calculated from the repository's
+        content, such as applicability, can tell when it is out of date.
+
+        :param repo_id: identifies the repo
+        :type  repo_id: str
+
+        :return: the new content revision token
+        :rtype:  str
+        """
+        content_revision = str(uuid.uuid4())
+        spec = {'id': repo_id}
+        operation = {'$set': {'content_revision': content_revision}}
+        Repo.get_collection().update(spec, operation, safe=True)
+        return content_revision
+
     @staticmethod
     def update_last_unit_removed(repo_id):
         """
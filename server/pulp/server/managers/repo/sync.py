@@ -145,7 +145,11 @@ class RepoSyncManager(object):
             # which will set up cancel_sync_repo() as the target for the signal handler
             sync_repo = register_sigterm_handler(importer_instance.sync_repo,
                                                  importer_instance.cancel_sync_repo)
-            sync_report = sync_repo(transfer_repo, conduit, call_config)
+            try:
+                sync_report = sync_repo(transfer_repo, conduit, call_config)
+            finally:
+                # units saved before a failure have still changed the content
+                conduit.update_content_revisions()
 
         except Exception, e:
             sync_end_timestamp = _now_timestamp()
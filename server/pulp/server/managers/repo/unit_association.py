@@ -12,6 +12,7 @@ import pymongo
 from pulp.plugins.conduits.unit_import import ImportUnitConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api
+from pulp.plugins.util.misc import paginate
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.criteria import UnitAssociationCriteria
 from pulp.server.db.model.repository import RepoContentUnit
@@ -43,6 +44,9 @@ SORT_DESCENDING = pymongo.DESCENDING
 
 _VALID_DIRECTIONS = (SORT_ASCENDING, SORT_DESCENDING)
 
+# The number of units looked up and associated at once by associate_all_by_ids.
+ASSOCIATE_BATCH_SIZE = 1000
+
 logger = logging.getLogger(__name__)
 
 
@@ -85,9 +89,10 @@ class RepoUnitAssociationManager(object):
 
         @param update_repo_metadata: if True, updates the unit association count
                                   after the new association is made. The last
-                                  unit added field will also be updated.  Set this
-                                  to False when doing bulk associations, and
-                                  make one call to update the count at the end.
+                                  unit added field and the content revision will
+                                  also be updated.  Set this to False when doing
+                                  bulk associations, and make one call to update
+                                  the count at the end.
                                   defaults to True
         @type  update_repo_metadata: bool
 
@@ -122,12 +127,16 @@ class RepoUnitAssociationManager(object):
 
             # update the record for the last added field
             manager.update_last_unit_added(repo_id)
+            manager.update_content_revision(repo_id)
 
-    def associate_all_by_ids(self, repo_id, unit_type_id, unit_id_list, owner_type, owner_id):
+    def associate_all_by_ids(self, repo_id, unit_type_id, unit_id_list, owner_type, owner_id,
+                             update_repo_metadata=True):
         """
         Creates multiple associations between the given repo and content units.
 
-        See associate_unit_by_id for semantics.
+        See associate_unit_by_id for semantics. Existing associations are
+        looked up and new associations are inserted for ASSOCIATE_BATCH_SIZE
+        units at a time.
 
         @param repo_id: identifies the repo
         @type  repo_id: str
@@ -146,28 +155,46 @@ class RepoUnitAssociationManager(object):
                          the importer ID or user login
         @type  owner_id: str
 
+        @param update_repo_metadata: if True, updates the unit association count,
+                                  the last unit added field and the content
+                                  revision once all of the associations are made.
+                                  defaults to True
+        @type  update_repo_metadata: bool
+
         :return:    number of new units added to the repo
         :rtype:     int
 
         @raise InvalidType: if the given owner type is not of the valid enumeration
         """
 
-        # There may be a way to batch this in mongo which would be ideal for a
-        # bulk operation like this. But for deadline purposes, this call will
-        # simply loop and call the single method.
+        if owner_type not in _OWNER_TYPES:
+            raise exceptions.InvalidValue(['owner_type'])
 
+        collection = RepoContentUnit.get_collection()
         unique_count = 0
-        for unit_id in unit_id_list:
-            if not RepoUnitAssociationManager.association_exists(repo_id, unit_id, unit_type_id):
-                unique_count += 1
-            self.associate_unit_by_id(repo_id, unit_type_id, unit_id, owner_type, owner_id, False)
+        for page in paginate(unit_id_list, ASSOCIATE_BATCH_SIZE):
+            spec = {'repo_id': repo_id,
+                    'unit_type_id': unit_type_id,
+                    'unit_id': {'$in': list(set(page))}}
+            associated = set(a['unit_id'] for a in collection.find(spec, fields=['unit_id']))
+            associations = []
+            for unit_id in page:
+                if unit_id in associated:
+                    continue
+                associated.add(unit_id)
+                associations.append(
+                    RepoContentUnit(repo_id, unit_id, unit_type_id, owner_type, owner_id))
+            if associations:
+                collection.insert(associations, safe=True)
+                unique_count += len(associations)
 
         # update the count of associated units on the repo object
-        if unique_count:
+        if update_repo_metadata and unique_count:
             manager_factory.repo_manager().update_unit_count(
                 repo_id, unit_type_id, unique_count)
             # update the timestamp for when the units were added to the repo
             manager_factory.repo_manager().update_last_unit_added(repo_id)
+            manager_factory.repo_manager().update_content_revision(repo_id)
         return unique_count
 
     @staticmethod
@@ -264,9 +291,12 @@ class RepoUnitAssociationManager(object):
             RepoContentUnit.OWNER_TYPE_USER, login)
 
         try:
-            copied_units = importer_instance.import_units(
-                transfer_source_repo, transfer_dest_repo, conduit, call_config,
-                units=transfer_units)
+            try:
+                copied_units = importer_instance.import_units(
+                    transfer_source_repo, transfer_dest_repo, conduit, call_config,
+                    units=transfer_units)
+            finally:
+                conduit.update_content_revisions()
             unit_ids = [u.to_id_dict() for u in copied_units]
             return {'units_successful': unit_ids}
 
@@ -391,6 +421,7 @@ class RepoUnitAssociationManager(object):
             repo_manager.update_unit_count(repo_id, unit_type_id, -unique_count)
 
         repo_manager.update_last_unit_removed(repo_id)
+        repo_manager.update_content_revision(repo_id)
 
         # Convert the units into transfer units. This happens regardless of whether or not
         # the plugin will be notified as it's used to generate the return result,
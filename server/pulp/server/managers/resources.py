@@ -3,12 +3,40 @@ This module contains management functions for the models found in the
 pulp.server.db.model.resources module.
 """
 
+from gettext import gettext as _
+import logging
+import Queue
+import time
+
+import kombu
+
 from pulp.common.constants import SCHEDULER_WORKER_NAME
-from pulp.server.async.celery_instance import RESOURCE_MANAGER_QUEUE
+from pulp.server.async import placement
+from pulp.server.async.celery_instance import celery, RESOURCE_MANAGER_QUEUE, \
+    RESERVATION_EVENT_QUEUE
 from pulp.server.db.model import criteria, resources
 from pulp.server.exceptions import NoWorkers
 
 
+_logger = logging.getLogger(__name__)
+
+# Types of the events sent to the resource manager on the RESERVATION_EVENT_QUEUE
+EVENT_RELEASED = 'released'
+EVENT_WORKERS_CHANGED = 'workers_changed'
+
+# The number of seconds to wait for an event before reloading the reservation table
+RELOAD_INTERVAL = 5
+
+# The number of seconds to wait before reloading the reservation table when events
+# cannot be received
+EVENT_ERROR_INTERVAL = 0.25
+
+# The exchange and queue the events are published to, declared the same way as the SimpleQueue
+# the resource manager receives them from
+_event_exchange = kombu.Exchange(RESERVATION_EVENT_QUEUE, type='direct')
+_event_queue = kombu.Queue(RESERVATION_EVENT_QUEUE, _event_exchange, RESERVATION_EVENT_QUEUE)
+
+
 def filter_workers(criteria):
     """
     Return Worker objects that match the given criteria
@@ -30,6 +58,9 @@ def get_worker_for_reservation(resource_id):
     there are no workers with that reservation_id type a pulp.server.exceptions.NoWorkers exception
     is raised.
 
+    The reservations are found in the in-memory reservation table, which is brought up to date
+    with any pending events first.
+
     :param resource_id:    The name of the resource you wish to reserve for your task.
 
     :raises NoWorkers:     If all workers have reserved_resource entries associated with them.
@@ -39,13 +70,11 @@ def get_worker_for_reservation(resource_id):
                            `resource_id` associated with it.
     :rtype:                pulp.server.db.model.resources.Worker
     """
-    reservation = resources.ReservedResource.get_collection().find_one({'resource_id': resource_id})
-    if reservation:
-        find_worker_by_name = criteria.Criteria({'_id': reservation['worker_name']})
-        worker_bson = resources.Worker.get_collection().query(find_worker_by_name)[0]
-        return resources.Worker.from_bson(worker_bson)
-    else:
+    reservation_table.refresh()
+    worker = reservation_table.get_worker_for_resource(resource_id)
+    if worker is None:
         raise NoWorkers()
+    return worker
 
 
 def _is_worker(worker_name):
@@ -60,29 +89,339 @@ def _is_worker(worker_name):
     return True
 
 
-def get_unreserved_worker():
+def get_unreserved_worker(resource_id=None):
     """
-    Return the Worker instance that has no reserved_resource entries associated with it. If there
-    are no unreserved workers a pulp.server.exceptions.NoWorkers exception is raised.
+    Return a Worker instance that may take a reservation of a resource that is not yet reserved.
+    The worker is chosen by the placement policy configured in the [tasks] section of
+    server.conf. With the default settings this is a worker that has no reserved_resource
+    entries associated with it. If no worker may take another reservation a
+    pulp.server.exceptions.NoWorkers exception is raised.
 
-    :raises NoWorkers: If all workers have reserved_resource entries associated with them.
+    The reservations are found in the in-memory reservation table, which is brought up to date
+    with any pending events first.
 
-    :returns:          The Worker instance that has no reserved_resource entries associated with it.
+    :param resource_id: The name of the resource to be reserved, used by placement policies
+                        that place resources by name
+    :type  resource_id: basestring
+
+    :raises NoWorkers: If no worker may take another reservation.
+
+    :returns:          The Worker instance the resource should be reserved on.
     :rtype:            pulp.server.db.model.resources.Worker
     """
+    reservation_table.refresh()
+    worker = reservation_table.get_unreserved_worker(resource_id)
+    if worker is None:
+        # All workers are reserved
+        raise NoWorkers()
+    return worker
+
+
+def add_reservation(task_id, worker_name, resource_id):
+    """
+    Record a reservation that has been saved to the database in the in-memory reservation table.
+
+    :param task_id:     The UUID of the task that requested the reservation
+    :type  task_id:     basestring
+    :param worker_name: The name of the worker the resource is reserved on
+    :type  worker_name: basestring
+    :param resource_id: The name of the reserved resource
+    :type  resource_id: basestring
+    """
+    reservation_table.add(task_id, worker_name, resource_id)
 
-    # Build a mapping of queue names to Worker objects
-    workers_dict = dict((worker['name'], worker) for worker in filter_workers(criteria.Criteria()))
-    worker_names = [name for name in workers_dict.keys()]
-    reserved_names = [r['worker_name'] for r in resources.ReservedResource.get_collection().find()]
 
-    # Find an unreserved worker using set differences of the names, and filter
-    # out workers that should not be assigned work.
-    # NB: this is a little messy but set comprehensions are in python 2.7+
-    unreserved_workers = set(filter(_is_worker, worker_names)) - set(reserved_names)
+def wait_for_release():
+    """
+    Block until a reservation is released or the workers change, or until RELOAD_INTERVAL
+    seconds have passed. In the latter case the reservation table is reloaded from the database.
+    """
+    reservation_table.wait(RELOAD_INTERVAL)
+
+
+def notify_released(task_id):
+    """
+    Tell the resource manager that the reservation held by a task has been removed from the
+    database. Failures are logged and otherwise ignored because the resource manager will
+    reload the reservation table after RELOAD_INTERVAL seconds.
+
+    :param task_id: The UUID of the task that requested the reservation
+    :type  task_id: basestring
+    """
+    _send_event({'type': EVENT_RELEASED, 'task_id': task_id})
+
+
+def notify_workers_changed():
+    """
+    Tell the resource manager that a worker has been added to or deleted from the database,
+    along with any of its reservations. Failures are logged and otherwise ignored because the
+    resource manager will reload the reservation table after RELOAD_INTERVAL seconds.
+    """
+    _send_event({'type': EVENT_WORKERS_CHANGED})
+
+
+def _send_event(event):
+    """
+    Send an event to the resource manager on the RESERVATION_EVENT_QUEUE. The event is published
+    by a producer from the process's producer pool, so the broker connection is reused and the
+    queue is only declared the first time it is used on that connection.
 
+    :param event: The event to send
+    :type  event: dict
+    """
     try:
-        return workers_dict[unreserved_workers.pop()]
-    except KeyError:
-        # All workers are reserved
-        raise NoWorkers()
+        with celery.producer_or_acquire() as producer:
+            producer.publish(event, exchange=_event_exchange,
+                             routing_key=RESERVATION_EVENT_QUEUE, declare=[_event_queue],
+                             serializer='json')
+    except Exception:
+        msg = _('Could not send the %(t)s event to the resource manager')
+        _logger.exception(msg % {'t': event['type']})
+
+
+class ReservationTable(object):
+    """
+    An in-memory copy of the workers and reserved_resources collections kept by the resource
+    manager, so that placing a reserved task does not read both collections for every attempt.
+
+    The table is loaded from the database when it is first used. Afterwards, reservations made
+    by the resource manager are added directly and releases and worker changes arrive as
+    events on the RESERVATION_EVENT_QUEUE. The table is reloaded when the workers change and
+    whenever no event arrives within the wait timeout.
+
+    :ivar workers:   Workers that can be assigned work, keyed by name
+    :type workers:   dict
+    :ivar tasks:     The (worker_name, resource_id) reserved by each task, keyed by task ID
+    :type tasks:     dict
+    :ivar resources: The [worker_name, reservation count] of each reserved resource, keyed by
+                     resource ID
+    :type resources: dict
+    :ivar depths:    The number of tasks holding reservations on each worker, keyed by name
+    :type depths:    dict
+    :ivar reserved:  The number of resources reserved on each worker, keyed by name
+    :type reserved:  dict
+    :ivar policy:    The policy that places resources that are not yet reserved
+    :type policy:    pulp.server.async.placement.PlacementPolicy
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self.workers = {}
+        self.tasks = {}
+        self.resources = {}
+        self.depths = {}
+        self.reserved = {}
+        self.policy = None
+        self._connection = None
+        self._queue = None
+
+    def load(self):
+        """
+        Rebuild the table from the workers and reserved_resources collections.
+        """
+        workers = filter_workers(criteria.Criteria())
+        self.workers = dict((w.name, w) for w in workers if _is_worker(w.name))
+        self.tasks = {}
+        self.resources = {}
+        self.depths = {}
+        self.reserved = {}
+        if self.policy is None:
+            self.policy = placement.get_policy()
+        for reservation in resources.ReservedResource.get_collection().find():
+            self.add(reservation['_id'], reservation['worker_name'], reservation['resource_id'])
+        self.loaded = True
+
+    def refresh(self):
+        """
+        Load the table if it has not been loaded, then apply any events that have arrived.
+        """
+        if not self.loaded:
+            self.load()
+        try:
+            self._receive_events(block=False)
+        except Exception:
+            _logger.exception(_('Could not receive reservation events'))
+            self._close()
+            self.load()
+
+    def wait(self, timeout):
+        """
+        Wait for at least one event to arrive and apply it along with any others that are
+        waiting. When no event arrives within the timeout, the table is reloaded.
+
+        :param timeout: The number of seconds to wait for an event
+        :type  timeout: float
+        """
+        try:
+            received = self._receive_events(block=True, timeout=timeout)
+        except Exception:
+            _logger.exception(_('Could not receive reservation events'))
+            self._close()
+            time.sleep(EVENT_ERROR_INTERVAL)
+            received = False
+        if not received:
+            self.load()
+
+    def add(self, task_id, worker_name, resource_id):
+        """
+        Add a reservation to the table.
+
+        :param task_id:     The UUID of the task that requested the reservation
+        :type  task_id:     basestring
+        :param worker_name: The name of the worker the resource is reserved on
+        :type  worker_name: basestring
+        :param resource_id: The name of the reserved resource
+        :type  resource_id: basestring
+        """
+        if task_id in self.tasks:
+            return
+        self.tasks[task_id] = (worker_name, resource_id)
+        self.depths[worker_name] = self.depths.get(worker_name, 0) + 1
+        reservation = self.resources.get(resource_id)
+        if reservation is None:
+            reservation = self.resources[resource_id] = [worker_name, 0]
+            self.reserved[worker_name] = self.reserved.get(worker_name, 0) + 1
+        reservation[1] += 1
+
+    def release(self, task_id):
+        """
+        Remove a reservation from the table. Unknown task IDs are ignored.
+
+        :param task_id: The UUID of the task that requested the reservation
+        :type  task_id: basestring
+        """
+        try:
+            worker_name, resource_id = self.tasks.pop(task_id)
+        except KeyError:
+            return
+        _decrement(self.depths, worker_name)
+        reservation = self.resources[resource_id]
+        reservation[1] -= 1
+        if not reservation[1]:
+            del self.resources[resource_id]
+            _decrement(self.reserved, reservation[0])
+
+    def get_worker_for_resource(self, resource_id):
+        """
+        :param resource_id: The name of the resource
+        :type  resource_id: basestring
+
+        :return: The worker the resource is reserved on, or None if it is not reserved or the
+                 worker is not known.
+        :rtype:  pulp.server.db.model.resources.Worker or None
+        """
+        reservation = self.resources.get(resource_id)
+        if reservation is None:
+            return None
+        return self.workers.get(reservation[0])
+
+    def get_unreserved_worker(self, resource_id=None):
+        """
+        :param resource_id: The name of the resource to be reserved
+        :type  resource_id: basestring
+
+        :return: The worker chosen by the placement policy, or None if no worker may take
+                 another reservation.
+        :rtype:  pulp.server.db.model.resources.Worker or None
+        """
+        if self.policy is None:
+            self.policy = placement.get_policy()
+        return self.policy.select(self, resource_id)
+
+    def queue_depth(self, worker_name):
+        """
+        :param worker_name: The name of a worker
+        :type  worker_name: basestring
+
+        :return: The number of tasks that hold reservations on the worker and have not finished
+        :rtype:  int
+        """
+        return self.depths.get(worker_name, 0)
+
+    def reserved_resource_count(self, worker_name):
+        """
+        :param worker_name: The name of a worker
+        :type  worker_name: basestring
+
+        :return: The number of resources reserved on the worker
+        :rtype:  int
+        """
+        return self.reserved.get(worker_name, 0)
+
+    def _receive_events(self, block, timeout=None):
+        """
+        Apply the events waiting on the RESERVATION_EVENT_QUEUE.
+
+        :param block:   If True, wait for the first event to arrive
+        :type  block:   bool
+        :param timeout: The number of seconds to wait for the first event
+        :type  timeout: float
+
+        :return: True if any events were applied
+        :rtype:  bool
+        """
+        queue = self._get_queue()
+        received = False
+        while True:
+            try:
+                message = queue.get(block=block, timeout=timeout)
+            except Queue.Empty:
+                return received
+            self._apply_event(message.payload)
+            message.ack()
+            received = True
+            block = False
+
+    def _apply_event(self, event):
+        """
+        Apply a single event to the table.
+
+        :param event: The event sent by notify_released() or notify_workers_changed()
+        :type  event: dict
+        """
+        if event['type'] == EVENT_RELEASED:
+            self.release(event['task_id'])
+        elif event['type'] == EVENT_WORKERS_CHANGED:
+            self.load()
+
+    def _get_queue(self):
+        """
+        :return: The queue the events are received on, connecting to the broker if needed
+        :rtype:  kombu.simple.SimpleQueue
+        """
+        if self._queue is None:
+            self._connection = celery.connection()
+            self._queue = self._connection.SimpleQueue(RESERVATION_EVENT_QUEUE)
+        return self._queue
+
+    def _close(self):
+        """
+        Close the connection to the broker so that it is reopened for the next event.
+        """
+        try:
+            if self._queue is not None:
+                self._queue.close()
+            if self._connection is not None:
+                self._connection.release()
+        except Exception:
+            _logger.debug(_('Error closing the reservation event queue'), exc_info=True)
+        self._queue = None
+        self._connection = None
+
+
+def _decrement(counts, key):
+    """
+    Decrement a count in a dictionary of counts, removing the key when it reaches zero.
+
+    :param counts: Counts keyed by name
+    :type  counts: dict
+    :param key:    The key of the count to decrement
+    :type  key:    basestring
+    """
+    counts[key] -= 1
+    if not counts[key]:
+        del counts[key]
+
+
+# The reservation table of this process. Only the resource manager uses it to place tasks.
+reservation_table = ReservationTable()
@@ -151,6 +151,32 @@ class JSONController(object):
         http.header('Content-Length', len(body))
         return body
 
+    def _output_stream(self, items):
+        """
+        JSON encode the given items into a response body that is a JSON array, one item at a
+        time, and set the appropriate headers. The returned body is a generator, so the items
+        are read and encoded only as the response is being written.
+        """
+        http.header('Content-Type', 'application/json')
+        return self._generate_json_array(items)
+
+    @staticmethod
+    def _generate_json_array(items):
+        """
+        Generate the JSON encoding of a list of the given items in pieces.
+
+        :param items: items that can be JSON encoded
+        :type  items: iterable
+        :return:      generator of str
+        :rtype:       generator
+        """
+        yield '['
+        separator = ''
+        for item in items:
+            yield separator + json.dumps(item, default=json_encoder)
+            separator = ', '
+        yield ']'
+
     def _error_dict(self, msg, code=None):
         """
         Standardized error returns
@@ -172,6 +198,17 @@ class JSONController(object):
         http.status_ok()
         return self._output(data)
 
+    def ok_stream(self, items):
+        """
+        Return an ok response whose body is a JSON array of the given items, encoded as the
+        response is written.
+        @type items: iterable
+        @param items: items to be returned in the body of the response
+        @return: generator of JSON encoded response pieces
+        """
+        http.status_ok()
+        return self._output_stream(items)
+
     def created(self, location, data):
         """
         Return a created response.
@@ -11,7 +11,7 @@ from pulp.server.db.model.criteria import Criteria
 from pulp.server.exceptions import InvalidValue, MissingValue, OperationPostponed, \
     UnsupportedValue, MissingResource
 from pulp.server.managers.consumer.applicability import (regenerate_applicability_for_consumers,
-                                                         retrieve_consumer_applicability)
+                                                         stream_consumer_applicability)
 from pulp.server.managers.schedule.consumer import UNIT_INSTALL_ACTION, UNIT_UNINSTALL_ACTION, \
     UNIT_UPDATE_ACTION
 from pulp.server.tasks import consumer
@@ -579,7 +579,11 @@ class ContentApplicability(JSONController):
         except InvalidValue, e:
             return self.bad_request(str(e))
 
-        return self.ok(retrieve_consumer_applicability(consumer_criteria, content_types))
+        # The matching consumers are found here, so errors are reported before the response is
+        # started. The report is then streamed so that the memory it takes doesn't grow with the
+        # number of consumers that match
+        applicability = stream_consumer_applicability(consumer_criteria, content_types)
+        return self.ok_stream(applicability)
 
     def _get_consumer_criteria(self):
         """
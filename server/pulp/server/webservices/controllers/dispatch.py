@@ -1,3 +1,5 @@
+import itertools
+
 import web
 
 from pulp.server.auth.authorization import READ
@@ -38,12 +40,11 @@ class SearchTaskCollection(SearchController):
         example, '/v2/sometype/search/?field=id&field=display_name' will
         return the fields 'id' and 'display_name'.
 
-        :return: json encoded response
-        :rtype: str
+        :return: json encoded response, generated as the tasks are read from the database
+        :rtype: generator
         """
-        raw_tasks = self._get_query_results_from_get()
-        serialized_tasks = [task_serializer(task) for task in raw_tasks]
-        return self.ok(serialized_tasks)
+        criteria = self._get_criteria_from_get()
+        return self._stream_tasks(criteria)
 
     @auth_required(READ)
     def POST(self):
@@ -52,12 +53,26 @@ class SearchTaskCollection(SearchController):
         'criteria' which has a data structure that can be turned into a
         Criteria instance.
 
-        :return: response for web browser
-        :rtype: str
+        :return: json encoded response, generated as the tasks are read from the database
+        :rtype: generator
+        """
+        criteria = self._get_criteria_from_post()
+        return self._stream_tasks(criteria)
+
+    def _stream_tasks(self, criteria):
+        """
+        Run the search and stream the matching tasks.
+
+        :param criteria: the criteria of the search
+        :type  criteria: pulp.server.db.model.criteria.Criteria
+        :return: json encoded response, generated as the tasks are read from the database
+        :rtype: generator
         """
-        raw_tasks = self._get_query_results_from_post()
-        serialized_tasks = [task_serializer(task) for task in raw_tasks]
-        return self.ok(serialized_tasks)
+        # Reading the first task runs the query, so that an invalid criteria or a database error
+        # is raised here rather than after the response has been started
+        tasks = iter(self.query_method(criteria))
+        first_tasks = list(itertools.islice(tasks, 1))
+        return self.ok_stream(task_serializer(task) for task in itertools.chain(first_tasks, tasks))
 
 # mapped to /v2/tasks/
 TASK_URLS = (
@@ -947,7 +947,7 @@ class ContentApplicabilityRegeneration(JSONController):
         Creates an async task to regenerate content applicability data for given updated
         repositories.
 
-        body {repo_criteria:<dict>}
+        body {repo_criteria:<dict>, parallel:<bool>}
         """
         body = self.params()
         repo_criteria = body.get('repo_criteria', None)
@@ -957,11 +957,14 @@ class ContentApplicabilityRegeneration(JSONController):
             repo_criteria = Criteria.from_client_input(repo_criteria)
         except:
             raise exceptions.InvalidValue('repo_criteria')
+        parallel = body.get('parallel', False)
+        if not isinstance(parallel, bool):
+            raise exceptions.InvalidValue('parallel')
 
         regeneration_tag = tags.action_tag('content_applicability_regeneration')
         async_result = regenerate_applicability_for_repos.apply_async_with_reservation(
             tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE, tags.RESOURCE_ANY_ID,
-            (repo_criteria.as_dict(),), tags=[regeneration_tag])
+            (repo_criteria.as_dict(), parallel), tags=[regeneration_tag])
         raise exceptions.OperationPostponed(async_result)
 
 
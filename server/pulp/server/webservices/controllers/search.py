@@ -78,6 +78,17 @@ class SearchController(JSONController):
                     for the collection associated with this controller
         @rtype:     list
         """
+        criteria = self._get_criteria_from_get(ignore_fields, is_user_search)
+        return list(self.query_method(criteria))
+
+    def _get_criteria_from_get(self, ignore_fields=None, is_user_search=False):
+        """
+        Looks for query parameters that define a Criteria, and returns it.
+        The parameters are the same as for _get_query_results_from_get.
+
+        @return:    criteria given by the query parameters
+        @rtype:     pulp.server.db.model.criteria.Criteria
+        """
         input = self._ensure_input_encoding(web.input(field=[]))
         if ignore_fields:
             for field in ignore_fields:
@@ -93,8 +104,7 @@ class SearchController(JSONController):
                 fields.append('login')
             input['fields'] = fields
 
-        criteria = Criteria.from_client_input(input)
-        return list(self.query_method(criteria))
+        return Criteria.from_client_input(input)
 
     def _get_query_results_from_post(self, is_user_search=False):
         """
@@ -105,6 +115,17 @@ class SearchController(JSONController):
                     for the collection associated with this controller
         @rtype:     list
         """
+        criteria = self._get_criteria_from_post(is_user_search)
+        return list(self.query_method(criteria))
+
+    def _get_criteria_from_post(self, is_user_search=False):
+        """
+        Looks for a Criteria passed as a POST parameter on key 'criteria', and
+        returns it.
+
+        @return:    criteria given by the POST parameter
+        @rtype:     pulp.server.db.model.criteria.Criteria
+        """
         try:
             criteria_param = self.params()['criteria']
         except KeyError:
@@ -115,4 +136,4 @@ class SearchController(JSONController):
                 criteria.fields.append('id')
             if is_user_search and 'login' not in criteria.fields and u'login' not in criteria.fields:
                 criteria.fields.append('login')
-        return list(self.query_method(criteria))
+        return criteria
@@ -41,7 +41,7 @@ class OrphanCollectionView(View):
         # convert the counts into sub-documents so we can add _href fields to them
         # add links to the content type sub-collections
         rest_summary = {}
-        for key, value in orphan_manager.orphans_summary().items():
+        for key, value in orphan_manager.orphans_summary(use_cache=True).items():
             rest_summary[key] = {
                 'count': value,
                 '_href': reverse('content_orphan_type_subcollection', kwargs={'content_type': key})
@@ -406,13 +406,21 @@ class UploadsCollectionView(View):
         """
         Initialize an upload and return a serialized dict containing the upload data.
 
+        The body may contain the size of the file to be uploaded, so the upload cannot be
+        imported until all of it is received, and the name of a checksum type used to checksum
+        each segment as it is saved.
+
         :param request: WSGI request object
         :type request: django.core.handlers.wsgi.WSGIRequest
         :return : Serialized response containing a url to delete an upload and a unique id.
         :rtype : django.http.HttpResponse
+
+        :raises InvalidValue: if the size or checksum type is not valid
         """
+        params = request.body_as_json
         upload_manager = factory.content_upload_manager()
-        upload_id = upload_manager.initialize_upload()
+        upload_id = upload_manager.initialize_upload(params.get('size'),
+                                                     params.get('checksum_type'))
         href = reverse('content_upload_resource', kwargs={'upload_id': upload_id})
         response = generate_json_response({'_href': href, 'upload_id': upload_id})
         response_redirect = generate_redirect_response(response, href)
@@ -450,8 +458,10 @@ class UploadSegmentResourceView(View):
         upload_manager = factory.content_upload_manager()
 
         # If the upload ID doesn't exists, either because it was not initialized
-        # or was deleted, the call to the manager will raise missing resource
-        upload_manager.save_data(upload_id, offset, request.body)
+        # or was deleted, the call to the manager will raise missing resource.
+        # The body is read from the request as it is written so the segment is
+        # not held in memory.
+        upload_manager.save_stream(upload_id, offset, request)
         return generate_json_response(None)
 
 
@@ -460,6 +470,27 @@ class UploadResourceView(View):
     View for single upload
     """
 
+    @auth_required(authorization.READ)
+    def get(self, request, upload_id):
+        """
+        Return which parts of a single upload have been received.
+
+        :param request: WSGI request object
+        :type  request: django.core.handlers.wsgi.WSGIRequest
+        :param upload_id: id of the upload
+        :type  upload_id: str
+
+        :return: response containing the received byte ranges of the upload and whether it is
+                 complete
+        :rtype: django.http.HttpResponse
+
+        :raises MissingResource: if the upload does not exist
+        """
+        upload_manager = factory.content_upload_manager()
+        status = upload_manager.upload_status(upload_id)
+        status['upload_id'] = upload_id
+        return generate_json_response(status)
+
     @auth_required(authorization.DELETE)
     def delete(self, request, upload_id):
         """
@@ -1,5 +1,7 @@
 from datetime import datetime
+import itertools
 
+from bson.objectid import InvalidId, ObjectId
 from django.views.generic import View
 from mongoengine.queryset import DoesNotExist
 
@@ -7,11 +9,16 @@ from pulp.server.async import tasks
 from pulp.server.auth import authorization
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import Worker
-from pulp.server.exceptions import MissingResource
+from pulp.server.exceptions import InvalidValue, MissingResource
 from pulp.server.webservices import serialization
 from pulp.server.webservices.controllers.decorators import auth_required
-from pulp.server.webservices.views.util import (generate_json_response,
-                                                generate_json_response_with_pulp_encoder)
+from pulp.server.webservices.views.util import (
+    generate_json_response, generate_json_response_with_pulp_encoder,
+    generate_streaming_json_response_with_pulp_encoder)
+
+
+# Fields of a task that can be large, and are left out of task lists unless they are requested
+TASK_DETAIL_FIELDS = ('progress_report', 'result')
 
 
 def task_serializer(task):
@@ -38,22 +45,68 @@ class TaskCollectionView(View):
     @auth_required(authorization.READ)
     def get(self, request):
         """
-        Return a response containing a list of all tasks or a response containg a list of all tasks
-        that can be filtered by the optional GET parameter 'tags'.
+        Return a response containing a list of tasks, oldest first, that can be filtered by the
+        optional GET parameter 'tag'.
+
+        The list can be paged with the optional GET parameters 'limit', the most tasks to return,
+        and 'marker', the id of the last task of the previous page. The progress_report and result
+        of each task are left out unless the GET parameter 'details' is 'true'. Alternatively, the
+        fields returned for each task can be named with 'field' parameters.
 
         :param request: WSGI request object
         :type  request: django.core.handlers.wsgi.WSGIRequest
 
-        :return: Response containing a serialized list of dicts, one for each task
+        :return: Response containing a serialized list of dicts, one for each task, which is
+                 written as the tasks are read from the database
         :rtype:  django.http.HttpResponse
+        :raises InvalidValue: if the limit, marker or a field is not valid
         """
+        filters = {}
         tags = request.GET.getlist('tag')
         if tags:
-            raw_tasks = TaskStatus.objects(tags__all=tags)
+            filters['tags__all'] = tags
+        marker = request.GET.get('marker')
+        if marker:
+            try:
+                filters['id__gt'] = ObjectId(marker)
+            except (InvalidId, TypeError):
+                raise InvalidValue(['marker'])
+        raw_tasks = TaskStatus.objects(**filters).order_by('id')
+
+        fields = request.GET.getlist('field')
+        if fields:
+            if [f for f in fields if f not in TaskStatus._fields]:
+                raise InvalidValue(['field'])
+            raw_tasks = raw_tasks.only(*set(fields + ['id', 'task_id']))
+            omitted = [f for f in TaskStatus._fields if f not in fields and f != 'id']
+        elif request.GET.get('details', '').lower() == 'true':
+            omitted = []
         else:
-            raw_tasks = TaskStatus.objects()
-        serialized_task_statuses = [task_serializer(task) for task in raw_tasks]
-        return generate_json_response_with_pulp_encoder(serialized_task_statuses)
+            raw_tasks = raw_tasks.exclude(*TASK_DETAIL_FIELDS)
+            omitted = TASK_DETAIL_FIELDS
+
+        limit = request.GET.get('limit')
+        if limit:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise InvalidValue(['limit'])
+            if limit < 1:
+                raise InvalidValue(['limit'])
+            raw_tasks = raw_tasks.limit(limit)
+
+        def serialize(task):
+            task_dict = task_serializer(task)
+            for field in omitted:
+                task_dict.pop(field, None)
+            return task_dict
+
+        # Reading the first task runs the query, so that a database error is raised here rather
+        # than after the response has been started
+        tasks = iter(raw_tasks)
+        first_tasks = list(itertools.islice(tasks, 1))
+        return generate_streaming_json_response_with_pulp_encoder(
+            serialize(task) for task in itertools.chain(first_tasks, tasks))
 
 
 class TaskResourceView(View):
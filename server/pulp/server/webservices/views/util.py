@@ -5,6 +5,12 @@ from functools import wraps
 
 from django.http import HttpResponse
 from django.utils.encoding import iri_to_uri
+try:
+    from django.http import StreamingHttpResponse
+except ImportError:
+    # Django < 1.5 cannot stream a response safely: middleware such as ConditionalGetMiddleware
+    # reads the content of every response, which would use up an iterator passed to HttpResponse
+    StreamingHttpResponse = None
 
 from pulp.common import error_codes
 from pulp.common.util import decode_unicode, encode_unicode
@@ -46,6 +52,67 @@ generate_json_response_with_pulp_encoder = functools.partial(
 )
 
 
+def generate_json_array(items, default=None):
+    """
+    Generate the JSON encoding of a list of the given items in pieces.
+
+    :param items   : items to be serialized
+    :type  items   : iterable of anything that is serializable by json.dumps
+    :param default : function used by json.dumps to serialize content (also called default)
+    :type  default : function or None
+
+    :return        : pieces of the JSON encoded list
+    :rtype         : generator of str
+    """
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(item, default=default)
+        separator = ', '
+    yield ']'
+
+
+def generate_streaming_json_response(items, response_class=None, default=None,
+                                     content_type='application/json'):
+    """
+    Return a django response whose body is a JSON list of the given items. The items are read
+    and serialized one at a time as the response is written, so they are never all in memory.
+    Django versions older than 1.5 cannot stream a response, so with those the items are
+    serialized into an ordinary HttpResponse before it is returned.
+
+    :param items          : items to be serialized
+    :type  items          : iterable of anything that is serializable by json.dumps
+    :param response_class : Django response object that accepts an iterator as its content;
+                            defaults to StreamingHttpResponse when Django provides it
+    :type  response_class : StreamingHttpResponse class or subclass, or None
+    :param default        : function used by json.dumps to serialize content (also called default)
+    :type  default        : function or None
+    :param content_type   : type of returned content
+    :type  content_type   : str
+
+    :return               : response that serializes the items as it is written
+    :rtype                : StreamingHttpResponse or subclass, or HttpResponse
+    """
+    pieces = generate_json_array(items, default=default)
+    if response_class is None:
+        response_class = StreamingHttpResponse
+    if response_class is None:
+        return HttpResponse(''.join(pieces), content_type=content_type)
+    return response_class(pieces, content_type=content_type)
+
+
+"""
+Shortcut function to generate a streaming json response using the in house json_encoder.
+
+This function is equivalent to:
+generate_streaming_json_response(items, default=pulp_json_encoder)
+"""
+generate_streaming_json_response_with_pulp_encoder = functools.partial(
+    generate_streaming_json_response,
+    default=pulp_json_encoder,
+)
+
+
 def generate_redirect_response(response, href):
     response['Location'] = iri_to_uri(href)
     response.status_code = 201
@@ -39,6 +39,9 @@ class TestCatalogerConduit(PulpServerTests):
         for unit_key, url in units:
             conduit.add_entry(TYPE_ID, unit_key, url)
         collection = ContentCatalog.get_collection()
+        self.assertEqual(collection.find().count(), 0)
+        conduit.flush()
+        self.assertEqual(conduit.pending, [])
         self.assertEqual(conduit.source_id, SOURCE_ID)
         self.assertEqual(conduit.expires, EXPIRES)
         self.assertEqual(len(units), collection.find().count())
@@ -51,6 +54,19 @@ class TestCatalogerConduit(PulpServerTests):
             self.assertEqual(entry['unit_key'], unit_key)
             self.assertEqual(entry['url'], url)
 
+    def test_add_batch_size(self):
+        units = self.units(0, 10)
+        conduit = CatalogerConduit(SOURCE_ID, EXPIRES)
+        conduit.ADD_BATCH_SIZE = 4
+        for unit_key, url in units:
+            conduit.add_entry(TYPE_ID, unit_key, url)
+        collection = ContentCatalog.get_collection()
+        self.assertEqual(collection.find().count(), 8)
+        self.assertEqual(len(conduit.pending), 2)
+        conduit.flush()
+        self.assertEqual(collection.find().count(), len(units))
+        self.assertEqual(conduit.added_count, len(units))
+
     def test_delete(self):
         units = self.units(0, 10)
         conduit = CatalogerConduit(SOURCE_ID, EXPIRES)
@@ -75,6 +91,8 @@ class TestCatalogerConduit(PulpServerTests):
         conduit = CatalogerConduit(SOURCE_ID, EXPIRES)
         conduit.added_count = 10
         conduit.deleted_count = 10
+        conduit.pending = [(TYPE_ID, {'A': 1}, 'http://host/a')]
         conduit.reset()
         self.assertEqual(conduit.added_count, 0)
         self.assertEqual(conduit.deleted_count, 0)
+        self.assertEqual(conduit.pending, [])
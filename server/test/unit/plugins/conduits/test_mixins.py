@@ -561,6 +561,16 @@ class AddUnitMixinTests(unittest.TestCase):
         self.mixin = mixins.AddUnitMixin(self.repo_id, self.importer_id,
                                          self.association_owner_type, self.association_owner_id)
 
+        patcher = mock.patch('pulp.server.managers.repo.cud.RepoManager.update_content_revision')
+        self.mock_update_content_revision = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('pulp.plugins.conduits.mixins.RepoContentUnit')
+        self.mock_repo_content_unit = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.mock_find = self.mock_repo_content_unit.get_collection.return_value.find
+        self.mock_find.return_value.distinct.return_value = [self.repo_id]
+
     @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
                 'request_content_unit_file_path')
     def test_init_unit(self, mock_file_path_call):
@@ -616,6 +626,7 @@ class AddUnitMixinTests(unittest.TestCase):
         self.assertEqual(1, self.mixin._added_count)
         self.assertEqual(0, self.mixin._updated_count)
         self.assertEqual(saved.id, 'new-unit-id')
+        self.assertEqual(0, self.mock_update_content_revision.call_count)
 
     @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
                 'request_content_unit_file_path')
@@ -708,6 +719,50 @@ class AddUnitMixinTests(unittest.TestCase):
         self.assertEqual(0, self.mixin._added_count)
         self.assertEqual(1, self.mixin._updated_count)
         self.assertEqual(saved.id, 'existing')
+        self.assertEqual(self.mixin._changed_unit_ids, {'t': set(['existing'])})
+        # the revisions are replaced once the importer is finished
+        self.assertEqual(0, self.mock_update_content_revision.call_count)
+
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_content_unit_by_keys_dict')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.update_content_unit')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'associate_unit_by_id')
+    def test_save_unit_unchanged_unit(self, mock_associate, mock_update, mock_get):
+        # Setup
+        unit = Unit('t', {'k': 'v'}, {'m': 'm1'}, '/bar')
+        mock_get.return_value = {'_id': 'existing', 'k': 'v', 'm': 'm1', '_storage_path': '/bar',
+                                 '_last_updated': 1}
+
+        # Test
+        self.mixin.save_unit(unit)
+        self.mixin.update_content_revisions()
+
+        # Verify
+        self.assertEqual(1, mock_update.call_count)
+        self.assertEqual(1, self.mixin._updated_count)
+        self.assertEqual(self.mixin._changed_unit_ids, {})
+        self.assertEqual(0, self.mock_update_content_revision.call_count)
+
+    def test_update_content_revisions(self):
+        # Setup
+        self.mixin._revised_repo_ids.add(self.repo_id)
+        self.mixin._changed_unit_ids = {'t': set(['u1', 'u2'])}
+        self.mock_find.return_value.distinct.return_value = [self.repo_id, 'other-repo']
+
+        # Test
+        self.mixin.update_content_revisions()
+
+        # Verify
+        spec = self.mock_find.call_args[0][0]
+        self.assertEqual(spec['unit_type_id'], 't')
+        self.assertEqual(sorted(spec['unit_id']['$in']), ['u1', 'u2'])
+        # every repository containing a changed unit gets one new revision
+        self.assertEqual(sorted(c[0][0] for c in self.mock_update_content_revision.call_args_list),
+                         [self.repo_id, 'other-repo'])
+        self.mock_update_content_revision.reset_mock()
+        self.mixin.update_content_revisions()
+        self.assertEqual(0, self.mock_update_content_revision.call_count)
 
     @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
                 'request_content_unit_file_path')
@@ -724,6 +779,117 @@ class AddUnitMixinTests(unittest.TestCase):
         # Test
         self.assertRaises(mixins.ImporterConduitException, self.mixin.save_unit, None)
 
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.update_content_unit')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.add_content_units')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'associate_all_by_ids')
+    def test_save_units(self, mock_associate, mock_add, mock_update, mock_get, mock_count,
+                        mock_last_added):
+        # Setup
+        units = [Unit('t', {'k': 'v1'}, {'m': 'm1'}, None),
+                 Unit('t', {'k': 'v2'}, {'m': 'm2'}, None),
+                 Unit('t2', {'k': 'v3'}, {'m': 'm3'}, None)]
+        mock_get.side_effect = lambda type_id, keys: iter(
+            [{'_id': 'existing', 'k': 'v1'}] if type_id == 't' else [])
+        mock_associate.side_effect = lambda repo_id, type_id, ids, *args, **kwargs: len(ids)
+
+        # Test
+        saved = self.mixin.save_units(iter(units))
+
+        # Verify
+        self.assertEqual(saved, units)
+        self.assertEqual(units[0].id, 'existing')
+        self.assertTrue(units[1].id is not None)
+        self.assertTrue(units[2].id is not None)
+        self.assertEqual(2, mock_get.call_count)
+        self.assertEqual(1, mock_update.call_count)
+        self.assertEqual(2, mock_add.call_count)
+        self.assertEqual(2, mock_associate.call_count)
+        for call in mock_associate.call_args_list:
+            self.assertEqual(call[1], {'update_repo_metadata': False})
+        self.assertEqual(2, self.mixin._added_count)
+        self.assertEqual(1, self.mixin._updated_count)
+        self.assertEqual(2, mock_count.call_count)
+        mock_count.assert_any_call(self.repo_id, 't', 2)
+        mock_count.assert_any_call(self.repo_id, 't2', 1)
+        mock_last_added.assert_called_once_with(self.repo_id)
+        self.mock_update_content_revision.assert_called_once_with(self.repo_id)
+
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.update_content_unit')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.add_content_units')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'associate_all_by_ids')
+    def test_save_units_duplicate_keys(self, mock_associate, mock_add, mock_update, mock_get,
+                                       mock_count, mock_last_added):
+        # Setup
+        units = [Unit('t', {'k': 'v1'}, {'m': 'm1'}, None),
+                 Unit('t', {'k': 'v1'}, {'m': 'm2'}, None)]
+        mock_get.return_value = iter([])
+        mock_associate.return_value = 1
+
+        # Test
+        self.mixin.save_units(units)
+
+        # Verify
+        self.assertEqual(1, len(mock_add.call_args[0][1]))
+        self.assertEqual(units[0].id, units[1].id)
+        self.assertEqual(1, self.mixin._added_count)
+        mock_count.assert_called_once_with(self.repo_id, 't', 1)
+
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_ids')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_content_unit_by_keys_dict')
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.update_content_unit')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.add_content_units')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoUnitAssociationManager.'
+                'associate_all_by_ids')
+    def test_save_units_race_condition(self, mock_associate, mock_add, mock_update, mock_get,
+                                       mock_get_one, mock_get_ids, mock_count, mock_last_added):
+        """
+        This simulates a case where one of the units gets added by another workflow
+        after the existing units are looked up. That unit is updated instead.
+        """
+        # Setup
+        units = [Unit('t', {'k': 'v1'}, {'m': 'm1'}, None),
+                 Unit('t', {'k': 'v2'}, {'m': 'm2'}, None)]
+        mock_get.return_value = iter([])
+        mock_add.side_effect = DuplicateKeyError('dups!')
+        mock_get_ids.side_effect = lambda type_id, ids, model_fields: ({'_id': ids[0]},)
+        mock_get_one.return_value = {'_id': 'existing'}
+        mock_associate.return_value = 1
+
+        # Test
+        self.mixin.save_units(units)
+
+        # Verify
+        self.assertEqual(sorted(unit.id == 'existing' for unit in units), [False, True])
+        self.assertEqual(1, mock_update.call_count)
+        self.assertEqual(1, self.mixin._added_count)
+        self.assertEqual(1, self.mixin._updated_count)
+
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'get_multiple_units_by_keys_dicts')
+    def test_save_units_with_error(self, mock_get):
+        # Setup
+        mock_get.side_effect = Exception()
+        units = [Unit('t', {'k': 'v1'}, {'m': 'm1'}, None)]
+
+        # Test
+        self.assertRaises(mixins.ImporterConduitException, self.mixin.save_units, units)
+
     @mock.patch('pulp.server.managers.content.cud.ContentManager.link_referenced_content_units')
     def test_link_unit(self, mock_link):
         # Setup
@@ -782,15 +948,13 @@ class StatusMixinTests(unittest.TestCase):
     def setUp(self):
         manager_factory.initialize()
 
-    @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
     @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
-    def test_set_progress(self, mock_get_task_id, mock_task_status_objects):
+    def test_set_progress(self, mock_get_task_id, mock_get_collection):
         # Setup
         self.report_id = 'test-report'
         task_id = 'test-id'
         mock_get_task_id.return_value = task_id
-        test_task_documents = mock.Mock()
-        mock_task_status_objects.return_value = test_task_documents
         self.mixin = mixins.StatusMixin(self.report_id, mixins.ImporterConduitException)
 
         # Test
@@ -798,10 +962,10 @@ class StatusMixinTests(unittest.TestCase):
         self.mixin.set_progress(status)
 
         # Verify
-        mock_task_status_objects.assert_called_with(task_id=task_id)
-        self.assertEqual(1, test_task_documents.update_one.call_count)
-        test_task_documents.update_one.assert_called_with(
-            set__progress_report={'test-report': 'status'})
+        # only the report of this conduit is written, leaving those of other conduits alone
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': task_id}, {'$set': {'progress_report.test-report': 'status'}})
+        self.assertEqual(self.mixin.progress_report, {'test-report': 'status'})
 
     @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
     @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
@@ -817,7 +981,7 @@ class StatusMixinTests(unittest.TestCase):
         # Verify
         self.assertFalse(mock_task_status_objects.called)
 
-    @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
     def test_set_progress_with_exception(self, mock_call):
         # Setup
         self.report_id = 'test-report'
@@ -828,6 +992,132 @@ class StatusMixinTests(unittest.TestCase):
         # Test
         self.assertRaises(mixins.ImporterConduitException, self.mixin.set_progress, 'foo')
 
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus.objects')
+    def test_update_progress(self, mock_task_status_objects):
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+        self.mixin.task_id = 'test-id'
+
+        with mock.patch.object(mixins.ProgressReportWriter, 'update') as mock_update:
+            self.mixin.update_progress('status')
+
+        mock_update.assert_called_once_with('status')
+        self.assertFalse(mock_task_status_objects.called)
+
+    @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
+    def test_update_progress_no_task(self, mock_get_task_id):
+        mock_get_task_id.return_value = None
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+
+        self.mixin.update_progress('status')
+        self.mixin.flush_progress()
+
+        self.assertEqual(self.mixin._progress_writer, None)
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_flush_progress_with_exception(self, mock_call):
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+        self.mixin.task_id = 'test_id'
+        mock_call.side_effect = Exception()
+
+        with mock.patch.object(mixins.ProgressReportWriter, 'update'):
+            self.mixin.update_progress('foo')
+        self.mixin._progress_writer.pending = 'foo'
+
+        self.assertRaises(mixins.ImporterConduitException, self.mixin.flush_progress)
+
+
+class ProgressReportWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = mixins.ProgressReportWriter('test-id', 'test-report', interval=0)
+        self.report = {'step': [{'state': 'IN_PROGRESS', 'num_processed': 1},
+                                {'state': 'NOT_STARTED', 'num_processed': 0}]}
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_first_write_whole(self, mock_get_collection):
+        self.writer.pending = self.report
+
+        self.writer.flush()
+
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': 'test-id'}, {'$set': {'progress_report.test-report': self.report}})
+        self.assertEqual(self.writer.pending, None)
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_changes_written(self, mock_get_collection):
+        self.writer.written = self.report
+        self.writer.pending = {'step': [{'state': 'FINISHED', 'num_processed': 2},
+                                        {'state': 'NOT_STARTED', 'num_processed': 0}]}
+
+        self.writer.flush()
+
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': 'test-id'},
+            {'$set': {'progress_report.test-report.step.0.state': 'FINISHED',
+                      'progress_report.test-report.step.0.num_processed': 2}})
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_changed_structure_replaced(self, mock_get_collection):
+        self.writer.written = self.report
+        self.writer.pending = {'step': [{'state': 'FINISHED', 'num_processed': 2}],
+                               'other': {'a.b': 1}}
+
+        self.writer.flush()
+
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': 'test-id'},
+            {'$set': {'progress_report.test-report': self.writer.written}})
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_nothing_changed(self, mock_get_collection):
+        self.writer.written = self.report
+        self.writer.pending = dict(self.report)
+
+        self.writer.flush()
+
+        self.assertFalse(mock_get_collection.called)
+        self.assertEqual(self.writer.pending, None)
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_failed_write_left_pending(self, mock_get_collection):
+        mock_get_collection.side_effect = ValueError()
+        self.writer.pending = self.report
+
+        self.assertRaises(ValueError, self.writer.flush)
+
+        self.assertEqual(self.writer.pending, self.report)
+        self.assertEqual(self.writer.written, None)
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_update_coalesced(self, mock_get_collection):
+        self.writer.interval = 60
+        self.writer.last_write = mixins.time.time()
+
+        self.writer.update({'step': 1})
+        thread = self.writer._thread
+        self.writer.update({'step': 2})
+
+        # a single thread waits for the interval, so flush the latest report instead
+        self.assertTrue(self.writer._thread is thread)
+        self.writer.flush()
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': 'test-id'}, {'$set': {'progress_report.test-report': {'step': 2}}})
+
+    @mock.patch('pulp.server.db.model.dispatch.TaskStatus._get_collection')
+    def test_update_written_in_background(self, mock_get_collection):
+        report = {'step': 1}
+
+        # hold the lock so the thread cannot finish before it is joined
+        with self.writer._lock:
+            self.writer.update(report)
+            thread = self.writer._thread
+        report['step'] = 2
+        thread.join()
+
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'task_id': 'test-id'}, {'$set': {'progress_report.test-report': {'step': 1}}})
+        self.assertEqual(self.writer._thread, None)
+
 
 class PublishReportMixinTests(unittest.TestCase):
 
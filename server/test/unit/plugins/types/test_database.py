@@ -1,3 +1,7 @@
+import unittest
+
+import mock
+
 from ... import base
 from pulp.plugins.types.model import TypeDefinition
 from pulp.server.db.model.content import ContentType
@@ -233,6 +237,53 @@ class TypesDatabaseTests(base.PulpServerTests):
         # Verify
         self.assertEqual(type_def.unit_key, unit_key)
 
+    def test_type_units_unit_key_fields(self):
+        """
+        Tests the unit key fields of a type are flattened.
+        """
+
+        # Setup
+        type_def = TypeDefinition('rpm', 'RPM', 'RPM Packages', ['unique_1', ['unique_2']],
+                                  ['name'], [])
+        types_db._create_or_update_type(type_def)
+
+        # Test
+        fields = types_db.type_units_unit_key_fields('rpm')
+
+        # Verify
+        self.assertEqual(('unique_1', 'unique_2'), fields)
+        self.assertTrue(types_db.type_units_unit_key_fields('not_there') is None)
+
+    def test_update_database_visible(self):
+        """
+        Tests types added after the definitions were cached are returned.
+        """
+
+        # Setup
+        types_db.update_database([DEF_1])
+        self.assertEqual([DEF_1.id], types_db.all_type_ids())
+
+        # Test
+        types_db.update_database([DEF_1, DEF_2])
+
+        # Verify
+        self.assertEqual(set([DEF_1.id, DEF_2.id]), set(types_db.all_type_ids()))
+
+    def test_type_definition_copy(self):
+        """
+        Tests changes to a returned definition do not change the cached definition.
+        """
+
+        # Setup
+        types_db.update_database([DEF_3])
+
+        # Test
+        types_db.type_definition(DEF_3.id)['unit_key'].append('changed')
+        types_db.type_units_unit_key(DEF_3.id).append('changed')
+
+        # Verify
+        self.assertEqual(DEF_3.unit_key, types_db.type_definition(DEF_3.id)['unit_key'])
+
     def test_type_units_unique_indexes_missing_def(self):
         """
         Tests no error is raised when requesting the indexes on a type that does not exist.
@@ -433,3 +484,72 @@ class TypesDatabaseTests(base.PulpServerTests):
         index_dict = collection.index_information()
 
         self.assertEqual(2, len(index_dict))  # default (_id) + new one
+
+
+class TypeDefinitionCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = types_db.TypeDefinitionCache()
+        self.definitions = [{'id': 'rpm', 'unit_key': ['name', ['version', 'release']]},
+                            {'id': 'srpm', 'unit_key': 'name'}]
+
+    @mock.patch('pulp.plugins.types.database.ContentType')
+    def test_load(self, mock_content_type):
+        mock_content_type.get_collection.return_value.find.return_value = self.definitions
+
+        self.cache.load(4)
+
+        self.assertEqual(self.cache.generation, 4)
+        self.assertEqual(self.cache.definitions, self.definitions)
+        self.assertEqual(self.cache.by_id['srpm'], self.definitions[1])
+        self.assertEqual(self.cache.unit_key_fields,
+                         {'rpm': ('name', 'version', 'release'), 'srpm': ('name',)})
+
+    @mock.patch('pulp.plugins.types.database.time')
+    @mock.patch('pulp.plugins.types.database._read_generation')
+    @mock.patch('pulp.plugins.types.database.TypeDefinitionCache.load')
+    def test_get_check_interval(self, mock_load, mock_read_generation, mock_time):
+        def load(generation):
+            self.cache.definitions = []
+            self.cache.generation = generation
+        mock_load.side_effect = load
+        mock_read_generation.return_value = 1
+        mock_time.time.side_effect = [100, 100 + types_db.GENERATION_CHECK_INTERVAL - 1,
+                                      100 + types_db.GENERATION_CHECK_INTERVAL,
+                                      100 + types_db.GENERATION_CHECK_INTERVAL * 2]
+
+        self.cache.get()
+        self.cache.get()
+        self.assertEqual(mock_read_generation.call_count, 1)
+        self.assertEqual(mock_load.call_count, 1)
+
+        # the generation has not changed, so the definitions are not read again
+        self.cache.get()
+        self.assertEqual(mock_read_generation.call_count, 2)
+        self.assertEqual(mock_load.call_count, 1)
+
+        mock_read_generation.return_value = 2
+        self.cache.get()
+        mock_load.assert_called_with(2)
+        self.assertEqual(mock_load.call_count, 2)
+
+    @mock.patch('pulp.plugins.types.database._read_generation', return_value=1)
+    @mock.patch('pulp.plugins.types.database.ContentType')
+    def test_invalidate(self, mock_content_type, mock_read_generation):
+        mock_content_type.get_collection.return_value.find.return_value = self.definitions
+        self.cache.get()
+
+        self.cache.invalidate()
+        self.cache.get()
+
+        self.assertEqual(mock_content_type.get_collection.return_value.find.call_count, 2)
+
+    @mock.patch('pulp.plugins.types.database._type_cache')
+    @mock.patch('pulp.plugins.types.database.ContentTypeGeneration')
+    def test_increment_generation(self, mock_generation, mock_type_cache):
+        types_db._increment_generation()
+
+        mock_generation.get_collection.return_value.update.assert_called_once_with(
+            {'_id': mock_generation.DOCUMENT_ID}, {'$inc': {'generation': 1}}, upsert=True,
+            safe=True)
+        mock_type_cache.invalidate.assert_called_once_with()
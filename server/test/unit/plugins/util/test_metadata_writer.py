@@ -247,6 +247,62 @@ class MetadataWriterTests(unittest.TestCase):
                                                    expected_metadata_file_name)
         self.assertEquals(expected_metadata_file_path, context.metadata_file_path)
 
+    def test_finalize_checksum_matches_file(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha256')
+
+        context.initialize()
+        context.metadata_file_handle.write('<test>data</test>')
+        context.finalize()
+
+        with open(context.metadata_file_path, 'rb') as file_handle:
+            content = file_handle.read()
+        self.assertEqual(context.checksum, hashlib.sha256(content).hexdigest())
+        self.assertEqual(context.open_checksum, context.checksum)
+        self.assertEqual(context.open_size, len(content))
+
+    def test_finalize_checksum_matches_gzip_file(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml.gz')
+        context = MetadataFileContext(path, 'sha256')
+
+        context.initialize()
+        context.metadata_file_handle.write('<test>data</test>' * 100)
+        context.finalize()
+
+        with open(context.metadata_file_path, 'rb') as file_handle:
+            content = file_handle.read()
+        self.assertEqual(context.checksum, hashlib.sha256(content).hexdigest())
+        file_handle = gzip.open(context.metadata_file_path)
+        try:
+            open_content = file_handle.read()
+        finally:
+            file_handle.close()
+        self.assertEqual(open_content, '<test>data</test>' * 100)
+        self.assertEqual(context.open_checksum, hashlib.sha256(open_content).hexdigest())
+        self.assertEqual(context.open_size, len(open_content))
+
+    def test_finalize_checksum_external_handle(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha1')
+        context.metadata_file_handle = open(path, 'w')
+        context.metadata_file_handle.write('data')
+
+        context.finalize()
+
+        self.assertEqual(context.checksum, hashlib.sha1('data').hexdigest())
+        self.assertEqual(context.open_checksum, None)
+
+    def test_is_closed_checksum_file(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml.gz')
+        context = MetadataFileContext(path, 'sha1')
+
+        context._open_metadata_file_handle()
+        self.assertFalse(MetadataFileContext._is_closed(context.metadata_file_handle))
+        context._close_metadata_file_handle()
+        self.assertTrue(MetadataFileContext._is_closed(context.metadata_file_handle))
+        # the compressed file is closed along with the gzip file
+        self.assertTrue(context._checksum_file.closed)
+
     @patch('pulp.plugins.util.metadata_writer._LOG.exception')
     def test_finalize_error_on_footer(self, mock_logger):
 
@@ -263,3 +263,45 @@ class TestCreateSymlink(unittest.TestCase):
         touch(link_path)
 
         self.assertRaises(RuntimeError, misc.create_symlink, source_path, link_path)
+
+
+class TestLinkTree(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='working_')
+        self.source_dir = os.path.join(self.working_dir, 'source')
+        self.target_dir = os.path.join(self.working_dir, 'target')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_link_tree(self):
+        touch(os.path.join(self.source_dir, 'a'))
+        touch(os.path.join(self.source_dir, 'b', 'c'))
+        touch(os.path.join(self.source_dir, 'b', 'd', 'e'))
+        os.makedirs(os.path.join(self.source_dir, 'f'))
+        os.symlink('../a', os.path.join(self.source_dir, 'b', 'link'))
+
+        misc.link_tree(self.source_dir, self.target_dir, threads=2)
+
+        for relative_path in ('a', os.path.join('b', 'c'), os.path.join('b', 'd', 'e')):
+            source_stat = os.stat(os.path.join(self.source_dir, relative_path))
+            target_stat = os.stat(os.path.join(self.target_dir, relative_path))
+            self.assertEqual(source_stat.st_ino, target_stat.st_ino)
+        self.assertTrue(os.path.isdir(os.path.join(self.target_dir, 'f')))
+        link_path = os.path.join(self.target_dir, 'b', 'link')
+        self.assertTrue(os.path.islink(link_path))
+        self.assertEqual(os.readlink(link_path), '../a')
+
+    def test_link_tree_target_exists(self):
+        touch(os.path.join(self.source_dir, 'a'))
+        os.makedirs(self.target_dir)
+
+        self.assertRaises(OSError, misc.link_tree, self.source_dir, self.target_dir)
+
+    @patch('pulp.plugins.util.misc.os.link')
+    def test_link_tree_link_error(self, mock_link):
+        touch(os.path.join(self.source_dir, 'a'))
+        mock_link.side_effect = OSError(errno.EXDEV, 'Invalid cross-device link')
+
+        self.assertRaises(OSError, misc.link_tree, self.source_dir, self.target_dir)
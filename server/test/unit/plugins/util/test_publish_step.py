@@ -20,7 +20,8 @@ from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.model import Repository, SyncReport, Unit
 from pulp.plugins.util.publish_step import Step, PublishStep, UnitPublishStep, PluginStep, \
     AtomicDirectoryPublishStep, SaveTarFilePublishStep, _post_order, CopyDirectoryStep, \
-    PluginStepIterativeProcessingMixin, DownloadStep, GetLocalUnitsStep
+    PluginStepIterativeProcessingMixin, DownloadStep, GetLocalUnitsStep, MASTER_HARDLINK, \
+    MASTER_RENAME
 from pulp.server.managers import factory
 
 
@@ -116,6 +117,22 @@ class StepTests(PublisherBase):
         step.parent.get_status_conduit.return_value = 'foo'
         self.assertEquals('foo', step.get_status_conduit())
 
+    def test_report_progress_update(self):
+        step = Step('foo_step', status_conduit=Mock())
+
+        step.report_progress()
+
+        step.status_conduit.update_progress.assert_called_once_with(step.get_progress_report())
+        self.assertFalse(step.status_conduit.set_progress.called)
+
+    def test_report_progress_set_progress_only(self):
+        # a conduit written before update_progress existed
+        step = Step('foo_step', status_conduit=Mock(spec=['set_progress']))
+
+        step.report_progress()
+
+        step.status_conduit.set_progress.assert_called_once_with(step.get_progress_report())
+
 
 class PluginStepTests(PluginBase):
     """
@@ -827,6 +844,56 @@ class TestAtomicDirectoryPublishStep(unittest.TestCase):
         self.assertTrue(os.path.exists(existing_file))
         self.assertEquals(1, len(os.listdir(master_dir)))
 
+    def _process_main_master_mode(self, master_mode):
+        source_dir = os.path.join(self.working_directory, 'source')
+        master_dir = os.path.join(self.working_directory, 'master')
+        publish_dir = os.path.join(self.working_directory, 'publish', 'bar')
+        step = AtomicDirectoryPublishStep(source_dir, [('/', publish_dir)], master_dir,
+                                          master_mode=master_mode)
+        step.parent = Mock(timestamp=str(time.time()))
+        sub_file = os.path.join(source_dir, 'foo', 'bar.html')
+        touch(sub_file)
+        source_stat = os.stat(sub_file)
+
+        step.process_main()
+
+        target_file = os.path.join(publish_dir, 'foo', 'bar.html')
+        self.assertTrue(os.path.islink(publish_dir))
+        self.assertEquals(os.stat(target_file).st_ino, source_stat.st_ino)
+        self.assertEquals(1, len(os.listdir(master_dir)))
+        return source_dir
+
+    def test_process_main_master_hardlink(self):
+        source_dir = self._process_main_master_mode(MASTER_HARDLINK)
+        self.assertTrue(os.path.exists(os.path.join(source_dir, 'foo', 'bar.html')))
+
+    def test_process_main_master_rename(self):
+        source_dir = self._process_main_master_mode(MASTER_RENAME)
+        self.assertFalse(os.path.exists(source_dir))
+
+    @patch('pulp.plugins.util.publish_step.shutil.copytree')
+    @patch('pulp.plugins.util.publish_step.misc.link_tree')
+    @patch('pulp.plugins.util.publish_step.misc.mkdir')
+    @patch('pulp.plugins.util.publish_step.os.rename')
+    @patch('pulp.plugins.util.publish_step.os.stat')
+    def test_create_master_dir_different_filesystem(self, mock_stat, mock_rename, mock_mkdir,
+                                                    mock_link_tree, mock_copytree):
+        master_dir = os.path.join(self.working_directory, 'master')
+        mock_stat.side_effect = lambda path: Mock(st_dev=hash(path))
+        for master_mode in (MASTER_HARDLINK, MASTER_RENAME):
+            step = AtomicDirectoryPublishStep('source', [], master_dir, master_mode=master_mode)
+
+            step._create_master_dir('master/timestamp')
+
+            mock_copytree.assert_called_once_with('source', 'master/timestamp', symlinks=True)
+            mock_copytree.reset_mock()
+        self.assertFalse(mock_rename.called)
+        self.assertFalse(mock_link_tree.called)
+
+    def test_unknown_master_mode(self):
+        self.assertRaises(ValueError, AtomicDirectoryPublishStep, 'source', [], 'master',
+                          master_mode='hardlinks')
+
 
 class TestSaveTarFilePublishStep(unittest.TestCase):
     def setUp(self):
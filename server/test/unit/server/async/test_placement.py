@@ -0,0 +1,180 @@
+from datetime import datetime
+import unittest
+
+import mock
+
+from pulp.common import constants
+from pulp.server.async import placement
+from pulp.server.db.model.resources import Worker
+from pulp.server.managers.resources import ReservationTable
+
+
+def make_table(policy, *worker_names):
+    table = ReservationTable()
+    table.workers = dict((name, Worker(name, datetime.utcnow())) for name in worker_names)
+    table.policy = policy
+    table.loaded = True
+    return table
+
+
+class TestUnreservedPolicy(unittest.TestCase):
+
+    def test_unreserved_worker(self):
+        table = make_table(placement.UnreservedPolicy(), 'worker_1', 'worker_2')
+        table.add('task1', 'worker_1', 'resource1')
+
+        self.assertEqual(table.get_unreserved_worker('resource2').name, 'worker_2')
+
+        table.add('task2', 'worker_2', 'resource2')
+        self.assertEqual(table.get_unreserved_worker('resource3'), None)
+
+    def test_fewest_reservations(self):
+        table = make_table(placement.UnreservedPolicy(3), 'worker_1', 'worker_2')
+        table.add('task1', 'worker_1', 'resource1')
+        table.add('task2', 'worker_2', 'resource2')
+        table.add('task3', 'worker_2', 'resource3')
+
+        self.assertEqual(table.get_unreserved_worker('resource4').name, 'worker_1')
+
+        table.add('task4', 'worker_1', 'resource4')
+        table.add('task5', 'worker_1', 'resource5')
+        table.add('task6', 'worker_2', 'resource6')
+        self.assertEqual(table.get_unreserved_worker('resource7'), None)
+
+
+class TestLeastLoadedPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.durations = mock.Mock()
+        self.durations.get.side_effect = {'worker_1': 600.0, 'worker_2': 5.0}.get
+        self.policy = placement.LeastLoadedPolicy(2, durations=self.durations)
+
+    def test_shortest_expected_wait(self):
+        table = make_table(self.policy, 'worker_1', 'worker_2')
+        table.add('task1', 'worker_1', 'resource1')
+        table.add('task2', 'worker_2', 'resource2')
+        table.add('task3', 'worker_2', 'resource2')
+
+        # worker_2 has more tasks queued, but they are expected to finish sooner
+        self.assertEqual(table.get_unreserved_worker('resource3').name, 'worker_2')
+
+    def test_bounded(self):
+        table = make_table(self.policy, 'worker_1', 'worker_2')
+        table.add('task1', 'worker_2', 'resource1')
+        table.add('task2', 'worker_2', 'resource2')
+
+        self.assertEqual(table.get_unreserved_worker('resource3').name, 'worker_1')
+
+    def test_no_workers(self):
+        table = make_table(self.policy)
+
+        self.assertEqual(table.get_unreserved_worker('resource1'), None)
+
+
+class TestConsistentHashPolicy(unittest.TestCase):
+
+    def test_stable(self):
+        policy = placement.ConsistentHashPolicy(10)
+        table = make_table(policy, 'worker_1', 'worker_2', 'worker_3')
+        placed = dict((r, table.get_unreserved_worker(r).name)
+                      for r in ('resource%d' % i for i in range(30)))
+
+        # the same resource is placed on the same worker, and the resources are spread out
+        for resource_id, name in placed.items():
+            self.assertEqual(table.get_unreserved_worker(resource_id).name, name)
+        self.assertEqual(len(set(placed.values())), 3)
+
+    def test_worker_removed(self):
+        policy = placement.ConsistentHashPolicy(10)
+        table = make_table(policy, 'worker_1', 'worker_2', 'worker_3')
+        placed = dict((r, table.get_unreserved_worker(r).name)
+                      for r in ('resource%d' % i for i in range(30)))
+
+        del table.workers['worker_3']
+
+        # only the resources of the removed worker move
+        for resource_id, name in placed.items():
+            if name != 'worker_3':
+                self.assertEqual(table.get_unreserved_worker(resource_id).name, name)
+
+    def test_next_worker_when_full(self):
+        policy = placement.ConsistentHashPolicy()
+        table = make_table(policy, 'worker_1', 'worker_2')
+        first = table.get_unreserved_worker('resource1').name
+        table.add('task1', first, 'resource1')
+
+        self.assertNotEqual(table.get_unreserved_worker('resource1').name, first)
+
+        table.add('task2', table.get_unreserved_worker('resource1').name, 'resource2')
+        self.assertEqual(table.get_unreserved_worker('resource1'), None)
+
+
+class TestTaskDurations(unittest.TestCase):
+
+    def status(self, worker_name, start_time, finish_time):
+        return mock.Mock(worker_name=worker_name, start_time=start_time, finish_time=finish_time)
+
+    @mock.patch('pulp.server.async.placement.TaskStatus')
+    def test_load(self, mock_task_status):
+        query = mock_task_status.objects.return_value.only.return_value.order_by.return_value
+        query.limit.return_value = [
+            self.status('worker_1', '2014-01-01T00:00:00Z', '2014-01-01T00:01:00Z'),
+            self.status('worker_1', '2014-01-01T00:00:00Z', '2014-01-01T00:03:00Z'),
+            self.status('worker_2', '2014-01-01T00:00:00Z', '2014-01-01T00:00:10Z'),
+        ]
+        durations = placement.TaskDurations()
+
+        self.assertEqual(durations.get('worker_1'), 120.0)
+        self.assertEqual(durations.get('worker_2'), 10.0)
+        self.assertEqual(durations.get('worker_3'), 250.0 / 3)
+        mock_task_status.objects.assert_called_once_with(
+            state__in=constants.CALL_COMPLETE_STATES, start_time__ne=None, finish_time__ne=None)
+        query.limit.assert_called_once_with(placement.DURATION_SAMPLE_SIZE)
+
+    @mock.patch('pulp.server.async.placement.time')
+    @mock.patch('pulp.server.async.placement.TaskDurations.load')
+    def test_refresh_interval(self, mock_load, mock_time):
+        mock_time.time.side_effect = [100, 100 + placement.DURATION_REFRESH_INTERVAL - 1,
+                                      100 + placement.DURATION_REFRESH_INTERVAL]
+        durations = placement.TaskDurations()
+
+        for i in range(3):
+            durations.get('worker_1')
+
+        self.assertEqual(mock_load.call_count, 2)
+
+    @mock.patch('pulp.server.async.placement._logger')
+    @mock.patch('pulp.server.async.placement.TaskDurations.load')
+    def test_load_error(self, mock_load, mock_logger):
+        mock_load.side_effect = ValueError()
+        durations = placement.TaskDurations()
+
+        self.assertEqual(durations.get('worker_1'), placement.DEFAULT_DURATION)
+        self.assertEqual(mock_logger.exception.call_count, 1)
+
+
+class TestGetPolicy(unittest.TestCase):
+
+    @mock.patch('pulp.server.async.placement.config')
+    def test_configured(self, mock_config):
+        mock_config.get.return_value = placement.PLACEMENT_CONSISTENT_HASH
+        mock_config.getint.return_value = 3
+
+        policy = placement.get_policy()
+
+        self.assertTrue(isinstance(policy, placement.ConsistentHashPolicy))
+        self.assertEqual(policy.max_reservations, 3)
+        mock_config.get.assert_called_once_with('tasks', 'worker_placement')
+        mock_config.getint.assert_called_once_with('tasks', 'max_reservations_per_worker')
+
+    @mock.patch('pulp.server.async.placement._logger')
+    @mock.patch('pulp.server.async.placement.config')
+    def test_unknown(self, mock_config, mock_logger):
+        mock_config.get.return_value = 'random'
+        mock_config.getint.return_value = 0
+
+        policy = placement.get_policy()
+
+        self.assertTrue(isinstance(policy, placement.UnreservedPolicy))
+        self.assertEqual(policy.max_reservations, 1)
+        self.assertEqual(mock_logger.error.call_count, 1)
@@ -41,8 +41,9 @@ class TestQueueReservedTask(ResourceReservationTests):
                                   autospec=True)
         self.mock_get_unreserved_worker = self.patch_b.start()
 
-        self.patch_c = mock.patch('pulp.server.async.tasks.time', autospec=True)
-        self.mock_time = self.patch_c.start()
+        self.patch_c = mock.patch('pulp.server.async.tasks.resources.wait_for_release',
+                                  autospec=True)
+        self.mock_wait_for_release = self.patch_c.start()
 
         self.patch_d = mock.patch('pulp.server.async.tasks.ReservedResource', autospec=True)
         self.mock_reserved_resource = self.patch_d.start()
@@ -54,6 +55,10 @@ class TestQueueReservedTask(ResourceReservationTests):
         self.patch_f = mock.patch('pulp.server.async.tasks._release_resource', autospec=True)
         self.mock__release_resource = self.patch_f.start()
 
+        self.patch_g = mock.patch('pulp.server.async.tasks.resources.add_reservation',
+                                  autospec=True)
+        self.mock_add_reservation = self.patch_g.start()
+
         super(TestQueueReservedTask, self).setUp()
 
     def tearDown(self):
@@ -63,6 +68,7 @@ class TestQueueReservedTask(ResourceReservationTests):
         self.patch_d.stop()
         self.patch_e.stop()
         self.patch_f.stop()
+        self.patch_g.stop()
         super(TestQueueReservedTask, self).tearDown()
 
     def test_creates_and_saves_reserved_resource(self):
@@ -71,6 +77,8 @@ class TestQueueReservedTask(ResourceReservationTests):
         self.mock_reserved_resource.assert_called_once_with('my_task_id', 'worker1',
                                                             'my_resource_id')
         self.mock_reserved_resource.return_value.save.assert_called_once_with()
+        self.mock_add_reservation.assert_called_once_with('my_task_id', 'worker1',
+                                                          'my_resource_id')
 
     def test_dispatches_inner_task(self):
         self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
@@ -90,38 +98,25 @@ class TestQueueReservedTask(ResourceReservationTests):
         self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
         tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
         self.assertTrue(not self.mock_get_unreserved_worker.called)
-        self.assertTrue(not self.mock_time.sleep.called)
+        self.assertTrue(not self.mock_wait_for_release.called)
 
     def test_get_unreserved_worker_breaks_out_of_loop(self):
         self.mock_get_worker_for_reservation.side_effect = NoWorkers()
         self.mock_get_unreserved_worker.return_value = Worker('worker1', datetime.utcnow())
         tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
-        self.assertTrue(not self.mock_time.sleep.called)
+        self.mock_get_unreserved_worker.assert_called_once_with('my_resource_id')
+        self.assertTrue(not self.mock_wait_for_release.called)
 
-    def test_loops_and_sleeps_waiting_for_available_worker(self):
+    def test_loops_and_waits_for_release(self):
         self.mock_get_worker_for_reservation.side_effect = NoWorkers()
-        self.mock_get_unreserved_worker.side_effect = NoWorkers()
-
-        class BreakOutException(Exception):
-            pass
+        self.mock_get_unreserved_worker.side_effect = [NoWorkers(), NoWorkers(),
+                                                       Worker('worker1', datetime.utcnow())]
 
-        def side_effect(*args):
-            def second_call(*args):
-                raise BreakOutException()
-            self.mock_time.sleep.side_effect = second_call
-            return None
-
-        self.mock_time.sleep.side_effect = side_effect
-
-        try:
-            tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2],
-                                       {'a': 2})
-        except BreakOutException:
-            pass
-        else:
-            self.fail('_queue_reserved_task should have raised a BreakOutException')
+        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
 
-        self.mock_time.sleep.assert_has_calls([mock.call(0.25), mock.call(0.25)])
+        self.assertEqual(self.mock_wait_for_release.call_count, 2)
+        self.mock_reserved_resource.assert_called_once_with('my_task_id', 'worker1',
+                                                            'my_resource_id')
 
 
 class TestDeleteWorker(ResourceReservationTests):
@@ -221,11 +216,25 @@ class TestDeleteWorker(ResourceReservationTests):
 
         self.mock_cancel.assert_has_calls([mock.call(mock_task_id_a), mock.call(mock_task_id_b)])
 
+    def test_notifies_workers_changed(self):
+        tasks._delete_worker('worker1')
+        self.mock_resources.notify_workers_changed.assert_called_once_with()
+
 
 class TestReleaseResource(ResourceReservationTests):
     """
     Test the _release_resource() Task.
     """
+    def setUp(self):
+        super(TestReleaseResource, self).setUp()
+        patcher = mock.patch('pulp.server.async.tasks.resources.notify_released', autospec=True)
+        self.mock_notify_released = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_notifies_resource_manager(self):
+        tasks._release_resource('some_task_id')
+        self.mock_notify_released.assert_called_once_with('some_task_id')
+
     def test_resource_not_in_resource_map(self):
         """
         Test _release_resource() with a resource that is not in the database. This should be
@@ -815,6 +824,14 @@ class TestCleanupOldWorker(unittest.TestCase):
         mock__create_worker_working_directory.assert_called_once_with(sender.hostname)
 
 
+class TestDeliverNotifications(unittest.TestCase):
+
+    @mock.patch('pulp.server.async.tasks.dispatch.dispatcher')
+    def test_deliver_notifications(self, mock_dispatcher):
+        tasks.deliver_notifications(sender=None, pid=1, exitcode=0)
+        mock_dispatcher.shutdown.assert_called_once_with()
+
+
 class TestScheduledTasks(unittest.TestCase):
 
     @mock.patch('pulp.server.db.reaper.reap_expired_documents.apply_async')
@@ -0,0 +1,160 @@
+import unittest
+
+import mock
+
+from pulp.server.auth import authorization, cache
+from pulp.server.exceptions import MissingResource
+
+
+def permission(resource, **users):
+    return {'resource': resource,
+            'users': [{'username': login, 'permissions': ops} for login, ops in users.items()]}
+
+
+class TestPermissionTree(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = cache.PermissionTree([
+            permission('/', admin=[authorization.READ]),
+            permission('/v2/repositories/', alice=[authorization.CREATE]),
+            permission('/v2/repositories/zoo/', bob=[authorization.READ, authorization.EXECUTE]),
+        ])
+
+    def test_exact(self):
+        self.assertTrue(self.tree.is_authorized('/v2/repositories/zoo/', 'bob',
+                                                authorization.EXECUTE))
+        self.assertFalse(self.tree.is_authorized('/v2/repositories/zoo/', 'bob',
+                                                 authorization.DELETE))
+
+    def test_parent(self):
+        self.assertTrue(self.tree.is_authorized('/v2/repositories/zoo/actions/sync/', 'alice',
+                                                authorization.CREATE))
+        self.assertTrue(self.tree.is_authorized('/v2/repositories/zoo/actions/sync/', 'bob',
+                                                authorization.READ))
+        self.assertFalse(self.tree.is_authorized('/v2/repositories/', 'bob',
+                                                 authorization.READ))
+
+    def test_root(self):
+        self.assertTrue(self.tree.is_authorized('/v2/consumers/', 'admin', authorization.READ))
+        self.assertTrue(self.tree.is_authorized('/', 'admin', authorization.READ))
+        self.assertFalse(self.tree.is_authorized('/v2/consumers/', 'alice', authorization.READ))
+
+    def test_unnormalized_resource(self):
+        """
+        Permissions whose resource is missing a slash were never matched and still are not.
+        """
+        tree = cache.PermissionTree([permission('/v2/users', alice=[authorization.READ])])
+
+        self.assertFalse(tree.is_authorized('/v2/users/', 'alice', authorization.READ))
+
+
+class TestAuthorizationCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.AuthorizationCache()
+
+    @mock.patch('pulp.server.auth.cache.time')
+    @mock.patch('pulp.server.auth.cache.Permission')
+    def test_permission_tree_ttl(self, mock_permission, mock_time):
+        find = mock_permission.get_collection.return_value.find
+        find.return_value = [permission('/v2/', alice=[authorization.READ])]
+        mock_time.time.side_effect = [100, 100 + self.cache.ttl - 1, 100 + self.cache.ttl]
+
+        tree = self.cache.permission_tree()
+        self.assertTrue(self.cache.permission_tree() is tree)
+        self.assertEqual(find.call_count, 1)
+
+        self.assertFalse(self.cache.permission_tree() is tree)
+        self.assertEqual(find.call_count, 2)
+        self.assertTrue(tree.is_authorized('/v2/', 'alice', authorization.READ))
+
+    @mock.patch('pulp.server.auth.cache.Permission')
+    def test_invalidate_permissions(self, mock_permission):
+        find = mock_permission.get_collection.return_value.find
+        find.return_value = []
+        self.cache.permission_tree()
+
+        self.cache.invalidate_permissions()
+        self.cache.permission_tree()
+
+        self.assertEqual(find.call_count, 2)
+
+    @mock.patch('pulp.server.auth.cache.User')
+    def test_user_roles(self, mock_user):
+        find_one = mock_user.get_collection.return_value.find_one
+        find_one.return_value = {'login': 'alice', 'roles': ['super-users']}
+
+        self.assertEqual(self.cache.user_roles('alice'), frozenset(['super-users']))
+        self.assertEqual(self.cache.user_roles('alice'), frozenset(['super-users']))
+
+        find_one.assert_called_once_with({'login': 'alice'}, fields=['roles'])
+
+    @mock.patch('pulp.server.auth.cache.User')
+    def test_user_roles_missing(self, mock_user):
+        mock_user.get_collection.return_value.find_one.return_value = None
+
+        self.assertRaises(MissingResource, self.cache.user_roles, 'alice')
+
+    @mock.patch('pulp.server.auth.cache.User')
+    def test_invalidate_users(self, mock_user):
+        find_one = mock_user.get_collection.return_value.find_one
+        find_one.return_value = {'login': 'alice', 'roles': []}
+        self.cache.user_roles('alice')
+        self.cache.user_roles('bob')
+
+        self.cache.invalidate_users('alice')
+        self.cache.user_roles('alice')
+        self.cache.user_roles('bob')
+        self.assertEqual(find_one.call_count, 3)
+
+        self.cache.invalidate_users()
+        self.cache.user_roles('bob')
+        self.assertEqual(find_one.call_count, 4)
+
+
+class TestCredentialCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.CredentialCache(size=2, ttl=30)
+
+    def test_get(self):
+        self.cache.add('a', 'alice')
+
+        self.assertEqual(self.cache.get('a'), 'alice')
+        self.assertEqual(self.cache.get('b'), None)
+
+    @mock.patch('pulp.server.auth.cache.time')
+    def test_expired(self, mock_time):
+        mock_time.time.return_value = 100
+        self.cache.add('a', 'alice')
+
+        mock_time.time.return_value = 129
+        self.assertEqual(self.cache.get('a'), 'alice')
+        mock_time.time.return_value = 130
+        self.assertEqual(self.cache.get('a'), None)
+
+    def test_least_recently_used(self):
+        self.cache.add('a', 'alice')
+        self.cache.add('b', 'bob')
+        self.cache.get('a')
+
+        self.cache.add('c', 'carol')
+
+        self.assertEqual(self.cache.get('a'), 'alice')
+        self.assertEqual(self.cache.get('b'), None)
+        self.assertEqual(self.cache.get('c'), 'carol')
+
+    def test_invalidate(self):
+        self.cache.add('a', 'alice')
+        self.cache.add('b', 'bob')
+
+        self.cache.invalidate('alice')
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.cache.get('b'), 'bob')
+
+        self.cache.invalidate()
+        self.assertEqual(self.cache.get('b'), None)
+
+    def test_credential_digest(self):
+        self.assertEqual(cache.credential_digest('ab', 'c'), cache.credential_digest('ab', u'c'))
+        self.assertNotEqual(cache.credential_digest('ab', 'c'), cache.credential_digest('a', 'bc'))
@@ -539,9 +539,10 @@ class TestBatch(TestCase):
         self.assertEqual(batch.queues[fake_source.id], fake_queue())
         self.assertEqual(queue, fake_queue())
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
-    def test_download(self, fake_dispatch, fake_wait):
+    def test_download(self, fake_dispatch, fake_wait, fake_manager):
         primary = Mock()
         sources = [Mock(), Mock()]
         requests = [Mock(), Mock(), Mock()]
@@ -566,8 +567,12 @@ class TestBatch(TestCase):
 
         # validation
         # initial dispatch
+        catalog = fake_manager.return_value
+        self.assertEqual(catalog.find_many.call_count, 1)
+        found = catalog.find_many.return_value
         for request in requests:
-            request.find_sources.assert_called_with(primary, sources)
+            found.get.assert_any_call(request.locator, [])
+            request.find_sources.assert_called_with(primary, sources, found.get.return_value)
         calls = fake_dispatch.call_args_list
         self.assertEqual(len(calls), len(requests))
         for i, request in enumerate(requests):
@@ -401,6 +401,7 @@ class TestContentSource(TestCase):
         self.assertEqual(canceled.isSet.call_count, len(urls))
         self.assertEqual(conduit.reset.call_count, len(urls))
         self.assertEqual(cataloger.refresh.call_count, len(urls))
+        self.assertEqual(conduit.flush.call_count, len(urls))
 
         n = 0
         added = 10
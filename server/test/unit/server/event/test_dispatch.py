@@ -0,0 +1,201 @@
+import unittest
+
+import mock
+
+from pulp.server.event import dispatch
+
+
+class TestConnections(unittest.TestCase):
+
+    def test_get(self):
+        connections = dispatch.Connections()
+        connect = mock.Mock()
+
+        first = connections.get(('http', 'a'), connect)
+        second = connections.get(('http', 'a'), connect)
+
+        self.assertTrue(first is second)
+        self.assertEqual(connect.call_count, 1)
+        self.assertTrue(('http', 'a') in connections)
+
+    def test_discard(self):
+        connections = dispatch.Connections()
+        connection = connections.get(('http', 'a'), mock.Mock())
+        connection.close.side_effect = IOError()
+
+        connections.discard(('http', 'a'))
+        connections.discard(('http', 'b'))
+
+        self.assertEqual(connection.close.call_count, 1)
+        self.assertFalse(('http', 'a') in connections)
+
+    @mock.patch('pulp.server.event.dispatch.time')
+    def test_close_idle(self, mock_time):
+        connections = dispatch.Connections()
+        mock_time.time.return_value = 100
+        idle = connections.get(('http', 'a'), mock.Mock())
+        mock_time.time.return_value = 120
+        used = connections.get(('http', 'b'), mock.Mock())
+
+        connections.close_idle(10)
+
+        self.assertEqual(idle.close.call_count, 1)
+        self.assertEqual(used.close.call_count, 0)
+        self.assertEqual(list(connections._connections), [('http', 'b')])
+
+
+class TestDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = dispatch.Dispatcher(workers=2, retry_delay=0)
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+
+    def test_deliver(self):
+        connect = mock.Mock()
+        send = mock.Mock()
+
+        for i in range(10):
+            self.assertTrue(self.dispatcher.submit(dispatch.Delivery(('t',), connect, send, i)))
+        self.dispatcher.join()
+
+        self.assertEqual(sorted(c[0][1] for c in send.call_args_list), range(10))
+        # each worker opens at most one connection to the target
+        self.assertTrue(connect.call_count <= 2)
+        metrics = self.dispatcher.metrics()
+        self.assertEqual(metrics['queue_depth'], 0)
+        self.assertEqual(metrics['queued'], 10)
+        self.assertEqual(metrics['delivered'], 10)
+        self.assertEqual(metrics['failed'], 0)
+        self.assertTrue(metrics['max_latency'] >= metrics['average_latency'] > 0)
+
+    @mock.patch('pulp.server.event.dispatch.time.sleep')
+    def test_retry(self, mock_sleep):
+        self.dispatcher.retry_delay = 1
+        connect = mock.Mock()
+        send = mock.Mock(side_effect=[IOError(), IOError(), None])
+
+        self.dispatcher.submit(dispatch.Delivery(('t',), connect, send))
+        self.dispatcher.join()
+
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(connect.call_count, 3)
+        self.assertEqual([c[0][0] for c in mock_sleep.call_args_list], [1, 2])
+        self.assertEqual(self.dispatcher.metrics()['retried'], 2)
+        self.assertEqual(self.dispatcher.metrics()['delivered'], 1)
+
+    @mock.patch('pulp.server.event.dispatch._logger')
+    def test_failed(self, mock_logger):
+        send = mock.Mock(side_effect=IOError())
+
+        self.dispatcher.submit(dispatch.Delivery(('t',), mock.Mock(), send))
+        self.dispatcher.join()
+
+        self.assertEqual(send.call_count, dispatch.RETRIES + 1)
+        self.assertEqual(mock_logger.exception.call_count, 1)
+        self.assertEqual(self.dispatcher.metrics()['failed'], 1)
+
+    def test_reused_connection_closed(self):
+        # the target closed the connection while it was idle
+        self.dispatcher = dispatch.Dispatcher(workers=1, retries=0)
+        connect = mock.Mock()
+        send = mock.Mock(side_effect=[None, dispatch.NotSent(), None])
+
+        self.dispatcher.submit(dispatch.Delivery(('t',), connect, send))
+        self.dispatcher.submit(dispatch.Delivery(('t',), connect, send))
+        self.dispatcher.join()
+
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(connect.call_count, 2)
+        self.assertEqual(self.dispatcher.metrics()['delivered'], 2)
+
+    @mock.patch('pulp.server.event.dispatch._logger')
+    def test_reused_connection_failed(self, mock_logger):
+        # the notification may have been received, so it is not sent again at once
+        self.dispatcher = dispatch.Dispatcher(workers=1, retries=0)
+        connect = mock.Mock()
+        send = mock.Mock(side_effect=[None, IOError()])
+
+        self.dispatcher.submit(dispatch.Delivery(('t',), connect, send))
+        self.dispatcher.submit(dispatch.Delivery(('t',), connect, send))
+        self.dispatcher.join()
+
+        self.assertEqual(send.call_count, 2)
+        self.assertEqual(self.dispatcher.metrics()['delivered'], 1)
+        self.assertEqual(self.dispatcher.metrics()['failed'], 1)
+
+    @mock.patch('pulp.server.event.dispatch._logger')
+    def test_log_metrics(self, mock_logger):
+        self.dispatcher = dispatch.Dispatcher(workers=0, metrics_interval=0)
+
+        # nothing was submitted
+        self.dispatcher._log_metrics()
+        self.assertEqual(mock_logger.info.call_count, 0)
+
+        self.dispatcher.submit(dispatch.Delivery(('t',), None, None))
+        self.dispatcher._log_metrics()
+
+        self.assertEqual(mock_logger.info.call_count, 1)
+        self.assertTrue('1 waiting, 1 queued' in mock_logger.info.call_args[0][0])
+        # nothing was submitted since the metrics were logged
+        self.dispatcher._log_metrics()
+        self.assertEqual(mock_logger.info.call_count, 1)
+
+    @mock.patch('pulp.server.event.dispatch._logger')
+    def test_log_metrics_interval(self, mock_logger):
+        self.dispatcher = dispatch.Dispatcher(workers=0)
+        self.dispatcher.submit(dispatch.Delivery(('t',), None, None))
+
+        self.dispatcher._log_metrics()
+        self.assertEqual(mock_logger.info.call_count, 0)
+
+        self.dispatcher._metrics_logged -= dispatch.METRICS_INTERVAL
+        self.dispatcher._log_metrics()
+        self.assertEqual(mock_logger.info.call_count, 1)
+
+    @mock.patch.object(dispatch.Dispatcher, '_log_metrics')
+    def test_worker_logs_metrics(self, mock_log_metrics):
+        self.dispatcher.submit(dispatch.Delivery(('t',), mock.Mock(), mock.Mock()))
+
+        self.dispatcher.shutdown()
+
+        self.assertTrue(mock_log_metrics.called)
+
+    @mock.patch('pulp.server.event.dispatch._logger')
+    def test_queue_full(self, mock_logger):
+        self.dispatcher = dispatch.Dispatcher(workers=0, queue_size=1, queue_timeout=0)
+
+        self.assertTrue(self.dispatcher.submit(dispatch.Delivery(('t',), None, None)))
+        self.assertFalse(self.dispatcher.submit(dispatch.Delivery(('t',), None, None)))
+
+        self.assertEqual(mock_logger.error.call_count, 1)
+        metrics = self.dispatcher.metrics()
+        self.assertEqual(metrics['queue_depth'], 1)
+        self.assertEqual(metrics['dropped'], 1)
+
+    def test_shutdown(self):
+        send = mock.Mock()
+        for i in range(5):
+            self.dispatcher.submit(dispatch.Delivery(('t',), mock.Mock(), send))
+        threads = self.dispatcher._threads
+
+        self.dispatcher.shutdown()
+
+        self.assertEqual(send.call_count, 5)
+        self.assertFalse([t for t in threads if t.isAlive()])
+
+    @mock.patch('pulp.server.event.dispatch.os')
+    def test_forked(self, mock_os):
+        mock_os.getpid.return_value = 1
+        queue = self.dispatcher._start()
+        threads = self.dispatcher._threads
+        mock_os.getpid.return_value = 2
+
+        self.assertFalse(self.dispatcher._start() is queue)
+        self.dispatcher.shutdown()
+        # stop the workers of the first process too
+        for thread in threads:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
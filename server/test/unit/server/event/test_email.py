@@ -1,4 +1,3 @@
-import dummy_threading
 import smtplib
 import unittest
 try:
@@ -13,20 +12,25 @@ import mock
 
 from pulp.server.compat import json
 from pulp.server.config import config
-from pulp.server.event import data, mail
+from pulp.server.event import data, dispatch, mail
 from pulp.server.managers import factory
+from pulp.server.managers.event import fire
 
 
 class TestSendEmail(unittest.TestCase):
     @mock.patch('smtplib.SMTP')
-    def test_basic(self, mock_smtp):
+    def test_connect(self, mock_smtp):
+        connection = mail._connect('localhost', 25)
+        mock_smtp.assert_called_once_with(host='localhost', port=25)
+        self.assertEqual(connection, mock_smtp.return_value)
+
+    def test_basic(self):
         # send a message
-        mail._send_email('hello', 'stuff', 'someone@some.domain')
-        mock_smtp.assert_called_once_with(host=config.get('email', 'host'),
-                                          port=config.getint('email', 'port'))
+        mock_connection = mock.Mock()
+        mail._send_email(mock_connection, 'hello', 'stuff', 'someone@some.domain')
 
         # verify
-        mock_sendmail = mock_smtp.return_value.sendmail
+        mock_sendmail = mock_connection.sendmail
         self.assertEqual(mock_sendmail.call_count, 1)
         self.assertEqual(mock_sendmail.call_args[0][0],
                          config.get('email', 'from'))
@@ -39,21 +43,29 @@ class TestSendEmail(unittest.TestCase):
         self.assertEqual(message.get('From', None), config.get('email', 'from'))
         self.assertEqual(message.get('To', None), 'someone@some.domain')
 
-    @mock.patch('smtplib.SMTP')
-    @mock.patch('logging.Logger.error')
-    def test_connect_failure(self, mock_error, mock_smtp):
-        mock_smtp.side_effect = smtplib.SMTPConnectError(123, 'aww crap')
-        mail._send_email('hello', 'stuff', 'someone@some.domain')
-        self.assertTrue(mock_error.called)
-
-    @mock.patch('smtplib.SMTP')
     @mock.patch('logging.Logger.error')
-    def test_send_failure(self, mock_error, mock_smtp):
-        mock_smtp.return_value.sendmail.side_effect = smtplib.SMTPRecipientsRefused(
+    def test_send_failure(self, mock_error):
+        mock_connection = mock.Mock()
+        mock_connection.sendmail.side_effect = smtplib.SMTPRecipientsRefused(
             ['someone@some.domain'])
-        mail._send_email('hello', 'stuff', 'someone@some.domain')
+        mail._send_email(mock_connection, 'hello', 'stuff', 'someone@some.domain')
         self.assertTrue(mock_error.called)
 
+    def test_closed(self):
+        # the dispatcher sends the email again at once on a new connection
+        mock_connection = mock.Mock()
+        mock_connection.noop.side_effect = smtplib.SMTPServerDisconnected()
+        self.assertRaises(dispatch.NotSent, mail._send_email, mock_connection,
+                          'hello', 'stuff', 'someone@some.domain')
+        self.assertFalse(mock_connection.sendmail.called)
+
+    def test_disconnected(self):
+        # the dispatcher retries after a delay
+        mock_connection = mock.Mock()
+        mock_connection.sendmail.side_effect = smtplib.SMTPServerDisconnected()
+        self.assertRaises(smtplib.SMTPServerDisconnected, mail._send_email, mock_connection,
+                          'hello', 'stuff', 'someone@some.domain')
+
 
 class TestHandleEvent(unittest.TestCase):
     def setUp(self):
@@ -64,24 +76,31 @@ class TestHandleEvent(unittest.TestCase):
         self.event = mock.MagicMock()
         self.event.payload = 'stuff'
         self.event.data.return_value = self.event.payload
+        self.dispatcher = dispatch.Dispatcher(workers=1, retries=0)
+        self.patcher = mock.patch('pulp.server.event.dispatch.dispatcher', self.dispatcher)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.dispatcher.shutdown()
 
-    # don't actually spawn a thread
-    @mock.patch('threading.Thread', new=dummy_threading.Thread)
     @mock.patch('ConfigParser.SafeConfigParser.getboolean', return_value=False)
     @mock.patch('smtplib.SMTP')
     def test_email_disabled(self, mock_smtp, mock_getbool):
         mail.handle_event(self.notifier_config, self.event)
+        self.dispatcher.join()
         self.assertFalse(mock_smtp.called)
 
-    # don't actually spawn a thread
-    @mock.patch('threading.Thread', new=dummy_threading.Thread)
     @mock.patch('ConfigParser.SafeConfigParser.getboolean', return_value=True)
     @mock.patch('smtplib.SMTP')
     def test_email_enabled(self, mock_smtp, mock_getbool):
         mail.handle_event(self.notifier_config, self.event)
+        self.dispatcher.join()
 
         # verify
-        self.assertEqual(mock_smtp.call_count, 2)
+        # both emails are sent over the connection of the dispatcher worker
+        self.assertEqual(mock_smtp.call_count, 1)
+        self.assertEqual(mock_smtp.return_value.sendmail.call_count, 2)
         mock_sendmail = mock_smtp.return_value.sendmail
         self.assertEqual(mock_sendmail.call_args[0][0],
                          config.get('email', 'from'))
@@ -95,13 +114,13 @@ class TestHandleEvent(unittest.TestCase):
         self.assertTrue(message.get('To', None) in self.notifier_config['addresses'])
 
     # tests bz 1099945
-    @mock.patch('threading.Thread', new=dummy_threading.Thread)
     @mock.patch('ConfigParser.SafeConfigParser.getboolean', return_value=True)
     @mock.patch('smtplib.SMTP')
     def test_email_serialize_objid(self, mock_smtp, mock_getbool):
         event_with_id = data.Event('test-1', {'foo': _test_objid()})
         # no TypeError = success
         mail.handle_event(self.notifier_config, event_with_id)
+        self.dispatcher.join()
 
 
 class TestSystem(unittest.TestCase):
@@ -118,9 +137,9 @@ class TestSystem(unittest.TestCase):
             'notifier_config': self.notifier_config,
         }
 
-    # don't actually spawn a thread
-    @mock.patch('threading.Thread', new=dummy_threading.Thread)
-    # mock qpid, because it freaks out over dummy_threading
+    # deliver with a dispatcher the test can wait for
+    @mock.patch('pulp.server.event.dispatch.dispatcher', dispatch.Dispatcher(workers=1))
+    # mock qpid
     @mock.patch('pulp.server.managers.event.remote.TopicPublishManager')
     # don't actually send any email
     @mock.patch('smtplib.SMTP')
@@ -133,7 +152,11 @@ class TestSystem(unittest.TestCase):
         mock_get_collection.return_value.find.return_value = [self.event_doc]
         event = data.Event(data.TYPE_REPO_SYNC_FINISHED, 'stuff')
         factory.initialize()
+        fire.listener_cache.invalidate()
         factory.event_fire_manager()._do_fire(event)
+        dispatch.dispatcher.join()
+        dispatch.dispatcher.shutdown()
+        fire.listener_cache.invalidate()
 
         # verify that the mail event handler was called and processed something
         self.assertTrue(mock_smtp.return_value.sendmail.call_count, 2)
@@ -1,5 +1,4 @@
 import httplib
-import time
 
 # needed to create unserializable ID
 from bson.objectid import ObjectId as _test_objid
@@ -7,12 +6,23 @@ import mock
 
 from ... import base
 from pulp.server.compat import json
-from pulp.server.event import http
+from pulp.server.event import dispatch, http
 from pulp.server.event.data import Event
 
 
 class TestHTTPNotifierTests(base.PulpServerTests):
 
+    def setUp(self):
+        super(TestHTTPNotifierTests, self).setUp()
+        self.dispatcher = dispatch.Dispatcher(workers=1, retries=0)
+        self.patcher = mock.patch('pulp.server.event.dispatch.dispatcher', self.dispatcher)
+        self.patcher.start()
+
+    def tearDown(self):
+        super(TestHTTPNotifierTests, self).tearDown()
+        self.patcher.stop()
+        self.dispatcher.shutdown()
+
     @mock.patch('pulp.server.event.http._create_connection')
     def test_handle_event(self, mock_create):
         # Setup
@@ -34,7 +44,7 @@ class TestHTTPNotifierTests(base.PulpServerTests):
 
         # Test
         http.handle_event(notifier_config, event)
-        time.sleep(.5)  # handle works in a thread so give it a bit to finish
+        self.dispatcher.join()  # handle works in a thread so wait for it to finish
 
         # Verify
         self.assertEqual(1, mock_create.call_count)
@@ -72,7 +82,7 @@ class TestHTTPNotifierTests(base.PulpServerTests):
 
         # Test
         http.handle_event(notifier_config, event)  # should not error
-        time.sleep(.5)
+        self.dispatcher.join()
 
         # Verify
         self.assertEqual(1, mock_create.call_count)
@@ -113,6 +123,53 @@ class TestHTTPNotifierTests(base.PulpServerTests):
         # Verify
         self.assertEqual(0, mock_create.call_count)
 
+    @mock.patch('pulp.server.event.http._create_connection')
+    def test_handle_event_reuses_connection(self, mock_create):
+        # Setup
+        notifier_config = {'url': 'https://localhost/api/'}
+
+        mock_connection = mock_create.return_value
+        mock_connection.getresponse.return_value.status = httplib.OK
+
+        # Test
+        for i in range(3):
+            http.handle_event(notifier_config, Event('type-1', {'k1': i}))
+        self.dispatcher.join()
+
+        # Verify
+        self.assertEqual(1, mock_create.call_count)
+        self.assertEqual(3, mock_connection.request.call_count)
+        self.assertEqual(3, mock_connection.getresponse.return_value.read.call_count)
+        self.assertEqual(3, self.dispatcher.metrics()['delivered'])
+
+    def test_send_post_server_error(self):
+        # Setup
+        mock_connection = mock.Mock()
+        mock_connection.getresponse.return_value.status = httplib.SERVICE_UNAVAILABLE
+
+        # Test
+        self.assertRaises(httplib.HTTPException, http._send_post, mock_connection, '/api/',
+                          '{}', {})
+
+    def test_send_post_not_sent(self):
+        # the connection was closed before the post was written or answered
+        for request_error, response_error in ((httplib.CannotSendRequest(), None),
+                                              (None, httplib.BadStatusLine(''))):
+            mock_connection = mock.Mock()
+            mock_connection.request.side_effect = request_error
+            mock_connection.getresponse.side_effect = response_error
+
+            self.assertRaises(dispatch.NotSent, http._send_post, mock_connection, '/api/',
+                              '{}', {})
+
+    def test_send_post_response_lost(self):
+        # the post was written, so the server may have received it
+        mock_connection = mock.Mock()
+        mock_connection.getresponse.side_effect = httplib.BadStatusLine('HTTP/1.1 junk')
+
+        self.assertRaises(httplib.BadStatusLine, http._send_post, mock_connection, '/api/',
+                          '{}', {})
+
     def test_create_configuration(self):
         # Test HTTPS
         conn = http._create_connection('https', 'foo')
@@ -1,5 +1,11 @@
+from hmac import HMAC
+
+import mock
+
 from .... import base
+from pulp.server.compat import digestmod
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.auth import password
 
 
 class PasswordManagerTests(base.PulpServerTests):
@@ -21,3 +27,33 @@ class PasswordManagerTests(base.PulpServerTests):
         password = "some password"
         hashed = self.password_manager.hash_password(password)
         self.assertTrue(self.password_manager.check_password(hashed, password))
+
+    def test_check_wrong_password(self):
+        hashed = self.password_manager.hash_password("some password")
+        self.assertFalse(self.password_manager.check_password(hashed, "other password"))
+
+    def test_saved_format(self):
+        """
+        Test passwords hashed with the HMAC module are still verified.
+        """
+        hashed = self.password_manager.hash_password("some password")
+        salt, hashed_password = [part.decode("base64") for part in hashed.split(",")]
+
+        result = "some password"
+        for i in xrange(password.NUM_ITERATIONS):
+            result = HMAC(result, salt, digestmod).digest()
+
+        self.assertEqual(result, hashed_password)
+
+    def test_check_password_cached(self):
+        hashed = self.password_manager.hash_password("some password")
+        mock_pbkdf = mock.Mock(wraps=self.password_manager.pbkdf_sha256)
+        self.password_manager.pbkdf_sha256 = mock_pbkdf
+
+        self.assertTrue(self.password_manager.check_password(hashed, "some password"))
+        self.assertTrue(self.password_manager.check_password(hashed, "some password"))
+        self.assertEqual(mock_pbkdf.call_count, 1)
+
+        self.password_manager.invalidate_password(hashed)
+        self.assertTrue(self.password_manager.check_password(hashed, "some password"))
+        self.assertEqual(mock_pbkdf.call_count, 2)
@@ -1,18 +1,24 @@
+import types
+
 import mock
 
 from .... import base
+from pulp.common import tags
 from pulp.devel import mock_plugins
 from pulp.plugins.loader import api as plugins
+from pulp.server.async.tasks import TaskResult
 from pulp.server.db.model.consumer import (Bind, Consumer, RepoProfileApplicability,
                                            UnitProfile)
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.repository import Repo, RepoDistributor
+from pulp.server.exceptions import InvalidValue
 from pulp.server.managers import factory as factory
 from pulp.server.managers.consumer.applicability import (
     _add_consumers_to_applicability_map, _add_profiles_to_consumer_map_and_get_hashes,
     _add_repo_ids_to_consumer_map, _format_report, _get_applicability_map,
     _get_consumer_applicability_map, DoesNotExist, MultipleObjectsReturned,
-    retrieve_consumer_applicability, ApplicabilityRegenerationManager)
+    retrieve_consumer_applicability, stream_consumer_applicability,
+    ApplicabilityRegenerationManager)
 from pulp.server.managers.consumer.bind import BindManager
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -184,6 +190,52 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         applicability_list = list(RepoProfileApplicability.get_collection().find())
         self.assertEqual(len(applicability_list), 0)
 
+    def test_regenerate_applicability_for_consumers_report(self):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        # Test
+        manager = factory.applicability_regeneration_manager()
+        report = manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        # Verify
+        self.assertEqual(report, {'skipped': 0, 'computed': 4, 'written': 4})
+        # Regenerating again should find all the existing applicability
+        report = manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        self.assertEqual(report, {'skipped': 4, 'computed': 0, 'written': 0})
+        self.assertEqual(RepoProfileApplicability.get_collection().find().count(), 4)
+
+    @mock.patch('pulp.server.managers.consumer.applicability.APPLICABILITY_BATCH_SIZE', 1)
+    def test_regenerate_applicability_for_consumers_small_batches(self):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        # Test
+        manager = factory.applicability_regeneration_manager()
+        report = manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        # Verify
+        self.assertEqual(report, {'skipped': 0, 'computed': 4, 'written': 4})
+        applicability_list = list(RepoProfileApplicability.get_collection().find())
+        self.assertEqual(len(applicability_list), 4)
+        # The repo content types are only looked up once per repo
+        self.assertEqual(
+            ApplicabilityRegenerationManager._get_existing_repo_content_types.call_count, 2)
+
+    def test_regenerate_applicability_for_consumers_skips_existing(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        profile_hash = UnitProfile.get_collection().find_one()['profile_hash']
+        RepoProfileApplicability.objects.create(profile_hash, self.REPO_IDS[0], self.PROFILE1,
+                                                {'rpm': ['existing']})
+        # Test
+        manager = factory.applicability_regeneration_manager()
+        report = manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        # Verify
+        self.assertEqual(report, {'skipped': 1, 'computed': 1, 'written': 1})
+        existing = RepoProfileApplicability.get_collection().find_one(
+            {'repo_id': self.REPO_IDS[0]})
+        self.assertEqual(existing['applicability'], {'rpm': ['existing']})
+
     # Applicability regeneration with repo criteria
 
     def test_regenerate_applicability_for_repos_with_different_consumer_profiles(self):
@@ -288,6 +340,80 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         self.assertEqual(applicability_list[0]['profile'], self.PROFILE1)
         self.assertEqual(applicability_list[0]['applicability'], expected_applicability)
 
+    @mock.patch('pulp.server.managers.consumer.applicability.APPLICABILITY_SHARD_SIZE', 1)
+    @mock.patch('pulp.server.managers.consumer.applicability.'
+                'regenerate_applicability_for_repo_shard')
+    def test_regenerate_applicability_for_repos_parallel(self, mock_shard_task):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        mock_shard_task.apply_async_with_reservation.side_effect = ['a', 'b', 'c', 'd']
+        # Test
+        result = manager.regenerate_applicability_for_repos(self.REPO_CRITERIA, parallel=True)
+        # Verify
+        self.assertTrue(isinstance(result, TaskResult))
+        self.assertEqual(result.return_value, {'repo_count': 2, 'shard_count': 4})
+        self.assertEqual(len(result.spawned_tasks), 4)
+        calls = mock_shard_task.apply_async_with_reservation.call_args_list
+        resource_ids = sorted(c[0][1] for c in calls)
+        self.assertEqual(resource_ids, ['repo-1:0', 'repo-1:1', 'repo-2:0', 'repo-2:1'])
+        for c in calls:
+            self.assertEqual(c[0][0], tags.RESOURCE_REPOSITORY_PROFILE_APPLICABILITY_TYPE)
+            repo_id, profile_hashes = c[0][2]
+            self.assertEqual(c[0][1].split(':')[0], repo_id)
+            self.assertEqual(len(profile_hashes), 1)
+        # the shards of each repository are cut from the profile hashes in order
+        for repo_id in self.REPO_IDS:
+            shards = sorted((c[0][1], c[0][2][1][0]) for c in calls
+                            if c[0][2][0] == repo_id)
+            hashes = [profile_hash for resource_id, profile_hash in shards]
+            self.assertEqual(hashes, sorted(hashes))
+
+    def test_regenerate_applicability_for_repos_up_to_date(self):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        for repo_id in self.REPO_IDS:
+            factory.repo_manager().update_content_revision(repo_id)
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units.reset_mock()
+        # Test
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+        # Verify that nothing was recalculated
+        self.assertEqual(profiler.calculate_applicable_units.call_count, 0)
+        # Changing the content of one repo makes its applicability out of date
+        revision = factory.repo_manager().update_content_revision(self.REPO_IDS[0])
+        manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+        self.assertEqual(profiler.calculate_applicable_units.call_count, 2)
+        for applicability in RepoProfileApplicability.get_collection().find(
+                {'repo_id': self.REPO_IDS[0]}):
+            self.assertEqual(applicability['repo_content_revision'], revision)
+
+    def test_regenerate_applicability_for_repo_shard(self):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        RepoProfileApplicability.get_collection().update({}, {'$set': {'applicability': {}}},
+                                                         multi=True)
+        profile_hash = UnitProfile.get_collection().find_one(
+            {'consumer_id': self.CONSUMER_IDS[0]})['profile_hash']
+        # Test
+        manager.regenerate_applicability_for_repo_shard(self.REPO_IDS[0], [profile_hash])
+        # Verify that only the requested shard was regenerated
+        expected_applicability = {'rpm': ['rpm-1', 'rpm-2'], 'erratum': ['errata-1', 'errata-2']}
+        for applicability in RepoProfileApplicability.get_collection().find():
+            if (applicability['repo_id'], applicability['profile_hash']) == \
+                    (self.REPO_IDS[0], profile_hash):
+                self.assertEqual(applicability['applicability'], expected_applicability)
+            else:
+                self.assertEqual(applicability['applicability'], {})
+
 
 class TestRepoProfileApplicabilityManager(base.PulpServerTests):
     """
@@ -1067,6 +1193,87 @@ class TestRetrieveConsumerApplicability(base.PulpServerTests,
         self.assert_equal_ignoring_list_order(applicability, expected_applicability)
 
 
+class TestStreamConsumerApplicability(base.PulpServerTests,
+                                      base.RecursiveUnorderedListComparisonMixin):
+    """
+    Test the stream_consumer_applicability() function.
+    """
+    def tearDown(self):
+        """
+        Empty the collections that were written to during this test suite.
+        """
+        super(TestStreamConsumerApplicability, self).tearDown()
+        Consumer.get_collection().remove()
+        UnitProfile.get_collection().remove()
+        RepoProfileApplicability.get_collection().drop()
+        Bind.get_collection().drop()
+
+    def populate(self):
+        """
+        Create two consumers with the same profile, bound to the same repository.
+        """
+        consumer_ids = ['consumer_1', 'consumer_2']
+        manager = factory.consumer_manager()
+        for consumer_id in consumer_ids:
+            manager.register(consumer_id)
+        consumer_profile_data = ['unit_1-0.9.1', 'unit_2-1.1.3', 'unit_3-12.0.13']
+        manager = ProfileManager()
+        for consumer_id in consumer_ids:
+            consumer_profile = manager.create(consumer_id, 'content_type',
+                                              consumer_profile_data)
+        applicability = {'content_type': ['unit_1-0.9.2', 'unit_3-13.0.1']}
+        RepoProfileApplicability.objects.create(consumer_profile.profile_hash, 'repo_id',
+                                                consumer_profile_data, applicability)
+        bind_manager = BindManager()
+        for consumer_id in consumer_ids:
+            bind_manager.bind(consumer_id, 'repo_id', 'distributor_id', False, {})
+
+    @mock.patch('pulp.server.managers.consumer.bind.factory.consumer_history_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_distributor_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_query_manager')
+    def test_single_chunk(self, *unused_mocks):
+        """
+        Test that consumers in the same chunk are grouped like retrieve_consumer_applicability
+        does.
+        """
+        self.populate()
+
+        applicability = stream_consumer_applicability(Criteria(filters={}))
+
+        self.assertTrue(isinstance(applicability, types.GeneratorType))
+        expected_applicability = retrieve_consumer_applicability(Criteria(filters={}))
+        self.assert_equal_ignoring_list_order(list(applicability), expected_applicability)
+
+    @mock.patch('pulp.server.managers.consumer.bind.factory.consumer_history_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_distributor_manager')
+    @mock.patch('pulp.server.managers.consumer.bind.factory.repo_query_manager')
+    def test_multiple_chunks(self, *unused_mocks):
+        """
+        Test that consumers in different chunks are reported separately.
+        """
+        self.populate()
+
+        applicability = stream_consumer_applicability(Criteria(filters={}), chunk_size=1)
+
+        expected_applicability = [
+            {'consumers': ['consumer_1'],
+             'applicability': {'content_type': ['unit_1-0.9.2', 'unit_3-13.0.1']}},
+            {'consumers': ['consumer_2'],
+             'applicability': {'content_type': ['unit_1-0.9.2', 'unit_3-13.0.1']}}]
+        self.assert_equal_ignoring_list_order(list(applicability), expected_applicability)
+
+    @mock.patch('pulp.server.managers.consumer.applicability.ConsumerQueryManager.'
+                'find_by_criteria')
+    def test_criteria_error(self, mock_find):
+        """
+        Test that the consumers are queried before anything is generated, so that errors are
+        raised to the caller.
+        """
+        mock_find.side_effect = InvalidValue(['criteria'])
+
+        self.assertRaises(InvalidValue, stream_consumer_applicability, Criteria(filters={}))
+
+
 class TestAddConsumersToApplicabilityMap(base.PulpServerTests,
                                          base.RecursiveUnorderedListComparisonMixin):
     """
@@ -1,5 +1,7 @@
 from uuid import uuid4
 
+from mock import patch
+
 from ....base import PulpServerTests
 from pulp.server.db.model.content import ContentCatalog
 from pulp.server.managers import factory
@@ -62,6 +64,28 @@ class TestCatalogManager(PulpServerTests):
             self.assertEqual(entry['unit_key'], unit_key)
             self.assertEqual(entry['url'], url)
 
+    def test_add_entries(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        entries = [(TYPE_ID, unit_key, url) for unit_key, url in units]
+        added = manager.add_entries(SOURCE_ID, EXPIRATION, entries)
+        self.assertEqual(added, len(units))
+        collection = ContentCatalog.get_collection()
+        self.assertEqual(len(units), collection.find().count())
+        for unit_key, url in units:
+            locator = ContentCatalog.get_locator(TYPE_ID, unit_key)
+            entry = collection.find_one({'locator': locator})
+            self.assertEqual(entry['source_id'], SOURCE_ID)
+            self.assertEqual(entry['type_id'], TYPE_ID)
+            self.assertEqual(entry['unit_key'], unit_key)
+            self.assertEqual(entry['url'], url)
+
+    def test_add_entries_empty(self):
+        manager = ContentCatalogManager()
+        added = manager.add_entries(SOURCE_ID, EXPIRATION, [])
+        self.assertEqual(added, 0)
+        self.assertEqual(ContentCatalog.get_collection().find().count(), 0)
+
     def test_delete(self):
         units = self.units(0, 10)
         manager = ContentCatalogManager()
@@ -171,6 +195,32 @@ class TestCatalogManager(PulpServerTests):
             self.assertEqual(entry['unit_key'], unit_key)
             self.assertEqual(entry['url'], url)
 
+    @patch('pulp.server.managers.content.catalog.FIND_BATCH_SIZE', 3)
+    def test_find_many(self):
+        source_a = 'A'
+        source_b = 'B'
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units:
+            manager.add_entry(source_a, EXPIRATION, TYPE_ID, unit_key, url)
+        for unit_key, url in units[:5]:
+            manager.add_entry(source_b, EXPIRATION, TYPE_ID, unit_key, url)
+        missing = self.units(10, 2)
+        wanted = [(TYPE_ID, unit_key) for unit_key, url in units + missing]
+        found = manager.find_many(wanted)
+        self.assertEqual(len(found), len(units))
+        for n, (unit_key, url) in enumerate(units):
+            locator = ContentCatalog.get_locator(TYPE_ID, unit_key)
+            entries = found[locator]
+            sources = sorted(entry['source_id'] for entry in entries)
+            if n < 5:
+                self.assertEqual(sources, [source_a, source_b])
+            else:
+                self.assertEqual(sources, [source_a])
+            for entry in entries:
+                self.assertEqual(entry['unit_key'], unit_key)
+                self.assertEqual(entry['url'], url)
+
     def test_expired(self):
         units = self.units(0, 10)
         manager = ContentCatalogManager()
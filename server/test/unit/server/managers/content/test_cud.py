@@ -1,3 +1,5 @@
+from pymongo.errors import DuplicateKeyError
+
 from .... import base
 from pulp.plugins.types import database, model
 from pulp.server.managers.content.cud import ContentManager
@@ -53,6 +55,25 @@ class PulpContentCUDTests(PulpContentTests):
         self.assertEqual(len(units), 1)
         self.assertTrue('_last_updated' in units[0])
 
+    def test_add_content_units(self):
+        unit_ids = self.cud_manager.add_content_units(
+            TYPE_1_DEF.id, [('unit-a', TYPE_1_UNITS[0]), (None, TYPE_1_UNITS[1])])
+        self.assertEqual(len(unit_ids), 2)
+        self.assertEqual(unit_ids[0], 'unit-a')
+        self.assertNotEqual(unit_ids[1], None)
+        units = self.query_manager.list_content_units(TYPE_1_DEF.id)
+        self.assertEqual(len(units), 2)
+        for unit in units:
+            self.assertTrue(unit['_id'] in unit_ids)
+            self.assertTrue('_last_updated' in unit)
+
+    def test_add_content_units_duplicate(self):
+        self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
+        self.assertRaises(DuplicateKeyError, self.cud_manager.add_content_units, TYPE_1_DEF.id,
+                          [(None, TYPE_1_UNITS[0]), (None, TYPE_1_UNITS[1])])
+        units = self.query_manager.list_content_units(TYPE_1_DEF.id)
+        self.assertEqual(len(units), 2)
+
     def test_update_content_unit(self):
         unit_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
         unit = self.query_manager.get_content_unit_by_id(TYPE_1_DEF.id, unit_id)
@@ -7,15 +7,19 @@ import string
 import tempfile
 import traceback
 
-from mock import patch
+from mock import MagicMock, patch
 
 from .... import base
+from pulp.common.plugins import reporting_constants
 from pulp.plugins.types import database as content_type_db
 from pulp.plugins.types.model import TypeDefinition
+from pulp.plugins.util.publish_step import Step
 from pulp.server import exceptions as pulp_exceptions
+from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.repository import RepoContentUnit
 from pulp.server.managers import factory as manager_factory
-from pulp.server.managers.content.orphan import OrphanManager
+from pulp.server.managers.content import orphan
+from pulp.server.managers.content.orphan import DeleteOrphansStep, OrphanManager
 
 
 PHONY_TYPE_1 = TypeDefinition('phony_type_1', 'Phony Type 1', None, 'name', [], [])
@@ -103,6 +107,7 @@ class OrphanManagerTests(base.PulpServerTests):
         super(OrphanManagerTests, self).tearDown()
         RepoContentUnit.get_collection().remove(safe=True)
         content_type_db.clean()
+        OrphanManager.invalidate_summary_cache()
         if os.path.exists(self.content_root):  # can be removed by delete operations
             shutil.rmtree(self.content_root)
 
@@ -197,6 +202,70 @@ class OrphanManagerGeneratorTests(OrphanManagerTests):
         orphans = list(self.orphan_manager.generate_all_orphans())
         self.assertEqual(len(orphans), 1)
 
+    @patch('pulp.server.managers.content.orphan.ORPHAN_BATCH_SIZE', 2)
+    def test_orphans_across_batches(self):
+        units = [gen_content_unit(PHONY_TYPE_1.id, self.content_root) for i in range(5)]
+        associate_content_unit_with_repo(units[1])
+        associate_content_unit_with_repo(units[4])
+
+        orphans = list(self.orphan_manager.generate_orphans_by_type(PHONY_TYPE_1.id))
+
+        expected = set(units[i]['_id'] for i in (0, 2, 3))
+        self.assertEqual(set(orphan['_id'] for orphan in orphans), expected)
+
+    def test_get_associated_unit_using_generators(self):
+        unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        associate_content_unit_with_repo(unit)
+
+        self.assertRaises(pulp_exceptions.MissingResource,
+                          self.orphan_manager.get_orphan,
+                          PHONY_TYPE_1.id, unit['_id'])
+
+    def test_summary(self):
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+
+        summary = self.orphan_manager.orphans_summary()
+
+        self.assertEqual(summary, {PHONY_TYPE_1.id: 2, PHONY_TYPE_2.id: 0})
+
+    @patch.object(OrphanManager, 'orphans_count_by_type', return_value=0)
+    def test_cached_summary(self, mock_count):
+        self.orphan_manager.orphans_summary(use_cache=True)
+        summary = self.orphan_manager.orphans_summary(use_cache=True)
+
+        self.assertEqual(summary, {PHONY_TYPE_1.id: 0, PHONY_TYPE_2.id: 0})
+        # the second call is served from the cache
+        self.assertEqual(mock_count.call_count, 2)
+
+    def test_cached_summary_invalidated_by_association(self):
+        unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        self.assertEqual(self.orphan_manager.orphans_summary(use_cache=True)[PHONY_TYPE_1.id], 1)
+
+        associate_content_unit_with_repo(unit)
+
+        self.assertEqual(self.orphan_manager.orphans_summary(use_cache=True)[PHONY_TYPE_1.id], 0)
+
+    def test_cached_summary_invalidated_by_new_unit(self):
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        self.assertEqual(self.orphan_manager.orphans_summary(use_cache=True)[PHONY_TYPE_1.id], 1)
+
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+
+        self.assertEqual(self.orphan_manager.orphans_summary(use_cache=True)[PHONY_TYPE_1.id], 2)
+
+    def test_cached_summary_invalidated_by_replaced_unit(self):
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        associate_content_unit_with_repo(unit)
+        self.assertEqual(self.orphan_manager.orphans_summary(use_cache=True)[PHONY_TYPE_1.id], 1)
+
+        # the unit and association counts are the same afterwards
+        manager_factory.content_manager().remove_content_unit(PHONY_TYPE_1.id, unit['_id'])
+        gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+
+        self.assertEqual(self.orphan_manager.orphans_summary(use_cache=True)[PHONY_TYPE_1.id], 2)
+
     def test_delete_one_orphan_using_generators(self):
         gen_content_unit(PHONY_TYPE_1.id, self.content_root)
         orphans = list(self.orphan_manager.generate_all_orphans())
@@ -263,6 +332,70 @@ class OrphanManagerGeneratorTests(OrphanManagerTests):
         self.assertEqual(len(orphans), 0)
         self.assertEqual(self.number_of_files_in_content_root(), 0)
 
+    @patch('pulp.server.managers.content.orphan.ORPHAN_BATCH_SIZE', 2)
+    def test_delete_by_type_in_batches(self):
+        units = [gen_content_unit(PHONY_TYPE_1.id, self.content_root) for i in range(5)]
+        associate_content_unit_with_repo(units[2])
+
+        self.orphan_manager.delete_orphans_by_type(PHONY_TYPE_1.id)
+
+        remaining = content_type_db.type_units_collection(PHONY_TYPE_1.id).find()
+        self.assertEqual([unit['_id'] for unit in remaining], [units[2]['_id']])
+        self.assertEqual(self.number_of_files_in_content_root(), 1)
+
+    def test_delete_by_id_skips_associated_units(self):
+        unit_1 = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        unit_2 = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        associate_content_unit_with_repo(unit_2)
+
+        json_objs = [{'content_type_id': unit['_content_type_id'], 'unit_id': unit['_id']}
+                     for unit in (unit_1, unit_2)]
+        self.orphan_manager.delete_orphans_by_id(json_objs)
+
+        self.assertFalse(os.path.exists(unit_1['_storage_path']))
+        self.assertTrue(os.path.exists(unit_2['_storage_path']))
+
+
+class OrphanTaskTests(OrphanManagerTests):
+    # run the celery tasks, which report the progress of the deletion steps on the task
+
+    def tearDown(self):
+        super(OrphanTaskTests, self).tearDown()
+        TaskStatus.objects().delete()
+
+    def test_delete_all_orphans_task(self):
+        unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+
+        result = orphan.delete_all_orphans.apply()
+
+        self.assertTrue(result.successful(), result.traceback)
+        self.assertFalse(os.path.exists(unit['_storage_path']))
+        progress = TaskStatus.objects.get(task_id=result.id)['progress_report']
+        report = progress[reporting_constants.ORPHAN_STEP_DELETE]
+        self.assertEqual(report[0][reporting_constants.PROGRESS_STEP_TYPE_KEY],
+                         reporting_constants.ORPHAN_STEP_DELETE_TYPE)
+        self.assertEqual(report[0][reporting_constants.PROGRESS_STATE_KEY],
+                         reporting_constants.STATE_COMPLETE)
+
+    def test_delete_orphans_by_id_task(self):
+        unit = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        json_obj = {'content_type_id': unit['_content_type_id'], 'unit_id': unit['_id']}
+
+        result = orphan.delete_orphans_by_id.apply(args=[[json_obj]])
+
+        self.assertTrue(result.successful(), result.traceback)
+        self.assertFalse(os.path.exists(unit['_storage_path']))
+
+    def test_delete_orphans_by_type_task(self):
+        unit_1 = gen_content_unit(PHONY_TYPE_1.id, self.content_root)
+        unit_2 = gen_content_unit(PHONY_TYPE_2.id, self.content_root)
+
+        result = orphan.delete_orphans_by_type.apply(args=[PHONY_TYPE_1.id])
+
+        self.assertTrue(result.successful(), result.traceback)
+        self.assertFalse(os.path.exists(unit_1['_storage_path']))
+        self.assertTrue(os.path.exists(unit_2['_storage_path']))
+
 
 class TestDelete(TestCase):
 
@@ -447,11 +580,12 @@ class TestDeleteOrphanedFile(TestCase):
     def test_not_absolute_path(self):
         self.assertRaises(ValueError, OrphanManager.delete_orphaned_file, 'path-1')
 
+    @patch('os.path.lexists', return_value=True)
     @patch('pulp.server.managers.content.orphan.pulp_config.config')
     @patch('pulp.server.managers.content.orphan.OrphanManager.delete')
     @patch('pulp.server.managers.content.orphan.OrphanManager.unlink_shared')
     @patch('pulp.server.managers.content.orphan.OrphanManager.is_shared')
-    def test_shared(self, is_shared, unlink_shared, delete, config):
+    def test_shared(self, is_shared, unlink_shared, delete, config, lexists):
         path = '/path-1'
         storage_dir = '/storage/pulp/dir'
         is_shared.return_value = True
@@ -465,11 +599,12 @@ class TestDeleteOrphanedFile(TestCase):
         unlink_shared.assert_called_once_with(path)
         self.assertFalse(delete.called)
 
+    @patch('os.path.lexists', return_value=True)
     @patch('pulp.server.managers.content.orphan.pulp_config.config')
     @patch('pulp.server.managers.content.orphan.OrphanManager.delete')
     @patch('pulp.server.managers.content.orphan.OrphanManager.unlink_shared')
     @patch('pulp.server.managers.content.orphan.OrphanManager.is_shared')
-    def test_not_shared(self, is_shared, unlink_shared, delete, config):
+    def test_not_shared(self, is_shared, unlink_shared, delete, config, lexists):
         path = '/path-1'
         storage_dir = '/storage/pulp/dir'
         is_shared.return_value = False
@@ -482,3 +617,133 @@ class TestDeleteOrphanedFile(TestCase):
         is_shared.assert_called_once_with(storage_dir, path)
         delete.assert_called_once_with(path)
         self.assertFalse(unlink_shared.called)
+
+    @patch('os.rmdir')
+    @patch('os.access', return_value=True)
+    @patch('os.listdir')
+    @patch('os.path.lexists', return_value=True)
+    @patch('pulp.server.managers.content.orphan.pulp_config.config')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.is_shared', return_value=False)
+    def test_parent_removed_concurrently(self, is_shared, delete, config, lexists, listdir,
+                                         access, rmdir):
+        config.get.return_value = '/storage/pulp/dir'
+        listdir.side_effect = OSError()
+
+        # test
+        OrphanManager.delete_orphaned_file('/var/lib/other/a/file')
+
+        # validation
+        delete.assert_called_once_with('/var/lib/other/a/file')
+        self.assertEqual(listdir.call_count, 1)
+        self.assertFalse(rmdir.called)
+
+    @patch('pulp.server.managers.content.orphan.pulp_config.config')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.is_shared')
+    def test_missing(self, is_shared, delete, config):
+        # the file was deleted by an earlier, interrupted deletion of the unit
+        OrphanManager.delete_orphaned_file('/var/lib/other/a/missing-file')
+
+        self.assertFalse(is_shared.called)
+        self.assertFalse(delete.called)
+
+
+class TestDeleteOrphanUnits(TestCase):
+
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete_orphaned_file')
+    @patch('pulp.server.managers.content.orphan.content_types_db')
+    def test_delete_batch(self, mock_types_db, delete_file):
+        units = [{'_id': 'a', '_storage_path': '/a'}, {'_id': 'b', '_storage_path': None},
+                 {'_id': 'c', '_storage_path': '/c'}]
+        pool = MagicMock()
+        collection = mock_types_db.type_units_collection.return_value
+        # the files are deleted before the units, which are the only record of them
+        pool.map.side_effect = lambda f, paths: self.assertFalse(collection.remove.called)
+
+        OrphanManager.delete_orphan_units('rpm', units, pool)
+
+        collection.remove.assert_called_once_with({'_id': {'$in': ['a', 'b', 'c']}}, safe=True)
+        pool.map.assert_called_once_with(delete_file, ['/a', '/c'])
+
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete_orphaned_file')
+    @patch('pulp.server.managers.content.orphan.content_types_db')
+    def test_delete_batch_no_pool(self, mock_types_db, delete_file):
+        OrphanManager.delete_orphan_units('rpm', [{'_id': 'a', '_storage_path': '/a'}])
+
+        delete_file.assert_called_once_with('/a')
+
+    @patch('pulp.server.managers.content.orphan.content_types_db')
+    def test_delete_empty_batch(self, mock_types_db):
+        OrphanManager.delete_orphan_units('rpm', [])
+
+        self.assertFalse(mock_types_db.type_units_collection.called)
+
+
+class TestDeleteOrphansStep(TestCase):
+
+    @patch('pulp.server.managers.content.orphan.ORPHAN_BATCH_SIZE', 2)
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete_orphan_units')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.generate_orphans_by_type')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.orphans_count_by_type',
+           return_value=3)
+    def test_process(self, count, generate, delete_units):
+        units = [{'_id': 'a'}, {'_id': 'b'}, {'_id': 'c'}]
+        generate.return_value = iter(units)
+        conduit = MagicMock()
+        parent = Step('parent', status_conduit=conduit, non_halting_exceptions=[])
+        step = DeleteOrphansStep('rpm')
+        parent.add_child(step)
+
+        parent.process_lifecycle()
+
+        self.assertEqual(delete_units.call_count, 2)
+        self.assertEqual(delete_units.call_args_list[0][0][1], tuple(units[:2]))
+        self.assertEqual(delete_units.call_args_list[1][0][1], tuple(units[2:]))
+        self.assertEqual(step.total_units, 3)
+        self.assertEqual(step.progress_successes, 3)
+        self.assertEqual(step.state, reporting_constants.STATE_COMPLETE)
+        self.assertTrue(step.pool is None)
+        self.assertTrue(conduit.set_progress.called)
+
+    @patch('pulp.server.managers.content.orphan.OrphanManager.generate_orphans_by_ids')
+    def test_total_for_ids(self, generate):
+        step = DeleteOrphansStep('rpm', ['a', 'b', 'a'])
+
+        self.assertEqual(step._get_total(), 2)
+        step.get_iterator()
+        generate.assert_called_once_with('rpm', ['a', 'b', 'a'], fields=['_id', '_storage_path'])
+
+    @patch('pulp.server.managers.content.orphan.ORPHAN_BATCH_SIZE', 1)
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete_orphan_units')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.generate_orphans_by_type')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.orphans_count_by_type',
+           return_value=3)
+    def test_canceled(self, count, generate, delete_units):
+        generate.return_value = iter([{'_id': 'a'}, {'_id': 'b'}, {'_id': 'c'}])
+        step = DeleteOrphansStep('rpm')
+        step.status_conduit = MagicMock()
+        # the task is canceled while the first batch is deleted
+        delete_units.side_effect = lambda *args: step.cancel()
+
+        step.process()
+
+        self.assertEqual(delete_units.call_count, 1)
+        self.assertTrue(step.pool is None)
+
+
+class TestProcessDeleteSteps(TestCase):
+
+    @patch('pulp.server.managers.content.orphan.OrphanConduit')
+    @patch('pulp.server.managers.content.orphan.register_sigterm_handler')
+    def test_cancel(self, register, conduit):
+        step = DeleteOrphansStep('rpm')
+
+        OrphanManager._process_delete_steps([step])
+
+        conduit.assert_called_once_with(reporting_constants.ORPHAN_STEP_DELETE)
+        register.return_value.assert_called_once_with()
+        # canceling the task sends SIGTERM, whose handler cancels the steps
+        handler = register.call_args[0][1]
+        handler()
+        self.assertTrue(step.canceled)
@@ -87,7 +87,7 @@ class PulpContentQueryTests(PulpContentTests):
         self.assertEqual(len(units), 2)
 
 
-@mock.patch('pulp.plugins.types.database.type_units_unit_key', return_value=['a'])
+@mock.patch('pulp.plugins.types.database.type_units_unit_key_fields', return_value=('a',))
 @mock.patch('pulp.plugins.types.database.type_units_collection')
 class TestGetContentUnitIDs(unittest.TestCase):
     def setUp(self):
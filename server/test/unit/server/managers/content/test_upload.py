@@ -1,6 +1,10 @@
+from cStringIO import StringIO
+import hashlib
 import os
 import shutil
 
+import mock
+
 from .... import base
 from pulp.devel import mock_plugins
 from pulp.plugins.conduits.upload import UploadConduit
@@ -9,6 +13,7 @@ from pulp.server.db.model.auth import User
 from pulp.server.db.model.repository import Repo, RepoImporter
 from pulp.server.exceptions import (MissingResource, PulpDataException, PulpExecutionException,
                                     InvalidValue)
+from pulp.server.managers.content import upload
 from pulp.server.managers.repo.unit_association import OWNER_TYPE_USER
 import pulp.server.managers.factory as manager_factory
 
@@ -85,6 +90,95 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
         self.assertEqual(expected_size, found_size)
 
+    def test_save_stream(self):
+        upload_id = self.upload_manager.initialize_upload()
+        data = 'x' * (upload.STREAM_BUFFER_SIZE * 2 + 10)
+
+        written = self.upload_manager.save_stream(upload_id, 5, StringIO(data))
+
+        self.assertEqual(written, len(data))
+        self.assertEqual(self.upload_manager.read_upload(upload_id), '\0' * 5 + data)
+
+    def test_save_data_ledger(self):
+        upload_id = self.upload_manager.initialize_upload(size=9, checksum_type='sha256')
+
+        # out of order, with one segment saved twice
+        self.upload_manager.save_data(upload_id, 6, 'ghi')
+        self.upload_manager.save_data(upload_id, 0, 'abc')
+        self.upload_manager.save_data(upload_id, 0, 'abc')
+
+        status = self.upload_manager.upload_status(upload_id)
+        self.assertEqual(status['size'], 9)
+        self.assertEqual(status['received'], [[0, 3], [6, 9]])
+        self.assertFalse(status['complete'])
+        self.assertEqual(status['segments'], [
+            {'offset': 0, 'length': 3, 'checksum': hashlib.sha256('abc').hexdigest()},
+            {'offset': 6, 'length': 3, 'checksum': hashlib.sha256('ghi').hexdigest()},
+        ])
+
+        self.upload_manager.save_data(upload_id, 3, 'def')
+
+        status = self.upload_manager.upload_status(upload_id)
+        self.assertEqual(status['received'], [[0, 9]])
+        self.assertTrue(status['complete'])
+
+    def test_save_stream_reads_ledger_description(self):
+        upload_id = self.upload_manager.initialize_upload(checksum_type='sha256')
+        self.upload_manager.save_data(upload_id, 0, 'abc')
+        ledger = self.upload_manager._upload_ledger(upload_id)
+
+        self.assertEqual(ledger.description(), {'size': None, 'checksum_type': 'sha256'})
+
+        # only the description is needed to save a segment, so the ledger is not read in full
+        with mock.patch.object(upload.UploadLedger, 'read') as mock_read:
+            self.upload_manager.save_data(upload_id, 3, 'def')
+        self.assertFalse(mock_read.called)
+
+        status = self.upload_manager.upload_status(upload_id)
+        self.assertEqual(status['segments'][-1]['checksum'], hashlib.sha256('def').hexdigest())
+
+    def test_ledger_description_no_ledger(self):
+        ledger = upload.UploadLedger(
+            os.path.join(self.upload_manager._upload_storage_dir(), 'missing.ledger'))
+
+        self.assertEqual(ledger.description(), None)
+
+    def test_upload_status_no_size(self):
+        upload_id = self.upload_manager.initialize_upload()
+
+        status = self.upload_manager.upload_status(upload_id)
+        self.assertEqual(status['received'], [])
+        self.assertTrue(status['complete'])
+        self.assertEqual(status['checksum_type'], None)
+
+        self.upload_manager.save_data(upload_id, 4, 'bar')
+
+        status = self.upload_manager.upload_status(upload_id)
+        self.assertFalse(status['complete'])
+        self.assertEqual(status['segments'], [{'offset': 4, 'length': 3, 'checksum': None}])
+
+        self.upload_manager.save_data(upload_id, 0, 'foo ')
+
+        self.assertTrue(self.upload_manager.upload_status(upload_id)['complete'])
+
+    def test_upload_status_no_ledger(self):
+        upload_id = self.upload_manager.initialize_upload()
+        os.remove(self.upload_manager._upload_ledger(upload_id).path)
+
+        self.upload_manager.save_data(upload_id, 4, 'bar')
+
+        status = self.upload_manager.upload_status(upload_id)
+        self.assertTrue(status['complete'])
+        self.assertEqual(status['received'], None)
+
+    def test_upload_status_missing(self):
+        self.assertRaises(MissingResource, self.upload_manager.upload_status, 'foo')
+
+    def test_initialize_upload_invalid(self):
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload, -1)
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload, '10')
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload, 10, 'fake')
+
     def test_save_no_init(self):
 
         # Test
@@ -108,6 +202,7 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
         # Verify
         self.assertTrue(not os.path.exists(uploaded_filename))
+        self.assertFalse(self.upload_manager._upload_ledger(upload_id).exists())
 
     def test_delete_non_existent_upload(self):
 
@@ -204,6 +299,18 @@ class ContentUploadManagerTests(base.PulpServerTests):
         mock_plugins.MOCK_IMPORTER.upload_unit.return_value = None
         manager_factory.principal_manager().set_principal(principal=None)
 
+    def test_import_uploaded_unit_incomplete(self):
+        self.repo_manager.create_repo('repo-u')
+        self.importer_manager.set_importer('repo-u', 'mock-importer', {})
+
+        upload_id = self.upload_manager.initialize_upload(size=10)
+        self.upload_manager.save_data(upload_id, 0, 'abc')
+        mock_plugins.MOCK_IMPORTER.upload_unit.reset_mock()
+
+        self.assertRaises(PulpDataException, self.upload_manager.import_uploaded_unit, 'repo-u',
+                          'mock-type', {}, {}, upload_id)
+        self.assertFalse(mock_plugins.MOCK_IMPORTER.upload_unit.called)
+
     def test_import_uploaded_unit_missing_repo(self):
         # Test
         self.assertRaises(MissingResource, self.upload_manager.import_uploaded_unit, 'fake',
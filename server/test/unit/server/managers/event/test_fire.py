@@ -1,9 +1,12 @@
+import unittest
+
 import mock
 
 from .... import base
 from pulp.server.db.model.event import EventListener
 from pulp.server.event import data as event_data, notifiers
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.event import fire
 
 
 class EventFireManagerTests(base.PulpServerTests):
@@ -18,6 +21,7 @@ class EventFireManagerTests(base.PulpServerTests):
         super(EventFireManagerTests, self).tearDown()
 
         EventListener.get_collection().remove()
+        fire.listener_cache.invalidate()
         notifiers.reset()
 
     def test_do_fire(self):
@@ -141,3 +145,68 @@ class EventFireManagerTests(base.PulpServerTests):
 
         self.assertEqual(event.event_type, event_data.TYPE_REPO_SYNC_FINISHED)
         self.assertEqual(event.payload, result)
+
+    def test_listeners_cached(self):
+        # Setup
+        notifiers.NOTIFIER_FUNCTIONS.clear()
+
+        notifier_1 = mock.Mock()
+
+        notifiers.NOTIFIER_FUNCTIONS['notifier_1'] = notifier_1.fire
+
+        self.event_manager.create('notifier_1', {}, [event_data.TYPE_REPO_SYNC_STARTED])
+        event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
+        self.manager._do_fire(event)
+
+        # Test
+        # a listener removed by another process is used until the cache expires
+        EventListener.get_collection().remove()
+        self.manager._do_fire(event)
+        fire.listener_cache.invalidate()
+        self.manager._do_fire(event)
+
+        # Verify
+        self.assertEqual(2, notifier_1.fire.call_count)
+
+    def test_listeners_invalidated(self):
+        # Setup
+        notifiers.NOTIFIER_FUNCTIONS.clear()
+
+        notifier_1 = mock.Mock()
+
+        notifiers.NOTIFIER_FUNCTIONS['notifier_1'] = notifier_1.fire
+
+        created = self.event_manager.create('notifier_1', {}, [event_data.TYPE_REPO_SYNC_STARTED])
+        event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
+        self.manager._do_fire(event)
+
+        # Test
+        self.event_manager.update(created['_id'], event_types=[event_data.TYPE_REPO_SYNC_FINISHED])
+        self.manager._do_fire(event)
+        self.event_manager.delete(created['_id'])
+        self.manager._do_fire(event_data.Event(event_data.TYPE_REPO_SYNC_FINISHED, 'payload'))
+
+        # Verify
+        self.assertEqual(1, notifier_1.fire.call_count)
+
+
+class ListenerCacheTests(unittest.TestCase):
+
+    @mock.patch('pulp.server.managers.event.fire.time')
+    @mock.patch('pulp.server.managers.event.fire.EventListener')
+    def test_listeners(self, mock_event_listener, mock_time):
+        mock_time.time.side_effect = [100, 100 + fire.LISTENER_CACHE_TTL - 1,
+                                      100 + fire.LISTENER_CACHE_TTL]
+        mock_event_listener.get_collection.return_value.find.return_value = [
+            {'event_types': [event_data.TYPE_REPO_SYNC_STARTED]},
+            {'event_types': ['*']},
+            {'event_types': event_data.TYPE_REPO_SYNC_FINISHED},
+        ]
+        cache = fire.ListenerCache()
+
+        for i in range(3):
+            listeners = cache.listeners(event_data.TYPE_REPO_SYNC_FINISHED)
+
+        self.assertEqual([l['event_types'] for l in listeners],
+                         [['*'], event_data.TYPE_REPO_SYNC_FINISHED])
+        self.assertEqual(mock_event_listener.get_collection.return_value.find.call_count, 2)
@@ -632,6 +632,13 @@ class RepoManagerTests(base.ResourceReservationTests):
         self.assertEquals(call[0], 'foo')
         self.assertEquals(call[1], 'last_unit_added')
 
+    @mock.patch('pulp.server.managers.repo.cud.Repo.get_collection')
+    def test_update_content_revision(self, mock_repo_collection):
+        revision = self.manager.update_content_revision('foo_repo')
+        mock_repo_collection.return_value.update.assert_called_once_with(
+            {'id': 'foo_repo'}, {'$set': {'content_revision': revision}}, safe=True)
+        self.assertNotEqual(revision, self.manager.update_content_revision('foo_repo'))
+
     @mock.patch('pulp.server.managers.repo.cud.RepoManager._set_current_date_on_field')
     def test_update_last_unit_removed(self, mock_set_date):
         self.manager.update_last_unit_removed('foo')
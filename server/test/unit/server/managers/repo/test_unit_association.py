@@ -119,6 +119,26 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
         self.assertEqual(1, len(repo_units))
         self.assertEqual('unit-1', repo_units[0]['unit_id'])
 
+    def test_associate_by_id_content_revision(self):
+        """
+        Tests that the repo's content revision changes only when a new unit is associated.
+        """
+        # Test
+        self.manager.associate_unit_by_id(self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_USER,
+                                          'admin')
+        first_revision = Repo.get_collection().find_one({'id': self.repo_id})['content_revision']
+        self.manager.associate_unit_by_id(self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_IMPORTER,
+                                          'test-importer')
+        second_revision = Repo.get_collection().find_one({'id': self.repo_id})['content_revision']
+        self.manager.associate_unit_by_id(self.repo_id, 'type-1', 'unit-2', OWNER_TYPE_USER,
+                                          'admin')
+        third_revision = Repo.get_collection().find_one({'id': self.repo_id})['content_revision']
+
+        # Verify
+        self.assertTrue(first_revision is not None)
+        self.assertEqual(first_revision, second_revision)
+        self.assertNotEqual(second_revision, third_revision)
+
     def test_associate_invalid_owner_type(self):
         # Test
         self.assertRaises(exceptions.InvalidValue, self.manager.associate_unit_by_id,
@@ -171,6 +191,20 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
         self.manager.unassociate_unit_by_id(self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_USER,
                                             'admin')
 
+    def test_unassociate_by_id_content_revision(self):
+        # Setup
+        self.manager.associate_unit_by_id(self.repo_id, self.unit_type_id, self.unit_id,
+                                          OWNER_TYPE_USER, 'admin')
+        revision = Repo.get_collection().find_one({'id': self.repo_id})['content_revision']
+
+        # Test
+        self.manager.unassociate_unit_by_id(self.repo_id, self.unit_type_id, self.unit_id,
+                                            OWNER_TYPE_USER, 'admin')
+
+        # Verify
+        repo = Repo.get_collection().find_one({'id': self.repo_id})
+        self.assertNotEqual(repo['content_revision'], revision)
+
     def test_associate_from_repo_no_criteria(self):
         # Setup
         source_repo_id = 'source-repo'
@@ -457,6 +491,34 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
 
         mock_call.assert_called_once_with(self.repo_id, 'type-1', 2)
 
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_associate_all_no_repo_metadata(self, mock_count, mock_last_added):
+        ret = self.manager.associate_all_by_ids(self.repo_id, 'type-1', ['foo', 'bar'],
+                                                OWNER_TYPE_USER, 'admin',
+                                                update_repo_metadata=False)
+
+        self.assertEqual(ret, 2)
+        self.assertEqual(mock_count.call_count, 0)
+        self.assertEqual(mock_last_added.call_count, 0)
+
+    @mock.patch('pulp.server.managers.repo.unit_association.ASSOCIATE_BATCH_SIZE', 2)
+    def test_associate_all_batches(self):
+        self.manager.associate_unit_by_id(self.repo_id, 'type-1', 'bar', OWNER_TYPE_IMPORTER,
+                                          'imp')
+        ids = ['foo', 'bar', 'baz', 'foo', 'qux']
+
+        ret = self.manager.associate_all_by_ids(self.repo_id, 'type-1', iter(ids),
+                                                OWNER_TYPE_USER, 'admin')
+
+        self.assertEqual(ret, 3)
+        repo_units = list(RepoContentUnit.get_collection().find({'repo_id': self.repo_id}))
+        self.assertEqual(len(repo_units), 4)
+
+    def test_associate_all_invalid_owner_type(self):
+        self.assertRaises(exceptions.InvalidValue, self.manager.associate_all_by_ids,
+                          self.repo_id, 'type-1', ['foo'], 'bad-owner', 'irrelevant')
+
     def test_unassociate_all(self):
         """
         Tests unassociating multiple units in a single call.
@@ -2,6 +2,7 @@
 This module contains tests for the pulp.server.managers.resources module.
 """
 from datetime import datetime
+import Queue
 import types
 
 import mock
@@ -10,7 +11,7 @@ import pymongo
 from ...base import ResourceReservationTests
 from pulp.server.exceptions import NoWorkers
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.resources import Worker
+from pulp.server.db.model.resources import ReservedResource, Worker
 from pulp.server.managers import resources
 
 
@@ -56,49 +57,27 @@ class TestFilterWorkers(ResourceReservationTests):
 class TestGetWorkerForReservation(ResourceReservationTests):
 
     def setUp(self):
-        self.patch_a = mock.patch('pulp.server.managers.resources.resources', autospec=True)
-        self.mock_resources = self.patch_a.start()
-
-        self.patch_b = mock.patch('pulp.server.managers.resources.criteria', autospec=True)
-        self.mock_criteria = self.patch_b.start()
+        self.patch_a = mock.patch('pulp.server.managers.resources.reservation_table',
+                                  autospec=True)
+        self.mock_table = self.patch_a.start()
 
         super(TestGetWorkerForReservation, self).setUp()
 
     def tearDown(self):
         self.patch_a.stop()
-        self.patch_b.stop()
         super(TestGetWorkerForReservation, self).tearDown()
 
-    def test_existing_reservation_correctly_found(self):
-        resources.get_worker_for_reservation('resource1')
-        get_collection = self.mock_resources.ReservedResource.get_collection
-        get_collection.assert_called_once_with()
-        get_collection.return_value.find_one.assert_called_once_with({'resource_id': 'resource1'})
-
-    def test_criteria_by_name_for_a_found_reservation_built_correctly(self):
-        find_one = self.mock_resources.ReservedResource.get_collection.return_value.find_one
-        find_one.return_value = {'worker_name': 'worker1'}
+    def test_table_refreshed(self):
         resources.get_worker_for_reservation('resource1')
-        self.mock_criteria.Criteria.assert_called_once_with({'_id': 'worker1'})
+        self.mock_table.refresh.assert_called_once_with()
 
-    def test_correct_worker_bson_found(self):
-        find_one = self.mock_resources.ReservedResource.get_collection.return_value.find_one
-        find_one.return_value = {'worker_name': 'worker1'}
-        resources.get_worker_for_reservation('resource1')
-        get_collection = self.mock_resources.Worker.get_collection
-        get_collection.assert_called_once_with()
-        query = get_collection.return_value.query
-        query.assert_called_once_with(self.mock_criteria.Criteria.return_value)
-
-    def test_correct_worker_returned(self):
-        find_one = self.mock_resources.ReservedResource.get_collection.return_value.find_one
-        find_one.return_value = {'worker_name': 'worker1'}
+    def test_existing_reservation_correctly_found(self):
         result = resources.get_worker_for_reservation('resource1')
-        self.assertTrue(result is self.mock_resources.Worker.from_bson.return_value)
+        self.mock_table.get_worker_for_resource.assert_called_once_with('resource1')
+        self.assertEqual(result, self.mock_table.get_worker_for_resource.return_value)
 
-    def test_no_workers_raised_if_no_reservations(self):
-        find_one = self.mock_resources.ReservedResource.get_collection.return_value.find_one
-        find_one.return_value = False
+    def test_no_reservation_found(self):
+        self.mock_table.get_worker_for_resource.return_value = None
         try:
             resources.get_worker_for_reservation('resource1')
         except NoWorkers:
@@ -110,63 +89,24 @@ class TestGetWorkerForReservation(ResourceReservationTests):
 class TestGetUnreservedWorker(ResourceReservationTests):
 
     def setUp(self):
-        self.patch_a = mock.patch('pulp.server.managers.resources.filter_workers')
-        self.mock_filter_workers = self.patch_a.start()
-
-        self.patch_b = mock.patch('pulp.server.managers.resources.criteria')
-        self.mock_criteria = self.patch_b.start()
-
-        self.patch_c = mock.patch('pulp.server.managers.resources.resources', autospec=True)
-        self.mock_resources = self.patch_c.start()
+        self.patch_a = mock.patch('pulp.server.managers.resources.reservation_table',
+                                  autospec=True)
+        self.mock_table = self.patch_a.start()
 
         super(TestGetUnreservedWorker, self).setUp()
 
     def tearDown(self):
         self.patch_a.stop()
-        self.patch_b.stop()
-        self.patch_c.stop()
         super(TestGetUnreservedWorker, self).tearDown()
 
-    def test_workers_correctly_queried(self):
-        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
-        resources.get_unreserved_worker()
-        self.mock_criteria.Criteria.assert_called_once_with()
-        self.mock_filter_workers.assert_called_once_with(self.mock_criteria.Criteria.return_value)
-
-    def test_reserved_resources_queried_correctly(self):
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'b'}]
-        try:
-            resources.get_unreserved_worker()
-        except NoWorkers:
-            pass
-        else:
-            self.fail("NoWorkers() Exception should have been raised.")
-        self.mock_resources.ReservedResource.get_collection.assert_called_once_with()
-        find.assert_called_once_with()
-
     def test_worker_returned_when_one_worker_is_not_reserved(self):
-        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}]
-        result = resources.get_unreserved_worker()
-        self.assertEqual(result, {'name': 'b'})
+        result = resources.get_unreserved_worker('resource1')
+        self.mock_table.refresh.assert_called_once_with()
+        self.mock_table.get_unreserved_worker.assert_called_once_with('resource1')
+        self.assertEqual(result, self.mock_table.get_unreserved_worker.return_value)
 
     def test_no_workers_raised_when_all_workers_reserved(self):
-        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'b'}]
-        try:
-            resources.get_unreserved_worker()
-        except NoWorkers:
-            pass
-        else:
-            self.fail("NoWorkers() Exception should have been raised.")
-
-    def test_no_workers_raised_when_there_are_no_workers(self):
-        self.mock_filter_workers.return_value = []
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'b'}]
+        self.mock_table.get_unreserved_worker.return_value = None
         try:
             resources.get_unreserved_worker()
         except NoWorkers:
@@ -182,3 +122,147 @@ class TestGetUnreservedWorker(ResourceReservationTests):
 
     def test_is_not_worker_is_resource_mgr(self):
         self.assertEquals(resources._is_worker("resource_manager@some.hostname"), False)
+
+
+class TestNotify(ResourceReservationTests):
+
+    @mock.patch('pulp.server.managers.resources.celery')
+    def test_notify_released(self, mock_celery):
+        resources.notify_released('task1')
+        mock_celery.producer_or_acquire.assert_called_once_with()
+        producer = mock_celery.producer_or_acquire.return_value.__enter__.return_value
+        producer.publish.assert_called_once_with(
+            {'type': resources.EVENT_RELEASED, 'task_id': 'task1'},
+            exchange=resources._event_exchange, routing_key=resources.RESERVATION_EVENT_QUEUE,
+            declare=[resources._event_queue], serializer='json')
+        self.assertFalse(mock_celery.connection.called)
+
+    def test_event_queue(self):
+        # the queue is declared the same way as the SimpleQueue the events are received from
+        queue = resources._event_queue
+        self.assertEqual(queue.name, resources.RESERVATION_EVENT_QUEUE)
+        self.assertEqual(queue.routing_key, resources.RESERVATION_EVENT_QUEUE)
+        self.assertEqual(queue.exchange.name, resources.RESERVATION_EVENT_QUEUE)
+        self.assertEqual(queue.exchange.type, 'direct')
+        self.assertTrue(queue.durable)
+        self.assertTrue(queue.exchange.durable)
+
+    @mock.patch('pulp.server.managers.resources.celery')
+    def test_notify_workers_changed(self, mock_celery):
+        resources.notify_workers_changed()
+        producer = mock_celery.producer_or_acquire.return_value.__enter__.return_value
+        self.assertEqual(producer.publish.call_args[0][0],
+                         {'type': resources.EVENT_WORKERS_CHANGED})
+
+    @mock.patch('pulp.server.managers.resources._logger')
+    @mock.patch('pulp.server.managers.resources.celery')
+    def test_notify_error_logged(self, mock_celery, mock_logger):
+        mock_celery.producer_or_acquire.side_effect = IOError()
+        resources.notify_released('task1')
+        self.assertEqual(mock_logger.exception.call_count, 1)
+
+
+class TestReservationTable(ResourceReservationTests):
+
+    def setUp(self):
+        super(TestReservationTable, self).setUp()
+        now = datetime.utcnow()
+        for name in ('worker_1', 'worker_2', 'resource_manager@host'):
+            Worker(name, now).save()
+        ReservedResource('task1', 'worker_1', 'resource1').save()
+        self.table = resources.ReservationTable()
+        self.queue = mock.Mock()
+        self.queue.get.side_effect = Queue.Empty()
+        self.table._queue = self.queue
+
+    def message(self, event):
+        message = mock.Mock()
+        message.payload = event
+        return message
+
+    def test_load(self):
+        self.table.load()
+        self.assertTrue(self.table.loaded)
+        self.assertEqual(sorted(self.table.workers), ['worker_1', 'worker_2'])
+        self.assertEqual(self.table.tasks, {'task1': ('worker_1', 'resource1')})
+        self.assertEqual(self.table.get_worker_for_resource('resource1').name, 'worker_1')
+        self.assertEqual(self.table.get_unreserved_worker().name, 'worker_2')
+
+    def test_add_and_release(self):
+        self.table.load()
+        self.table.add('task2', 'worker_1', 'resource1')
+        self.table.add('task3', 'worker_2', 'resource2')
+        self.assertEqual(self.table.get_unreserved_worker(), None)
+        self.table.release('task1')
+        self.assertEqual(self.table.get_worker_for_resource('resource1').name, 'worker_1')
+        self.table.release('task2')
+        self.assertEqual(self.table.get_worker_for_resource('resource1'), None)
+        self.assertEqual(self.table.get_unreserved_worker().name, 'worker_1')
+        # unknown tasks are ignored
+        self.table.release('task2')
+
+    def test_counts(self):
+        self.table.load()
+        self.table.add('task2', 'worker_1', 'resource1')
+        self.table.add('task3', 'worker_1', 'resource2')
+        self.assertEqual(self.table.queue_depth('worker_1'), 3)
+        self.assertEqual(self.table.reserved_resource_count('worker_1'), 2)
+        self.table.release('task1')
+        self.table.release('task3')
+        self.assertEqual(self.table.queue_depth('worker_1'), 1)
+        self.assertEqual(self.table.reserved_resource_count('worker_1'), 1)
+        self.table.release('task2')
+        self.assertEqual(self.table.queue_depth('worker_1'), 0)
+        self.assertEqual(self.table.reserved_resource_count('worker_1'), 0)
+        self.assertEqual(self.table.depths, {})
+        self.assertEqual(self.table.reserved, {})
+
+    def test_refresh_loads_once(self):
+        self.table.refresh()
+        ReservedResource.get_collection().remove()
+        self.table.refresh()
+        self.assertEqual(self.table.tasks, {'task1': ('worker_1', 'resource1')})
+        self.assertEqual(self.queue.get.call_count, 2)
+        self.queue.get.assert_called_with(block=False, timeout=None)
+
+    def test_refresh_applies_events(self):
+        self.table.load()
+        message = self.message({'type': resources.EVENT_RELEASED, 'task_id': 'task1'})
+        self.queue.get.side_effect = [message, Queue.Empty()]
+        self.table.refresh()
+        message.ack.assert_called_once_with()
+        self.assertEqual(self.table.tasks, {})
+
+    def test_workers_changed_event_reloads(self):
+        self.table.load()
+        Worker('worker_3', datetime.utcnow()).save()
+        message = self.message({'type': resources.EVENT_WORKERS_CHANGED})
+        self.queue.get.side_effect = [message, Queue.Empty()]
+        self.table.refresh()
+        self.assertTrue('worker_3' in self.table.workers)
+
+    def test_wait_applies_event(self):
+        self.table.load()
+        self.table.load = mock.Mock()
+        message = self.message({'type': resources.EVENT_RELEASED, 'task_id': 'task1'})
+        self.queue.get.side_effect = [message, Queue.Empty()]
+        self.table.wait(5)
+        self.assertEqual(self.queue.get.call_args_list,
+                         [mock.call(block=True, timeout=5), mock.call(block=False, timeout=5)])
+        self.assertFalse(self.table.load.called)
+        self.assertEqual(self.table.tasks, {})
+
+    def test_wait_timeout_reloads(self):
+        self.table.load = mock.Mock()
+        self.table.wait(5)
+        self.table.load.assert_called_once_with()
+
+    @mock.patch('pulp.server.managers.resources._logger')
+    @mock.patch('pulp.server.managers.resources.time')
+    def test_wait_error_reloads(self, mock_time, mock_logger):
+        self.table.load = mock.Mock()
+        self.queue.get.side_effect = IOError()
+        self.table.wait(5)
+        mock_time.sleep.assert_called_once_with(resources.EVENT_ERROR_INTERVAL)
+        self.table.load.assert_called_once_with()
+        self.assertEqual(self.table._queue, None)
@@ -12,6 +12,7 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import copy
+import json
 import unittest
 
 from datetime import datetime
@@ -98,3 +99,43 @@ class JSONControllerTests(unittest.TestCase):
                 (('Content-Type', 'application/json'), {}),
                 (('Content-Length', len(encoded)), {}),
             ])
+
+    @patch('pulp.server.webservices.http.header')
+    def test_output_stream(self, header):
+        """
+        Test json encoding of a stream of items.
+        """
+        items = iter([{'a': 1}, [2, 3], 'four'])
+
+        # test
+        controller = JSONController()
+        encoded = controller._output_stream(items)
+
+        # validation
+        header.assert_called_once_with('Content-Type', 'application/json')
+        self.assertEqual(json.loads(''.join(encoded)), [{'a': 1}, [2, 3], 'four'])
+
+    def test_output_stream_empty(self):
+        """
+        Test json encoding of an empty stream of items.
+        """
+        encoded = JSONController._generate_json_array(iter([]))
+
+        self.assertEqual(''.join(encoded), '[]')
+
+    @patch('pulp.server.webservices.http.status_ok')
+    @patch('pulp.server.webservices.http.header')
+    def test_ok_stream(self, header, status_ok):
+        """
+        Test that the items are only read as the response is generated.
+        """
+        def items():
+            yield {'a': 1}
+            self.fail('The stream should not be read past the first item')
+
+        controller = JSONController()
+        encoded = controller.ok_stream(items())
+
+        status_ok.assert_called_once_with()
+        self.assertEqual(encoded.next(), '[')
+        self.assertEqual(encoded.next(), '{"a": 1}')
@@ -18,11 +18,15 @@ class SearchTaskCollectionTests(PulpWebservicesTests):
         return TaskStatus(task_id='foo', spawned_tasks=['bar', 'baz'])
 
     @mock.patch('pulp.server.webservices.controllers.dispatch.SearchTaskCollection.'
-                '_get_query_results_from_get', autospec=True)
-    def test_get(self, mock_get_results):
+                '_get_criteria_from_get', autospec=True)
+    def test_get(self, mock_get_criteria):
         search_controller = dispatch_controller.SearchTaskCollection()
-        mock_get_results.return_value = [self.get_task()]
-        processed_tasks_json = search_controller.GET()
+        search_controller.query_method = mock.Mock(return_value=iter([self.get_task()]))
+        processed_tasks_json = ''.join(search_controller.GET())
+
+        # the tasks are streamed from the query
+        search_controller.query_method.assert_called_once_with(
+            mock_get_criteria.return_value)
 
         # Mimic the processing
         updated_task = dispatch_controller.task_serializer(self.get_task())
@@ -33,11 +37,15 @@ class SearchTaskCollectionTests(PulpWebservicesTests):
         self.validate_auth(authorization.READ)
 
     @mock.patch('pulp.server.webservices.controllers.dispatch.SearchTaskCollection.'
-                '_get_query_results_from_post', autospec=True)
-    def test_post(self, mock_get_results):
+                '_get_criteria_from_post', autospec=True)
+    def test_post(self, mock_get_criteria):
         search_controller = dispatch_controller.SearchTaskCollection()
-        mock_get_results.return_value = [self.get_task()]
-        processed_tasks_json = search_controller.POST()
+        search_controller.query_method = mock.Mock(return_value=iter([self.get_task()]))
+        processed_tasks_json = ''.join(search_controller.POST())
+
+        # the tasks are streamed from the query
+        search_controller.query_method.assert_called_once_with(
+            mock_get_criteria.return_value)
 
         # Mimic the processing
         updated_task = dispatch_controller.task_serializer(self.get_task())
@@ -46,3 +54,19 @@ class SearchTaskCollectionTests(PulpWebservicesTests):
 
         # validate the permissions
         self.validate_auth(authorization.READ)
+
+    @mock.patch('pulp.server.webservices.http.status_ok')
+    @mock.patch('pulp.server.webservices.controllers.dispatch.SearchTaskCollection.'
+                '_get_criteria_from_post', autospec=True)
+    def test_post_query_error(self, mock_get_criteria, mock_status_ok):
+        def tasks():
+            raise ValueError('bad criteria')
+            yield
+
+        search_controller = dispatch_controller.SearchTaskCollection()
+        search_controller.query_method = mock.Mock(return_value=tasks())
+
+        # the error is raised before the response is started, so it is reported with an error
+        # status instead of a truncated body
+        self.assertRaises(ValueError, search_controller.POST)
+        self.assertFalse(mock_status_ok.called)
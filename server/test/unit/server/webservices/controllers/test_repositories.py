@@ -1730,6 +1730,30 @@ class TestRepoApplicabilityRegeneration(base.PulpWebserviceTests):
         self.assertEquals(status, 202)
         self.assertTrue('task_id' in body['spawned_tasks'][0])
 
+    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
+    def test_regenerate_applicability_parallel(self, mock_get_worker_for_reservation):
+        # Setup
+        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
+        self.populate()
+        self.populate_bindings()
+        # Test
+        request_body = dict(repo_criteria={'filters': self.REPO_FILTER}, parallel=True)
+        status, body = self.post(self.PATH, request_body)
+        # Verify
+        self.assertEquals(status, 202)
+        self.assertTrue('task_id' in body['spawned_tasks'][0])
+
+    def test_regenerate_applicability_wrong_parallel(self):
+        # Setup
+        self.populate()
+        # Test
+        request_body = dict(repo_criteria={'filters': self.REPO_FILTER}, parallel='foo')
+        status, body = self.post(self.PATH, request_body)
+        # Verify
+        self.assertEquals(status, 400)
+        self.assertTrue(body['property_names'] == ['parallel'])
+        self.assertFalse('task_id' in body)
+
     def test_regenerate_applicability_no_criteria(self):
         # Setup
         self.populate()
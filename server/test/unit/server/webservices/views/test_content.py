@@ -53,6 +53,7 @@ class TestOrphanCollectionView(unittest.TestCase):
                 '_href': '/mock/path/',
             },
         }
+        mock_orphan_manager.orphans_summary.assert_called_once_with(use_cache=True)
         mock_resp.assert_called_once_with(expected_content)
         self.assertTrue(response is mock_resp.return_value)
 
@@ -571,12 +572,36 @@ class TestUploadsCollectionView(unittest.TestCase):
         content_types_view = UploadsCollectionView()
         response = content_types_view.post(request)
 
-        self.assertTrue(mock_upload_manager.initialize_upload.called)
+        mock_upload_manager.initialize_upload.assert_called_once_with(None, None)
 
         mock_resp.assert_called_once_with({'upload_id': 'mock_id', '_href': '/mock/path/'})
         mock_redirect.assert_called_once_with(mock_resp.return_value, '/mock/path/')
         self.assertTrue(response is mock_redirect.return_value)
 
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_CREATE())
+    @mock.patch('pulp.server.webservices.views.content.generate_redirect_response')
+    @mock.patch('pulp.server.webservices.views.content.generate_json_response')
+    @mock.patch('pulp.server.webservices.views.content.reverse')
+    @mock.patch('pulp.server.webservices.views.content.factory')
+    def test_post_uploads_collection_view_size(self, mock_factory, mock_reverse, mock_resp,
+                                               mock_redirect):
+        """
+        The size and checksum type in the body should be passed to the manager.
+        """
+        mock_upload_manager = mock.MagicMock()
+        mock_upload_manager.initialize_upload.return_value = 'mock_id'
+        mock_factory.content_upload_manager.return_value = mock_upload_manager
+
+        request = mock.MagicMock()
+        request.body = '{"size": 1024, "checksum_type": "sha256"}'
+        mock_reverse.return_value = '/mock/path/'
+
+        content_types_view = UploadsCollectionView()
+        content_types_view.post(request)
+
+        mock_upload_manager.initialize_upload.assert_called_once_with(1024, 'sha256')
+
 
 class TestUploadSegmentResourceView(unittest.TestCase):
     """
@@ -594,12 +619,13 @@ class TestUploadSegmentResourceView(unittest.TestCase):
         mock_upload_manager = mock.MagicMock()
         mock_factory.content_upload_manager.return_value = mock_upload_manager
         request = mock.MagicMock()
-        request.body = 'upload these bits'
 
         upload_segment_resource = UploadSegmentResourceView()
         response = upload_segment_resource.put(request, 'mock_id', 4)
 
-        mock_upload_manager.save_data.assert_called_once_with('mock_id', 4, 'upload these bits')
+        # the body is streamed from the request rather than read into memory
+        mock_upload_manager.save_stream.assert_called_once_with('mock_id', 4, request)
+        self.assertFalse(mock_upload_manager.save_data.called)
         mock_resp.assert_called_once_with(None)
         self.assertTrue(response is mock_resp.return_value)
 
@@ -625,6 +651,28 @@ class TestUploadResourceView(unittest.TestCase):
     Tests for views of a single upload.
     """
 
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.content.generate_json_response')
+    @mock.patch('pulp.server.webservices.views.content.factory')
+    def test_get_upload_resource_view(self, mock_factory, mock_resp):
+        """
+        View should return the received parts of an upload.
+        """
+        mock_upload_manager = mock.MagicMock()
+        mock_upload_manager.upload_status.return_value = {'received': [[0, 10]],
+                                                          'complete': True}
+        mock_factory.content_upload_manager.return_value = mock_upload_manager
+        request = mock.MagicMock()
+
+        upload_resource_view = UploadResourceView()
+        response = upload_resource_view.get(request, 'mock_unit')
+
+        mock_upload_manager.upload_status.assert_called_once_with('mock_unit')
+        mock_resp.assert_called_once_with({'upload_id': 'mock_unit', 'received': [[0, 10]],
+                                           'complete': True})
+        self.assertTrue(response is mock_resp.return_value)
+
     @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
                 new=assert_auth_DELETE())
     @mock.patch('pulp.server.webservices.views.content.generate_json_response')
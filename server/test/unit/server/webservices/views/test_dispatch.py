@@ -1,12 +1,17 @@
 import mock
 import unittest
 
+from bson.objectid import ObjectId
 from mongoengine.queryset import DoesNotExist
 
 from .base import assert_auth_DELETE, assert_auth_READ
-from pulp.server.exceptions import MissingResource
-from pulp.server.webservices.views.dispatch import (TaskCollectionView, TaskResourceView,
-                                                    task_serializer)
+from pulp.server.exceptions import InvalidValue, MissingResource
+from pulp.server.webservices.views.dispatch import (TASK_DETAIL_FIELDS, TaskCollectionView,
+                                                    TaskResourceView, task_serializer)
+
+
+TASK_FIELDS = ('id', 'task_id', 'worker_name', 'tags', 'state', 'error', 'spawned_tasks',
+               'progress_report', 'task_type', 'start_time', 'finish_time', 'result')
 
 
 @mock.patch('pulp.server.webservices.views.dispatch.serialization')
@@ -35,51 +40,149 @@ class TestTaskCollection(unittest.TestCase):
     Tests for TaskCollectionView.
     """
 
+    def setUp(self):
+        self.request = mock.MagicMock()
+        self.params = {}
+        self.list_params = {}
+        self.request.GET.get.side_effect = lambda k, d=None: self.params.get(k, d)
+        self.request.GET.getlist.side_effect = lambda k: self.list_params.get(k, [])
+
+    def get(self, mock_task_status, tasks):
+        """
+        Call the view and return the serialized tasks and the query set that was iterated.
+        """
+        query_set = mock_task_status.objects.return_value
+        for method in ('order_by', 'only', 'exclude', 'limit'):
+            getattr(query_set, method).return_value = query_set
+        query_set.__iter__.return_value = iter(tasks)
+        mock_task_status._fields = dict((f, None) for f in TASK_FIELDS)
+
+        with mock.patch('pulp.server.webservices.views.dispatch.'
+                        'generate_streaming_json_response_with_pulp_encoder') as mock_resp:
+            response = TaskCollectionView().get(self.request)
+
+        self.assertTrue(response is mock_resp.return_value)
+        return list(mock_resp.call_args[0][0]), query_set
+
     @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
                 new=assert_auth_READ())
     @mock.patch('pulp.server.webservices.views.dispatch.task_serializer')
     @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
-    @mock.patch('pulp.server.webservices.views.dispatch.generate_json_response_with_pulp_encoder')
-    def test_get_task_collection(self, mock_resp, mock_task_status, mock_task_serializer):
+    def test_get_task_collection(self, mock_task_status, mock_task_serializer):
         """
         Test get task_collection with tags.
         """
+        self.list_params['tag'] = ['mock_tag_1', 'mock_tag_2']
+        mock_task_serializer.side_effect = lambda x: {'id': x}
 
-        mock_request = mock.MagicMock()
-        mock_request.GET.getlist.return_value = ['mock_tag_1', 'mock_tag_2']
-        mock_task_status.objects.return_value = ['mock_1', 'mock_2']
-        mock_task_serializer.side_effect = lambda x: x
-
-        task_collection = TaskCollectionView()
-        response = task_collection.get(mock_request)
+        tasks, query_set = self.get(mock_task_status, ['mock_1', 'mock_2'])
 
         mock_task_status.objects.assert_called_once_with(tags__all=['mock_tag_1', 'mock_tag_2'])
-        mock_resp.assert_called_once_with(['mock_1', 'mock_2'])
+        query_set.order_by.assert_called_once_with('id')
+        self.assertEqual(tasks, [{'id': 'mock_1'}, {'id': 'mock_2'}])
         mock_task_serializer.assert_has_calls([mock.call('mock_1'), mock.call('mock_2')])
-        self.assertTrue(response is mock_resp.return_value)
 
     @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
                 new=assert_auth_READ())
     @mock.patch('pulp.server.webservices.views.dispatch.task_serializer')
     @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
-    @mock.patch('pulp.server.webservices.views.dispatch.generate_json_response_with_pulp_encoder')
-    def test_get_task_collection_no_tags(self, mock_resp, mock_task_status, mock_task_serializer):
+    def test_get_task_collection_no_tags(self, mock_task_status, mock_task_serializer):
         """
-        Test get task_collection with no tags.
+        Test get task_collection with no tags. The large fields are left out by default.
         """
+        mock_task_serializer.side_effect = lambda x: {'id': x, 'progress_report': {},
+                                                      'result': None, 'state': 'running'}
 
-        mock_request = mock.MagicMock()
-        mock_request.GET.getlist.return_value = []
-        mock_task_status.objects.return_value = ['mock_1', 'mock_2']
-        mock_task_serializer.side_effect = lambda x: x
-
-        task_collection = TaskCollectionView()
-        response = task_collection.get(mock_request)
+        tasks, query_set = self.get(mock_task_status, ['mock_1', 'mock_2'])
 
         mock_task_status.objects.assert_called_once_with()
-        mock_resp.assert_called_once_with(['mock_1', 'mock_2'])
-        mock_task_serializer.assert_has_calls([mock.call('mock_1'), mock.call('mock_2')])
-        self.assertTrue(response is mock_resp.return_value)
+        query_set.exclude.assert_called_once_with(*TASK_DETAIL_FIELDS)
+        self.assertFalse(query_set.limit.called)
+        self.assertEqual(tasks, [{'id': 'mock_1', 'state': 'running'},
+                                 {'id': 'mock_2', 'state': 'running'}])
+
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.dispatch.task_serializer')
+    @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
+    def test_get_task_collection_details(self, mock_task_status, mock_task_serializer):
+        """
+        Test get task_collection with the large fields included.
+        """
+        self.params['details'] = 'True'
+        task = {'id': 'mock_1', 'progress_report': {'a': 1}, 'result': 'foo'}
+        mock_task_serializer.side_effect = lambda x: dict(task)
+
+        tasks, query_set = self.get(mock_task_status, ['mock_1'])
+
+        self.assertFalse(query_set.exclude.called)
+        self.assertEqual(tasks, [task])
+
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.dispatch.task_serializer')
+    @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
+    def test_get_task_collection_fields(self, mock_task_status, mock_task_serializer):
+        """
+        Test get task_collection with a projection.
+        """
+        self.list_params['field'] = ['state']
+        mock_task_serializer.side_effect = lambda x: {'id': x, '_href': '/mock/', 'state': 'ok',
+                                                      'task_id': 'foo', 'tags': []}
+
+        tasks, query_set = self.get(mock_task_status, ['mock_1'])
+
+        self.assertEqual(sorted(query_set.only.call_args[0]), ['id', 'state', 'task_id'])
+        self.assertEqual(tasks, [{'id': 'mock_1', '_href': '/mock/', 'state': 'ok'}])
+
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.dispatch.task_serializer')
+    @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
+    def test_get_task_collection_page(self, mock_task_status, mock_task_serializer):
+        """
+        Test get task_collection with a limit and marker.
+        """
+        self.params['limit'] = '100'
+        self.params['marker'] = '5390931b81a97875924cc0d1'
+        mock_task_serializer.side_effect = lambda x: {'id': x}
+
+        tasks, query_set = self.get(mock_task_status, ['mock_1'])
+
+        mock_task_status.objects.assert_called_once_with(
+            id__gt=ObjectId('5390931b81a97875924cc0d1'))
+        query_set.limit.assert_called_once_with(100)
+
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.dispatch.'
+                'generate_streaming_json_response_with_pulp_encoder')
+    @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
+    def test_get_task_collection_database_error(self, mock_task_status, mock_resp):
+        """
+        Test that a database error is raised before the response is created.
+        """
+        query_set = mock_task_status.objects.return_value
+        for method in ('order_by', 'only', 'exclude', 'limit'):
+            getattr(query_set, method).return_value = query_set
+        query_set.__iter__.side_effect = IOError()
+
+        self.assertRaises(IOError, TaskCollectionView().get, self.request)
+        self.assertFalse(mock_resp.called)
+
+    @mock.patch('pulp.server.webservices.controllers.decorators._verify_auth',
+                new=assert_auth_READ())
+    @mock.patch('pulp.server.webservices.views.dispatch.TaskStatus')
+    def test_get_task_collection_invalid(self, mock_task_status):
+        """
+        Test get task_collection with invalid paging and projection parameters.
+        """
+        mock_task_status._fields = dict((f, None) for f in TASK_FIELDS)
+        for params, list_params in (({'limit': 'foo'}, {}), ({'limit': '0'}, {}),
+                                    ({'marker': 'foo'}, {}), ({}, {'field': ['foo']})):
+            self.params = params
+            self.list_params = list_params
+            self.assertRaises(InvalidValue, TaskCollectionView().get, self.request)
 
 
 class TestTaskResource(unittest.TestCase):
@@ -58,6 +58,52 @@ class TestResponseGenerators(unittest.TestCase):
         util.generate_json_response_with_pulp_encoder(test_content)
         mock_json.dumps.assert_called_once_with(test_content, default=pulp_json_encoder)
 
+    def test_generate_streaming_json_response(self):
+        """
+        Make sure the items are serialized as the response is read.
+        """
+        read = []
+
+        def items():
+            for i in range(3):
+                read.append(i)
+                yield {'foo': i}
+
+        response = util.generate_streaming_json_response(items())
+        self.assertEqual(read, [])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response._headers.get('content-type'),
+                         ('Content-Type', 'application/json'))
+        response_content = json.loads(''.join(response))
+        self.assertEqual(response_content, [{'foo': 0}, {'foo': 1}, {'foo': 2}])
+
+    @mock.patch('pulp.server.webservices.views.util.StreamingHttpResponse', None)
+    def test_generate_streaming_json_response_not_supported(self):
+        """
+        Make sure a complete response is returned when Django cannot stream responses.
+        """
+        response = util.generate_streaming_json_response(iter([{'foo': 0}, {'foo': 1}]))
+        self.assertTrue(isinstance(response, HttpResponse))
+        self.assertEqual(json.loads(response.content), [{'foo': 0}, {'foo': 1}])
+        # the content can be read more than once, as middleware does
+        self.assertEqual(json.loads(response.content), [{'foo': 0}, {'foo': 1}])
+
+    def test_generate_json_array_empty(self):
+        """
+        Make sure an empty list is generated when there are no items.
+        """
+        self.assertEqual(''.join(util.generate_json_array(iter([]))), '[]')
+
+    @mock.patch('pulp.server.webservices.views.util.json')
+    def test_generate_streaming_json_response_with_pulp_encoder(self, mock_json):
+        """
+        Ensure that the shortcut function uses the specified encoder.
+        """
+        mock_json.dumps.return_value = '{}'
+        response = util.generate_streaming_json_response_with_pulp_encoder([{'foo': 'bar'}])
+        ''.join(response)
+        mock_json.dumps.assert_called_once_with({'foo': 'bar'}, default=pulp_json_encoder)
+
     @mock.patch('pulp.server.webservices.views.util.iri_to_uri')
     def test_generate_redirect_response(self, mock_iri_to_uri):
         """